@@ -144,15 +144,28 @@ USE_TZ = True
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='')
 STRIPE_PUBLISHABLE_KEY = config('STRIPE_PUBLISHABLE_KEY', default='')
 STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='')
+# Antigüedad máxima (segundos) aceptada en la firma de un webhook de Stripe
+STRIPE_WEBHOOK_TOLERANCIA = config('STRIPE_WEBHOOK_TOLERANCIA', default=300, cast=int)
 
 # Pasarela de Pago - Mercado Pago
 MERCADOPAGO_ACCESS_TOKEN = config('MERCADOPAGO_ACCESS_TOKEN', default='')
 MERCADOPAGO_PUBLIC_KEY = config('MERCADOPAGO_PUBLIC_KEY', default='')
+# Clave secreta de webhooks (panel de Mercado Pago > Webhooks) para verificar x-signature
+MERCADOPAGO_WEBHOOK_SECRET = config('MERCADOPAGO_WEBHOOK_SECRET', default='')
 
 # Pasarela de Pago - PayPal
 PAYPAL_CLIENT_ID = config('PAYPAL_CLIENT_ID', default='')
 PAYPAL_SECRET = config('PAYPAL_SECRET', default='')
 PAYPAL_MODE = config('PAYPAL_MODE', default='sandbox')  # sandbox o live
+# Timeout (segundos) y reintentos ante errores transitorios de cada petición a PayPal
+PAYPAL_TIMEOUT = config('PAYPAL_TIMEOUT', default=15, cast=int)
+PAYPAL_REINTENTOS = config('PAYPAL_REINTENTOS', default=3, cast=int)
+
+# URL base de la API de cada pasarela (solo para apuntar a un servidor de pruebas;
+# vacía = la URL oficial, y en PayPal la del PAYPAL_MODE)
+STRIPE_API_URL = config('STRIPE_API_URL', default='https://api.stripe.com')
+MERCADOPAGO_API_URL = config('MERCADOPAGO_API_URL', default='https://api.mercadopago.com')
+PAYPAL_API_URL = config('PAYPAL_API_URL', default='')
 
 # URL del sitio (para webhooks y redirects)
 # Limpiar espacios y comentarios del valor
@@ -174,6 +187,67 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Exportaciones de pagos: por encima de este número de filas se generan en segundo plano
+PAGOS_EXPORTACION_LIMITE_SINCRONO = config('PAGOS_EXPORTACION_LIMITE_SINCRONO', default=20000, cast=int)
+PAGOS_EXPORTACION_PDF_LIMITE_SINCRONO = config('PAGOS_EXPORTACION_PDF_LIMITE_SINCRONO', default=2000, cast=int)
+# Horas durante las que se reutiliza un archivo generado con los mismos filtros y datos
+PAGOS_EXPORTACION_CACHE_HORAS = config('PAGOS_EXPORTACION_CACHE_HORAS', default=24, cast=int)
+# Los PDF más grandes se dividen en tomos que se renderizan en un pool de procesos
+PAGOS_PDF_FILAS_POR_TOMO = config('PAGOS_PDF_FILAS_POR_TOMO', default=50000, cast=int)
+PAGOS_PDF_PROCESOS = config('PAGOS_PDF_PROCESOS', default=0, cast=int) or None
+# Recordatorios de pago: procesos para renderizar las ejecuciones grandes (0 = según CPUs, 1 = sin pool)
+PAGOS_RECORDATORIOS_PROCESOS = config('PAGOS_RECORDATORIOS_PROCESOS', default=0, cast=int) or None
+# Un solo recordatorio por cliente y canal con todos sus pagos por vencer y vencidos
+PAGOS_RECORDATORIOS_RESUMEN = config('PAGOS_RECORDATORIOS_RESUMEN', default=False, cast=bool)
+# Iniciar el trabajo en un hilo al solicitarlo (si es False, lo procesa el comando
+# procesar_exportaciones_pagos desde cron)
+PAGOS_EXPORTACION_HILO = config('PAGOS_EXPORTACION_HILO', default=True, cast=bool)
+
+# Bandeja de webhooks de pasarelas: eventos por lote y reintentos antes de marcar un evento como fallido
+PAGOS_WEBHOOK_LOTE = config('PAGOS_WEBHOOK_LOTE', default=100, cast=int)
+PAGOS_WEBHOOK_MAX_INTENTOS = config('PAGOS_WEBHOOK_MAX_INTENTOS', default=5, cast=int)
+
+# Minutos durante los que una sesión de checkout abierta se reutiliza para el mismo pago
+# (se ajusta a los límites de cada pasarela)
+PAGOS_CHECKOUT_VIGENCIA_MINUTOS = config('PAGOS_CHECKOUT_VIGENCIA_MINUTOS', default=60, cast=int)
+
+# Conciliación de transacciones pendientes con las pasarelas: consultas simultáneas,
+# transacciones por lote y consultas por segundo permitidas en cada pasarela
+PAGOS_CONCILIACION_HILOS = config('PAGOS_CONCILIACION_HILOS', default=16, cast=int)
+PAGOS_CONCILIACION_LOTE = config('PAGOS_CONCILIACION_LOTE', default=500, cast=int)
+PAGOS_CONCILIACION_TASAS = {
+    'stripe': config('PAGOS_CONCILIACION_TASA_STRIPE', default=25, cast=float),
+    'mercadopago': config('PAGOS_CONCILIACION_TASA_MERCADOPAGO', default=10, cast=float),
+    'paypal': config('PAGOS_CONCILIACION_TASA_PAYPAL', default=10, cast=float),
+}
+
+# Importación de estados de cuenta: días de diferencia aceptados entre un abono y el
+# vencimiento de un pago con el mismo monto (esas coincidencias siempre van a revisión),
+# y expresión regular cuyo primer grupo es el número de pago en el concepto del abono
+PAGOS_EXTRACTO_VENTANA_DIAS = config('PAGOS_EXTRACTO_VENTANA_DIAS', default=15, cast=int)
+PAGOS_EXTRACTO_PATRON = config('PAGOS_EXTRACTO_PATRON', default=r'\bPAGO\s*[#:-]?\s*(\d{1,9})\b')
+
+# Envío de notificaciones (send_notifications): hilos y mensajes por segundo de cada canal
+NOTIFICACIONES_CONCURRENCIA = {
+    'email': config('NOTIFICACIONES_HILOS_EMAIL', default=2, cast=int),
+    'sms': config('NOTIFICACIONES_HILOS_SMS', default=4, cast=int),
+    'whatsapp': config('NOTIFICACIONES_HILOS_WHATSAPP', default=4, cast=int),
+}
+NOTIFICACIONES_TASAS = {
+    'email': config('NOTIFICACIONES_TASA_EMAIL', default=25, cast=float),
+    'sms': config('NOTIFICACIONES_TASA_SMS', default=10, cast=float),
+    'whatsapp': config('NOTIFICACIONES_TASA_WHATSAPP', default=10, cast=float),
+}
+# Cola de envío: notificaciones que reclama cada proceso por vez y segundos que dura su
+# reserva (si el proceso muere, vuelven a la cola al vencer; debe superar lo que tarda un lote)
+NOTIFICACIONES_LOTE = config('NOTIFICACIONES_LOTE', default=500, cast=int)
+NOTIFICACIONES_VISIBILIDAD_SEGUNDOS = config('NOTIFICACIONES_VISIBILIDAD_SEGUNDOS', default=300, cast=int)
+# Reintentos ante errores transitorios (SMTP 4xx, Twilio 429/5xx, red): intentos antes de
+# descartar la notificación y espera exponencial (base * 2^intento, con tope) en segundos
+NOTIFICACIONES_MAX_INTENTOS = config('NOTIFICACIONES_MAX_INTENTOS', default=5, cast=int)
+NOTIFICACIONES_REINTENTO_BASE_SEGUNDOS = config('NOTIFICACIONES_REINTENTO_BASE_SEGUNDOS', default=60, cast=int)
+NOTIFICACIONES_REINTENTO_MAX_SEGUNDOS = config('NOTIFICACIONES_REINTENTO_MAX_SEGUNDOS', default=3600, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
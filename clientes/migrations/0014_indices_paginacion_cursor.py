@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:53
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0013_remove_historicalcliente_created_by_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['fecha_registro', 'id'], name='clientes_cl_fecha_r_63f380_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(models.F('apellido1'), django.db.models.functions.comparison.Coalesce('apellido2', models.Value('')), models.F('nombre'), models.F('id'), name='cliente_orden_apellidos_idx'),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
 from django.core.validators import RegexValidator
 from django.utils import timezone
 
@@ -51,6 +53,12 @@ class Cliente(models.Model):
             models.Index(fields=['nombre', 'apellido1']),
             models.Index(fields=['telefono']),
             models.Index(fields=['estado_cliente']),
+            # Órdenes del listado con paginación por cursor (ver clientes/views.py)
+            models.Index(fields=['fecha_registro', 'id']),
+            models.Index(
+                F('apellido1'), Coalesce('apellido2', Value('')), F('nombre'), F('id'),
+                name='cliente_orden_apellidos_idx',
+            ),
         ]
     
     @property
@@ -71,5 +79,6 @@ class Cliente(models.Model):
     
     @property
     def tiene_pagos_pendientes(self):
-        """Verifica si el cliente tiene pagos pendientes."""
-        return self.pagos.filter(estado='pendiente').exists()
+        """Verifica si el cliente tiene pagos sin pagar (pendientes o vencidos), desde su saldo."""
+        from pagos.saldos import SaldosClienteService
+        return SaldosClienteService.de_cliente(self).pagos_pendientes > 0
@@ -6,7 +6,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Sum, Count
+from django.db.models import Q, Count
 from django.core.paginator import Paginator
 from django.http import JsonResponse
 from django.utils import timezone
@@ -14,6 +14,8 @@ from datetime import date, timedelta
 from .models import Cliente
 from pagos.models import Pago, TransaccionPago
 from instalaciones.models import Instalacion
+from pagos.saldos import SaldosClienteService
+from core.estadisticas import calcular_estadisticas, Conteo
 # from .forms import ClienteForm  # No necesario para el portal
 from django.contrib.auth import get_user_model
 
@@ -227,12 +229,15 @@ def portal_dashboard(request, cliente):
         Q(instalacion__isnull=True) | Q(instalacion__cliente=cliente)
     )
     
-    # Estadísticas
-    total_pagos = pagos.count()
-    pagos_pendientes = pagos.filter(estado='pendiente').count()
-    pagos_vencidos = pagos.filter(estado='vencido').count()
-    pagos_pagados = pagos.filter(estado='pagado').count()
-    monto_pendiente = pagos.filter(estado__in=['pendiente', 'vencido']).aggregate(Sum('monto'))['monto__sum'] or 0
+    # Estadísticas (una sola consulta)
+    stats = calcular_estadisticas(pagos, {
+        'total_pagos': Conteo(),
+        'pagos_pendientes': Conteo(Q(estado='pendiente')),
+        'pagos_vencidos': Conteo(Q(estado='vencido')),
+        'pagos_pagados': Conteo(Q(estado='pagado')),
+    })
+    # Saldo desde la fila desnormalizada del cliente (sin recorrer sus pagos)
+    saldo = SaldosClienteService.de_cliente(cliente)
     
     # Filtros
     estado_filter = request.GET.get('estado', '')
@@ -260,11 +265,12 @@ def portal_dashboard(request, cliente):
         'query': query,
         'estado_filter': estado_filter,
         'estados': Pago.ESTADO_CHOICES,
-        'total_pagos': total_pagos,
-        'pagos_pendientes': pagos_pendientes,
-        'pagos_vencidos': pagos_vencidos,
-        'pagos_pagados': pagos_pagados,
-        'monto_pendiente': monto_pendiente,
+        'total_pagos': stats['total_pagos'],
+        'pagos_pendientes': stats['pagos_pendientes'],
+        'pagos_vencidos': stats['pagos_vencidos'],
+        'pagos_pagados': stats['pagos_pagados'],
+        'monto_pendiente': saldo.monto_pendiente,
+        'saldo': saldo,
     }
     
     return render(request, 'clientes/portal_dashboard.html', context)
@@ -286,13 +292,14 @@ def portal_mis_pagos(request, cliente):
         Q(instalacion__isnull=True) | Q(instalacion__cliente=cliente)
     )
     
-    # Estadísticas generales (antes de aplicar filtros)
-    total_pagos = todos_los_pagos.count()
-    pagos_pendientes = todos_los_pagos.filter(estado='pendiente').count()
-    pagos_vencidos = todos_los_pagos.filter(estado='vencido').count()
-    pagos_pagados = todos_los_pagos.filter(estado='pagado').count()
-    monto_pendiente = todos_los_pagos.filter(estado__in=['pendiente', 'vencido']).aggregate(Sum('monto'))['monto__sum'] or 0
-    monto_vencido = todos_los_pagos.filter(estado='vencido').aggregate(Sum('monto'))['monto__sum'] or 0
+    # Estadísticas generales (antes de aplicar filtros, en una sola consulta)
+    stats = calcular_estadisticas(todos_los_pagos, {
+        'total_pagos': Conteo(),
+        'pagos_pendientes': Conteo(Q(estado='pendiente')),
+        'pagos_vencidos': Conteo(Q(estado='vencido')),
+        'pagos_pagados': Conteo(Q(estado='pagado')),
+    })
+    saldo = SaldosClienteService.de_cliente(cliente)
     
     # Próximos vencimientos (próximos 7 días)
     hoy = timezone.now().date()
@@ -360,12 +367,13 @@ def portal_mis_pagos(request, cliente):
         'estado_filter': estado_filter,
         'estados': Pago.ESTADO_CHOICES,
         # Estadísticas
-        'total_pagos': total_pagos,
-        'pagos_pendientes': pagos_pendientes,
-        'pagos_vencidos': pagos_vencidos,
-        'pagos_pagados': pagos_pagados,
-        'monto_pendiente': monto_pendiente,
-        'monto_vencido': monto_vencido,
+        'total_pagos': stats['total_pagos'],
+        'pagos_pendientes': stats['pagos_pendientes'],
+        'pagos_vencidos': stats['pagos_vencidos'],
+        'pagos_pagados': stats['pagos_pagados'],
+        'monto_pendiente': saldo.monto_pendiente,
+        'monto_vencido': saldo.monto_vencido,
+        'saldo': saldo,
         'proximos_vencimientos': proximos_vencimientos,
         'hoy': hoy,
     }
@@ -1,49 +1,47 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from core.busqueda import BusquedaService
+from core.paginacion import PaginadorKeyset
 from .models import Cliente
 from .forms import ClienteForm
+from pagos.saldos import SaldosClienteService
+
+# Órdenes permitidos del listado; cada uno respaldado por un índice compuesto de Cliente.
+# apellido2 admite NULL: se ordena por COALESCE(apellido2, '') para que el cursor sea comparable.
+ORDENES_CLIENTES = {
+    '-fecha_registro': ('-fecha_registro', '-id'),
+    'fecha_registro': ('fecha_registro', 'id'),
+    'nombre': ('apellido1', 'apellido2_orden', 'nombre', 'id'),
+    '-nombre': ('-apellido1', '-apellido2_orden', '-nombre', '-id'),
+}
 
 
 @login_required
 def cliente_list(request):
     """Lista todos los clientes con búsqueda y paginación."""
-    clientes = Cliente.objects.all()
+    # El saldo se lee de la fila desnormalizada del cliente (un JOIN, sin sumar pagos)
+    clientes = Cliente.objects.select_related('saldo')
     
-    # Búsqueda
+    # Búsqueda (sin acentos ni mayúsculas, sobre el documento indexado)
     query = request.GET.get('q', '')
     if query:
-        clientes = clientes.filter(
-            Q(nombre__icontains=query) |
-            Q(apellido1__icontains=query) |
-            Q(apellido2__icontains=query) |
-            Q(telefono__icontains=query) |
-            Q(email__icontains=query) |
-            Q(ciudad__icontains=query)
-        )
+        clientes = BusquedaService.filtrar(clientes, 'cliente', query)
     
     # Filtro por estado
     estado_filter = request.GET.get('estado', '')
     if estado_filter:
         clientes = clientes.filter(estado_cliente=estado_filter)
     
-    # Ordenamiento
-    orden = request.GET.get('orden', '-fecha_registro')
-    # Si el orden es por nombre, ordenar por apellido1 y luego nombre
-    if orden in ['nombre', '-nombre']:
-        if orden == 'nombre':
-            clientes = clientes.order_by('apellido1', 'apellido2', 'nombre')
-        else:
-            clientes = clientes.order_by('-apellido1', '-apellido2', '-nombre')
-    else:
-        clientes = clientes.order_by(orden)
-    
-    # Paginación
-    paginator = Paginator(clientes, 15)  # 15 clientes por página
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Ordenamiento (lista blanca) y paginación por cursor
+    clientes = clientes.annotate(apellido2_orden=Coalesce('apellido2', Value('')))
+    paginador = PaginadorKeyset(
+        clientes, ORDENES_CLIENTES, request.GET.get('orden'), por_pagina=15, con_total_estimado=True
+    )
+    page_obj = paginador.pagina(request.GET.get('cursor'), parametros=request.GET)
+    orden = paginador.orden
     
     context = {
         'page_obj': page_obj,
@@ -71,6 +69,7 @@ def cliente_detail(request, pk):
         'cliente': cliente,
         'instalaciones': instalaciones,
         'pagos': pagos,
+        'saldo': SaldosClienteService.de_cliente(cliente),
     }
     
     return render(request, 'clientes/cliente_detail.html', context)
@@ -7,4 +7,6 @@ class CoreConfig(AppConfig):
     
     def ready(self):
         """Importa las señales cuando la aplicación está lista."""
-        import core.signals  # noqa
\ No newline at end of file
+        import core.signals  # noqa
+        from core.busqueda import conectar_senales
+        conectar_senales()
\ No newline at end of file
@@ -0,0 +1,289 @@
+"""
+Búsqueda de texto indexada para clientes, pagos e instalaciones.
+
+Cada objeto tiene un documento de búsqueda (DocumentoBusqueda) con sus textos
+relevantes normalizados: sin acentos, en minúsculas y con espacios simples, de
+modo que "perez" encuentra "Pérez". Los pagos y las instalaciones incluyen los
+datos de su cliente.
+
+- PostgreSQL: índice GIN con pg_trgm sobre el contenido; cada término se busca con
+  LIKE '%término%' (resuelto por el índice) y se ordena por similitud de trigramas.
+- SQLite: tabla virtual FTS5 con tokenizador trigram, sincronizada por triggers;
+  se ordena por bm25.
+- Otros motores: LIKE sobre el documento normalizado, sin índice.
+
+Los documentos se mantienen con señales (post_save/post_delete, conectadas en
+CoreConfig.ready) y se pueden reconstruir con `manage.py reconstruir_busqueda`.
+
+Uso:
+    clientes = BusquedaService.filtrar(Cliente.objects.all(), 'cliente', 'perez')
+    clientes = BusquedaService.buscar(Cliente.objects.all(), 'cliente', 'perez', limite=15)
+"""
+import logging
+import unicodedata
+from django.apps import apps
+from django.db import connection
+from django.db.models import OuterRef
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_save, post_delete
+from .models import DocumentoBusqueda
+
+logger = logging.getLogger(__name__)
+
+# tipo -> (modelo, campos que forman el documento)
+DOCUMENTOS = {
+    'cliente': (
+        'clientes.Cliente',
+        ('nombre', 'apellido1', 'apellido2', 'telefono', 'email', 'ciudad'),
+    ),
+    'pago': (
+        'pagos.Pago',
+        ('cliente__nombre', 'cliente__apellido1', 'cliente__apellido2', 'cliente__telefono',
+         'concepto', 'referencia_pago'),
+    ),
+    'instalacion': (
+        'instalaciones.Instalacion',
+        ('cliente__nombre', 'cliente__apellido1', 'cliente__apellido2', 'plan_nombre',
+         'numero_contrato', 'direccion_instalacion'),
+    ),
+}
+
+# Documentos que incluyen datos del cliente: se regeneran cuando este cambia
+DEPENDIENTES_CLIENTE = ('pago', 'instalacion')
+
+TABLA_FTS = 'core_documentobusqueda_fts'
+
+# Longitud mínima de un término para el índice de trigramas
+MIN_TRIGRAMA = 3
+
+
+def normalizar(texto):
+    """Texto sin acentos, en minúsculas y con espacios simples."""
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def construir_contenido(valores):
+    """Contenido del documento a partir de los valores de sus campos."""
+    return normalizar(' '.join(str(valor) for valor in valores if valor))
+
+
+def terminos(texto):
+    """Términos normalizados de una búsqueda."""
+    return normalizar(texto).split()
+
+
+def _fts_disponible():
+    """Indica si existe la tabla FTS5 (SQLite con FTS5 y migraciones aplicadas)."""
+    if connection.vendor != 'sqlite':
+        return False
+    if getattr(connection, '_busqueda_fts', False):
+        return True
+    with connection.cursor() as cursor:
+        disponible = TABLA_FTS in connection.introspection.table_names(cursor)
+    if disponible:
+        connection._busqueda_fts = True
+    return disponible
+
+
+class BusquedaService:
+    """Servicio para mantener y consultar los documentos de búsqueda."""
+
+    BATCH_SIZE = 1000
+
+    @staticmethod
+    def modelo(tipo):
+        return apps.get_model(DOCUMENTOS[tipo][0])
+
+    @classmethod
+    def indexar(cls, tipo, queryset=None, batch_size=None):
+        """
+        Crea o actualiza los documentos de los objetos del queryset (por defecto, todos).
+
+        Returns:
+            int: Documentos escritos
+        """
+        batch_size = batch_size or cls.BATCH_SIZE
+        if queryset is None:
+            queryset = cls.modelo(tipo).objects.all()
+        campos = DOCUMENTOS[tipo][1]
+
+        total = 0
+        bloque = []
+        filas = queryset.order_by().values_list('pk', *campos).iterator(chunk_size=batch_size)
+        for pk, *valores in filas:
+            bloque.append(DocumentoBusqueda(tipo=tipo, objeto_id=pk, contenido=construir_contenido(valores)))
+            if len(bloque) >= batch_size:
+                total += cls._escribir(bloque)
+                bloque = []
+        if bloque:
+            total += cls._escribir(bloque)
+        return total
+
+    @staticmethod
+    def _escribir(documentos):
+        DocumentoBusqueda.objects.bulk_create(
+            documentos,
+            update_conflicts=True,
+            unique_fields=['tipo', 'objeto_id'],
+            update_fields=['contenido', 'fecha_actualizacion'],
+        )
+        return len(documentos)
+
+    @classmethod
+    def indexar_faltantes(cls, tipo, queryset=None):
+        """Indexa los objetos del queryset que aún no tienen documento (ej. tras un bulk_create)."""
+        if queryset is None:
+            queryset = cls.modelo(tipo).objects.all()
+        existentes = DocumentoBusqueda.objects.filter(tipo=tipo, objeto_id=OuterRef('pk'))
+        return cls.indexar(tipo, queryset.exclude(pk__in=existentes.values('objeto_id')))
+
+    @classmethod
+    def actualizar_objeto(cls, tipo, pk):
+        """
+        Regenera el documento de un objeto.
+
+        Returns:
+            bool: True si el contenido cambió
+        """
+        campos = DOCUMENTOS[tipo][1]
+        valores = cls.modelo(tipo).objects.filter(pk=pk).values_list(*campos).first()
+        if valores is None:
+            return False
+        contenido = construir_contenido(valores)
+        anterior = DocumentoBusqueda.objects.filter(tipo=tipo, objeto_id=pk).values_list(
+            'contenido', flat=True
+        ).first()
+        if anterior == contenido:
+            return False
+        cls._escribir([DocumentoBusqueda(tipo=tipo, objeto_id=pk, contenido=contenido)])
+        return True
+
+    @staticmethod
+    def eliminar(tipo, ids):
+        DocumentoBusqueda.objects.filter(tipo=tipo, objeto_id__in=ids).delete()
+
+    @classmethod
+    def reconstruir(cls, tipo=None):
+        """
+        Regenera todos los documentos (o los de un tipo) y elimina los huérfanos.
+
+        Returns:
+            dict: tipo -> documentos escritos
+        """
+        resultado = {}
+        for nombre in ([tipo] if tipo else DOCUMENTOS):
+            modelo = cls.modelo(nombre)
+            DocumentoBusqueda.objects.filter(tipo=nombre).exclude(
+                objeto_id__in=modelo.objects.values('pk')
+            ).delete()
+            resultado[nombre] = cls.indexar(nombre)
+            logger.info(f'Documentos de búsqueda reconstruidos ({nombre}): {resultado[nombre]}')
+        return resultado
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def documentos(tipo, texto, ordenar=False):
+        """
+        Documentos del tipo que contienen todos los términos de la búsqueda.
+
+        Args:
+            ordenar: Si es True, ordena por relevancia (más relevante primero)
+
+        Returns:
+            QuerySet de DocumentoBusqueda, o None si la búsqueda no tiene términos
+        """
+        lista = terminos(texto)
+        if not lista:
+            return None
+        documentos = DocumentoBusqueda.objects.filter(tipo=tipo)
+
+        if _fts_disponible():
+            largos = [t for t in lista if len(t) >= MIN_TRIGRAMA]
+            # El tokenizador trigram no indexa términos de menos de 3 caracteres
+            for termino in lista:
+                if len(termino) < MIN_TRIGRAMA:
+                    documentos = documentos.filter(contenido__contains=termino)
+            if largos:
+                consulta = ' '.join('"{}"'.format(t.replace('"', '""')) for t in largos)
+                documentos = documentos.filter(id__in=RawSQL(
+                    f'SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s', [consulta]
+                ))
+                if ordenar:
+                    rango = RawSQL(
+                        f'SELECT bm25({TABLA_FTS}) FROM {TABLA_FTS} '
+                        f'WHERE {TABLA_FTS} MATCH %s AND rowid = core_documentobusqueda.id',
+                        [consulta],
+                    )
+                    return documentos.annotate(rango=rango).order_by('rango', 'objeto_id')
+            return documentos.order_by('objeto_id') if ordenar else documentos
+
+        for termino in lista:
+            documentos = documentos.filter(contenido__contains=termino)
+        if ordenar and connection.vendor == 'postgresql':
+            from django.contrib.postgres.search import TrigramWordSimilarity
+
+            return documentos.annotate(
+                rango=TrigramWordSimilarity(' '.join(lista), 'contenido')
+            ).order_by('-rango', 'objeto_id')
+        return documentos.order_by('objeto_id') if ordenar else documentos
+
+    @classmethod
+    def filtrar(cls, queryset, tipo, texto):
+        """Filtra el queryset a los objetos cuyo documento coincide con la búsqueda."""
+        documentos = cls.documentos(tipo, texto)
+        if documentos is None:
+            return queryset
+        return queryset.filter(pk__in=documentos.values('objeto_id'))
+
+    @classmethod
+    def buscar(cls, queryset, tipo, texto, limite=15):
+        """
+        Los `limite` objetos más relevantes para la búsqueda, en orden de relevancia.
+
+        Returns:
+            list: Instancias del queryset
+        """
+        documentos = cls.documentos(tipo, texto, ordenar=True)
+        if documentos is None:
+            return []
+        ids = list(documentos.values_list('objeto_id', flat=True)[:limite])
+        objetos = queryset.in_bulk(ids)
+        return [objetos[pk] for pk in ids if pk in objetos]
+
+
+# ----------------------------------------------------------------------
+# Señales
+# ----------------------------------------------------------------------
+
+def _al_guardar(tipo):
+    def receptor(sender, instance, raw=False, **kwargs):
+        if raw:
+            return
+        cambiado = BusquedaService.actualizar_objeto(tipo, instance.pk)
+        if tipo == 'cliente' and cambiado:
+            for dependiente in DEPENDIENTES_CLIENTE:
+                BusquedaService.indexar(
+                    dependiente,
+                    BusquedaService.modelo(dependiente).objects.filter(cliente_id=instance.pk),
+                )
+    return receptor
+
+
+def _al_eliminar(tipo):
+    def receptor(sender, instance, **kwargs):
+        BusquedaService.eliminar(tipo, [instance.pk])
+    return receptor
+
+
+def conectar_senales():
+    """Conecta las señales que mantienen los documentos de búsqueda."""
+    for tipo in DOCUMENTOS:
+        modelo = BusquedaService.modelo(tipo)
+        post_save.connect(_al_guardar(tipo), sender=modelo, weak=False, dispatch_uid=f'busqueda_guardar_{tipo}')
+        post_delete.connect(_al_eliminar(tipo), sender=modelo, weak=False, dispatch_uid=f'busqueda_eliminar_{tipo}')
+
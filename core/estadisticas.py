@@ -0,0 +1,141 @@
+"""
+Estadísticas de listados calculadas en una sola consulta.
+
+Las tarjetas de estadísticas de los listados (total, pendientes, vencidos, monto...)
+se declaran como "cubetas" y se resuelven con un único aggregate() usando
+agregaciones condicionales (Count/Sum con filter=Q(...)), en lugar de una
+consulta count()/aggregate() por tarjeta.
+
+Uso:
+    stats = calcular_estadisticas(pagos, {
+        'total_pagos': Conteo(),
+        'pagos_pagados': Conteo(Q(estado='pagado')),
+        'total_monto': Suma('monto'),
+    })
+
+Opcionalmente el resultado se guarda en caché, con una clave formada por los
+parámetros de filtro normalizados y la versión de datos del grupo indicado.
+
+version_datos() vive en la caché del proceso (LocMem): basta para cachés cortas del
+mismo proceso. Lo que se reutiliza entre procesos o por horas debe usar
+version_persistente(), guardada en la base de datos (core.VersionDatos).
+"""
+import hashlib
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum, Q
+
+
+class Conteo:
+    """Cubeta que cuenta las filas que cumplen el filtro (o todas)."""
+
+    def __init__(self, filtro=None):
+        self.filtro = filtro
+
+    def expresion(self):
+        return Count('pk', filter=self.filtro)
+
+
+class Suma:
+    """Cubeta que suma un campo o expresión de las filas que cumplen el filtro."""
+
+    def __init__(self, campo, filtro=None):
+        self.campo = campo
+        self.filtro = filtro
+
+    def expresion(self):
+        return Sum(self.campo, filter=self.filtro)
+
+
+def conteos_por_valor(campo, valores, prefijo=''):
+    """
+    Genera una cubeta Conteo por cada valor de un campo.
+
+    Ejemplo: conteos_por_valor('estado', ['pagado', 'vencido'], 'pagos_')
+    devuelve {'pagos_pagado': Conteo(Q(estado='pagado')), ...}
+    """
+    return {f'{prefijo}{valor}': Conteo(Q(**{campo: valor})) for valor in valores}
+
+
+def version_datos(grupo):
+    """Versión actual de los datos de un grupo (se incrementa al modificarlos)."""
+    return cache.get_or_set(f'estadisticas_version_{grupo}', 1, None)
+
+
+def version_persistente(grupo):
+    """Versión de los datos de un grupo guardada en la base de datos (igual en todos los procesos)."""
+    from .models import VersionDatos
+
+    return VersionDatos.objects.filter(grupo=grupo).values_list('version', flat=True).first() or 1
+
+
+def _incrementar_version_persistente(grupo):
+    from .models import VersionDatos
+
+    if VersionDatos.objects.filter(grupo=grupo).update(version=F('version') + 1):
+        return
+    try:
+        with transaction.atomic():
+            VersionDatos.objects.create(grupo=grupo, version=2)
+    except IntegrityError:
+        # Otro proceso creó la fila en medio
+        VersionDatos.objects.filter(grupo=grupo).update(version=F('version') + 1)
+
+
+def invalidar_estadisticas(grupo):
+    """
+    Invalida las estadísticas en caché de un grupo incrementando su versión.
+
+    La versión persistente se incrementa al confirmar la transacción: así no bloquea
+    su fila mientras dura la transacción que modificó los datos.
+    """
+    clave = f'estadisticas_version_{grupo}'
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, 2, None)
+    transaction.on_commit(lambda: _incrementar_version_persistente(grupo))
+
+
+def _clave_cache(grupo, parametros):
+    normalizados = sorted(
+        (str(clave), str(valor).strip())
+        for clave, valor in parametros.items()
+        if valor not in (None, '')
+    )
+    huella = hashlib.md5(repr(normalizados).encode('utf-8')).hexdigest()
+    return f'estadisticas_{grupo}_v{version_datos(grupo)}_{huella}'
+
+
+def calcular_estadisticas(queryset, cubetas, cache_grupo=None, cache_parametros=None, timeout=300):
+    """
+    Calcula todas las cubetas sobre el queryset con un único aggregate().
+
+    Args:
+        queryset: QuerySet ya filtrado
+        cubetas: dict nombre -> Conteo/Suma
+        cache_grupo: Grupo de datos para la caché (ej. 'pagos'); None desactiva la caché
+        cache_parametros: dict con los parámetros de filtro que definen el queryset
+        timeout: Segundos de vida del resultado en caché
+
+    Returns:
+        dict: nombre -> valor (las sumas sin filas devuelven 0)
+    """
+    clave = None
+    if cache_grupo:
+        clave = _clave_cache(cache_grupo, cache_parametros or {})
+        resultado = cache.get(clave)
+        if resultado is not None:
+            return resultado
+
+    # Alias internos: el nombre de una cubeta puede coincidir con un campo del modelo.
+    # order_by() vacío evita que el ORDER BY del listado llegue al aggregate.
+    nombres = list(cubetas)
+    valores = queryset.order_by().aggregate(
+        **{f'cubeta_{i}': cubetas[nombre].expresion() for i, nombre in enumerate(nombres)}
+    )
+    resultado = {nombre: valores[f'cubeta_{i}'] or 0 for i, nombre in enumerate(nombres)}
+
+    if clave:
+        cache.set(clave, resultado, timeout)
+    return resultado
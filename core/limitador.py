@@ -0,0 +1,35 @@
+"""
+Limitador de tasa (token bucket) compartido entre hilos.
+
+Lo usan los procesos que llaman a servicios externos en paralelo (conciliación con
+las pasarelas, envío de notificaciones) para no superar sus límites de peticiones.
+"""
+import threading
+import time
+
+
+class LimitadorTasa:
+    """
+    Token bucket: permite `tasa` peticiones por segundo con ráfagas de hasta `capacidad`.
+
+    Es seguro entre hilos; `adquirir()` bloquea hasta que haya un token disponible.
+    """
+
+    def __init__(self, tasa, capacidad=None):
+        self.tasa = float(tasa)
+        self.capacidad = float(capacidad or max(1.0, tasa))
+        self._tokens = self.capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+                self._ultimo = ahora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                espera = (1 - self._tokens) / self.tasa
+            time.sleep(espera)
@@ -0,0 +1,28 @@
+"""
+Comando de gestión para reconstruir los documentos de búsqueda.
+
+Uso:
+    python manage.py reconstruir_busqueda
+    python manage.py reconstruir_busqueda --tipo pago
+
+Los documentos se mantienen con señales; este comando los regenera desde los
+datos (por ejemplo, después de cargas con loaddata o actualizaciones masivas).
+"""
+from django.core.management.base import BaseCommand
+from core.busqueda import BusquedaService, DOCUMENTOS
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los documentos de búsqueda de clientes, pagos e instalaciones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tipo',
+            choices=list(DOCUMENTOS),
+            help='Reconstruir solo los documentos de este tipo',
+        )
+
+    def handle(self, *args, **options):
+        resultado = BusquedaService.reconstruir(tipo=options.get('tipo'))
+        for tipo, cantidad in resultado.items():
+            self.stdout.write(self.style.SUCCESS(f'✓ {tipo}: {cantidad} documento(s) indexado(s).'))
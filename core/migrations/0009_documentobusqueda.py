@@ -0,0 +1,124 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:56
+
+import unicodedata
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+# Copias congeladas de core/busqueda.py al crear esta migración: la migración no debe
+# cambiar si después cambian los campos indexados o la normalización.
+TABLA_FTS = 'core_documentobusqueda_fts'
+
+DOCUMENTOS = {
+    'cliente': (
+        'clientes.Cliente',
+        ('nombre', 'apellido1', 'apellido2', 'telefono', 'email', 'ciudad'),
+    ),
+    'pago': (
+        'pagos.Pago',
+        ('cliente__nombre', 'cliente__apellido1', 'cliente__apellido2', 'cliente__telefono',
+         'concepto', 'referencia_pago'),
+    ),
+    'instalacion': (
+        'instalaciones.Instalacion',
+        ('cliente__nombre', 'cliente__apellido1', 'cliente__apellido2', 'plan_nombre',
+         'numero_contrato', 'direccion_instalacion'),
+    ),
+}
+
+
+def construir_contenido(valores):
+    """Contenido sin acentos, en minúsculas y con espacios simples."""
+    texto = unicodedata.normalize('NFKD', ' '.join(str(valor) for valor in valores if valor))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+# PostgreSQL: índice GIN de trigramas (resuelve LIKE '%término%')
+SQL_POSTGRESQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX documento_busqueda_trgm_idx ON core_documentobusqueda '
+    'USING gin (contenido gin_trgm_ops)',
+]
+
+# SQLite: tabla FTS5 de contenido externo sincronizada por triggers.
+# Si una migración futura reconstruye core_documentobusqueda, hay que recrear los triggers
+# y ejecutar INSERT INTO core_documentobusqueda_fts(core_documentobusqueda_fts) VALUES('rebuild').
+SQL_SQLITE = [
+    f"CREATE VIRTUAL TABLE {TABLA_FTS} USING fts5("
+    f"contenido, content='core_documentobusqueda', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER core_documentobusqueda_ai AFTER INSERT ON core_documentobusqueda BEGIN "
+    f"INSERT INTO {TABLA_FTS}(rowid, contenido) VALUES (new.id, new.contenido); END",
+    f"CREATE TRIGGER core_documentobusqueda_ad AFTER DELETE ON core_documentobusqueda BEGIN "
+    f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, contenido) VALUES ('delete', old.id, old.contenido); END",
+    f"CREATE TRIGGER core_documentobusqueda_au AFTER UPDATE ON core_documentobusqueda BEGIN "
+    f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, contenido) VALUES ('delete', old.id, old.contenido); "
+    f"INSERT INTO {TABLA_FTS}(rowid, contenido) VALUES (new.id, new.contenido); END",
+]
+
+
+def crear_indice_texto(apps, schema_editor):
+    """Crea el índice de texto según el motor de base de datos."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in SQL_POSTGRESQL:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        try:
+            for sql in SQL_SQLITE:
+                schema_editor.execute(sql)
+        except OperationalError:
+            # SQLite compilado sin FTS5: la búsqueda usa LIKE sobre el documento normalizado
+            pass
+
+
+def eliminar_indice_texto(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS documento_busqueda_trgm_idx')
+    elif vendor == 'sqlite':
+        for trigger in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS core_documentobusqueda_{trigger}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABLA_FTS}')
+
+
+def poblar_documentos(apps, schema_editor):
+    """Genera los documentos de búsqueda de los objetos existentes."""
+    DocumentoBusqueda = apps.get_model('core', 'DocumentoBusqueda')
+    for tipo, (modelo, campos) in DOCUMENTOS.items():
+        Modelo = apps.get_model(modelo)
+        bloque = []
+        for pk, *valores in Modelo.objects.order_by().values_list('pk', *campos).iterator(chunk_size=1000):
+            bloque.append(DocumentoBusqueda(tipo=tipo, objeto_id=pk, contenido=construir_contenido(valores)))
+            if len(bloque) >= 1000:
+                DocumentoBusqueda.objects.bulk_create(bloque)
+                bloque = []
+        DocumentoBusqueda.objects.bulk_create(bloque)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_remove_configuracionsistema_pagos_online_habilitados'),
+        ('clientes', '0014_indices_paginacion_cursor'),
+        ('instalaciones', '0011_indices_paginacion_cursor'),
+        ('pagos', '0011_indices_paginacion_cursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('cliente', 'Cliente'), ('pago', 'Pago'), ('instalacion', 'Instalación')], max_length=20, verbose_name='Tipo')),
+                ('objeto_id', models.BigIntegerField(verbose_name='ID del objeto')),
+                ('contenido', models.TextField(verbose_name='Contenido normalizado')),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')),
+            ],
+            options={
+                'verbose_name': 'Documento de Búsqueda',
+                'verbose_name_plural': 'Documentos de Búsqueda',
+                'constraints': [models.UniqueConstraint(fields=('tipo', 'objeto_id'), name='unique_documento_busqueda')],
+            },
+        ),
+        migrations.RunPython(crear_indice_texto, eliminar_indice_texto),
+        migrations.RunPython(poblar_documentos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_versiondatos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaTarea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tarea', models.CharField(max_length=50, unique=True, verbose_name='Tarea')),
+                ('fecha', models.DateField(blank=True, null=True, verbose_name='Última ejecución')),
+            ],
+            options={
+                'verbose_name': 'Marca de Tarea',
+                'verbose_name_plural': 'Marcas de Tareas',
+            },
+        ),
+    ]
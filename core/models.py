@@ -459,3 +459,72 @@ class UsuarioRol(models.Model):
     
     def __str__(self):
         return f"{self.usuario.username} - {self.rol.nombre}"
+
+
+class DocumentoBusqueda(models.Model):
+    """
+    Documento de búsqueda normalizado (sin acentos y en minúsculas) de un objeto.
+
+    Se mantiene con señales (ver core/busqueda.py) y se indexa con trigramas:
+    índice GIN pg_trgm en PostgreSQL y tabla virtual FTS5 en SQLite.
+    """
+    
+    TIPO_CHOICES = [
+        ('cliente', 'Cliente'),
+        ('pago', 'Pago'),
+        ('instalacion', 'Instalación'),
+    ]
+    
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, verbose_name='Tipo')
+    objeto_id = models.BigIntegerField(verbose_name='ID del objeto')
+    contenido = models.TextField(verbose_name='Contenido normalizado')
+    fecha_actualizacion = models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')
+    
+    class Meta:
+        verbose_name = 'Documento de Búsqueda'
+        verbose_name_plural = 'Documentos de Búsqueda'
+        constraints = [
+            models.UniqueConstraint(fields=['tipo', 'objeto_id'], name='unique_documento_busqueda'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.objeto_id}"
+
+
+class VersionDatos(models.Model):
+    """
+    Versión de los datos de un grupo (ej. 'pagos'), compartida por todos los procesos.
+
+    La incrementa invalidar_estadisticas (ver core/estadisticas.py) al confirmarse cada
+    cambio; sirve de clave para resultados guardados fuera del proceso, como las
+    exportaciones reutilizables, que no pueden depender de la caché local.
+    """
+    
+    grupo = models.CharField(max_length=50, unique=True, verbose_name='Grupo')
+    version = models.PositiveBigIntegerField(default=1, verbose_name='Versión')
+    
+    class Meta:
+        verbose_name = 'Versión de Datos'
+        verbose_name_plural = 'Versiones de Datos'
+    
+    def __str__(self):
+        return f"{self.grupo} v{self.version}"
+
+
+class MarcaTarea(models.Model):
+    """
+    Última fecha en que se ejecutó una tarea periódica (ej. el barrido de pagos vencidos).
+
+    Compartida por todos los procesos: los workers web y el cron consultan la misma
+    marca, y bloquear su fila con select_for_update evita que la tarea corra dos veces a la vez.
+    """
+    
+    tarea = models.CharField(max_length=50, unique=True, verbose_name='Tarea')
+    fecha = models.DateField(null=True, blank=True, verbose_name='Última ejecución')
+    
+    class Meta:
+        verbose_name = 'Marca de Tarea'
+        verbose_name_plural = 'Marcas de Tareas'
+    
+    def __str__(self):
+        return f"{self.tarea}: {self.fecha or 'nunca'}"
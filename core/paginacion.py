@@ -0,0 +1,258 @@
+"""
+Paginación por cursor (keyset) para listados grandes.
+
+A diferencia de django.core.paginator.Paginator, no ejecuta COUNT(*) ni usa OFFSET:
+cada página se obtiene con un WHERE sobre los valores de la última fila vista,
+por lo que una página profunda cuesta lo mismo que la primera.
+
+- Los órdenes permitidos se declaran en una lista blanca; cada orden termina en un
+  campo único (normalmente 'id' o '-id') y debe estar respaldado por un índice
+  compuesto en el modelo (ej. Index(fields=['fecha_vencimiento', 'id'])).
+- Los cursores son opacos (base64 de JSON) e incluyen la dirección de navegación.
+- Opcionalmente se obtiene un total estimado desde las estadísticas del planificador
+  (EXPLAIN) en PostgreSQL; en otros motores no se estima.
+
+Uso:
+    ORDENES = {
+        '-fecha_vencimiento': ('-fecha_vencimiento', '-id'),
+        'fecha_vencimiento': ('fecha_vencimiento', 'id'),
+    }
+    paginador = PaginadorKeyset(pagos, ORDENES, request.GET.get('orden'), por_pagina=20)
+    page_obj = paginador.pagina(request.GET.get('cursor'), parametros=request.GET)
+"""
+import base64
+import binascii
+import datetime
+import decimal
+import json
+import logging
+from django.db import connections
+from django.db.models import Q
+from django.utils.http import urlencode
+
+logger = logging.getLogger(__name__)
+
+PARAMETRO_CURSOR = 'cursor'
+
+
+class _CodificadorCursor(json.JSONEncoder):
+    """Serializa fechas con microsegundos completos (DjangoJSONEncoder los trunca)."""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.date, datetime.time)):
+            return o.isoformat()
+        if isinstance(o, decimal.Decimal):
+            return str(o)
+        return super().default(o)
+
+
+def codificar_cursor(valores, direccion):
+    datos = json.dumps({'v': valores, 'd': direccion}, cls=_CodificadorCursor, separators=(',', ':'))
+    return base64.urlsafe_b64encode(datos.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Devuelve (valores, direccion) o None si el cursor no es válido."""
+    if not cursor:
+        return None
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno).decode('utf-8'))
+        valores, direccion = datos['v'], datos['d']
+    except (ValueError, KeyError, TypeError, binascii.Error, UnicodeDecodeError):
+        return None
+    if direccion not in ('siguiente', 'anterior') or not isinstance(valores, list):
+        return None
+    return valores, direccion
+
+
+def estimar_total(queryset):
+    """
+    Total estimado de filas según el planificador de PostgreSQL (sin COUNT).
+
+    Returns:
+        int o None: None si el motor no es PostgreSQL o la estimación falla
+    """
+    conexion = connections[queryset.db]
+    if conexion.vendor != 'postgresql':
+        return None
+    try:
+        sql, params = queryset.order_by().query.sql_with_params()
+        with conexion.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    except Exception as e:
+        logger.warning(f'No se pudo estimar el total del listado: {str(e)}')
+        return None
+
+
+def _invertir(campo):
+    return campo[1:] if campo.startswith('-') else f'-{campo}'
+
+
+def _valor(objeto, campo):
+    """Valor de un campo (con '__' para relaciones) en una instancia o dict."""
+    if isinstance(objeto, dict):
+        return objeto[campo]
+    for parte in campo.split('__'):
+        objeto = getattr(objeto, parte)
+        if objeto is None:
+            return None
+    return objeto
+
+
+class PaginaKeyset:
+    """Página de resultados con cursores al estilo de Page de Django."""
+
+    def __init__(self, object_list, has_next, has_previous, campos, total_estimado=None, parametros=None):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.total_estimado = total_estimado
+        self._campos = campos
+        self._parametros = parametros
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def __getitem__(self, indice):
+        return self.object_list[indice]
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def _cursor(self, objeto, direccion):
+        return codificar_cursor([_valor(objeto, campo.lstrip('-')) for campo in self._campos], direccion)
+
+    @property
+    def cursor_siguiente(self):
+        if not self.has_next or not self.object_list:
+            return None
+        return self._cursor(self.object_list[-1], 'siguiente')
+
+    @property
+    def cursor_anterior(self):
+        if not self.has_previous or not self.object_list:
+            return None
+        return self._cursor(self.object_list[0], 'anterior')
+
+    def _querystring(self, cursor):
+        """Query string con los filtros actuales y el cursor indicado."""
+        parametros = []
+        if self._parametros is not None:
+            for clave, valores in self._parametros.lists():
+                if clave in (PARAMETRO_CURSOR, 'page'):
+                    continue
+                parametros.extend((clave, valor) for valor in valores if valor != '')
+        if cursor:
+            parametros.append((PARAMETRO_CURSOR, cursor))
+        return urlencode(parametros)
+
+    @property
+    def querystring_siguiente(self):
+        return self._querystring(self.cursor_siguiente)
+
+    @property
+    def querystring_anterior(self):
+        return self._querystring(self.cursor_anterior)
+
+    @property
+    def querystring_primera(self):
+        return self._querystring(None)
+
+
+class PaginadorKeyset:
+    """
+    Paginador por cursor sobre un queryset.
+
+    Args:
+        queryset: QuerySet filtrado (su orden se reemplaza por el de la lista blanca)
+        ordenes: dict nombre -> tupla de campos; el último campo debe ser único
+        orden: Nombre del orden pedido; si no está en la lista blanca se usa el primero
+        por_pagina: Filas por página
+        con_total_estimado: Si es True, calcula el total estimado (solo PostgreSQL)
+    """
+
+    def __init__(self, queryset, ordenes, orden=None, por_pagina=20, con_total_estimado=False):
+        self.queryset = queryset
+        self.ordenes = ordenes
+        self.orden = orden if orden in ordenes else next(iter(ordenes))
+        self.campos = ordenes[self.orden]
+        self.por_pagina = por_pagina
+        self.con_total_estimado = con_total_estimado
+
+    def _condicion(self, campos, valores):
+        """
+        Filas estrictamente posteriores a `valores` en el orden de `campos`.
+
+        (a, b) > (x, y) se expande a: a > x OR (a = x AND b > y). Se añade a >= x
+        para que el motor pueda usar el índice compuesto como rango.
+        """
+        condicion = Q()
+        iguales = Q()
+        for campo, valor in zip(campos, valores):
+            nombre = campo.lstrip('-')
+            operador = 'lt' if campo.startswith('-') else 'gt'
+            condicion |= iguales & Q(**{f'{nombre}__{operador}': valor})
+            iguales &= Q(**{nombre: valor})
+        primero = campos[0]
+        rango = Q(**{f"{primero.lstrip('-')}__{'lte' if primero.startswith('-') else 'gte'}": valores[0]})
+        return rango & condicion
+
+    def pagina(self, cursor=None, parametros=None):
+        """
+        Obtiene la página indicada por el cursor (la primera si no hay cursor).
+
+        Args:
+            cursor: Cursor recibido en la URL (inválido = primera página)
+            parametros: QueryDict de la petición, para construir los enlaces
+        """
+        decodificado = decodificar_cursor(cursor)
+        if decodificado and len(decodificado[0]) != len(self.campos):
+            decodificado = None
+
+        queryset = self.queryset
+        if decodificado is None:
+            filas = list(queryset.order_by(*self.campos)[:self.por_pagina + 1])
+            has_next = len(filas) > self.por_pagina
+            has_previous = False
+            filas = filas[:self.por_pagina]
+        else:
+            valores, direccion = decodificado
+            if direccion == 'siguiente':
+                filas = list(
+                    queryset.filter(self._condicion(self.campos, valores))
+                    .order_by(*self.campos)[:self.por_pagina + 1]
+                )
+                has_next = len(filas) > self.por_pagina
+                has_previous = True
+                filas = filas[:self.por_pagina]
+            else:
+                # Hacia atrás: recorrer el orden invertido y voltear el resultado
+                invertidos = tuple(_invertir(campo) for campo in self.campos)
+                filas = list(
+                    queryset.filter(self._condicion(invertidos, valores))
+                    .order_by(*invertidos)[:self.por_pagina + 1]
+                )
+                has_previous = len(filas) > self.por_pagina
+                has_next = True
+                filas = filas[:self.por_pagina][::-1]
+
+        total_estimado = estimar_total(self.queryset) if self.con_total_estimado else None
+        return PaginaKeyset(
+            filas,
+            has_next=has_next,
+            has_previous=has_previous,
+            campos=self.campos,
+            total_estimado=total_estimado,
+            parametros=parametros,
+        )
@@ -0,0 +1,71 @@
+"""
+Tests para la búsqueda indexada sin acentos.
+"""
+import pytest
+from django.urls import reverse
+from clientes.models import Cliente
+from core.busqueda import BusquedaService, normalizar
+from core.models import DocumentoBusqueda
+from pagos.filtros import filtrar_pagos
+from pagos.models import Pago
+
+
+def buscar_clientes(texto):
+    return list(BusquedaService.filtrar(Cliente.objects.all(), 'cliente', texto))
+
+
+@pytest.mark.django_db
+class TestBusqueda:
+    """Tests para BusquedaService y el mantenimiento de los documentos."""
+
+    def test_normalizar(self):
+        """Test: Se eliminan acentos, mayúsculas y espacios repetidos."""
+        assert normalizar('  José  PÉREZ Muñoz ') == 'jose perez munoz'
+
+    def test_ignora_acentos_y_mayusculas(self, cliente):
+        """Test: "perez" encuentra a "Pérez" y "PÉREZ garc" también."""
+        assert buscar_clientes('perez') == [cliente]
+        assert buscar_clientes('PÉREZ garc') == [cliente]
+        assert buscar_clientes('perez lopez') == []
+        assert buscar_clientes('') == [cliente]
+
+    def test_terminos_cortos(self, cliente):
+        """Test: Términos de menos de tres caracteres también filtran."""
+        assert buscar_clientes('ju') == [cliente]
+        assert buscar_clientes('zz') == []
+
+    def test_documentos_se_mantienen(self, cliente, pago):
+        """Test: Cambiar el cliente regenera los documentos de sus pagos; eliminar borra el documento."""
+        assert list(filtrar_pagos({'q': 'perez'})) == [pago]
+
+        cliente.apellido1 = 'Núñez'
+        cliente.save()
+        assert list(filtrar_pagos({'q': 'perez'})) == []
+        assert list(filtrar_pagos({'q': 'nunez'})) == [pago]
+
+        pago_id = pago.pk
+        pago.delete()
+        assert not DocumentoBusqueda.objects.filter(tipo='pago', objeto_id=pago_id).exists()
+
+    def test_indexar_faltantes(self, cliente, pago):
+        """Test: Los objetos creados sin señales (bulk_create) se indexan después."""
+        DocumentoBusqueda.objects.filter(tipo='pago').delete()
+        assert list(filtrar_pagos({'q': 'perez'})) == []
+
+        assert BusquedaService.indexar_faltantes('pago') == 1
+        assert list(filtrar_pagos({'q': 'perez'})) == [pago]
+
+    def test_api_de_clientes(self, client, user, cliente):
+        """Test: La API de clientes usa el mismo índice de búsqueda."""
+        otro = Cliente.objects.create(
+            nombre='Pedro', apellido1='Ramírez', telefono='5550001111',
+            direccion='Av. Pérez Galdós 10', ciudad='Puebla', estado='PUE',
+        )
+        client.force_login(user)
+        response = client.get(reverse('pagos:api_buscar_clientes'), {'q': 'perez'})
+        ids = [c['id'] for c in response.json()['clientes']]
+        assert ids == [cliente.id]
+
+        response = client.get(reverse('pagos:api_buscar_clientes'), {'q': 'pe'})
+        ids = [c['id'] for c in response.json()['clientes']]
+        assert set(ids) == {cliente.id, otro.id}
@@ -0,0 +1,74 @@
+"""
+Tests para el cálculo de estadísticas de listados en una sola consulta.
+"""
+import pytest
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from core.estadisticas import (
+    calcular_estadisticas, conteos_por_valor, invalidar_estadisticas, version_persistente, Conteo, Suma
+)
+from pagos.models import Pago
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.mark.django_db
+class TestCalcularEstadisticas:
+    """Tests para calcular_estadisticas."""
+    
+    def test_una_sola_consulta(self, pago):
+        """Test: Todas las cubetas se resuelven con un único aggregate."""
+        cubetas = {
+            'total': Conteo(),
+            'pagados': Conteo(Q(estado='pagado')),
+            'monto': Suma('monto'),
+            'monto_pagado': Suma('monto', Q(estado='pagado')),
+        }
+        cubetas.update(conteos_por_valor('estado', ['vencido', 'cancelado'], 'estado_'))
+        
+        with CaptureQueriesContext(connection) as ctx:
+            stats = calcular_estadisticas(Pago.objects.all(), cubetas)
+        
+        assert len(ctx.captured_queries) == 1
+        assert stats['total'] == 1
+        assert stats['pagados'] == 0
+        assert stats['monto'] == Decimal('500.00')
+        assert stats['monto_pagado'] == 0
+        assert stats['estado_vencido'] == 1
+        assert stats['estado_cancelado'] == 0
+    
+    def test_cache_por_parametros_e_invalidacion(self, pago):
+        """Test: El resultado se cachea por filtros y se invalida al cambiar los datos."""
+        cubetas = {'total': Conteo()}
+        parametros = {'q': 'juan', 'estado': ''}
+        
+        calcular_estadisticas(Pago.objects.all(), cubetas, cache_grupo='pagos', cache_parametros=parametros)
+        with CaptureQueriesContext(connection) as ctx:
+            stats = calcular_estadisticas(
+                Pago.objects.all(), cubetas, cache_grupo='pagos', cache_parametros={'estado': None, 'q': 'juan '}
+            )
+        assert len(ctx.captured_queries) == 0
+        assert stats['total'] == 1
+        
+        invalidar_estadisticas('pagos')
+        Pago.objects.all().delete()
+        stats = calcular_estadisticas(Pago.objects.all(), cubetas, cache_grupo='pagos', cache_parametros=parametros)
+        assert stats['total'] == 0
+
+    def test_version_persistente(self, django_capture_on_commit_callbacks):
+        """Test: La versión persistente cambia al confirmar y no depende de la caché del proceso."""
+        assert version_persistente('pagos') == 1
+        with django_capture_on_commit_callbacks(execute=True):
+            invalidar_estadisticas('pagos')
+            invalidar_estadisticas('pagos')
+        cache.clear()
+        assert version_persistente('pagos') == 3
+        assert version_persistente('clientes') == 1
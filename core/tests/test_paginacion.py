@@ -0,0 +1,92 @@
+"""
+Tests para la paginación por cursor (keyset).
+"""
+import pytest
+from datetime import date
+from decimal import Decimal
+from django.http import QueryDict
+from django.urls import reverse
+from core.paginacion import PaginadorKeyset, codificar_cursor, decodificar_cursor
+from pagos.filtros import ORDENES_PAGOS
+from pagos.models import Pago
+
+
+@pytest.fixture
+def pagos(cliente):
+    """Siete pagos con fechas de vencimiento repetidas (empates en el primer campo)."""
+    return [
+        Pago.objects.create(
+            cliente=cliente,
+            monto=Decimal('100.00') + i,
+            concepto=f'Pago {i}',
+            periodo_mes=1 + i % 12,
+            periodo_anio=2025,
+            fecha_vencimiento=date(2025, 1, 1 + i // 3),
+            estado='pendiente',
+        )
+        for i in range(7)
+    ]
+
+
+def ids_esperados(orden):
+    return list(Pago.objects.order_by(*ORDENES_PAGOS[orden]).values_list('id', flat=True))
+
+
+@pytest.mark.django_db
+class TestPaginadorKeyset:
+    """Tests para PaginadorKeyset."""
+
+    @pytest.mark.parametrize('orden', list(ORDENES_PAGOS))
+    def test_recorre_hacia_adelante_y_atras(self, pagos, orden):
+        """Test: Avanzar y retroceder con cursores recorre todas las filas sin saltos ni repetidos."""
+        paginador = PaginadorKeyset(Pago.objects.all(), ORDENES_PAGOS, orden, por_pagina=3)
+
+        paginas = [paginador.pagina()]
+        while paginas[-1].has_next:
+            paginas.append(paginador.pagina(paginas[-1].cursor_siguiente))
+        vistos = [p.id for pagina in paginas for p in pagina]
+        assert vistos == ids_esperados(orden)
+        assert not paginas[0].has_previous
+
+        # Desde la última página hacia atrás se obtienen las mismas páginas
+        pagina = paginas[-1]
+        for anterior in reversed(paginas[:-1]):
+            pagina = paginador.pagina(pagina.cursor_anterior)
+            assert [p.id for p in pagina] == [p.id for p in anterior]
+        assert not pagina.has_previous
+
+    def test_cursor_invalido_vuelve_a_la_primera_pagina(self, pagos):
+        """Test: Un cursor manipulado o de otro orden no produce error."""
+        paginador = PaginadorKeyset(Pago.objects.all(), ORDENES_PAGOS, por_pagina=3)
+        primera = [p.id for p in paginador.pagina()]
+
+        assert decodificar_cursor('no-es-un-cursor') is None
+        assert [p.id for p in paginador.pagina('no-es-un-cursor')] == primera
+        assert [p.id for p in paginador.pagina(codificar_cursor([1], 'siguiente'))] == primera
+
+    def test_orden_fuera_de_lista_blanca(self, pagos):
+        """Test: Un orden no permitido usa el primero de la lista blanca."""
+        paginador = PaginadorKeyset(Pago.objects.all(), ORDENES_PAGOS, 'cliente__password', por_pagina=3)
+        assert paginador.orden == '-fecha_vencimiento'
+
+    def test_enlaces_conservan_filtros(self, pagos):
+        """Test: Los enlaces mantienen los filtros y reemplazan el cursor."""
+        parametros = QueryDict('estado=pendiente&cursor=viejo&page=4')
+        paginador = PaginadorKeyset(Pago.objects.all(), ORDENES_PAGOS, por_pagina=3)
+        pagina = paginador.pagina(parametros=parametros)
+
+        siguiente = QueryDict(pagina.querystring_siguiente)
+        assert siguiente['estado'] == 'pendiente'
+        assert siguiente['cursor'] == pagina.cursor_siguiente
+        assert 'page' not in siguiente
+        assert pagina.querystring_primera == 'estado=pendiente'
+
+    def test_listado_de_pagos(self, client, superuser, pagos):
+        """Test: El listado pagina por cursor sin errores."""
+        client.force_login(superuser)
+        response = client.get(reverse('pagos:pago_list'))
+        assert response.status_code == 200
+        page_obj = response.context['page_obj']
+
+        response = client.get(reverse('pagos:pago_list'), {'cursor': page_obj.cursor_siguiente or ''})
+        assert response.status_code == 200
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0014_indices_paginacion_cursor'),
+        ('instalaciones', '0010_remove_historicalinstalacion_cliente_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='instalacion',
+            index=models.Index(fields=['fecha_solicitud', 'id'], name='instalacion_fecha_s_eeb97c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instalacion',
+            index=models.Index(fields=['plan_nombre', 'id'], name='instalacion_plan_no_e040cd_idx'),
+        ),
+    ]
@@ -265,6 +265,9 @@ class Instalacion(models.Model):
             models.Index(fields=['cliente', 'estado']),
             models.Index(fields=['numero_contrato']),
             models.Index(fields=['fecha_programada']),
+            # Órdenes del listado con paginación por cursor (ver instalaciones/views.py)
+            models.Index(fields=['fecha_solicitud', 'id']),
+            models.Index(fields=['plan_nombre', 'id']),
         ]
     
     def __str__(self):
@@ -3,15 +3,25 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q
 from django.http import JsonResponse
-from django.core.paginator import Paginator
 import logging
 from .models import Instalacion, PlanInternet, ConfiguracionNumeroContrato
 from .forms import InstalacionForm, ConfiguracionNumeroContratoForm
 from .services import NumeroContratoService
 from clientes.models import Cliente
+from core.estadisticas import calcular_estadisticas, Conteo
+from core.busqueda import BusquedaService
+from core.paginacion import PaginadorKeyset
 
 logger = logging.getLogger(__name__)
 
+# Órdenes permitidos del listado; cada uno respaldado por un índice compuesto de Instalacion
+ORDENES_INSTALACIONES = {
+    '-fecha_solicitud': ('-fecha_solicitud', '-id'),
+    'fecha_solicitud': ('fecha_solicitud', 'id'),
+    'plan_nombre': ('plan_nombre', 'id'),
+    '-plan_nombre': ('-plan_nombre', '-id'),
+}
+
 
 @login_required
 def instalacion_list(request):
@@ -21,36 +31,27 @@ def instalacion_list(request):
     # Búsqueda
     query = request.GET.get('q', '')
     if query:
-        instalaciones = instalaciones.filter(
-            Q(cliente__nombre__icontains=query) |
-            Q(cliente__apellido1__icontains=query) |
-            Q(cliente__apellido2__icontains=query) |
-            Q(plan_nombre__icontains=query) |
-            Q(numero_contrato__icontains=query) |
-            Q(direccion_instalacion__icontains=query)
-        )
+        instalaciones = BusquedaService.filtrar(instalaciones, 'instalacion', query)
     
     # Filtro por estado
     estado_filter = request.GET.get('estado', '')
     if estado_filter:
         instalaciones = instalaciones.filter(estado=estado_filter)
     
-    # Ordenamiento
-    orden = request.GET.get('orden', '-fecha_solicitud')
-    instalaciones = instalaciones.order_by(orden)
-    
-    # Calcular estadísticas (antes de paginación)
-    total_instalaciones = instalaciones.count()
-    activas = instalaciones.filter(estado='activa').count()
-    pendientes = instalaciones.filter(estado__in=['pendiente', 'programada', 'en_proceso']).count()
-    programadas = instalaciones.filter(estado='programada').count()
-    suspendidas = instalaciones.filter(estado='suspendida').count()
-    canceladas = instalaciones.filter(estado='cancelada').count()
+    # Calcular estadísticas (antes de paginación, en una sola consulta)
+    stats = calcular_estadisticas(instalaciones, {
+        'total_instalaciones': Conteo(),
+        'activas': Conteo(Q(estado='activa')),
+        'pendientes': Conteo(Q(estado__in=['pendiente', 'programada', 'en_proceso'])),
+        'programadas': Conteo(Q(estado='programada')),
+        'suspendidas': Conteo(Q(estado='suspendida')),
+        'canceladas': Conteo(Q(estado='cancelada')),
+    })
     
-    # Paginación
-    paginator = Paginator(instalaciones, 20)  # 20 por página
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Ordenamiento (lista blanca) y paginación por cursor; el total exacto está en las estadísticas
+    paginador = PaginadorKeyset(instalaciones, ORDENES_INSTALACIONES, request.GET.get('orden'), por_pagina=20)
+    page_obj = paginador.pagina(request.GET.get('cursor'), parametros=request.GET)
+    orden = paginador.orden
     
     context = {
         'page_obj': page_obj,
@@ -58,12 +59,12 @@ def instalacion_list(request):
         'estado_filter': estado_filter,
         'orden': orden,
         'estados': Instalacion.ESTADO_CHOICES,
-        'total_instalaciones': total_instalaciones,
-        'activas': activas,
-        'pendientes': pendientes,
-        'programadas': programadas,
-        'suspendidas': suspendidas,
-        'canceladas': canceladas,
+        'total_instalaciones': stats['total_instalaciones'],
+        'activas': stats['activas'],
+        'pendientes': stats['pendientes'],
+        'programadas': stats['programadas'],
+        'suspendidas': stats['suspendidas'],
+        'canceladas': stats['canceladas'],
     }
     
     return render(request, 'instalaciones/instalacion_list.html', context)
@@ -205,13 +206,8 @@ def buscar_clientes_api(request):
     if len(query) < 2:
         return JsonResponse({'clientes': []})
     
-    clientes = Cliente.objects.filter(
-        Q(nombre__icontains=query) |
-        Q(apellido1__icontains=query) |
-        Q(apellido2__icontains=query) |
-        Q(telefono__icontains=query) |
-        Q(email__icontains=query)
-    ).order_by('nombre', 'apellido1')[:15]
+    # Resultados ordenados por relevancia
+    clientes = BusquedaService.buscar(Cliente.objects.all(), 'cliente', query, limite=15)
     
     data = {
         'clientes': [
@@ -198,6 +198,8 @@ class MovimientoInventario(models.Model):
         indexes = [
             models.Index(fields=['material', 'fecha']),
             models.Index(fields=['tipo']),
+            # Órdenes del listado con paginación por cursor (ver inventario/views.py)
+            models.Index(fields=['fecha', 'id']),
         ]
     
     def __str__(self):
@@ -1,12 +1,20 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Sum, Count, F
+from django.db.models import Q, Count, F
 from django.core.paginator import Paginator
 from django.http import JsonResponse
 from .models import Material, MovimientoInventario, CategoriaMaterial
+from core.estadisticas import calcular_estadisticas, Conteo, Suma
+from core.paginacion import PaginadorKeyset
 from .forms import MaterialForm, MovimientoInventarioForm, CategoriaMaterialForm
 
+# Órdenes permitidos del listado de movimientos; respaldados por un índice compuesto
+ORDENES_MOVIMIENTOS = {
+    '-fecha': ('-fecha', '-id'),
+    'fecha': ('fecha', 'id'),
+}
+
 
 @login_required
 def material_list(request):
@@ -46,16 +54,14 @@ def material_list(request):
     orden = request.GET.get('orden', 'nombre')
     materiales = materiales.order_by(orden)
     
-    # Calcular estadísticas
-    total_materiales = materiales.count()
-    materiales_bajo_stock = materiales.filter(stock_actual__lte=F('stock_minimo')).count()
-    materiales_agotados = materiales.filter(estado='agotado').count()
-    materiales_disponibles = materiales.filter(estado='disponible').count()
-    
-    # Valor total del inventario
-    valor_total = materiales.aggregate(
-        total=Sum(F('stock_actual') * F('precio_compra'))
-    )['total'] or 0
+    # Calcular estadísticas y valor total del inventario en una sola consulta
+    stats = calcular_estadisticas(materiales, {
+        'total_materiales': Conteo(),
+        'materiales_bajo_stock': Conteo(Q(stock_actual__lte=F('stock_minimo'))),
+        'materiales_agotados': Conteo(Q(estado='agotado')),
+        'materiales_disponibles': Conteo(Q(estado='disponible')),
+        'valor_total': Suma(F('stock_actual') * F('precio_compra')),
+    })
     
     # Paginación
     paginator = Paginator(materiales, 20)
@@ -76,11 +82,11 @@ def material_list(request):
         'estados': Material.ESTADO_CHOICES,
         'unidades': Material.UNIDAD_MEDIDA_CHOICES,
         'categorias': categorias,
-        'total_materiales': total_materiales,
-        'materiales_bajo_stock': materiales_bajo_stock,
-        'materiales_agotados': materiales_agotados,
-        'materiales_disponibles': materiales_disponibles,
-        'valor_total': valor_total,
+        'total_materiales': stats['total_materiales'],
+        'materiales_bajo_stock': stats['materiales_bajo_stock'],
+        'materiales_agotados': stats['materiales_agotados'],
+        'materiales_disponibles': stats['materiales_disponibles'],
+        'valor_total': stats['valor_total'],
     }
     
     return render(request, 'inventario/material_list.html', context)
@@ -194,14 +200,12 @@ def movimiento_list(request):
     if material_filter:
         movimientos = movimientos.filter(material_id=material_filter)
     
-    # Ordenamiento
-    orden = request.GET.get('orden', '-fecha')
-    movimientos = movimientos.order_by(orden)
-    
-    # Paginación
-    paginator = Paginator(movimientos, 30)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Ordenamiento (lista blanca) y paginación por cursor
+    paginador = PaginadorKeyset(
+        movimientos, ORDENES_MOVIMIENTOS, request.GET.get('orden'), por_pagina=30, con_total_estimado=True
+    )
+    page_obj = paginador.pagina(request.GET.get('cursor'), parametros=request.GET)
+    orden = paginador.orden
     
     # Obtener materiales para el filtro
     materiales = Material.objects.all().order_by('nombre')
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import TipoNotificacion, Notificacion, ConfiguracionNotificacion
+from .models import TipoNotificacion, Notificacion, NotificacionPago, ConfiguracionNotificacion
 
 
 @admin.register(TipoNotificacion)
@@ -8,8 +8,15 @@ class TipoNotificacionAdmin(admin.ModelAdmin):
     search_fields = ['nombre', 'codigo']
 
 
+class NotificacionPagoInline(admin.TabularInline):
+    model = NotificacionPago
+    extra = 0
+    raw_id_fields = ['pago']
+
+
 @admin.register(Notificacion)
 class NotificacionAdmin(admin.ModelAdmin):
+    inlines = [NotificacionPagoInline]
     list_display = [
         'asunto',
         'cliente',
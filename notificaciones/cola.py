@@ -0,0 +1,118 @@
+"""
+Cola de envío sobre Notificacion, segura con varios procesos de envío a la vez.
+
+Una notificación está disponible si está pendiente, su fecha programada ya llegó
+(o no tiene) y no tiene una reserva vigente. Reclamar un lote:
+- En motores con SELECT ... FOR UPDATE SKIP LOCKED (PostgreSQL, MySQL 8) se eligen
+  las filas saltando las que otro proceso está reclamando en ese momento.
+- En los demás (SQLite) se eligen candidatas y se reservan con un UPDATE
+  condicionado; solo quedan las que este proceso logró marcar con su token.
+En ambos casos la reserva (reservada_hasta) funciona como tiempo de visibilidad:
+si el proceso muere sin guardar el resultado, la notificación vuelve a estar
+disponible cuando la reserva vence. El índice parcial notif_cola_pendientes_idx
+cubre solo las filas pendientes.
+"""
+import logging
+import os
+import socket
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Notificacion
+
+logger = logging.getLogger(__name__)
+
+
+class ColaNotificaciones:
+    """
+    Reclama y libera lotes de notificaciones listas para enviarse.
+
+    Args:
+        visibilidad: Segundos que dura la reserva de un lote (default: NOTIFICACIONES_VISIBILIDAD_SEGUNDOS)
+        canales: Canales que atiende esta cola (default: todos)
+    """
+
+    def __init__(self, visibilidad=None, canales=None):
+        self.visibilidad = visibilidad or getattr(settings, 'NOTIFICACIONES_VISIBILIDAD_SEGUNDOS', 300)
+        self.canales = canales
+
+    @staticmethod
+    def nuevo_token():
+        """Identificador único de un reclamo (proceso y lote)."""
+        return f'{socket.gethostname()[:30]}:{os.getpid()}:{uuid.uuid4().hex[:12]}'
+
+    def disponibles(self, ahora=None):
+        """Notificaciones pendientes, vencidas y sin reserva vigente, en orden de llegada."""
+        ahora = ahora or timezone.now()
+        queryset = Notificacion.objects.filter(
+            Q(fecha_programada__isnull=True) | Q(fecha_programada__lte=ahora),
+            Q(reservada_hasta__isnull=True) | Q(reservada_hasta__lt=ahora),
+            estado='pendiente',
+        )
+        if self.canales:
+            queryset = queryset.filter(canal__in=self.canales)
+        return queryset.order_by('id')
+
+    def reclamar(self, limite):
+        """
+        Reserva hasta `limite` notificaciones para este proceso.
+
+        Returns:
+            list: Notificaciones reservadas (con su cliente), marcadas con el mismo token
+        """
+        ahora = timezone.now()
+        token = self.nuevo_token()
+        reserva = {'reservada_hasta': ahora + timedelta(seconds=self.visibilidad), 'reservada_por': token}
+
+        if connection.features.has_select_for_update_skip_locked:
+            with transaction.atomic():
+                ids = list(
+                    self.disponibles(ahora).select_for_update(skip_locked=True)
+                    .values_list('id', flat=True)[:limite]
+                )
+                Notificacion.objects.filter(pk__in=ids).update(**reserva)
+        else:
+            ids = list(self.disponibles(ahora).values_list('id', flat=True)[:limite])
+            # Solo se reservan las que siguen disponibles: si otro proceso ganó alguna, no se toca
+            Notificacion.objects.filter(
+                Q(reservada_hasta__isnull=True) | Q(reservada_hasta__lt=ahora),
+                pk__in=ids,
+                estado='pendiente',
+            ).update(**reserva)
+
+        reclamadas = list(
+            Notificacion.objects.filter(pk__in=ids, reservada_por=token).select_related('cliente').order_by('id')
+        )
+        if reclamadas:
+            logger.debug(f'Cola de notificaciones: {len(reclamadas)} reservadas por {token}')
+        return reclamadas
+
+    def reclamar_una(self, pk):
+        """
+        Reserva una notificación pendiente para enviarla fuera de la cola (envío manual).
+
+        A diferencia de reclamar(), no espera a su fecha programada.
+
+        Returns:
+            Notificacion reservada, o None si no está pendiente o la está enviando otro proceso
+        """
+        ahora = timezone.now()
+        token = self.nuevo_token()
+        reservada = Notificacion.objects.filter(
+            Q(reservada_hasta__isnull=True) | Q(reservada_hasta__lt=ahora),
+            pk=pk,
+            estado='pendiente',
+        ).update(reservada_hasta=ahora + timedelta(seconds=self.visibilidad), reservada_por=token)
+        if not reservada:
+            return None
+        return Notificacion.objects.select_related('cliente').get(pk=pk)
+
+    @staticmethod
+    def liberar(notificaciones):
+        """Quita la reserva de notificaciones que no se llegaron a procesar."""
+        Notificacion.objects.filter(
+            pk__in=[notificacion.pk for notificacion in notificaciones], estado='pendiente',
+        ).update(reservada_hasta=None, reservada_por='')
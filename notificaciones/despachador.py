@@ -0,0 +1,328 @@
+"""
+Envío en paralelo de las notificaciones pendientes, agrupadas por canal.
+
+- Las notificaciones se reclaman por lotes de la cola (notificaciones/cola.py), por
+  lo que pueden correr varios procesos de envío a la vez sin duplicar mensajes.
+- Cada lote se reparte por canal; cada canal corre en su propio pool de hilos y
+  todos los canales avanzan al mismo tiempo.
+- Email: cada hilo abre una sola conexión SMTP (get_connection) y envía por ella
+  cada mensaje con su propio send_messages([mensaje]), así el resultado de cada
+  notificación es exacto (send_messages con varios mensajes se corta en el primer
+  error sin decir cuáles ya salieron, y reenviarlos duplicaría correos).
+- SMS y WhatsApp: un pool acotado de hilos comparte un único cliente de Twilio.
+- Cada canal tiene su concurrencia y su limitador de tasa (token bucket)
+  configurables en NOTIFICACIONES_CONCURRENCIA y NOTIFICACIONES_TASAS.
+- Los hilos no tocan la base de datos: los resultados se escriben al final con
+  bulk_update, solo en las filas que siguen reservadas con el token del lote.
+- Los fallos pasan por la política de reintentos (notificaciones/reintentos.py): los
+  transitorios se reprograman con espera exponencial y los que agotan los intentos
+  se descartan; los conteos por canal de cada lote quedan en el log.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.mail import get_connection
+from django.utils import timezone
+from decouple import config
+from core.limitador import LimitadorTasa
+from .cola import ColaNotificaciones
+from .models import Notificacion
+from .reintentos import PoliticaReintentos, es_transitorio, registrar_conteos
+from .services import construir_email, normalizar_telefono
+
+logger = logging.getLogger(__name__)
+
+CANALES = ('email', 'sms', 'whatsapp', 'sistema')
+CONCURRENCIA_POR_DEFECTO = {'email': 2, 'sms': 4, 'whatsapp': 4}
+TASAS_POR_DEFECTO = {'email': 25, 'sms': 10, 'whatsapp': 10}
+CAMPOS_RESULTADO = [
+    'estado', 'fecha_envio', 'fecha_programada', 'resultado', 'intentos', 'reservada_hasta', 'reservada_por',
+]
+
+
+def _repartir(elementos, partes):
+    """Divide una lista en `partes` sublistas de tamaño parecido (sin vacías)."""
+    partes = max(1, min(partes, len(elementos)))
+    return [elementos[i::partes] for i in range(partes)]
+
+
+class DespachadorNotificaciones:
+    """
+    Envía las notificaciones pendientes por canal, en paralelo.
+
+    Args:
+        concurrencia: dict canal -> hilos (default: NOTIFICACIONES_CONCURRENCIA)
+        tasas: dict canal -> mensajes por segundo (default: NOTIFICACIONES_TASAS)
+        cliente_twilio: Cliente de Twilio ya creado (por defecto se crea con las credenciales del .env)
+        lote: Notificaciones que se reclaman de la cola cada vez (default: NOTIFICACIONES_LOTE)
+        visibilidad: Segundos de reserva de cada lote (default: NOTIFICACIONES_VISIBILIDAD_SEGUNDOS)
+        politica: PoliticaReintentos que decide qué hacer con los fallos (default: la de settings)
+    """
+
+    def __init__(self, concurrencia=None, tasas=None, cliente_twilio=None, lote=None,
+                 visibilidad=None, politica=None):
+        concurrencia = {**CONCURRENCIA_POR_DEFECTO, **getattr(settings, 'NOTIFICACIONES_CONCURRENCIA', {}),
+                        **(concurrencia or {})}
+        tasas = {**TASAS_POR_DEFECTO, **getattr(settings, 'NOTIFICACIONES_TASAS', {}), **(tasas or {})}
+        self.concurrencia = {canal: max(1, int(valor)) for canal, valor in concurrencia.items()}
+        self.limitadores = {canal: LimitadorTasa(tasa) for canal, tasa in tasas.items()}
+        self.lote = max(1, lote or getattr(settings, 'NOTIFICACIONES_LOTE', 500))
+        self.visibilidad = visibilidad
+        self.politica = politica or PoliticaReintentos()
+        self._twilio = cliente_twilio
+        self._twilio_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Ejecución
+    # ------------------------------------------------------------------
+
+    def ejecutar(self, limite=None, canales=None, notificaciones=None):
+        """
+        Reclama lotes de la cola, los envía y guarda su resultado, hasta vaciar la cola o llegar al límite.
+
+        Args:
+            limite: Máximo de notificaciones a enviar
+            canales: Canales a procesar (default: todos)
+            notificaciones: Lista ya reclamada de notificaciones (se envía solo esa)
+
+        Returns:
+            dict: {'total', 'enviadas', 'fallidas', 'reintentos', 'descartadas', 'segundos',
+                   'canales': {canal: {'total', 'enviadas', 'fallidas', 'reintentos', 'descartadas', 'segundos'}},
+                   'fallos': [(notificacion_id, error)]}
+            'fallidas' cuenta todos los envíos fallidos, incluidos los reprogramados ('reintentos')
+            y los que agotaron sus intentos ('descartadas').
+        """
+        inicio = time.monotonic()
+        reporte = {'total': 0, 'enviadas': 0, 'fallidas': 0, 'reintentos': 0, 'descartadas': 0, 'canales': {}, 'fallos': []}
+        if notificaciones is not None:
+            self.enviar_lote(notificaciones, reporte)
+        else:
+            cola = ColaNotificaciones(self.visibilidad, canales)
+            while limite is None or reporte['total'] < limite:
+                tamano = self.lote if limite is None else min(self.lote, limite - reporte['total'])
+                lote = cola.reclamar(tamano)
+                if not lote:
+                    break
+                try:
+                    self.enviar_lote(lote, reporte)
+                except Exception:
+                    cola.liberar(lote)
+                    raise
+        reporte['segundos'] = round(time.monotonic() - inicio, 3)
+        logger.info(
+            f"Notificaciones: {reporte['enviadas']} enviadas y {reporte['fallidas']} fallidas "
+            f"({reporte['reintentos']} reprogramadas, {reporte['descartadas']} descartadas) "
+            f"de {reporte['total']} en {reporte['segundos']}s"
+        )
+        return reporte
+
+    def enviar_lote(self, notificaciones, reporte):
+        """Envía un lote en paralelo por canal, guarda los resultados y los suma al reporte."""
+        por_canal = {}
+        for notificacion in notificaciones:
+            por_canal.setdefault(notificacion.canal, []).append(notificacion)
+
+        resultados = {}
+        segundos_canal = {}
+        with ThreadPoolExecutor(max_workers=max(1, len(por_canal))) as executor:
+            futuros = {
+                canal: executor.submit(self._enviar_canal, canal, grupo)
+                for canal, grupo in por_canal.items()
+            }
+            for canal, futuro in futuros.items():
+                resultados_canal, segundos_canal[canal] = futuro.result()
+                resultados.update(resultados_canal)
+
+        eventos = self.guardar_resultados(notificaciones, resultados)
+        conteos = {
+            canal: {'total': 0, 'enviadas': 0, 'fallidas': 0, 'reintentos': 0, 'descartadas': 0}
+            for canal in por_canal
+        }
+        for notificacion in notificaciones:
+            evento = eventos[notificacion.pk]
+            datos = conteos[notificacion.canal]
+            datos['total'] += 1
+            if evento == 'enviadas':
+                datos['enviadas'] += 1
+                continue
+            datos['fallidas'] += 1
+            if evento != 'fallidas':
+                datos[evento] += 1
+            reporte['fallos'].append((notificacion.pk, resultados[notificacion.pk][1]))
+
+        for canal, datos in conteos.items():
+            registrar_conteos(canal, {
+                'reintentos': datos['reintentos'],
+                'descartadas': datos['descartadas'],
+                'fallidas': datos['fallidas'] - datos['reintentos'] - datos['descartadas'],
+            })
+            acumulado = reporte['canales'].setdefault(
+                canal, {'total': 0, 'enviadas': 0, 'fallidas': 0, 'reintentos': 0, 'descartadas': 0, 'segundos': 0.0}
+            )
+            for campo, valor in datos.items():
+                acumulado[campo] += valor
+                reporte[campo] += valor
+            acumulado['segundos'] = round(acumulado['segundos'] + segundos_canal[canal], 3)
+
+    def guardar_resultados(self, notificaciones, resultados):
+        """
+        Aplica los resultados (y la política de reintentos) y los guarda con bulk_update.
+
+        Solo se escriben las filas que siguen reservadas con el token de este lote: si la
+        reserva venció y otro proceso reclamó la notificación, su estado no se pisa.
+
+        Returns:
+            dict: {notificacion_id: 'enviadas' | 'reintentos' | 'fallidas' | 'descartadas'}
+        """
+        ahora = timezone.now()
+        eventos = {}
+        por_token = {}
+        for notificacion in notificaciones:
+            por_token.setdefault(notificacion.reservada_por, []).append(notificacion)
+            exito, mensaje, transitorio = resultados[notificacion.pk]
+            if exito:
+                notificacion.estado = 'enviada'
+                notificacion.intentos += 1
+                notificacion.resultado = mensaje
+                notificacion.fecha_envio = ahora
+                eventos[notificacion.pk] = 'enviadas'
+            else:
+                eventos[notificacion.pk] = self.politica.aplicar_fallo(notificacion, mensaje, transitorio, ahora)
+            notificacion.reservada_hasta = None
+            notificacion.reservada_por = ''
+        for token, grupo in por_token.items():
+            # bulk_update respeta el filtro del queryset: el UPDATE lleva "AND reservada_por = token"
+            guardadas = Notificacion.objects.filter(reservada_por=token).bulk_update(
+                grupo, CAMPOS_RESULTADO, batch_size=500
+            )
+            if guardadas < len(grupo):
+                logger.warning(
+                    f'{len(grupo) - guardadas} notificación(es) del lote {token or "sin reserva"} '
+                    f'las reclamó otro proceso al vencer la reserva; no se guardó su resultado'
+                )
+        return eventos
+
+    def _enviar_canal(self, canal, notificaciones):
+        """Envía las notificaciones de un canal; devuelve ({id: (exito, mensaje, transitorio)}, segundos)."""
+        inicio = time.monotonic()
+        if canal == 'email':
+            resultados = self._enviar_emails(notificaciones)
+        elif canal in ('sms', 'whatsapp'):
+            resultados = self._enviar_twilio(canal, notificaciones)
+        elif canal == 'sistema':
+            resultados = {n.pk: (True, 'Notificación del sistema registrada', False) for n in notificaciones}
+        else:
+            resultados = {n.pk: (False, f'Canal no soportado: {canal}', False) for n in notificaciones}
+        return resultados, round(time.monotonic() - inicio, 3)
+
+    # ------------------------------------------------------------------
+    # Email
+    # ------------------------------------------------------------------
+
+    def _enviar_emails(self, notificaciones):
+        resultados = {}
+        validas = []
+        for notificacion in notificaciones:
+            if not notificacion.cliente or not notificacion.cliente.email:
+                resultados[notificacion.pk] = (False, 'El cliente no tiene correo electrónico configurado', False)
+            else:
+                validas.append(notificacion)
+        if validas:
+            with ThreadPoolExecutor(max_workers=self.concurrencia.get('email', 1)) as executor:
+                for parcial in executor.map(self._enviar_emails_conexion, _repartir(validas, self.concurrencia.get('email', 1))):
+                    resultados.update(parcial)
+        return resultados
+
+    def _enviar_emails_conexion(self, notificaciones):
+        """Envía una parte de los correos por una sola conexión SMTP."""
+        resultados = {}
+        limitador = self.limitadores.get('email')
+        from_email = config('DEFAULT_FROM_EMAIL', default='noreply@adminired.com')
+        try:
+            conexion = get_connection(fail_silently=False)
+            conexion.open()
+        except Exception as e:
+            logger.error(f'Error al abrir la conexión de correo: {str(e)}')
+            transitorio = es_transitorio('email', e)
+            return {n.pk: (False, str(e), transitorio) for n in notificaciones}
+        try:
+            for notificacion in notificaciones:
+                if limitador:
+                    limitador.adquirir()
+                mensaje = construir_email(notificacion, from_email, conexion)
+                resultados[notificacion.pk] = self._enviar_email_individual(conexion, notificacion, mensaje)
+        finally:
+            try:
+                conexion.close()
+            except Exception:
+                pass
+        return resultados
+
+    @staticmethod
+    def _enviar_email_individual(conexion, notificacion, mensaje):
+        try:
+            conexion.send_messages([mensaje])
+            return True, f'Email enviado exitosamente a {notificacion.cliente.email}', False
+        except Exception as e:
+            logger.error(f'Error al enviar email: {str(e)}')
+            # La conexión pudo quedar cerrada por el servidor: se reabre para los siguientes
+            try:
+                conexion.close()
+                conexion.open()
+            except Exception:
+                pass
+            return False, str(e), es_transitorio('email', e)
+
+    # ------------------------------------------------------------------
+    # SMS y WhatsApp (Twilio)
+    # ------------------------------------------------------------------
+
+    def cliente_twilio(self):
+        """Cliente de Twilio compartido por todos los hilos; devuelve (cliente, error)."""
+        with self._twilio_lock:
+            if self._twilio is not None:
+                return self._twilio, None
+            twilio_account_sid = config('TWILIO_ACCOUNT_SID', default='')
+            twilio_auth_token = config('TWILIO_AUTH_TOKEN', default='')
+            if not all([twilio_account_sid, twilio_auth_token]):
+                return None, 'Twilio no está configurado. Agrega TWILIO_ACCOUNT_SID y TWILIO_AUTH_TOKEN en .env'
+            try:
+                from twilio.rest import Client
+            except ImportError:
+                return None, 'Twilio no está instalado. Ejecuta: pip install twilio'
+            self._twilio = Client(twilio_account_sid, twilio_auth_token)
+            return self._twilio, None
+
+    def _enviar_twilio(self, canal, notificaciones):
+        cliente, error = self.cliente_twilio()
+        if canal == 'sms':
+            origen = config('TWILIO_PHONE_NUMBER', default='')
+            if not origen:
+                error = error or 'Twilio no está configurado. Agrega TWILIO_PHONE_NUMBER en .env'
+        else:
+            origen = config('TWILIO_WHATSAPP_FROM', default='whatsapp:+14155238886')
+        if error:
+            return {n.pk: (False, error, False) for n in notificaciones}
+
+        limitador = self.limitadores.get(canal)
+        nombre = 'SMS' if canal == 'sms' else 'WhatsApp'
+
+        def enviar(notificacion):
+            if not notificacion.cliente or not notificacion.cliente.telefono:
+                return notificacion.pk, (False, 'El cliente no tiene teléfono configurado', False)
+            destino = normalizar_telefono(notificacion.cliente.telefono)
+            if canal == 'whatsapp':
+                destino = f'whatsapp:{destino}'
+            if limitador:
+                limitador.adquirir()
+            try:
+                mensaje = cliente.messages.create(body=notificacion.mensaje, from_=origen, to=destino)
+                return notificacion.pk, (True, f'{nombre} enviado exitosamente. SID: {mensaje.sid}', False)
+            except Exception as e:
+                logger.error(f'Error al enviar {nombre}: {str(e)}')
+                return notificacion.pk, (False, str(e), es_transitorio(canal, e))
+
+        with ThreadPoolExecutor(max_workers=self.concurrencia.get(canal, 1)) as executor:
+            return dict(executor.map(enviar, notificaciones))
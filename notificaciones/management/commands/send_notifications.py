@@ -1,11 +1,18 @@
 """
 Comando de gestión para enviar notificaciones pendientes.
 Uso: python manage.py send_notifications
+     python manage.py send_notifications --limit 5000 --canal email
+     python manage.py send_notifications --dry-run
+
+Las notificaciones se reclaman de la cola por lotes (ver notificaciones/cola.py), así
+que se pueden ejecutar varios procesos a la vez sin enviar dos veces la misma, y se
+envían en paralelo por canal (ver notificaciones/despachador.py); la concurrencia y
+la tasa de cada canal se configuran en NOTIFICACIONES_CONCURRENCIA y NOTIFICACIONES_TASAS.
+Los errores transitorios se reprograman solos (ver notificaciones/reintentos.py).
 """
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from notificaciones.models import Notificacion
-from notificaciones.services import NotificationService
+from notificaciones.cola import ColaNotificaciones
+from notificaciones.despachador import CANALES, DespachadorNotificaciones
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,6 +28,32 @@ class Command(BaseCommand):
             default=50,
             help='Número máximo de notificaciones a procesar (default: 50)',
         )
+        parser.add_argument(
+            '--canal',
+            action='append',
+            choices=CANALES,
+            help='Canal a procesar (se puede repetir; default: todos)',
+        )
+        parser.add_argument(
+            '--hilos-email',
+            type=int,
+            help='Conexiones SMTP simultáneas (default: NOTIFICACIONES_CONCURRENCIA)',
+        )
+        parser.add_argument(
+            '--hilos-sms',
+            type=int,
+            help='Envíos simultáneos de SMS y WhatsApp (default: NOTIFICACIONES_CONCURRENCIA)',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            help='Notificaciones que se reclaman de la cola por vez (default: NOTIFICACIONES_LOTE)',
+        )
+        parser.add_argument(
+            '--visibilidad',
+            type=int,
+            help='Segundos que dura la reserva de cada lote (default: NOTIFICACIONES_VISIBILIDAD_SEGUNDOS)',
+        )
         parser.add_argument(
             '--dry-run',
             action='store_true',
@@ -30,66 +63,62 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         limit = options['limit']
         dry_run = options['dry_run']
-        
-        # Obtener notificaciones pendientes que deben enviarse
-        notificaciones = Notificacion.objects.filter(
-            estado='pendiente'
-        ).select_related('cliente', 'tipo')[:limit]
-        
-        total = notificaciones.count()
-        
+
+        concurrencia = {}
+        if options['hilos_email']:
+            concurrencia['email'] = options['hilos_email']
+        if options['hilos_sms']:
+            concurrencia['sms'] = concurrencia['whatsapp'] = options['hilos_sms']
+        despachador = DespachadorNotificaciones(
+            concurrencia=concurrencia, lote=options['lote'], visibilidad=options['visibilidad'],
+        )
+
+        if dry_run:
+            self.stdout.write(
+                self.style.WARNING('MODO DRY-RUN: No se enviarán realmente las notificaciones')
+            )
+            # Solo se consultan las disponibles, sin reservarlas
+            cola = ColaNotificaciones(canales=options['canal'])
+            notificaciones = list(cola.disponibles().select_related('cliente')[:limit])
+            if not notificaciones:
+                self.stdout.write(self.style.SUCCESS('No hay notificaciones pendientes para enviar.'))
+            for notificacion in notificaciones:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f'  [DRY-RUN] {notificacion.asunto} ({notificacion.get_canal_display()}) se enviaría a: '
+                        f'{notificacion.cliente.nombre_completo if notificacion.cliente else "General"}'
+                    )
+                )
+            return
+
+        # Reclama de la cola por lotes hasta vaciarla o llegar al límite
+        reporte = despachador.ejecutar(limite=limit, canales=options['canal'])
+        total = reporte['total']
+
         if total == 0:
             self.stdout.write(
                 self.style.SUCCESS('No hay notificaciones pendientes para enviar.')
             )
             return
-        
-        self.stdout.write(
-            self.style.WARNING(f'Procesando {total} notificación(es)...')
-        )
-        
-        if dry_run:
+
+        for canal, datos in reporte['canales'].items():
             self.stdout.write(
-                self.style.WARNING('MODO DRY-RUN: No se enviarán realmente las notificaciones')
+                self.style.SUCCESS(
+                    f"  ✓ {canal}: {datos['enviadas']} enviadas, {datos['fallidas']} fallidas "
+                    f"({datos['reintentos']} reprogramadas, {datos['descartadas']} descartadas) en {datos['segundos']}s"
+                )
             )
-        
-        enviadas = 0
-        fallidas = 0
-        
-        for notificacion in notificaciones:
-            if not notificacion.debe_enviarse:
-                continue
-            
+        for notificacion_id, error in reporte['fallos']:
             self.stdout.write(
-                f'Procesando: {notificacion.asunto} ({notificacion.get_canal_display()})...'
+                self.style.ERROR(f'  ✗ Notificación {notificacion_id}: {error}')
             )
-            
-            if dry_run:
-                self.stdout.write(
-                    self.style.SUCCESS(f'  [DRY-RUN] Se enviaría a: {notificacion.cliente.nombre_completo if notificacion.cliente else "General"}')
-                )
-                enviadas += 1
-            else:
-                resultado = NotificationService.send_notification(notificacion)
-                
-                if resultado.get('success'):
-                    self.stdout.write(
-                        self.style.SUCCESS(f'  ✓ Enviada: {resultado.get("message", "Exitoso")}')
-                    )
-                    enviadas += 1
-                else:
-                    self.stdout.write(
-                        self.style.ERROR(f'  ✗ Fallida: {resultado.get("error", "Error desconocido")}')
-                    )
-                    fallidas += 1
-        
+
         # Resumen
         self.stdout.write('\n' + '='*50)
         self.stdout.write(
             self.style.SUCCESS(
-                f'Resumen: {enviadas} enviadas, {fallidas} fallidas de {total} totales'
+                f"Resumen: {reporte['enviadas']} enviadas, {reporte['fallidas']} fallidas de {total} totales "
+                f"en {reporte['segundos']}s; {reporte['reintentos']} se reintentarán y {reporte['descartadas']} "
+                f"agotaron sus intentos"
             )
         )
-
-
-
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0014_indices_paginacion_cursor'),
+        ('notificaciones', '0003_remove_configuracionnotificacion_canales_adicionales_and_more'),
+        ('pagos', '0011_indices_paginacion_cursor'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['fecha_creacion', 'id'], name='notificacio_fecha_c_afb931_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['asunto', 'id'], name='notificacio_asunto_858a9c_idx'),
+        ),
+    ]
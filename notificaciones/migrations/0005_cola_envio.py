@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0014_indices_paginacion_cursor'),
+        ('notificaciones', '0004_indices_paginacion_cursor'),
+        ('pagos', '0017_saldos_clientes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacion',
+            name='reservada_hasta',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Reservada hasta'),
+        ),
+        migrations.AddField(
+            model_name='notificacion',
+            name='reservada_por',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Reservada por'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(condition=models.Q(('estado', 'pendiente')), fields=['fecha_programada', 'id'], name='notif_cola_pendientes_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notificaciones', '0005_cola_envio'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificacion',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('enviada', 'Enviada'), ('fallida', 'Fallida'), ('cancelada', 'Cancelada'), ('descartada', 'Descartada (agotó los reintentos)')], default='pendiente', max_length=20, verbose_name='Estado'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notificaciones', '0006_estado_descartada'),
+        ('pagos', '0017_saldos_clientes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacionPago',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notificacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pagos_incluidos', to='notificaciones.notificacion', verbose_name='Notificación')),
+                ('pago', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_notificacion', to='pagos.pago', verbose_name='Pago')),
+            ],
+            options={
+                'verbose_name': 'Pago de la Notificación',
+                'verbose_name_plural': 'Pagos de la Notificación',
+            },
+        ),
+        migrations.AddField(
+            model_name='notificacion',
+            name='pagos',
+            field=models.ManyToManyField(blank=True, related_name='notificaciones_resumen', through='notificaciones.NotificacionPago', to='pagos.pago', verbose_name='Pagos incluidos'),
+        ),
+        migrations.AddConstraint(
+            model_name='notificacionpago',
+            constraint=models.UniqueConstraint(fields=('notificacion', 'pago'), name='unique_notificacion_pago'),
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.utils import timezone
 from clientes.models import Cliente
 from pagos.models import Pago
+from .reintentos import PoliticaReintentos, registrar_conteos
 
 
 class TipoNotificacion(models.Model):
@@ -28,6 +29,7 @@ class Notificacion(models.Model):
         ('enviada', 'Enviada'),
         ('fallida', 'Fallida'),
         ('cancelada', 'Cancelada'),
+        ('descartada', 'Descartada (agotó los reintentos)'),
     ]
     
     CANAL_CHOICES = [
@@ -100,6 +102,20 @@ class Notificacion(models.Model):
     )
     intentos = models.IntegerField(default=0, verbose_name='Intentos de envío')
     
+    # Pagos incluidos en un resumen de recordatorios (ver pagos/recordatorios.py)
+    pagos = models.ManyToManyField(
+        Pago,
+        through='NotificacionPago',
+        related_name='notificaciones_resumen',
+        blank=True,
+        verbose_name='Pagos incluidos'
+    )
+    
+    # Reserva en la cola de envío (ver notificaciones/cola.py): mientras no venza,
+    # ningún otro proceso de envío toma la notificación
+    reservada_hasta = models.DateTimeField(blank=True, null=True, verbose_name='Reservada hasta')
+    reservada_por = models.CharField(max_length=64, blank=True, default='', verbose_name='Reservada por')
+    
     class Meta:
         verbose_name = 'Notificación'
         verbose_name_plural = 'Notificaciones'
@@ -108,6 +124,15 @@ class Notificacion(models.Model):
             models.Index(fields=['cliente', 'estado']),
             models.Index(fields=['fecha_programada']),
             models.Index(fields=['tipo', 'canal']),
+            # Órdenes del listado con paginación por cursor (ver notificaciones/views.py)
+            models.Index(fields=['fecha_creacion', 'id']),
+            models.Index(fields=['asunto', 'id']),
+            # Cola de envío: solo las pendientes (una fracción pequeña de la tabla)
+            models.Index(
+                fields=['fecha_programada', 'id'],
+                condition=models.Q(estado='pendiente'),
+                name='notif_cola_pendientes_idx',
+            ),
         ]
     
     def __str__(self):
@@ -134,15 +159,49 @@ class Notificacion(models.Model):
         self.intentos += 1
         if resultado:
             self.resultado = resultado
+        self.reservada_hasta = None
+        self.reservada_por = ''
         self.save()
     
-    def marcar_como_fallida(self, resultado=None):
-        """Marca la notificación como fallida."""
-        self.estado = 'fallida'
-        self.intentos += 1
-        if resultado:
-            self.resultado = resultado
+    def marcar_como_fallida(self, resultado=None, transitorio=False):
+        """
+        Registra un envío fallido según la política de reintentos.
+        
+        Un error transitorio deja la notificación pendiente y reprogramada (o descartada
+        si agotó los intentos); uno permanente la marca como fallida.
+        """
+        evento = PoliticaReintentos().aplicar_fallo(self, resultado, transitorio)
+        self.reservada_hasta = None
+        self.reservada_por = ''
         self.save()
+        registrar_conteos(self.canal, {evento: 1})
+        return evento
+
+
+class NotificacionPago(models.Model):
+    """Pago incluido en una notificación de resumen (un mensaje por cliente y canal)."""
+    notificacion = models.ForeignKey(
+        Notificacion,
+        on_delete=models.CASCADE,
+        related_name='pagos_incluidos',
+        verbose_name='Notificación'
+    )
+    pago = models.ForeignKey(
+        Pago,
+        on_delete=models.CASCADE,
+        related_name='resumenes_notificacion',
+        verbose_name='Pago'
+    )
+    
+    class Meta:
+        verbose_name = 'Pago de la Notificación'
+        verbose_name_plural = 'Pagos de la Notificación'
+        constraints = [
+            models.UniqueConstraint(fields=['notificacion', 'pago'], name='unique_notificacion_pago'),
+        ]
+    
+    def __str__(self):
+        return f"{self.notificacion_id} - {self.pago}"
 
 
 class ConfiguracionNotificacion(models.Model):
@@ -0,0 +1,150 @@
+"""
+Política de reintentos de notificaciones fallidas.
+
+- Cada canal clasifica el error de envío como transitorio (vale la pena reintentar:
+  el servidor SMTP o Twilio no respondió, límite de tasa, error 4xx de SMTP o 5xx
+  de Twilio) o permanente (dirección rechazada, número inválido, canal sin configurar).
+- Un error transitorio deja la notificación pendiente y la reprograma en
+  fecha_programada con espera exponencial y jitter (base * 2^(intento-1), con tope),
+  así la cola de envío (notificaciones/cola.py) la vuelve a tomar sola cuando vence.
+- Al llegar a NOTIFICACIONES_MAX_INTENTOS la notificación pasa a 'descartada'
+  (no se vuelve a intentar); un error permanente la deja 'fallida' de inmediato.
+- Los contadores de reintentos, fallidas y descartadas por canal (contadores_envio)
+  se calculan de las propias notificaciones (estado e intentos), así incluyen los
+  envíos de cualquier proceso, como el comando send_notifications desde cron.
+"""
+import logging
+import random
+import smtplib
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+EVENTOS_CONTADOR = ('reintentos', 'fallidas', 'descartadas')
+# Códigos de Twilio que indican saturación temporal (además de HTTP 429 y 5xx)
+CODIGOS_TWILIO_TRANSITORIOS = {20429, 30001}
+
+
+def _transitorio_email(error):
+    """Errores de SMTP: 4xx y fallas de conexión son transitorios; 5xx, permanentes."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codigos = [codigo for codigo, _ in error.recipients.values()]
+        return bool(codigos) and all(400 <= codigo < 500 for codigo in codigos)
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    # Timeouts, conexión rechazada o cortada
+    return isinstance(error, OSError)
+
+
+def _transitorio_twilio(error):
+    """Errores de Twilio: 429, 5xx y fallas de red son transitorios; el resto (4xx), permanentes."""
+    estado = getattr(error, 'status', None)
+    if isinstance(estado, int):
+        return estado == 429 or estado >= 500 or getattr(error, 'code', None) in CODIGOS_TWILIO_TRANSITORIOS
+    # requests.ConnectionError / Timeout heredan de OSError
+    return isinstance(error, OSError)
+
+
+CLASIFICADORES = {
+    'email': _transitorio_email,
+    'sms': _transitorio_twilio,
+    'whatsapp': _transitorio_twilio,
+}
+
+
+def es_transitorio(canal, error):
+    """
+    Indica si un error de envío amerita reintento.
+
+    Args:
+        canal: Canal de la notificación
+        error: Excepción del proveedor (un mensaje de texto, como "sin teléfono", es permanente)
+    """
+    if not isinstance(error, BaseException):
+        return False
+    clasificador = CLASIFICADORES.get(canal)
+    return bool(clasificador and clasificador(error))
+
+
+class PoliticaReintentos:
+    """
+    Decide qué pasa con una notificación que falló: reintento, fallida o descartada.
+
+    Args:
+        max_intentos: Intentos antes de descartar (default: NOTIFICACIONES_MAX_INTENTOS)
+        base: Segundos de espera tras el primer fallo (default: NOTIFICACIONES_REINTENTO_BASE_SEGUNDOS)
+        tope: Espera máxima en segundos (default: NOTIFICACIONES_REINTENTO_MAX_SEGUNDOS)
+    """
+
+    def __init__(self, max_intentos=None, base=None, tope=None):
+        self.max_intentos = max(1, max_intentos or getattr(settings, 'NOTIFICACIONES_MAX_INTENTOS', 5))
+        self.base = base or getattr(settings, 'NOTIFICACIONES_REINTENTO_BASE_SEGUNDOS', 60)
+        self.tope = tope or getattr(settings, 'NOTIFICACIONES_REINTENTO_MAX_SEGUNDOS', 3600)
+
+    def espera(self, intento):
+        """Espera antes del siguiente intento: exponencial con tope, entre la mitad y el total."""
+        segundos = min(self.tope, self.base * 2 ** max(0, intento - 1))
+        return timedelta(seconds=segundos / 2 + random.uniform(0, segundos / 2))
+
+    def aplicar_fallo(self, notificacion, resultado, transitorio, ahora=None):
+        """
+        Registra un intento fallido en la notificación (sin guardarla).
+
+        Returns:
+            str: 'reintentos' (reprogramada), 'fallidas' (error permanente) o 'descartadas' (agotó los intentos)
+        """
+        notificacion.intentos += 1
+        if resultado:
+            notificacion.resultado = resultado
+        if not transitorio:
+            notificacion.estado = 'fallida'
+            return 'fallidas'
+        if notificacion.intentos >= self.max_intentos:
+            notificacion.estado = 'descartada'
+            return 'descartadas'
+        notificacion.estado = 'pendiente'
+        notificacion.fecha_programada = (ahora or timezone.now()) + self.espera(notificacion.intentos)
+        return 'reintentos'
+
+
+def registrar_conteos(canal, conteos):
+    """Deja en el log los conteos {'reintentos'|'fallidas'|'descartadas': n} de un envío."""
+    if conteos.get('reintentos') or conteos.get('descartadas'):
+        logger.warning(
+            f"Notificaciones {canal}: {conteos.get('reintentos', 0)} reprogramadas, "
+            f"{conteos.get('descartadas', 0)} descartadas"
+        )
+
+
+def contadores_envio(canales=('email', 'sms', 'whatsapp')):
+    """
+    Contadores por canal: {canal: {'reintentos', 'fallidas', 'descartadas'}}.
+
+    Se calculan en una consulta agrupada por canal. Cada intento fallido de una
+    notificación pendiente o cancelada fue un reintento; en las enviadas, fallidas y
+    descartadas lo fue cada intento salvo el último.
+    """
+    from .models import Notificacion
+
+    ultimo_intento = Case(When(estado__in=['enviada', 'fallida', 'descartada'], then=Value(1)), default=Value(0))
+    reintentos = Sum(F('intentos') - ultimo_intento, filter=Q(intentos__gt=0))
+    filas = (
+        Notificacion.objects.filter(canal__in=canales)
+        .filter(Q(intentos__gt=1) | Q(estado__in=['pendiente', 'cancelada', 'fallida', 'descartada']))
+        .order_by()
+        .values('canal')
+        .annotate(
+            reintentos=reintentos,
+            fallidas=Count('pk', filter=Q(estado='fallida')),
+            descartadas=Count('pk', filter=Q(estado='descartada')),
+        )
+    )
+    contadores = {canal: dict.fromkeys(EVENTOS_CONTADOR, 0) for canal in canales}
+    for fila in filas:
+        contadores[fila['canal']] = {evento: fila[evento] or 0 for evento in EVENTOS_CONTADOR}
+    return contadores
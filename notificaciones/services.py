@@ -2,14 +2,59 @@
 Servicios para enviar notificaciones por diferentes canales.
 """
 import logging
+import re
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, EmailMultiAlternatives
 from django.utils import timezone
 from decouple import config
+from .reintentos import es_transitorio
 
 logger = logging.getLogger(__name__)
 
 
+def normalizar_telefono(telefono):
+    """Teléfono en formato internacional (+52 si no trae código de país)."""
+    # Limpiar número de teléfono (remover caracteres especiales)
+    telefono = ''.join(filter(str.isdigit, telefono))
+    
+    # Agregar código de país si no está presente (México: +52)
+    if not telefono.startswith('52'):
+        telefono = f'52{telefono}'
+    return f'+{telefono}'
+
+
+def construir_email(notificacion, from_email=None, connection=None):
+    """Mensaje de correo de una notificación (con alternativa HTML si el mensaje es HTML)."""
+    from_email = from_email or config('DEFAULT_FROM_EMAIL', default='noreply@adminired.com')
+    recipient_list = [notificacion.cliente.email]
+    
+    # Verificar si el mensaje es HTML
+    es_html = '<html' in notificacion.mensaje.lower() or '<!DOCTYPE' in notificacion.mensaje.upper()
+    
+    if not es_html:
+        return EmailMessage(
+            subject=notificacion.asunto,
+            body=notificacion.mensaje,
+            from_email=from_email,
+            to=recipient_list,
+            connection=connection,
+        )
+    
+    # Extraer texto plano del HTML (simple)
+    texto_plano = re.sub(r'<[^>]+>', '', notificacion.mensaje)
+    texto_plano = re.sub(r'\s+', ' ', texto_plano).strip()
+    
+    msg = EmailMultiAlternatives(
+        subject=notificacion.asunto,
+        body=texto_plano,
+        from_email=from_email,
+        to=recipient_list,
+        connection=connection,
+    )
+    msg.attach_alternative(notificacion.mensaje, "text/html")
+    return msg
+
+
 class NotificationService:
     """Servicio base para enviar notificaciones."""
     
@@ -23,38 +68,7 @@ class NotificationService:
                     'error': 'El cliente no tiene correo electrónico configurado'
                 }
             
-            from_email = config('DEFAULT_FROM_EMAIL', default='noreply@adminired.com')
-            recipient_list = [notificacion.cliente.email]
-            
-            # Verificar si el mensaje es HTML
-            es_html = '<html' in notificacion.mensaje.lower() or '<!DOCTYPE' in notificacion.mensaje.upper()
-            
-            if es_html:
-                # Enviar email HTML
-                from django.core.mail import EmailMultiAlternatives
-                
-                # Extraer texto plano del HTML (simple)
-                import re
-                texto_plano = re.sub(r'<[^>]+>', '', notificacion.mensaje)
-                texto_plano = re.sub(r'\s+', ' ', texto_plano).strip()
-                
-                msg = EmailMultiAlternatives(
-                    subject=notificacion.asunto,
-                    body=texto_plano,
-                    from_email=from_email,
-                    to=recipient_list
-                )
-                msg.attach_alternative(notificacion.mensaje, "text/html")
-                msg.send()
-            else:
-                # Enviar email de texto plano
-                send_mail(
-                    subject=notificacion.asunto,
-                    message=notificacion.mensaje,
-                    from_email=from_email,
-                    recipient_list=recipient_list,
-                    fail_silently=False,
-                )
+            construir_email(notificacion).send()
             
             return {
                 'success': True,
@@ -64,7 +78,8 @@ class NotificationService:
             logger.error(f'Error al enviar email: {str(e)}')
             return {
                 'success': False,
-                'error': str(e)
+                'error': str(e),
+                'transitorio': es_transitorio('email', e)
             }
     
     @staticmethod
@@ -97,14 +112,7 @@ class NotificationService:
                     'error': 'Twilio no está instalado. Ejecuta: pip install twilio'
                 }
             
-            # Limpiar número de teléfono (remover caracteres especiales)
-            telefono = ''.join(filter(str.isdigit, notificacion.cliente.telefono))
-            
-            # Agregar código de país si no está presente (México: +52)
-            if not telefono.startswith('52'):
-                telefono = f'52{telefono}'
-            if not telefono.startswith('+'):
-                telefono = f'+{telefono}'
+            telefono = normalizar_telefono(notificacion.cliente.telefono)
             
             # Crear cliente de Twilio
             client = Client(twilio_account_sid, twilio_auth_token)
@@ -125,7 +133,8 @@ class NotificationService:
             logger.error(f'Error al enviar SMS: {str(e)}')
             return {
                 'success': False,
-                'error': str(e)
+                'error': str(e),
+                'transitorio': es_transitorio('sms', e)
             }
     
     @staticmethod
@@ -158,14 +167,7 @@ class NotificationService:
                     'error': 'Twilio no está instalado. Ejecuta: pip install twilio'
                 }
             
-            # Limpiar número de teléfono (remover caracteres especiales)
-            telefono = ''.join(filter(str.isdigit, notificacion.cliente.telefono))
-            
-            # Agregar código de país si no está presente (México: +52)
-            if not telefono.startswith('52'):
-                telefono = f'52{telefono}'
-            if not telefono.startswith('+'):
-                telefono = f'+{telefono}'
+            telefono = normalizar_telefono(notificacion.cliente.telefono)
             
             # Formatear para WhatsApp
             whatsapp_to = f'whatsapp:{telefono}'
@@ -189,7 +191,8 @@ class NotificationService:
             logger.error(f'Error al enviar WhatsApp: {str(e)}')
             return {
                 'success': False,
-                'error': str(e)
+                'error': str(e),
+                'transitorio': es_transitorio('whatsapp', e)
             }
     
     @staticmethod
@@ -230,13 +233,15 @@ class NotificationService:
                 notificacion.marcar_como_enviada(resultado=mensaje_resultado)
             else:
                 error_msg = resultado.get('error', 'Error desconocido')
-                notificacion.marcar_como_fallida(resultado=error_msg)
+                notificacion.marcar_como_fallida(resultado=error_msg, transitorio=resultado.get('transitorio', False))
             
             return resultado
             
         except Exception as e:
             logger.error(f'Error al procesar notificación {notificacion.pk}: {str(e)}')
-            notificacion.marcar_como_fallida(resultado=f'Error: {str(e)}')
+            notificacion.marcar_como_fallida(
+                resultado=f'Error: {str(e)}', transitorio=es_transitorio(notificacion.canal, e)
+            )
             return {
                 'success': False,
                 'error': str(e)
@@ -0,0 +1,75 @@
+"""
+Tests para la cola de envío de notificaciones.
+"""
+from datetime import timedelta
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from notificaciones.cola import ColaNotificaciones
+from notificaciones.despachador import DespachadorNotificaciones
+from notificaciones.models import Notificacion
+
+
+@pytest.mark.django_db
+class TestColaNotificaciones:
+    """Tests de reserva, visibilidad y liberación."""
+
+    def test_reclamos_no_se_solapan(self, cliente):
+        for numero in range(5):
+            Notificacion.objects.create(cliente=cliente, asunto=f'Aviso {numero}', mensaje='Hola')
+        Notificacion.objects.create(
+            cliente=cliente, asunto='Programada', mensaje='Hola', fecha_programada=timezone.now() + timedelta(hours=1),
+        )
+        cola = ColaNotificaciones(visibilidad=60)
+
+        primero = cola.reclamar(3)
+        segundo = cola.reclamar(10)
+
+        assert len(primero) == 3 and len(segundo) == 2
+        assert not {n.pk for n in primero} & {n.pk for n in segundo}
+        assert len({n.reservada_por for n in primero}) == 1
+        assert cola.reclamar(10) == []
+
+    def test_reserva_vencida_vuelve_a_la_cola(self, cliente):
+        notificacion = Notificacion.objects.create(cliente=cliente, asunto='Aviso', mensaje='Hola')
+        cola = ColaNotificaciones(visibilidad=60)
+        assert cola.reclamar(1) == [notificacion]
+
+        # El proceso murió: al vencer la reserva otro proceso la puede tomar
+        Notificacion.objects.update(reservada_hasta=timezone.now() - timedelta(seconds=1))
+        otra = cola.reclamar(1)
+        assert otra == [notificacion]
+
+        cola.liberar(otra)
+        notificacion.refresh_from_db()
+        assert (notificacion.reservada_hasta, notificacion.reservada_por) == (None, '')
+        assert ColaNotificaciones(canales=['sms']).reclamar(1) == []
+
+    def test_resultado_de_reserva_vencida_no_pisa_al_nuevo_dueno(self, cliente):
+        """Test: Si otro proceso reclamó la notificación al vencer la reserva, el lote viejo no guarda."""
+        notificacion = Notificacion.objects.create(cliente=cliente, asunto='Aviso', mensaje='Hola', canal='sistema')
+        cola = ColaNotificaciones(visibilidad=60)
+        [viejo] = cola.reclamar(1)
+        Notificacion.objects.update(reservada_hasta=timezone.now() - timedelta(seconds=1))
+        [nuevo] = cola.reclamar(1)
+
+        DespachadorNotificaciones().guardar_resultados([viejo], {viejo.pk: (False, 'Caído', False)})
+
+        notificacion.refresh_from_db()
+        assert (notificacion.estado, notificacion.intentos) == ('pendiente', 0)
+        assert notificacion.reservada_por == nuevo.reservada_por
+
+    def test_envio_manual_respeta_la_reserva(self, client, superuser, cliente):
+        """Test: El envío manual no manda una notificación que está enviando un proceso de la cola."""
+        notificacion = Notificacion.objects.create(cliente=cliente, asunto='Aviso', mensaje='Hola', canal='sistema')
+        client.force_login(superuser)
+        ColaNotificaciones(visibilidad=60).reclamar(1)
+
+        client.post(reverse('notificaciones:notificacion_send', args=[notificacion.pk]))
+        notificacion.refresh_from_db()
+        assert (notificacion.estado, notificacion.intentos) == ('pendiente', 0)
+
+        ColaNotificaciones.liberar([notificacion])
+        client.post(reverse('notificaciones:notificacion_send', args=[notificacion.pk]))
+        notificacion.refresh_from_db()
+        assert (notificacion.estado, notificacion.reservada_por) == ('enviada', '')
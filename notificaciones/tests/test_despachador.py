@@ -0,0 +1,111 @@
+"""
+Tests para el envío en paralelo de notificaciones.
+"""
+import smtplib
+from datetime import timedelta
+import pytest
+from django.core import mail
+from django.core.management import call_command
+from django.utils import timezone
+from notificaciones.despachador import DespachadorNotificaciones
+from notificaciones.models import Notificacion
+
+
+class TwilioFalso:
+    """Cliente de Twilio en memoria: registra los mensajes y rechaza un número."""
+
+    def __init__(self, rechazar=None):
+        self.enviados = []
+        self.rechazar = rechazar
+        self.messages = self
+
+    def create(self, body, from_, to):
+        if to.endswith(self.rechazar or '-'):
+            raise RuntimeError('Número inválido')
+        self.enviados.append(to)
+        return type('Mensaje', (), {'sid': f'SM{len(self.enviados)}'})()
+
+
+class ConexionSMTPFalsa:
+    """Conexión de correo que rechaza un asunto y registra los mensajes entregados."""
+
+    def __init__(self, rechazar):
+        self.rechazar = rechazar
+        self.entregados = []
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send_messages(self, mensajes):
+        for mensaje in mensajes:
+            if mensaje.subject == self.rechazar:
+                raise smtplib.SMTPRecipientsRefused({mensaje.to[0]: (550, b'Mailbox unavailable')})
+            self.entregados.append(mensaje.subject)
+        return len(mensajes)
+
+
+@pytest.mark.django_db
+class TestDespachadorNotificaciones:
+    """Tests del envío por canal y de la escritura masiva de resultados."""
+
+    def test_envia_por_canal_y_guarda_resultados(self, cliente, monkeypatch, django_assert_max_num_queries):
+        monkeypatch.setenv('TWILIO_PHONE_NUMBER', '+15550001111')
+        for numero in range(7):
+            Notificacion.objects.create(cliente=cliente, asunto=f'Aviso {numero}', mensaje='Hola', canal='email')
+        Notificacion.objects.create(cliente=cliente, asunto='SMS', mensaje='Hola', canal='sms')
+        Notificacion.objects.create(cliente=cliente, asunto='Sistema', mensaje='Hola', canal='sistema')
+        Notificacion.objects.create(
+            cliente=cliente, asunto='Programada', mensaje='Hola', canal='email',
+            fecha_programada=timezone.now() + timedelta(days=1),
+        )
+        twilio = TwilioFalso()
+        despachador = DespachadorNotificaciones(concurrencia={'email': 3}, cliente_twilio=twilio)
+
+        with django_assert_max_num_queries(6):
+            reporte = despachador.ejecutar()
+
+        assert (reporte['total'], reporte['enviadas'], reporte['fallidas']) == (9, 9, 0)
+        assert reporte['canales']['email']['enviadas'] == 7
+        assert len(mail.outbox) == 7
+        assert twilio.enviados == ['+521234567890']
+        assert Notificacion.objects.filter(estado='enviada', intentos=1, fecha_envio__isnull=False).count() == 9
+        assert Notificacion.objects.get(asunto='Programada').estado == 'pendiente'
+
+    def test_fallos_por_notificacion(self, cliente):
+        Notificacion.objects.create(cliente=cliente, asunto='WhatsApp', mensaje='Hola', canal='whatsapp')
+        Notificacion.objects.create(asunto='Sin cliente', mensaje='Hola', canal='email')
+        despachador = DespachadorNotificaciones(cliente_twilio=TwilioFalso(rechazar='7890'))
+
+        reporte = despachador.ejecutar()
+
+        assert reporte['fallidas'] == 2
+        assert Notificacion.objects.get(asunto='WhatsApp').resultado == 'Número inválido'
+        sin_cliente = Notificacion.objects.get(asunto='Sin cliente')
+        assert (sin_cliente.estado, sin_cliente.intentos) == ('fallida', 1)
+
+    def test_error_de_un_correo_no_reenvia_los_demas(self, cliente, monkeypatch):
+        """Test: Si falla un correo, los ya entregados por la misma conexión no se vuelven a enviar."""
+        conexion = ConexionSMTPFalsa(rechazar='Aviso 1')
+        monkeypatch.setattr('notificaciones.despachador.get_connection', lambda **kwargs: conexion)
+        for numero in range(3):
+            Notificacion.objects.create(cliente=cliente, asunto=f'Aviso {numero}', mensaje='Hola', canal='email')
+
+        reporte = DespachadorNotificaciones(concurrencia={'email': 1}).ejecutar()
+
+        assert (reporte['enviadas'], reporte['fallidas']) == (2, 1)
+        assert sorted(conexion.entregados) == ['Aviso 0', 'Aviso 2']
+        assert Notificacion.objects.get(asunto='Aviso 1').estado == 'fallida'
+
+    def test_comando(self, cliente):
+        Notificacion.objects.create(cliente=cliente, asunto='Aviso', mensaje='<html><b>Hola</b></html>', canal='email')
+
+        call_command('send_notifications', '--dry-run')
+        assert Notificacion.objects.get().estado == 'pendiente'
+
+        call_command('send_notifications')
+        assert Notificacion.objects.get().estado == 'enviada'
+        assert mail.outbox[0].alternatives[0][1] == 'text/html'
+        assert mail.outbox[0].body == 'Hola'
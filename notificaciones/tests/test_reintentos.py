@@ -0,0 +1,74 @@
+"""
+Tests para la política de reintentos de notificaciones.
+"""
+import smtplib
+from datetime import timedelta
+import pytest
+from django.core.cache import cache
+from django.utils import timezone
+from notificaciones.despachador import DespachadorNotificaciones
+from notificaciones.models import Notificacion
+from notificaciones.reintentos import PoliticaReintentos, contadores_envio, es_transitorio
+
+
+class ErrorTwilio(Exception):
+    """Error con la forma de TwilioRestException (status HTTP y código de Twilio)."""
+
+    def __init__(self, status, code=None):
+        super().__init__(f'HTTP {status}')
+        self.status = status
+        self.code = code
+
+
+class TwilioCaido:
+    """Cliente de Twilio que responde 503 a todo."""
+
+    def __init__(self):
+        self.messages = self
+
+    def create(self, body, from_, to):
+        raise ErrorTwilio(503)
+
+
+def test_clasificacion_por_canal():
+    assert es_transitorio('email', smtplib.SMTPResponseException(451, b'Try again later'))
+    assert es_transitorio('email', smtplib.SMTPServerDisconnected('Connection unexpectedly closed'))
+    assert es_transitorio('email', TimeoutError())
+    assert not es_transitorio('email', smtplib.SMTPRecipientsRefused({'x@y.com': (550, b'No such user')}))
+    assert es_transitorio('sms', ErrorTwilio(429))
+    assert es_transitorio('whatsapp', ErrorTwilio(500))
+    assert not es_transitorio('sms', ErrorTwilio(400, code=21211))
+    assert not es_transitorio('sms', 'El cliente no tiene teléfono configurado')
+
+    politica = PoliticaReintentos(base=60, tope=300)
+    assert timedelta(seconds=30) <= politica.espera(1) <= timedelta(seconds=60)
+    assert timedelta(seconds=120) <= politica.espera(3) <= timedelta(seconds=240)
+    assert politica.espera(10) <= timedelta(seconds=300)
+
+
+@pytest.mark.django_db
+def test_reprograma_y_descarta(cliente, monkeypatch):
+    cache.clear()
+    monkeypatch.setenv('TWILIO_PHONE_NUMBER', '+15550001111')
+    notificacion = Notificacion.objects.create(cliente=cliente, asunto='SMS', mensaje='Hola', canal='sms')
+    despachador = DespachadorNotificaciones(
+        cliente_twilio=TwilioCaido(), politica=PoliticaReintentos(max_intentos=2, base=60),
+    )
+
+    antes = timezone.now()
+    reporte = despachador.ejecutar()
+    notificacion.refresh_from_db()
+    assert (reporte['fallidas'], reporte['reintentos']) == (1, 1)
+    assert (notificacion.estado, notificacion.intentos, notificacion.resultado) == ('pendiente', 1, 'HTTP 503')
+    assert antes + timedelta(seconds=30) <= notificacion.fecha_programada <= timezone.now() + timedelta(seconds=60)
+
+    # Hasta que vence la espera, la cola no la vuelve a tomar
+    assert despachador.ejecutar()['total'] == 0
+    Notificacion.objects.update(fecha_programada=timezone.now())
+    assert despachador.ejecutar()['descartadas'] == 1
+    notificacion.refresh_from_db()
+    assert (notificacion.estado, notificacion.intentos) == ('descartada', 2)
+
+    # Los contadores salen de la base de datos: no se pierden con la caché del proceso
+    cache.clear()
+    assert contadores_envio()['sms'] == {'reintentos': 1, 'fallidas': 0, 'descartadas': 1}
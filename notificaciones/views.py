@@ -2,10 +2,22 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q
+from django.utils import timezone
+from core.estadisticas import calcular_estadisticas, Conteo
+from core.paginacion import PaginadorKeyset
+from .cola import ColaNotificaciones
 from .models import Notificacion
 from .forms import NotificacionForm
+from .reintentos import contadores_envio
 from .services import NotificationService
 
+# Órdenes permitidos del listado; cada uno respaldado por un índice compuesto de Notificacion
+ORDENES_NOTIFICACIONES = {
+    '-fecha_creacion': ('-fecha_creacion', '-id'),
+    'fecha_creacion': ('fecha_creacion', 'id'),
+    'asunto': ('asunto', 'id'),
+}
+
 
 @login_required
 def notificacion_list(request):
@@ -33,26 +45,32 @@ def notificacion_list(request):
     if canal_filter:
         notificaciones = notificaciones.filter(canal=canal_filter)
     
-    # Ordenamiento
-    orden = request.GET.get('orden', '-fecha_creacion')
-    notificaciones = notificaciones.order_by(orden)
+    # Calcular estadísticas (una sola consulta)
+    stats = calcular_estadisticas(notificaciones, {
+        'total_notificaciones': Conteo(),
+        'pendientes': Conteo(Q(estado='pendiente')),
+        'enviadas': Conteo(Q(estado='enviada')),
+    })
     
-    # Calcular estadísticas
-    total_notificaciones = notificaciones.count()
-    pendientes = notificaciones.filter(estado='pendiente').count()
-    enviadas = notificaciones.filter(estado='enviada').count()
+    # Ordenamiento (lista blanca) y paginación por cursor
+    paginador = PaginadorKeyset(notificaciones, ORDENES_NOTIFICACIONES, request.GET.get('orden'), por_pagina=25)
+    page_obj = paginador.pagina(request.GET.get('cursor'), parametros=request.GET)
+    orden = paginador.orden
     
     context = {
-        'notificaciones': notificaciones,
+        'notificaciones': page_obj,
+        'page_obj': page_obj,
         'query': query,
         'estado_filter': estado_filter,
         'canal_filter': canal_filter,
         'orden': orden,
         'estados': Notificacion.ESTADO_CHOICES,
         'canales': Notificacion.CANAL_CHOICES,
-        'total_notificaciones': total_notificaciones,
-        'pendientes': pendientes,
-        'enviadas': enviadas,
+        'total_notificaciones': stats['total_notificaciones'],
+        'pendientes': stats['pendientes'],
+        'enviadas': stats['enviadas'],
+        # Reintentos y fallos por canal (calculados de las notificaciones)
+        'contadores_envio': contadores_envio(),
     }
     
     return render(request, 'notificaciones/notificacion_list.html', context)
@@ -62,7 +80,7 @@ def notificacion_list(request):
 def notificacion_detail(request, pk):
     """Muestra los detalles de una notificación."""
     notificacion = get_object_or_404(
-        Notificacion.objects.select_related('cliente', 'tipo', 'pago'),
+        Notificacion.objects.select_related('cliente', 'tipo', 'pago').prefetch_related('pagos'),
         pk=pk
     )
     
@@ -158,11 +176,28 @@ def notificacion_send(request, pk):
         messages.warning(request, f'La notificación ya fue procesada (estado: {notificacion.get_estado_display()}).')
         return redirect('notificaciones:notificacion_detail', pk=notificacion.pk)
     
+    # Reservarla como lo hace la cola: si el envío automático la tiene tomada, no se envía dos veces
+    cola = ColaNotificaciones()
+    reservada = cola.reclamar_una(notificacion.pk)
+    if reservada is None:
+        messages.warning(request, 'La notificación se está enviando en este momento. Revisa su estado en unos minutos.')
+        return redirect('notificaciones:notificacion_detail', pk=notificacion.pk)
+    notificacion = reservada
+    
     # Enviar notificación
     resultado = NotificationService.send_notification(notificacion)
+    if notificacion.reservada_por:
+        # No se llegó a enviar (ej. todavía no es su fecha programada): devolverla a la cola
+        cola.liberar([notificacion])
     
     if resultado.get('success'):
         messages.success(request, f'Notificación enviada exitosamente: {resultado.get("message", "Enviado")}')
+    elif notificacion.estado == 'pendiente':
+        messages.warning(
+            request,
+            f'Error temporal al enviar la notificación: {resultado.get("error", "Error desconocido")}. '
+            f'Se reintentará automáticamente el {timezone.localtime(notificacion.fecha_programada):%d/%m/%Y %H:%M}.'
+        )
     else:
         messages.error(request, f'Error al enviar notificación: {resultado.get("error", "Error desconocido")}')
     
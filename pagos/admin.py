@@ -1,5 +1,10 @@
-from django.contrib import admin
-from .models import Pago, PlanPago, TransaccionPago
+from django.contrib import admin, messages
+from .models import (
+    Pago, PlanPago, TransaccionPago, ExportacionPagos, ResumenMensualPagos, EventoWebhook,
+    ClientePasarela, ExtractoBancario, MovimientoBancario, LoteCobranza, CobroCapturado,
+    SaldoCliente,
+)
+from .cobranza import CapturaCobranzaService
 
 
 @admin.register(Pago)
@@ -39,9 +44,19 @@ class PagoAdmin(admin.ModelAdmin):
     actions = ['marcar_como_pagado']
     
     def marcar_como_pagado(self, request, queryset):
-        """Acción para marcar pagos como pagados."""
-        updated = queryset.update(estado='pagado')
-        self.message_user(request, f'{updated} pago(s) marcado(s) como pagado(s).')
+        """Acción para marcar pagos como pagados (con fecha de pago y lote de cobranza de auditoría)."""
+        cobros = [
+            {'pago': pago_id, 'monto': monto, 'metodo': metodo or 'efectivo'}
+            for pago_id, monto, metodo in queryset.values_list('id', 'monto', 'metodo_pago')
+        ]
+        resultado = CapturaCobranzaService.capturar(cobros, usuario=request.user, origen='admin')
+        self.message_user(request, f"{resultado['aplicados']} pago(s) marcado(s) como pagado(s).")
+        if resultado['rechazados']:
+            self.message_user(
+                request,
+                f"{resultado['rechazados']} pago(s) no se modificaron (ya estaban pagados o cancelados).",
+                level=messages.WARNING,
+            )
     marcar_como_pagado.short_description = 'Marcar como pagado'
 
 
@@ -85,3 +100,73 @@ class TransaccionPagoAdmin(admin.ModelAdmin):
             'fields': ('fecha_creacion', 'fecha_actualizacion', 'fecha_completada')
         }),
     )
+
+
+@admin.register(ExportacionPagos)
+class ExportacionPagosAdmin(admin.ModelAdmin):
+    list_display = ['id', 'usuario', 'formato', 'estado', 'total_filas', 'fecha_creacion', 'fecha_completada']
+    list_filter = ['formato', 'estado', 'fecha_creacion']
+    readonly_fields = ['fecha_creacion', 'fecha_inicio', 'fecha_completada', 'total_filas', 'mensaje_error']
+
+
+@admin.register(ResumenMensualPagos)
+class ResumenMensualPagosAdmin(admin.ModelAdmin):
+    list_display = ['anio', 'mes', 'estado', 'metodo_pago', 'cantidad', 'monto']
+    list_filter = ['anio', 'estado', 'metodo_pago']
+
+
+@admin.register(EventoWebhook)
+class EventoWebhookAdmin(admin.ModelAdmin):
+    list_display = ['id', 'pasarela', 'tipo', 'id_evento', 'estado', 'intentos', 'fecha_recepcion', 'fecha_procesado']
+    list_filter = ['pasarela', 'estado', 'tipo']
+    search_fields = ['id_evento']
+    readonly_fields = ['fecha_recepcion', 'fecha_procesado', 'intentos', 'resultado']
+
+
+@admin.register(ClientePasarela)
+class ClientePasarelaAdmin(admin.ModelAdmin):
+    list_display = ['cliente', 'pasarela', 'id_cliente_pasarela', 'fecha_creacion']
+    list_filter = ['pasarela']
+    search_fields = ['id_cliente_pasarela', 'cliente__nombre', 'cliente__apellido1']
+    raw_id_fields = ['cliente']
+
+
+@admin.register(ExtractoBancario)
+class ExtractoBancarioAdmin(admin.ModelAdmin):
+    list_display = ['nombre_archivo', 'formato', 'usuario', 'total_lineas', 'aplicados', 'en_revision', 'sin_coincidencia', 'fecha_importacion']
+    list_filter = ['formato', 'fecha_importacion']
+    search_fields = ['nombre_archivo', 'huella']
+    readonly_fields = ['huella', 'total_lineas', 'aplicados', 'en_revision', 'sin_coincidencia', 'segundos', 'fecha_importacion']
+
+
+@admin.register(MovimientoBancario)
+class MovimientoBancarioAdmin(admin.ModelAdmin):
+    list_display = ['extracto', 'linea', 'fecha', 'monto', 'referencia', 'estado', 'criterio', 'pago']
+    list_filter = ['estado', 'criterio']
+    search_fields = ['referencia', 'descripcion']
+    raw_id_fields = ['extracto', 'pago']
+
+
+class CobroCapturadoInline(admin.TabularInline):
+    model = CobroCapturado
+    extra = 0
+    can_delete = False
+    raw_id_fields = ['pago']
+    readonly_fields = ['linea', 'pago', 'contrato', 'monto', 'metodo_pago', 'referencia', 'fecha_pago', 'resultado', 'error']
+
+
+@admin.register(LoteCobranza)
+class LoteCobranzaAdmin(admin.ModelAdmin):
+    list_display = ['id', 'cobrador', 'origen', 'usuario', 'total', 'aplicados', 'rechazados', 'monto_aplicado', 'fecha_captura']
+    list_filter = ['origen', 'fecha_captura']
+    search_fields = ['cobrador']
+    readonly_fields = ['usuario', 'origen', 'total', 'aplicados', 'rechazados', 'monto_aplicado', 'segundos', 'fecha_captura']
+    inlines = [CobroCapturadoInline]
+
+
+@admin.register(SaldoCliente)
+class SaldoClienteAdmin(admin.ModelAdmin):
+    list_display = ['cliente', 'monto_pendiente', 'monto_vencido', 'monto_90_mas', 'vencimiento_mas_antiguo', 'ultimo_pago', 'fecha_corte']
+    search_fields = ['cliente__nombre', 'cliente__apellido1', 'cliente__telefono']
+    raw_id_fields = ['cliente']
+    readonly_fields = [field.name for field in SaldoCliente._meta.fields]
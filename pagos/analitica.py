@@ -0,0 +1,295 @@
+"""
+Analítica de ingresos recurrentes: MRR, bajas, retención por cohorte y pronóstico de cobranza.
+
+Los datos se leen como columnas (una consulta por fuente) y se calculan con NumPy
+sobre arreglos, sin recorrer objetos del ORM:
+- Suscripciones: cada PlanPago con su monto mensual y el mes de alta de la instalación.
+- Bajas: historial de CambioEstadoInstalacion; una suscripción termina en el mes de
+  su último cambio si ese cambio la dejó suspendida o cancelada.
+- Cobranza: lo facturado y lo cobrado por periodo, agrupado en la base de datos.
+
+Los meses se manejan como enteros (anio * 12 + mes - 1). Una suscripción cuenta en
+el MRR de los meses inicio <= mes < fin. El resultado se guarda en caché por día.
+"""
+import logging
+import time
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce, ExtractMonth, ExtractYear
+from instalaciones.models import CambioEstadoInstalacion
+from .models import Pago, PlanPago
+from .vencimientos import VencimientoPagos
+
+logger = logging.getLogger(__name__)
+
+ESTADOS_BAJA = ('suspendida', 'cancelada')
+ESTADOS_SIN_ALTA = ('pendiente', 'programada', 'en_proceso')
+MESES = 12
+MESES_PROMEDIO = 6
+SIN_FIN = np.iinfo(np.int64).max // 2
+CACHE_SEGUNDOS = 60 * 60 * 24
+
+
+def indice_mes(anio, mes):
+    """Índice entero del mes (acepta escalares o arreglos)."""
+    return anio * 12 + mes - 1
+
+
+def nombre_mes(indice):
+    """'MM/AAAA' de un índice de mes."""
+    anio, mes = divmod(int(indice), 12)
+    return f'{mes + 1:02d}/{anio}'
+
+
+def cargar_suscripciones():
+    """
+    Suscripciones como columnas.
+
+    Returns:
+        tuple: (instalacion_id, monto, inicio, fin) como arreglos NumPy; fin es SIN_FIN
+               para las suscripciones vigentes
+    """
+    alta = Coalesce(
+        'instalacion__fecha_activacion', 'instalacion__fecha_instalacion', 'instalacion__fecha_solicitud'
+    )
+    filas = list(
+        PlanPago.objects.exclude(instalacion__estado__in=ESTADOS_SIN_ALTA)
+        .annotate(anio_alta=ExtractYear(alta), mes_alta=ExtractMonth(alta))
+        .order_by('instalacion_id')
+        .values_list('instalacion_id', 'monto_mensual', 'anio_alta', 'mes_alta', 'activo', 'instalacion__estado')
+    )
+    if not filas:
+        vacio = np.empty(0, dtype=np.int64)
+        return vacio, np.empty(0), vacio, vacio
+    ids, montos, anios, meses, activos, estados = zip(*filas)
+    ids = np.array(ids, dtype=np.int64)
+    montos = np.array(montos, dtype=np.float64)
+    inicio = indice_mes(np.array(anios, dtype=np.int64), np.array(meses, dtype=np.int64))
+    fin = np.full(len(ids), SIN_FIN, dtype=np.int64)
+
+    cambios = list(
+        CambioEstadoInstalacion.objects.filter(instalacion_id__in=PlanPago.objects.values('instalacion_id'))
+        .annotate(anio=ExtractYear('fecha_cambio'), mes=ExtractMonth('fecha_cambio'))
+        .order_by('instalacion_id', 'fecha_cambio', 'id')
+        .values_list('instalacion_id', 'anio', 'mes', 'estado_nuevo')
+    )
+    if cambios:
+        c_ids, c_anios, c_meses, c_estados = zip(*cambios)
+        c_ids = np.array(c_ids, dtype=np.int64)
+        # Último cambio de cada instalación (los cambios vienen ordenados por instalación y fecha)
+        ultimos = np.flatnonzero(np.append(c_ids[1:] != c_ids[:-1], True))
+        es_baja = np.isin(np.array(c_estados, dtype=object)[ultimos], ESTADOS_BAJA)
+        posiciones = np.searchsorted(ids, c_ids[ultimos])
+        validas = (posiciones < len(ids)) & es_baja
+        validas[validas] = ids[posiciones[validas]] == c_ids[ultimos][validas]
+        meses_baja = indice_mes(np.array(c_anios, dtype=np.int64), np.array(c_meses, dtype=np.int64))[ultimos]
+        fin[posiciones[validas]] = meses_baja[validas]
+
+    # Planes dados de baja sin historial: no se conoce la fecha, se excluyen del cálculo
+    sin_fecha = (fin == SIN_FIN) & (
+        ~np.array(activos, dtype=bool) | np.isin(np.array(estados, dtype=object), ESTADOS_BAJA)
+    )
+    fin[sin_fecha] = inicio[sin_fecha]
+    return ids, montos, inicio, fin
+
+
+def cargar_cobranza(desde):
+    """
+    Facturado y cobrado por periodo desde el mes indicado (agrupado en la base de datos).
+
+    Returns:
+        tuple: (periodo, facturado, cobrado) como arreglos NumPy
+    """
+    anio, mes = divmod(desde, 12)
+    filas = list(
+        Pago.objects.filter(Q(periodo_anio__gt=anio) | Q(periodo_anio=anio, periodo_mes__gte=mes + 1))
+        .exclude(estado='cancelado')
+        .order_by().values_list('periodo_anio', 'periodo_mes')
+        .annotate(facturado=Sum('monto'), cobrado=Sum('monto', filter=Q(estado='pagado')))
+    )
+    if not filas:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+    anios, meses, facturado, cobrado = zip(*filas)
+    periodo = indice_mes(np.array(anios, dtype=np.int64), np.array(meses, dtype=np.int64))
+    return (
+        periodo,
+        np.array(facturado, dtype=np.float64),
+        np.array([valor or 0 for valor in cobrado], dtype=np.float64),
+    )
+
+
+def serie_mrr(montos, inicio, fin, desde, meses=MESES):
+    """
+    MRR, altas y bajas de `meses` meses a partir de `desde`.
+
+    Returns:
+        dict de arreglos de largo `meses`: mrr, nuevo, perdido, neto, clientes, altas, bajas
+        y tasa_bajas (bajas / clientes del mes anterior)
+    """
+    vigentes = fin > inicio
+    montos, inicio, fin = montos[vigentes], inicio[vigentes], fin[vigentes]
+    # Se calcula desde el mes anterior para tener la base de la tasa de bajas del primer mes
+    base = desde - 1
+    largo = meses + 1
+    pos_inicio = np.clip(inicio - base, 0, largo)
+    pos_fin = np.clip(fin - base, 0, largo)
+
+    def acumulado(pesos):
+        cambio = np.bincount(pos_inicio, pesos, minlength=largo + 1) - np.bincount(pos_fin, pesos, minlength=largo + 1)
+        return np.cumsum(cambio)[:largo]
+
+    uno = np.ones(len(montos))
+    mrr = acumulado(montos)
+    clientes = acumulado(uno)
+    en_rango_alta = (inicio > base) & (inicio <= base + meses)
+    en_rango_baja = (fin > base) & (fin <= base + meses)
+    nuevo = np.bincount(inicio[en_rango_alta] - base, montos[en_rango_alta], minlength=largo)[:largo]
+    perdido = np.bincount(fin[en_rango_baja] - base, montos[en_rango_baja], minlength=largo)[:largo]
+    altas = np.bincount(inicio[en_rango_alta] - base, minlength=largo)[:largo]
+    bajas = np.bincount(fin[en_rango_baja] - base, minlength=largo)[:largo]
+    anteriores = clientes[:-1]
+    tasa_bajas = np.divide(bajas[1:], anteriores, out=np.zeros(meses), where=anteriores > 0)
+    tasa_mrr = np.divide(perdido[1:], mrr[:-1], out=np.zeros(meses), where=mrr[:-1] > 0)
+    return {
+        'mrr': mrr[1:],
+        'nuevo': nuevo[1:],
+        'perdido': perdido[1:],
+        'neto': nuevo[1:] - perdido[1:],
+        'clientes': clientes[1:],
+        'altas': altas[1:],
+        'bajas': bajas[1:],
+        'tasa_bajas': tasa_bajas,
+        'tasa_perdida_mrr': tasa_mrr,
+    }
+
+
+def retencion_cohortes(inicio, fin, desde, actual, meses=MESES):
+    """
+    Retención por cohorte de alta: fila = mes de alta, columna = meses desde el alta.
+
+    Returns:
+        tuple: (tamaños, matriz de retención en 0..1 con NaN en los meses que aún no pasan)
+    """
+    vigentes = fin > inicio
+    inicio, fin = inicio[vigentes], fin[vigentes]
+    en_rango = (inicio >= desde) & (inicio < desde + meses)
+    cohorte = inicio[en_rango] - desde
+    vida = fin[en_rango] - inicio[en_rango]
+    activos = vida[:, None] > np.arange(meses)[None, :]
+    conteo = np.zeros((meses, meses))
+    np.add.at(conteo, cohorte, activos)
+    tamanos = np.bincount(cohorte, minlength=meses)
+    retencion = np.divide(conteo, tamanos[:, None], out=np.zeros_like(conteo), where=tamanos[:, None] > 0)
+    transcurridos = (actual - desde) - np.arange(meses)[:, None]
+    retencion[np.arange(meses)[None, :] > transcurridos] = np.nan
+    return tamanos, retencion
+
+
+def pronostico_cobranza(mrr_actual, nuevo_promedio, tasa_perdida, tasa_cobro, meses=MESES):
+    """
+    Pronóstico de MRR y cobranza para los próximos `meses` meses.
+
+    El MRR actual decae con la tasa de pérdida mensual y se suma el MRR nuevo
+    promedio (que también decae desde su mes de alta); la cobranza esperada es
+    el MRR proyectado por la tasa de cobro histórica.
+
+    Returns:
+        tuple: (mrr proyectado, cobranza esperada) como arreglos de largo `meses`
+    """
+    horizonte = np.arange(1, meses + 1)
+    retiene = (1 - tasa_perdida) ** horizonte
+    if tasa_perdida > 0:
+        acumulado_nuevo = nuevo_promedio * (1 - retiene) / tasa_perdida
+    else:
+        acumulado_nuevo = nuevo_promedio * horizonte
+    mrr = mrr_actual * retiene + acumulado_nuevo
+    return mrr, mrr * tasa_cobro
+
+
+class AnaliticaIngresos:
+    """
+    Tablero de ingresos recurrentes al día indicado.
+
+    Args:
+        hoy: Fecha de corte (por defecto, hoy)
+    """
+
+    def __init__(self, hoy=None):
+        self.hoy = hoy or VencimientoPagos.hoy()
+        self.actual = indice_mes(self.hoy.year, self.hoy.month)
+        self.desde = self.actual - MESES + 1
+
+    def generar(self):
+        """Indicadores del tablero; se guardan en caché durante el día."""
+        clave = f'analitica_ingresos_{self.hoy}'
+        resultado = cache.get(clave)
+        if resultado is None:
+            resultado = self.calcular()
+            cache.set(clave, resultado, CACHE_SEGUNDOS)
+        return resultado
+
+    def calcular(self):
+        inicio_calculo = time.monotonic()
+        _, montos, inicio, fin = cargar_suscripciones()
+        serie = serie_mrr(montos, inicio, fin, self.desde)
+        tamanos, retencion = retencion_cohortes(inicio, fin, self.desde, self.actual)
+
+        # Tasa de cobro de los últimos periodos cerrados (sin el mes en curso)
+        periodo, facturado, cobrado = cargar_cobranza(self.actual - MESES_PROMEDIO)
+        cerrados = periodo < self.actual
+        total_facturado = facturado[cerrados].sum()
+        tasa_cobro = float(cobrado[cerrados].sum() / total_facturado) if total_facturado else 1.0
+
+        recientes = slice(-MESES_PROMEDIO, None)
+        tasa_perdida = float(serie['tasa_perdida_mrr'][recientes].mean())
+        nuevo_promedio = float(serie['nuevo'][recientes].mean())
+        mrr_actual = float(serie['mrr'][-1])
+        mrr_proyectado, cobranza = pronostico_cobranza(mrr_actual, nuevo_promedio, tasa_perdida, tasa_cobro)
+
+        meses = [
+            {
+                'mes': nombre_mes(self.desde + i),
+                'mrr': round(float(serie['mrr'][i]), 2),
+                'nuevo': round(float(serie['nuevo'][i]), 2),
+                'perdido': round(float(serie['perdido'][i]), 2),
+                'neto': round(float(serie['neto'][i]), 2),
+                'clientes': int(serie['clientes'][i]),
+                'altas': int(serie['altas'][i]),
+                'bajas': int(serie['bajas'][i]),
+                'tasa_bajas': round(float(serie['tasa_bajas'][i]) * 100, 2),
+            }
+            for i in range(MESES)
+        ]
+        cohortes = [
+            {
+                'mes': nombre_mes(self.desde + i),
+                'tamano': int(tamanos[i]),
+                'retencion': [None if np.isnan(valor) else round(float(valor) * 100, 1) for valor in retencion[i]],
+            }
+            for i in range(MESES)
+        ]
+        pronostico = [
+            {
+                'mes': nombre_mes(self.actual + i + 1),
+                'mrr': round(float(mrr_proyectado[i]), 2),
+                'cobranza': round(float(cobranza[i]), 2),
+            }
+            for i in range(MESES)
+        ]
+        segundos = round(time.monotonic() - inicio_calculo, 3)
+        logger.info(f'Analítica de ingresos calculada para {len(montos)} suscripciones en {segundos}s')
+        return {
+            'hoy': self.hoy,
+            'suscripciones': len(montos),
+            'mrr_actual': round(mrr_actual, 2),
+            'arr_actual': round(mrr_actual * 12, 2),
+            'tasa_perdida': round(tasa_perdida * 100, 2),
+            'tasa_cobro': round(tasa_cobro * 100, 2),
+            'nuevo_promedio': round(nuevo_promedio, 2),
+            'cobranza_12_meses': round(float(cobranza.sum()), 2),
+            'meses': meses,
+            'cohortes': cohortes,
+            'pronostico': pronostico,
+            'segundos': segundos,
+        }
@@ -0,0 +1,181 @@
+"""
+Reporte de antigüedad de saldos (cartera vencida).
+
+Todos los pagos sin pagar se reparten en rangos según los días transcurridos desde
+su vencimiento (por vencer, 0-30, 31-60, 61-90 y más de 90) y se agrupan por
+cliente, ciudad o plan en una sola consulta con SUM(CASE WHEN ...) por rango.
+- El resultado para pantalla se guarda en caché con la versión persistente de datos
+  de pagos (core.estadisticas.version_persistente), que cambia con cada pago, cliente
+  o instalación guardados o eliminados, también desde otros procesos y comandos.
+- La exportación CSV recorre la misma consulta con un iterador de servidor y se
+  envía en streaming, sin cargar todo el reporte en memoria.
+"""
+import csv
+from datetime import timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.db.models import Case, Count, DecimalField, F, Min, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from core.estadisticas import version_persistente
+from .models import Pago
+from .vencimientos import VencimientoPagos
+
+RANGOS = (
+    ('por_vencer', 'Por vencer'),
+    ('dias_0_30', '0-30 días'),
+    ('dias_31_60', '31-60 días'),
+    ('dias_61_90', '61-90 días'),
+    ('dias_90_mas', 'Más de 90 días'),
+)
+
+# Campos de agrupación: los del GROUP BY y la etiqueta de cada fila
+AGRUPACIONES = {
+    'cliente': {
+        'nombre': 'Cliente',
+        'campos': ('cliente_id', 'cliente__nombre', 'cliente__apellido1', 'cliente__telefono', 'cliente__ciudad'),
+        'orden': ('-vencido', 'cliente_id'),
+    },
+    'ciudad': {
+        'nombre': 'Ciudad',
+        'campos': ('cliente__ciudad',),
+        'orden': ('-vencido', 'cliente__ciudad'),
+    },
+    'plan': {
+        'nombre': 'Plan',
+        'campos': ('instalacion__plan_nombre',),
+        'orden': ('-vencido', 'instalacion__plan_nombre'),
+    },
+}
+
+CACHE_SEGUNDOS = 60 * 60
+
+
+def _monto_si(condicion):
+    return Sum(
+        Case(When(condicion, then=F('monto')), default=Value(Decimal('0'))),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+class ReporteAntiguedad:
+    """
+    Reporte de antigüedad de saldos agrupado por cliente, ciudad o plan.
+
+    Args:
+        agrupacion: 'cliente', 'ciudad' o 'plan'
+        hoy: Fecha de corte (por defecto, hoy)
+    """
+
+    def __init__(self, agrupacion='cliente', hoy=None):
+        self.agrupacion = agrupacion if agrupacion in AGRUPACIONES else 'cliente'
+        self.hoy = hoy or VencimientoPagos.hoy()
+
+    def consulta(self):
+        """Consulta agrupada con el monto de cada rango, el total, el vencido y el vencimiento más antiguo."""
+        hoy = self.hoy
+        limites = [hoy - timedelta(days=dias) for dias in (30, 60, 90)]
+        # Misma condición de vencido que SaldoCliente (pagos/saldos.py)
+        vencido = VencimientoPagos.condicion_vencido(hoy)
+        rangos = {
+            'por_vencer': _monto_si(~vencido),
+            'dias_0_30': _monto_si(vencido & Q(fecha_vencimiento__gte=limites[0])),
+            'dias_31_60': _monto_si(vencido & Q(fecha_vencimiento__lt=limites[0], fecha_vencimiento__gte=limites[1])),
+            'dias_61_90': _monto_si(vencido & Q(fecha_vencimiento__lt=limites[1], fecha_vencimiento__gte=limites[2])),
+            'dias_90_mas': _monto_si(vencido & Q(fecha_vencimiento__lt=limites[2])),
+        }
+        configuracion = AGRUPACIONES[self.agrupacion]
+        return (
+            Pago.objects.filter(estado__in=['pendiente', 'vencido'])
+            .order_by()
+            .values(*configuracion['campos'])
+            .annotate(
+                **rangos,
+                vencido=_monto_si(vencido),
+                total=Coalesce(Sum('monto'), Decimal('0')),
+                pagos=Count('pk'),
+                vencimiento_mas_antiguo=Min('fecha_vencimiento'),
+            )
+            .order_by(*configuracion['orden'])
+        )
+
+    def etiqueta(self, fila):
+        if self.agrupacion == 'cliente':
+            return f"{fila['cliente__nombre']} {fila['cliente__apellido1'] or ''}".strip()
+        if self.agrupacion == 'ciudad':
+            return fila['cliente__ciudad'] or 'Sin ciudad'
+        return fila['instalacion__plan_nombre'] or 'Sin plan'
+
+    def filas(self):
+        """Filas del reporte (iterador de servidor), con etiqueta y días de mayor atraso."""
+        for fila in self.consulta().iterator(chunk_size=2000):
+            fila['etiqueta'] = self.etiqueta(fila)
+            fila['dias_atraso'] = max((self.hoy - fila['vencimiento_mas_antiguo']).days, 0)
+            yield fila
+
+    def generar(self, limite=200):
+        """
+        Reporte para pantalla: totales de toda la cartera y las `limite` filas con más saldo vencido.
+
+        Se guarda en caché hasta que cambie algún pago, cliente o plan, o cambie el día.
+
+        Returns:
+            dict: {'agrupacion', 'hoy', 'filas', 'grupos', 'totales', 'rangos': [(nombre, monto)]}
+        """
+        clave = f'reporte_antiguedad_{self.agrupacion}_{self.hoy}_{limite}_v{version_persistente("pagos")}'
+        reporte = cache.get(clave)
+        if reporte is not None:
+            return reporte
+
+        totales = {campo: Decimal('0') for campo, _ in RANGOS}
+        totales.update(vencido=Decimal('0'), total=Decimal('0'), pagos=0)
+        filas = []
+        grupos = 0
+        for fila in self.filas():
+            grupos += 1
+            for campo in list(totales):
+                totales[campo] += fila[campo]
+            if len(filas) < limite:
+                fila['montos'] = [fila[campo] for campo, _ in RANGOS]
+                filas.append(fila)
+        reporte = {
+            'agrupacion': self.agrupacion,
+            'hoy': self.hoy,
+            'filas': filas,
+            'grupos': grupos,
+            'totales': totales,
+            'rangos': [(nombre, totales[campo]) for campo, nombre in RANGOS],
+        }
+        cache.set(clave, reporte, CACHE_SEGUNDOS)
+        return reporte
+
+    def encabezados_csv(self):
+        encabezados = [AGRUPACIONES[self.agrupacion]['nombre']]
+        if self.agrupacion == 'cliente':
+            encabezados += ['ID cliente', 'Teléfono', 'Ciudad']
+        encabezados += [nombre for _, nombre in RANGOS]
+        encabezados += ['Total vencido', 'Saldo total', 'Pagos', 'Vencimiento más antiguo', 'Días de atraso']
+        return encabezados
+
+    def lineas_csv(self):
+        """Genera el CSV línea por línea (para StreamingHttpResponse)."""
+        buffer = _Eco()
+        escritor = csv.writer(buffer)
+        # BOM para que Excel reconozca UTF-8
+        yield '﻿' + escritor.writerow(self.encabezados_csv())
+        for fila in self.filas():
+            valores = [fila['etiqueta']]
+            if self.agrupacion == 'cliente':
+                valores += [fila['cliente_id'], fila['cliente__telefono'], fila['cliente__ciudad']]
+            valores += [fila[campo] for campo, _ in RANGOS]
+            valores += [
+                fila['vencido'], fila['total'], fila['pagos'],
+                fila['vencimiento_mas_antiguo'].strftime('%d/%m/%Y'), fila['dias_atraso'],
+            ]
+            yield escritor.writerow(valores)
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve la línea en lugar de escribirla."""
+
+    def write(self, valor):
+        return valor
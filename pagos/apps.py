@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PagosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pagos'
+    
+    def ready(self):
+        """Importa las señales cuando la app está lista."""
+        import pagos.signals  # noqa
@@ -0,0 +1,123 @@
+"""
+Calendario mensual de pagos.
+
+- El mes se resume con una sola consulta GROUP BY fecha_vencimiento, estado efectivo
+  (cantidad y monto por día y estado); las tarjetas del mes salen de las mismas filas.
+- El detalle de un día se carga bajo demanda desde un endpoint JSON paginado por
+  cursor sobre el índice (fecha_vencimiento, id).
+- Ambas respuestas se guardan en caché unos minutos con la versión persistente de
+  datos de pagos (core.estadisticas.version_persistente), que cambia con cada pago
+  guardado o eliminado, también desde otros procesos y comandos.
+"""
+from calendar import monthrange
+from datetime import date
+from decimal import Decimal
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from core.estadisticas import version_persistente
+from core.paginacion import PaginadorKeyset
+from .models import Pago
+from .vencimientos import VencimientoPagos
+
+ESTADOS_CALENDARIO = ('pendiente', 'vencido', 'pagado', 'cancelado')
+ORDENES_DIA = {'fecha_vencimiento': ('fecha_vencimiento', 'id')}
+POR_PAGINA_DIA = 50
+CACHE_SEGUNDOS = 300
+
+
+class CalendarioPagos:
+    """Resumen del mes y detalle de cada día del calendario de pagos."""
+
+    @staticmethod
+    def resumen_mes(anio, mes, hoy=None):
+        """
+        Cantidad y monto por día y estado del mes indicado.
+
+        Returns:
+            dict: {'dias': {dia: {'cantidad', 'monto', 'estados': {estado: {'cantidad', 'monto'}}}},
+                   'total_pagos', 'total_monto', 'pagos_pendientes', 'pagos_vencidos', 'pagos_pagados'}
+        """
+        hoy = hoy or VencimientoPagos.hoy()
+        clave = f'calendario_pagos_{anio}_{mes}_{hoy}_v{version_persistente("pagos")}'
+        resumen = cache.get(clave)
+        if resumen is not None:
+            return resumen
+
+        filas = (
+            VencimientoPagos.con_estado_efectivo(
+                Pago.objects.filter(fecha_vencimiento__range=(date(anio, mes, 1), date(anio, mes, monthrange(anio, mes)[1]))),
+                hoy,
+            )
+            .order_by()
+            .values('fecha_vencimiento', 'estado_efectivo')
+            .annotate(cantidad=Count('pk'), monto=Sum('monto'))
+        )
+        dias = {}
+        por_estado = dict.fromkeys(ESTADOS_CALENDARIO, 0)
+        total_monto = Decimal('0')
+        for fila in filas:
+            dia = dias.setdefault(
+                fila['fecha_vencimiento'].day, {'cantidad': 0, 'monto': Decimal('0'), 'estados': {}}
+            )
+            dia['cantidad'] += fila['cantidad']
+            dia['monto'] += fila['monto']
+            dia['estados'][fila['estado_efectivo']] = {'cantidad': fila['cantidad'], 'monto': fila['monto']}
+            por_estado[fila['estado_efectivo']] = por_estado.get(fila['estado_efectivo'], 0) + fila['cantidad']
+            total_monto += fila['monto']
+
+        resumen = {
+            'dias': dias,
+            'total_pagos': sum(dia['cantidad'] for dia in dias.values()),
+            'total_monto': total_monto,
+            'pagos_pendientes': por_estado['pendiente'],
+            'pagos_vencidos': por_estado['vencido'],
+            'pagos_pagados': por_estado['pagado'],
+        }
+        cache.set(clave, resumen, CACHE_SEGUNDOS)
+        return resumen
+
+    @staticmethod
+    def pagos_dia(fecha, estado=None, cursor=None, hoy=None, por_pagina=POR_PAGINA_DIA):
+        """
+        Página de pagos que vencen en la fecha indicada (opcionalmente de un estado efectivo).
+
+        Returns:
+            dict: {'fecha', 'pagos': [...], 'cursor_siguiente', 'cursor_anterior'}
+        """
+        hoy = hoy or VencimientoPagos.hoy()
+        estado = estado if estado in ESTADOS_CALENDARIO else ''
+        clave = f'calendario_pagos_dia_{fecha}_{estado}_{cursor or ""}_{hoy}_v{version_persistente("pagos")}'
+        respuesta = cache.get(clave)
+        if respuesta is not None:
+            return respuesta
+
+        pagos = VencimientoPagos.con_estado_efectivo(Pago.objects.filter(fecha_vencimiento=fecha), hoy)
+        if estado:
+            pagos = VencimientoPagos.filtrar_por_estado(pagos, estado, hoy)
+        pagos = pagos.values(
+            'id', 'fecha_vencimiento', 'monto', 'concepto', 'estado_efectivo',
+            'cliente__nombre', 'cliente__apellido1', 'cliente__apellido2', 'instalacion__numero_contrato',
+        )
+        pagina = PaginadorKeyset(pagos, ORDENES_DIA, por_pagina=por_pagina).pagina(cursor)
+        estados = dict(Pago.ESTADO_CHOICES)
+        respuesta = {
+            'fecha': fecha.isoformat(),
+            'pagos': [
+                {
+                    'id': pago['id'],
+                    'cliente': ' '.join(filter(None, (
+                        pago['cliente__nombre'], pago['cliente__apellido1'], pago['cliente__apellido2'],
+                    ))),
+                    'contrato': pago['instalacion__numero_contrato'] or '',
+                    'concepto': pago['concepto'],
+                    'monto': str(pago['monto']),
+                    'estado': pago['estado_efectivo'],
+                    'estado_display': estados.get(pago['estado_efectivo'], pago['estado_efectivo']),
+                }
+                for pago in pagina
+            ],
+            'cursor_siguiente': pagina.cursor_siguiente,
+            'cursor_anterior': pagina.cursor_anterior,
+        }
+        cache.set(clave, respuesta, CACHE_SEGUNDOS)
+        return respuesta
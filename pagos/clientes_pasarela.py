@@ -0,0 +1,100 @@
+"""
+IDs de los clientes en las pasarelas de pago (ClientePasarela) con caché de lectura.
+
+Flujo de `ClientesPasarelaService.obtener_id`:
+1. Caché (sin consultas).
+2. Tabla ClientePasarela (se guarda en caché).
+3. Si no existe, se crea en la pasarela sin bloquear filas (la llamada HTTP no
+   retiene bloqueos) y se guarda confiando en la restricción única (cliente, pasarela):
+   si dos checkouts simultáneos crean el cliente a la vez, se conserva el ID que se
+   guardó primero y el otro queda sin uso.
+
+Cuando la pasarela informa que el ID guardado ya no existe, `invalidar` borra solo
+la fila que tiene ese ID: si otro proceso ya lo reemplazó, el nuevo se conserva.
+"""
+import logging
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from .models import ClientePasarela
+
+logger = logging.getLogger(__name__)
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def clave_cache(pasarela, cliente_id):
+    return f'cliente_pasarela_{pasarela}_{cliente_id}'
+
+
+class ClientesPasarelaService:
+    """Servicio para obtener o crear el ID de un cliente en una pasarela."""
+
+    @staticmethod
+    def buscar_id(cliente_id, pasarela):
+        """ID guardado del cliente en la pasarela (caché y luego base de datos), o None."""
+        clave = clave_cache(pasarela, cliente_id)
+        id_pasarela = cache.get(clave)
+        if id_pasarela:
+            return id_pasarela
+        id_pasarela = ClientePasarela.objects.filter(
+            cliente_id=cliente_id, pasarela=pasarela
+        ).values_list('id_cliente_pasarela', flat=True).first()
+        if id_pasarela:
+            cache.set(clave, id_pasarela, CACHE_TIMEOUT)
+        return id_pasarela
+
+    @classmethod
+    def obtener_id(cls, cliente, pasarela, crear):
+        """
+        Devuelve el ID del cliente en la pasarela, creándolo solo si no existe.
+
+        Args:
+            cliente: Instancia de Cliente
+            pasarela: Código de la pasarela ('stripe', ...)
+            crear: Función cliente -> ID que crea el cliente en la pasarela
+
+        Returns:
+            str: ID del cliente en la pasarela
+        """
+        id_pasarela = cls.buscar_id(cliente.pk, pasarela)
+        if id_pasarela:
+            return id_pasarela
+
+        id_pasarela = crear(cliente)
+        try:
+            with transaction.atomic():
+                ClientePasarela.objects.create(
+                    cliente=cliente, pasarela=pasarela, id_cliente_pasarela=id_pasarela
+                )
+        except IntegrityError:
+            # Otro proceso guardó primero el cliente remoto que creó en paralelo
+            duplicado = id_pasarela
+            id_pasarela = ClientePasarela.objects.get(
+                cliente_id=cliente.pk, pasarela=pasarela
+            ).id_cliente_pasarela
+            logger.warning(
+                f'Cliente {cliente.pk} creado dos veces en {pasarela}; se conserva {id_pasarela} '
+                f'y queda sin uso {duplicado}'
+            )
+        else:
+            logger.info(f'Cliente {cliente.pk} registrado en {pasarela}: {id_pasarela}')
+
+        cache.set(clave_cache(pasarela, cliente.pk), id_pasarela, CACHE_TIMEOUT)
+        return id_pasarela
+
+    @staticmethod
+    def invalidar(cliente_id, pasarela, id_obsoleto):
+        """
+        Elimina el ID guardado si sigue siendo id_obsoleto (ej. el cliente se borró en la pasarela).
+
+        La caché se borra siempre: si otro proceso ya guardó un ID nuevo, el siguiente
+        checkout lo lee de la base de datos en vez de reutilizar el valor en caché.
+
+        Returns:
+            bool: True si se eliminó la fila
+        """
+        borrados, _ = ClientePasarela.objects.filter(
+            cliente_id=cliente_id, pasarela=pasarela, id_cliente_pasarela=id_obsoleto
+        ).delete()
+        cache.delete(clave_cache(pasarela, cliente_id))
+        return bool(borrados)
@@ -0,0 +1,253 @@
+"""
+Captura masiva de cobros (recibos en efectivo de los cobradores de campo).
+
+Cada recibo identifica el pago por su número o por el contrato de la instalación
+(en ese caso se toma el pago abierto más antiguo del contrato). El lote completo
+se valida con unas pocas consultas por conjunto y los recibos válidos se aplican
+en una sola transacción; cada recibo queda registrado como CobroCapturado con su
+resultado para auditoría.
+"""
+import logging
+import time
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+from .extractos import convertir_fecha, convertir_monto, fecha_pago
+from .models import CobroCapturado, LoteCobranza, Pago
+from .services import PagosMasivosService
+
+logger = logging.getLogger(__name__)
+
+ESTADOS_ABIERTOS = ('pendiente', 'vencido')
+METODOS = dict(Pago.METODO_PAGO_CHOICES)
+MAX_RECIBOS = 5000
+
+
+def leer_lineas(texto):
+    """
+    Recibos desde texto: una línea por recibo con `pago o contrato, monto, método, referencia`.
+
+    Un identificador numérico (o con #) es el número de pago; cualquier otro, el
+    número de contrato. Método y referencia son opcionales (método por defecto: efectivo).
+    """
+    cobros = []
+    for linea in (texto or '').splitlines():
+        if not linea.strip():
+            continue
+        partes = [parte.strip() for parte in linea.replace(';', ',').replace('\t', ',').split(',')]
+        partes += [''] * (4 - len(partes))
+        identificador = partes[0].lstrip('#')
+        cobro = {
+            'monto': partes[1],
+            'metodo': partes[2] or 'efectivo',
+            'referencia': ','.join(partes[3:]).strip(', '),
+        }
+        if identificador.isdigit():
+            cobro['pago'] = int(identificador)
+        else:
+            cobro['contrato'] = identificador
+        cobros.append(cobro)
+    return cobros
+
+
+class CapturaCobranzaService:
+    """Servicio para validar y aplicar lotes de cobros."""
+
+    @staticmethod
+    def _normalizar(numero, cobro, ahora):
+        """Convierte los campos de un recibo; devuelve (dict, error)."""
+        datos = {
+            'linea': numero,
+            'pago_id': None,
+            'contrato': str(cobro.get('contrato') or '').strip()[:50],
+            'monto': convertir_monto(cobro.get('monto')),
+            'metodo': str(cobro.get('metodo') or 'efectivo').strip().lower(),
+            'referencia': str(cobro.get('referencia') or '').strip()[:100],
+            'fecha': ahora,
+            'existe': False,
+        }
+        try:
+            datos['pago_id'] = int(cobro['pago']) if cobro.get('pago') not in (None, '') else None
+        except (TypeError, ValueError):
+            return datos, 'Número de pago inválido'
+        if datos['pago_id'] is None and not datos['contrato']:
+            return datos, 'Falta el número de pago o de contrato'
+        if datos['monto'] is None or not 0 < datos['monto'] < Decimal('100000000'):
+            return datos, 'Monto inválido'
+        if datos['metodo'] not in METODOS:
+            return datos, f"Método de pago no válido: {datos['metodo']}"
+        if cobro.get('fecha'):
+            fecha = convertir_fecha(cobro['fecha'])
+            if fecha is None:
+                return datos, 'Fecha inválida'
+            if fecha > timezone.localdate():
+                return datos, 'La fecha de pago no puede ser futura'
+            datos['fecha'] = fecha_pago(fecha)
+        return datos, ''
+
+    @classmethod
+    def validar(cls, cobros):
+        """
+        Valida un lote de recibos con consultas por conjunto (no una por recibo).
+
+        Returns:
+            list: dicts por recibo con linea, pago_id, existe, contrato, monto, metodo,
+                  referencia, fecha y error ('' si se puede aplicar)
+        """
+        ahora = timezone.now()
+        filas = []
+        for numero, cobro in enumerate(cobros, start=1):
+            datos, error = cls._normalizar(numero, cobro, ahora)
+            datos['error'] = error
+            filas.append(datos)
+        validas = [fila for fila in filas if not fila['error']]
+
+        columnas = ('id', 'monto', 'estado', 'instalacion__numero_contrato')
+        pagos = {
+            pago['id']: pago for pago in Pago.objects.filter(
+                pk__in={fila['pago_id'] for fila in validas if fila['pago_id']}
+            ).values(*columnas)
+        }
+        contratos = {fila['contrato'] for fila in validas if not fila['pago_id']}
+        abiertos_por_contrato = defaultdict(list)
+        if contratos:
+            for pago in (
+                Pago.objects.filter(instalacion__numero_contrato__in=contratos, estado__in=ESTADOS_ABIERTOS)
+                .order_by('fecha_vencimiento', 'id').values(*columnas)
+            ):
+                abiertos_por_contrato[pago['instalacion__numero_contrato']].append(pago)
+                pagos[pago['id']] = pago
+        referencias = {fila['referencia'] for fila in validas if fila['referencia']}
+        referencias_usadas = dict(
+            Pago.objects.filter(referencia_pago__in=referencias).values_list('referencia_pago', 'id')
+        ) if referencias else {}
+
+        reclamados = {}
+        # Referencia -> línea que la usa en este lote (la base de datos solo ve las ya aplicadas)
+        referencias_lote = {}
+        for fila in validas:
+            if not fila['pago_id']:
+                # Pago abierto más antiguo del contrato que no se haya tomado en este lote
+                pendiente = next(
+                    (p for p in abiertos_por_contrato.get(fila['contrato'], ()) if p['id'] not in reclamados), None
+                )
+                if pendiente is None:
+                    fila['error'] = f"El contrato {fila['contrato']} no tiene pagos pendientes"
+                    continue
+                fila['pago_id'] = pendiente['id']
+            pago = pagos.get(fila['pago_id'])
+            fila['existe'] = pago is not None
+            if pago is None:
+                fila['error'] = f"El pago #{fila['pago_id']} no existe"
+            elif pago['estado'] not in ESTADOS_ABIERTOS:
+                fila['error'] = f"El pago #{pago['id']} ya está {dict(Pago.ESTADO_CHOICES)[pago['estado']].lower()}"
+            elif pago['id'] in reclamados:
+                fila['error'] = f"El pago #{pago['id']} ya está en la línea {reclamados[pago['id']]}"
+            elif Decimal(pago['monto']) != fila['monto']:
+                fila['error'] = f"El monto no coincide con el del pago #{pago['id']} (${pago['monto']})"
+            elif fila['referencia'] in referencias_usadas:
+                fila['error'] = f"La referencia ya está registrada en el pago #{referencias_usadas[fila['referencia']]}"
+            elif fila['referencia'] in referencias_lote:
+                fila['error'] = f"La referencia ya está en la línea {referencias_lote[fila['referencia']]}"
+            else:
+                reclamados[pago['id']] = fila['linea']
+                if fila['referencia']:
+                    referencias_lote[fila['referencia']] = fila['linea']
+        return filas
+
+    @classmethod
+    def capturar(cls, cobros, usuario=None, cobrador='', origen='pantalla', aplicar=True):
+        """
+        Valida y aplica un lote de recibos.
+
+        Args:
+            cobros: Lista de dicts con pago o contrato, monto, metodo, referencia y fecha (opcional)
+            usuario: Usuario que captura el lote
+            cobrador: Nombre del cobrador que entregó los recibos
+            origen: 'pantalla', 'api' o 'admin'
+            aplicar: Si es False, solo valida (no guarda nada)
+
+        Returns:
+            dict: {'success', 'lote', 'total', 'aplicados', 'rechazados', 'monto_aplicado',
+                   'segundos', 'resultados': [{'linea', 'pago_id', 'aplicado', 'error'}]}
+        """
+        inicio = time.monotonic()
+        filas = cls.validar(cobros)
+        lote = None
+
+        if aplicar and filas:
+            with transaction.atomic():
+                por_pago = {fila['pago_id']: fila for fila in filas if not fila['error']}
+                pagos = list(
+                    Pago.objects.select_for_update()
+                    .filter(pk__in=list(por_pago), estado__in=ESTADOS_ABIERTOS)
+                    .only('pk', 'periodo_anio', 'periodo_mes', 'referencia_pago')
+                )
+                for pago in pagos:
+                    fila = por_pago.pop(pago.pk)
+                    pago.estado = 'pagado'
+                    pago.fecha_pago = fila['fecha']
+                    pago.metodo_pago = fila['metodo']
+                    pago.referencia_pago = fila['referencia'] or pago.referencia_pago
+                # Pagos que cambiaron de estado mientras se validaba el lote
+                for fila in por_pago.values():
+                    fila['error'] = f"El pago #{fila['pago_id']} cambió de estado durante la captura"
+                PagosMasivosService.guardar(pagos, ['estado', 'fecha_pago', 'metodo_pago', 'referencia_pago'])
+
+                lote = LoteCobranza.objects.create(usuario=usuario, cobrador=cobrador[:100], origen=origen)
+                CobroCapturado.objects.bulk_create([
+                    CobroCapturado(
+                        lote=lote,
+                        linea=fila['linea'],
+                        pago_id=fila['pago_id'] if fila['existe'] else None,
+                        contrato=fila['contrato'],
+                        monto=fila['monto'],
+                        metodo_pago=fila['metodo'][:20],
+                        referencia=fila['referencia'],
+                        fecha_pago=fila['fecha'],
+                        resultado='rechazado' if fila['error'] else 'aplicado',
+                        error=fila['error'][:255],
+                    )
+                    for fila in filas
+                ], batch_size=1000)
+                cls._contar(lote, filas)
+                lote.segundos = round(time.monotonic() - inicio, 3)
+                lote.save(update_fields=['total', 'aplicados', 'rechazados', 'monto_aplicado', 'segundos'])
+            resumen = lote
+        else:
+            resumen = LoteCobranza()
+            cls._contar(resumen, filas)
+
+        segundos = round(time.monotonic() - inicio, 3)
+        if aplicar:
+            logger.info(
+                f'Lote de cobranza {lote.pk if lote else "-"}: {resumen.aplicados} de {resumen.total} recibos '
+                f'aplicados (${resumen.monto_aplicado}) en {segundos}s'
+            )
+        return {
+            'success': True,
+            'lote': lote,
+            'total': resumen.total,
+            'aplicados': resumen.aplicados,
+            'rechazados': resumen.rechazados,
+            'monto_aplicado': resumen.monto_aplicado,
+            'segundos': segundos,
+            'resultados': [
+                {
+                    'linea': fila['linea'],
+                    'pago_id': fila['pago_id'],
+                    'aplicado': not fila['error'],
+                    'error': fila['error'],
+                }
+                for fila in filas
+            ],
+        }
+
+    @staticmethod
+    def _contar(lote, filas):
+        aplicadas = [fila for fila in filas if not fila['error']]
+        lote.total = len(filas)
+        lote.aplicados = len(aplicadas)
+        lote.rechazados = lote.total - lote.aplicados
+        lote.monto_aplicado = sum((fila['monto'] for fila in aplicadas), Decimal('0'))
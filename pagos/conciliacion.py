@@ -0,0 +1,385 @@
+"""
+Conciliación de transacciones pendientes con las pasarelas de pago.
+
+Las transacciones quedan en 'pendiente' si el webhook no llegó o falló. La
+conciliación consulta su estado real en la pasarela y aplica las transiciones:
+- Las transacciones pendientes se leen por lotes (keyset por id).
+- Cada lote se consulta en paralelo en un pool de hilos acotado; cada pasarela
+  tiene su propio limitador de tasa (token bucket), para no superar sus límites
+  de peticiones por segundo. Los hilos solo hacen HTTP: no tocan la base de datos.
+- Las transiciones de cada lote se aplican con actualizaciones masivas, en una
+  transacción y solo sobre filas que siguen pendientes (si el webhook las
+  completó mientras tanto, no se tocan).
+
+Resultado de cada transacción en el reporte:
+- coincide: la pasarela la tiene también pendiente (o ya se había actualizado).
+- corregida: se completó, falló o se canceló según la pasarela.
+- huerfana: la pasarela no la conoce.
+- monto_distinto: la pasarela la cobró con otro monto; queda pendiente para revisión manual.
+- error: no se pudo consultar.
+
+Las URL de las API son configurables (STRIPE_API_URL, MERCADOPAGO_API_URL,
+PAYPAL_API_URL) para ejecutarla contra un servidor de pruebas.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from datetime import timedelta
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from core.limitador import LimitadorTasa
+from .models import Pago, TransaccionPago
+from .paypal import obtener_cliente_paypal
+from .services import PagosMasivosService
+
+logger = logging.getLogger(__name__)
+
+PASARELAS = ('stripe', 'mercadopago', 'paypal')
+
+# Estados de Mercado Pago que cierran una transacción pendiente
+ESTADOS_MERCADOPAGO = {
+    'approved': 'completada',
+    'rejected': 'fallida',
+    'cancelled': 'fallida',
+    'refunded': 'cancelada',
+    'charged_back': 'cancelada',
+}
+
+
+class ErrorConciliacion(Exception):
+    """La pasarela no respondió como se esperaba al consultar una transacción."""
+
+
+def _sesion_http(reintentos):
+    """requests.Session con pool de conexiones y reintentos ante errores transitorios."""
+    reintento = Retry(
+        total=reintentos,
+        backoff_factor=0.3,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({'GET'}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=reintento)
+    sesion = requests.Session()
+    sesion.mount('https://', adaptador)
+    sesion.mount('http://', adaptador)
+    sesion.headers.update({'Accept': 'application/json'})
+    return sesion
+
+
+def _monto(valor):
+    try:
+        return Decimal(str(valor)).quantize(Decimal('0.01'))
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+
+def nuevo_reporte():
+    return {
+        'revisadas': 0,
+        'coincide': 0,
+        'corregida': 0,
+        'huerfana': 0,
+        'monto_distinto': 0,
+        'error': 0,
+        'transiciones': {'completada': 0, 'fallida': 0, 'cancelada': 0},
+        'incidencias': [],
+        'segundos': 0.0,
+    }
+
+
+class ConciliacionPasarelas:
+    """
+    Consulta en las pasarelas las transacciones pendientes y aplica su estado real.
+
+    Args:
+        hilos: Consultas simultáneas (default: PAGOS_CONCILIACION_HILOS)
+        lote: Transacciones por lote (default: PAGOS_CONCILIACION_LOTE)
+        tasas: dict pasarela -> consultas por segundo (default: PAGOS_CONCILIACION_TASAS)
+        timeout: Segundos máximos por consulta
+        reintentos: Reintentos por consulta ante errores transitorios
+    """
+
+    def __init__(self, hilos=None, lote=None, tasas=None, timeout=10, reintentos=2):
+        self.hilos = max(1, hilos or getattr(settings, 'PAGOS_CONCILIACION_HILOS', 16))
+        self.lote = max(1, lote or getattr(settings, 'PAGOS_CONCILIACION_LOTE', 500))
+        tasas = tasas or getattr(settings, 'PAGOS_CONCILIACION_TASAS', {})
+        self.limitadores = {pasarela: LimitadorTasa(tasas.get(pasarela, 10)) for pasarela in PASARELAS}
+        self.timeout = (min(5, timeout), timeout)
+        self.sesion = _sesion_http(reintentos)
+        self._paypal = None
+
+    # ------------------------------------------------------------------
+    # Ejecución
+    # ------------------------------------------------------------------
+
+    def pendientes(self, pasarelas=None, antiguedad_minutos=10, limite=None):
+        """
+        Lotes de transacciones pendientes (dicts), en orden de id.
+
+        Las más recientes que `antiguedad_minutos` se omiten: el cliente puede seguir en el checkout.
+        """
+        queryset = TransaccionPago.objects.filter(
+            estado='pendiente',
+            pasarela__in=pasarelas or PASARELAS,
+            fecha_creacion__lt=timezone.now() - timedelta(minutes=antiguedad_minutos),
+        ).order_by('id')
+        ultimo_id = 0
+        restantes = limite
+        while restantes is None or restantes > 0:
+            tamano = self.lote if restantes is None else min(self.lote, restantes)
+            filas = list(queryset.filter(id__gt=ultimo_id).values(
+                'id', 'pago_id', 'pasarela', 'id_transaccion_pasarela', 'id_pago_intento', 'monto',
+            )[:tamano])
+            if not filas:
+                return
+            yield filas
+            ultimo_id = filas[-1]['id']
+            if restantes is not None:
+                restantes -= len(filas)
+
+    def ejecutar(self, pasarelas=None, antiguedad_minutos=10, limite=None, aplicar=True):
+        """
+        Concilia las transacciones pendientes.
+
+        Args:
+            pasarelas: Pasarelas a conciliar (default: todas)
+            antiguedad_minutos: Antigüedad mínima de las transacciones a revisar
+            limite: Máximo de transacciones a revisar
+            aplicar: Si es False, solo genera el reporte (sin escribir)
+
+        Returns:
+            dict: Reporte con la cantidad de transacciones por resultado y las incidencias
+        """
+        inicio = time.perf_counter()
+        reporte = nuevo_reporte()
+        with ThreadPoolExecutor(max_workers=self.hilos) as executor:
+            for filas in self.pendientes(pasarelas, antiguedad_minutos, limite):
+                remotos = list(executor.map(self.consultar_seguro, filas))
+                self.procesar_lote(filas, remotos, reporte, aplicar)
+        reporte['segundos'] = round(time.perf_counter() - inicio, 2)
+        logger.info(
+            f"Conciliación de pasarelas: {reporte['revisadas']} revisadas, {reporte['corregida']} corregidas, "
+            f"{reporte['huerfana']} huérfanas, {reporte['monto_distinto']} con monto distinto, "
+            f"{reporte['error']} errores"
+        )
+        return reporte
+
+    def procesar_lote(self, filas, remotos, reporte, aplicar=True):
+        """Clasifica un lote ya consultado, aplica sus transiciones y las suma al reporte."""
+        transiciones = {}
+        for fila, remoto in zip(filas, remotos):
+            resultado = self.clasificar(fila, remoto)
+            reporte['revisadas'] += 1
+            if resultado == 'corregida':
+                transiciones[fila['id']] = (fila, remoto)
+                continue
+            reporte[resultado] += 1
+            if resultado != 'coincide':
+                reporte['incidencias'].append({
+                    'resultado': resultado,
+                    'transaccion_id': fila['id'],
+                    'pago_id': fila['pago_id'],
+                    'pasarela': fila['pasarela'],
+                    'id_externo': fila['id_transaccion_pasarela'],
+                    'monto': fila['monto'],
+                    'monto_pasarela': remoto.get('monto'),
+                    'mensaje': remoto.get('mensaje', ''),
+                })
+
+        aplicadas = self.aplicar(transiciones) if aplicar else set(transiciones)
+        for transaccion_id, (fila, remoto) in transiciones.items():
+            if transaccion_id in aplicadas:
+                reporte['corregida'] += 1
+                reporte['transiciones'][remoto['estado']] += 1
+            else:
+                # Otro proceso (ej. el webhook) la actualizó mientras se consultaba
+                reporte['coincide'] += 1
+
+    @staticmethod
+    def clasificar(fila, remoto):
+        estado = remoto['estado']
+        if estado == 'error':
+            return 'error'
+        if estado == 'no_encontrada':
+            return 'huerfana'
+        if estado == 'pendiente':
+            return 'coincide'
+        if estado == 'completada' and remoto.get('monto') is not None and remoto['monto'] != _monto(fila['monto']):
+            return 'monto_distinto'
+        return 'corregida'
+
+    # ------------------------------------------------------------------
+    # Aplicación de transiciones
+    # ------------------------------------------------------------------
+
+    def aplicar(self, transiciones):
+        """
+        Aplica las transiciones de un lote con actualizaciones masivas.
+
+        Args:
+            transiciones: dict transaccion_id -> (fila, remoto)
+
+        Returns:
+            set: IDs de las transacciones actualizadas
+        """
+        if not transiciones:
+            return set()
+        ahora = timezone.now()
+        with transaction.atomic():
+            vigentes = set(
+                TransaccionPago.objects.select_for_update()
+                .filter(pk__in=list(transiciones), estado='pendiente')
+                .values_list('id', flat=True)
+            )
+            transacciones = []
+            pagos_pagados = {}
+            for transaccion_id in vigentes:
+                fila, remoto = transiciones[transaccion_id]
+                estado = remoto['estado']
+                transacciones.append(TransaccionPago(
+                    pk=transaccion_id,
+                    estado=estado,
+                    fecha_completada=ahora if estado == 'completada' else None,
+                    id_pago_intento=remoto.get('id_pago_intento') or fila['id_pago_intento'],
+                    mensaje_error='' if estado == 'completada' else remoto.get('mensaje', ''),
+                ))
+                if estado == 'completada':
+                    pagos_pagados[fila['pago_id']] = fila
+            TransaccionPago.objects.bulk_update(
+                transacciones, ['estado', 'fecha_completada', 'id_pago_intento', 'mensaje_error'],
+                batch_size=500,
+            )
+            if pagos_pagados:
+                self._marcar_pagados(pagos_pagados, ahora)
+        return vigentes
+
+    @staticmethod
+    def _marcar_pagados(pagos_pagados, ahora):
+        """Marca como pagados los pagos de las transacciones completadas (como marcar_como_completada)."""
+        pagos = list(
+            Pago.objects.filter(pk__in=list(pagos_pagados)).exclude(estado='pagado')
+            .only('pk', 'periodo_anio', 'periodo_mes')
+        )
+        for pago in pagos:
+            fila = pagos_pagados[pago.pk]
+            pago.estado = 'pagado'
+            pago.fecha_pago = ahora
+            pago.metodo_pago = 'tarjeta' if fila['pasarela'] in ['stripe', 'paypal', 'conekta'] else fila['pasarela']
+            pago.referencia_pago = fila['id_transaccion_pasarela']
+        PagosMasivosService.guardar(pagos, ['estado', 'fecha_pago', 'metodo_pago', 'referencia_pago'])
+
+    # ------------------------------------------------------------------
+    # Consultas a las pasarelas (se ejecutan en los hilos del pool)
+    # ------------------------------------------------------------------
+
+    def consultar_seguro(self, fila):
+        try:
+            return self.consultar(fila)
+        except (ErrorConciliacion, requests.RequestException, ValueError, KeyError) as e:
+            logger.warning(f"Conciliación: error al consultar la transacción {fila['id']} en {fila['pasarela']}: {e}")
+            return {'estado': 'error', 'mensaje': str(e)}
+
+    def consultar(self, fila):
+        """
+        Estado de una transacción en su pasarela.
+
+        Returns:
+            dict: {'estado': 'completada'|'fallida'|'cancelada'|'pendiente'|'no_encontrada',
+                   'monto': Decimal o None, 'id_pago_intento': str o None, 'mensaje': str}
+        """
+        self.limitadores[fila['pasarela']].adquirir()
+        if fila['pasarela'] == 'stripe':
+            return self._consultar_stripe(fila)
+        if fila['pasarela'] == 'mercadopago':
+            return self._consultar_mercadopago(fila)
+        if fila['pasarela'] == 'paypal':
+            return self._consultar_paypal(fila)
+        raise ErrorConciliacion(f"Pasarela {fila['pasarela']} no soportada")
+
+    def _get(self, url, token, **kwargs):
+        response = self.sesion.get(url, headers={'Authorization': f'Bearer {token}'}, timeout=self.timeout, **kwargs)
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise ErrorConciliacion(f'HTTP {response.status_code}: {response.text[:200]}')
+        return response.json()
+
+    def _consultar_stripe(self, fila):
+        api_url = getattr(settings, 'STRIPE_API_URL', '') or 'https://api.stripe.com'
+        session = self._get(
+            f"{api_url.rstrip('/')}/v1/checkout/sessions/{fila['id_transaccion_pasarela']}",
+            getattr(settings, 'STRIPE_SECRET_KEY', ''),
+        )
+        if session is None:
+            return {'estado': 'no_encontrada', 'mensaje': 'Sesión de checkout inexistente en Stripe'}
+        monto = _monto(Decimal(session['amount_total']) / 100) if session.get('amount_total') is not None else None
+        intento = session.get('payment_intent')
+        if isinstance(intento, dict):
+            intento = intento.get('id')
+        if session.get('payment_status') == 'paid':
+            return {'estado': 'completada', 'monto': monto, 'id_pago_intento': intento}
+        if session.get('status') == 'expired':
+            return {'estado': 'cancelada', 'monto': monto, 'mensaje': 'Sesión de checkout vencida en Stripe'}
+        return {'estado': 'pendiente', 'monto': monto}
+
+    def _consultar_mercadopago(self, fila):
+        api_url = (getattr(settings, 'MERCADOPAGO_API_URL', '') or 'https://api.mercadopago.com').rstrip('/')
+        token = getattr(settings, 'MERCADOPAGO_ACCESS_TOKEN', '')
+        if fila['id_pago_intento']:
+            pago_mp = self._get(f"{api_url}/v1/payments/{fila['id_pago_intento']}", token)
+            if pago_mp is None:
+                return {'estado': 'no_encontrada', 'mensaje': 'Pago inexistente en Mercado Pago'}
+        else:
+            # Las transacciones se crean con el id de la preferencia; el pago se busca por external_reference
+            busqueda = self._get(
+                f'{api_url}/v1/payments/search', token,
+                params={'external_reference': str(fila['pago_id']), 'sort': 'date_created', 'criteria': 'desc'},
+            ) or {}
+            resultados = busqueda.get('results') or []
+            if not resultados:
+                return {'estado': 'pendiente'}
+            aprobados = [r for r in resultados if r.get('status') == 'approved']
+            pago_mp = (aprobados or resultados)[0]
+
+        status = pago_mp.get('status')
+        return {
+            'estado': ESTADOS_MERCADOPAGO.get(status, 'pendiente'),
+            'monto': _monto(pago_mp.get('transaction_amount')),
+            'id_pago_intento': str(pago_mp['id']) if pago_mp.get('id') else None,
+            'mensaje': pago_mp.get('status_detail') or f'Pago {status}',
+        }
+
+    def _consultar_paypal(self, fila):
+        if self._paypal is None:
+            self._paypal = obtener_cliente_paypal(
+                getattr(settings, 'PAYPAL_CLIENT_ID', ''),
+                getattr(settings, 'PAYPAL_SECRET', ''),
+                getattr(settings, 'PAYPAL_MODE', 'sandbox'),
+                timeout=getattr(settings, 'PAYPAL_TIMEOUT', 15),
+                reintentos=getattr(settings, 'PAYPAL_REINTENTOS', 3),
+                api_url=getattr(settings, 'PAYPAL_API_URL', ''),
+            )
+        response = self._paypal.solicitud(
+            'GET', f"/v2/checkout/orders/{fila['id_transaccion_pasarela']}", 'orders.get',
+        )
+        if response.status_code == 404:
+            return {'estado': 'no_encontrada', 'mensaje': 'Orden inexistente en PayPal'}
+        if response.status_code != 200:
+            raise ErrorConciliacion(f'HTTP {response.status_code}: {response.text[:200]}')
+        orden = response.json()
+        unidades = orden.get('purchase_units') or [{}]
+        monto = _monto((unidades[0].get('amount') or {}).get('value'))
+        status = orden.get('status')
+        if status == 'COMPLETED':
+            return {'estado': 'completada', 'monto': monto}
+        if status == 'VOIDED':
+            return {'estado': 'cancelada', 'monto': monto, 'mensaje': 'Orden anulada en PayPal'}
+        # CREATED, APPROVED (sin capturar), PAYER_ACTION_REQUIRED...
+        return {'estado': 'pendiente', 'monto': monto}
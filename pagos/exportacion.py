@@ -0,0 +1,391 @@
+"""
+Exportación de pagos a Excel y PDF con memoria constante.
+
+- Las filas se leen con values_list().iterator(chunk_size=...), sin instanciar modelos.
+- El libro se escribe con el modo write-only de openpyxl: cada fila se vuelca a disco
+  al agregarse, por lo que la memoria no crece con el número de pagos.
+- El archivo resultante se envía en bloques con FileResponse (StreamingHttpResponse).
+- Por encima de PAGOS_EXPORTACION_LIMITE_SINCRONO filas la exportación se convierte en
+  un trabajo en segundo plano (ExportacionPagos) que guarda el archivo en MEDIA_ROOT
+  y avisa al usuario por correo cuando está listo.
+- El PDF se renderiza página a página (ver reporte_pdf.py), sin límite de filas.
+- Los archivos generados en segundo plano se reutilizan mientras no cambien los datos:
+  cada trabajo guarda una huella de formato + filtros + versión de datos de pagos + día.
+  La versión es la persistente (core.VersionDatos): la incrementan también los cambios
+  hechos por otros procesos o comandos, y no se pierde al reiniciar.
+"""
+import hashlib
+import logging
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from django.conf import settings
+from django.core.files import File
+from django.core.mail import send_mail
+from django.db import connection
+from django.http import FileResponse
+from django.urls import reverse
+from django.utils import timezone
+from .models import Pago, ExportacionPagos
+from .filtros import filtrar_pagos
+from .vencimientos import VencimientoPagos
+from core.estadisticas import version_persistente
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE_EXCEL = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CONTENT_TYPE_PDF = 'application/pdf'
+
+ENCABEZADOS_EXCEL = [
+    'Cliente', 'Instalación', 'Concepto', 'Monto', 'Período',
+    'Fecha Vencimiento', 'Fecha Pago', 'Estado', 'Método Pago',
+    'Referencia', 'Notas',
+]
+
+CAMPOS_EXCEL = (
+    'cliente__nombre', 'cliente__apellido1', 'cliente__apellido2',
+    'instalacion__plan_nombre', 'concepto', 'monto', 'periodo_mes', 'periodo_anio',
+    'fecha_vencimiento', 'fecha_pago', 'estado_efectivo', 'metodo_pago',
+    'referencia_pago', 'notas',
+)
+
+CAMPOS_PDF = (
+    'cliente__nombre', 'cliente__apellido1', 'cliente__apellido2', 'concepto', 'monto',
+    'periodo_mes', 'periodo_anio', 'fecha_vencimiento', 'estado_efectivo',
+)
+
+MESES = dict(Pago.PERIODO_MES_CHOICES)
+ESTADOS = dict(Pago.ESTADO_CHOICES)
+METODOS = dict(Pago.METODO_PAGO_CHOICES)
+
+
+def consultar_pagos(parametros):
+    """Queryset filtrado de pagos con el estado efectivo anotado."""
+    return filtrar_pagos(parametros, VencimientoPagos.con_estado_efectivo(Pago.objects.all()))
+
+
+def filas_excel(queryset, chunk_size=2000):
+    """
+    Genera las filas de la hoja de pagos a partir de tuplas de values_list.
+
+    Args:
+        queryset: Pagos filtrados con `estado_efectivo` anotado
+        chunk_size: Filas leídas por viaje a la base de datos
+    """
+    valores = queryset.values_list(*CAMPOS_EXCEL).iterator(chunk_size=chunk_size)
+    for (nombre, apellido1, apellido2, plan_nombre, concepto, monto, mes, anio,
+         fecha_vencimiento, fecha_pago, estado, metodo, referencia, notas) in valores:
+        apellidos = f"{apellido1} {apellido2}" if apellido2 else f"{apellido1}"
+        yield (
+            f"{nombre} {apellidos}".strip(),
+            plan_nombre or '',
+            concepto,
+            float(monto),
+            f"{MESES.get(mes, mes)} {anio}",
+            fecha_vencimiento.strftime('%d/%m/%Y'),
+            fecha_pago.strftime('%d/%m/%Y %H:%M') if fecha_pago else '',
+            ESTADOS.get(estado, estado),
+            METODOS.get(metodo, metodo) if metodo else '',
+            referencia or '',
+            notas or '',
+        )
+
+
+def escribir_excel(filas, destino):
+    """
+    Escribe las filas en un libro write-only de openpyxl.
+
+    Args:
+        filas: Iterable de tuplas (ver ENCABEZADOS_EXCEL)
+        destino: Ruta o archivo binario abierto donde guardar el .xlsx
+
+    Returns:
+        int: Cantidad de filas escritas (sin el encabezado)
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title='Pagos')
+
+    # En modo write-only los anchos deben definirse antes de escribir filas
+    for col in range(1, len(ENCABEZADOS_EXCEL) + 1):
+        ws.column_dimensions[get_column_letter(col)].width = 20
+
+    header_fill = PatternFill(start_color="667eea", end_color="667eea", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF")
+    header_alignment = Alignment(horizontal='center', vertical='center')
+    encabezado = []
+    for texto in ENCABEZADOS_EXCEL:
+        cell = WriteOnlyCell(ws, value=texto)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = header_alignment
+        encabezado.append(cell)
+    ws.append(encabezado)
+
+    total = 0
+    for fila in filas:
+        ws.append(fila)
+        total += 1
+
+    wb.save(destino)
+    return total
+
+
+def filas_pdf(queryset, chunk_size=2000):
+    """Genera las filas del reporte PDF (textos largos truncados al ancho de columna)."""
+    valores = queryset.values_list(*CAMPOS_PDF).iterator(chunk_size=chunk_size)
+    for (nombre, apellido1, apellido2, concepto, monto, mes, anio,
+         fecha_vencimiento, estado) in valores:
+        apellidos = f"{apellido1} {apellido2}" if apellido2 else f"{apellido1}"
+        yield [
+            f"{nombre} {apellidos}".strip()[:30],
+            concepto[:25],
+            f"${monto:.2f}",
+            f"{MESES.get(mes, mes)} {anio}",
+            fecha_vencimiento.strftime('%d/%m/%Y'),
+            ESTADOS.get(estado, estado),
+        ]
+
+
+def info_reporte(parametros):
+    """Líneas de información del encabezado del PDF."""
+    lineas = [f"Fecha de generación: {date.today().strftime('%d/%m/%Y')}"]
+    if parametros.get('q'):
+        lineas.append(f"Búsqueda: {parametros['q']}")
+    if parametros.get('estado'):
+        lineas.append(f"Estado: {ESTADOS.get(parametros['estado'], parametros['estado'])}")
+    if parametros.get('metodo'):
+        lineas.append(f"Método de pago: {METODOS.get(parametros['metodo'], parametros['metodo'])}")
+    mes = parametros.get('mes', '')
+    if mes.isdigit():
+        mes = MESES.get(int(mes), mes)
+    periodo = f"{mes} {parametros.get('anio', '')}".strip()
+    if periodo:
+        lineas.append(f"Período: {periodo}")
+    return lineas
+
+
+def nombre_archivo(formato, exportacion_id=None, extension=None):
+    extension = extension or ('xlsx' if formato == 'excel' else 'pdf')
+    sufijo = f'_{exportacion_id}' if exportacion_id else ''
+    return f'pagos_export_{date.today().strftime("%Y%m%d")}{sufijo}.{extension}'
+
+
+class ExportacionPagosService:
+    """Servicio para exportar pagos en la petición o como trabajo en segundo plano."""
+
+    CHUNK_SIZE = 2000
+
+    @staticmethod
+    def limite_sincrono(formato='excel'):
+        if formato == 'pdf':
+            return getattr(settings, 'PAGOS_EXPORTACION_PDF_LIMITE_SINCRONO', 2000)
+        return getattr(settings, 'PAGOS_EXPORTACION_LIMITE_SINCRONO', 20000)
+
+    @staticmethod
+    def en_segundo_plano(queryset, formato='excel'):
+        """Indica si la exportación supera el límite para generarse en la petición."""
+        limite = ExportacionPagosService.limite_sincrono(formato)
+        # Basta con saber si hay más de `limite` filas: no se cuenta toda la tabla
+        return queryset.order_by().values('pk')[limite:limite + 1].exists()
+
+    @classmethod
+    def respuesta_excel(cls, queryset):
+        """
+        Genera el Excel en un archivo temporal y lo envía en bloques.
+
+        Returns:
+            FileResponse: Respuesta en streaming; el temporal se elimina al cerrarla
+        """
+        temporal = tempfile.TemporaryFile()
+        escribir_excel(filas_excel(queryset, cls.CHUNK_SIZE), temporal)
+        temporal.seek(0)
+        return FileResponse(
+            temporal,
+            as_attachment=True,
+            filename=nombre_archivo('excel'),
+            content_type=CONTENT_TYPE_EXCEL,
+        )
+
+    @classmethod
+    def respuesta_pdf(cls, queryset, parametros):
+        """Genera un PDF pequeño en la petición y lo envía en bloques."""
+        from .reporte_pdf import escribir_pdf
+
+        temporal = tempfile.TemporaryFile()
+        escribir_pdf(filas_pdf(queryset, cls.CHUNK_SIZE), temporal, info=info_reporte(parametros))
+        temporal.seek(0)
+        return FileResponse(
+            temporal,
+            as_attachment=True,
+            filename=nombre_archivo('pdf'),
+            content_type=CONTENT_TYPE_PDF,
+        )
+
+    @staticmethod
+    def huella(formato, parametros):
+        """Clave de caché del archivo: formato, filtros, versión de datos y día."""
+        datos = (
+            formato,
+            sorted(parametros.items()),
+            # Versión guardada en la base de datos: el archivo se reutiliza entre procesos
+            version_persistente('pagos'),
+            # El estado efectivo depende de la fecha
+            VencimientoPagos.hoy().isoformat(),
+        )
+        return hashlib.sha256(repr(datos).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def buscar_en_cache(formato, huella):
+        """Exportación completada con la misma huella y cuyo archivo sigue en disco."""
+        horas = getattr(settings, 'PAGOS_EXPORTACION_CACHE_HORAS', 24)
+        candidatas = ExportacionPagos.objects.filter(
+            formato=formato,
+            huella=huella,
+            estado='completada',
+            fecha_completada__gte=timezone.now() - timedelta(hours=horas),
+        ).exclude(archivo='')
+        for exportacion in candidatas[:3]:
+            if exportacion.archivo.storage.exists(exportacion.archivo.name):
+                return exportacion
+        return None
+
+    @classmethod
+    def encolar(cls, usuario, formato, parametros):
+        """
+        Registra una exportación en segundo plano y la inicia.
+
+        Si ya existe un archivo generado con los mismos filtros y datos, la nueva
+        exportación lo reutiliza y queda completada de inmediato.
+        Si PAGOS_EXPORTACION_HILO está desactivado, el trabajo queda pendiente para
+        el comando `procesar_exportaciones_pagos`.
+        """
+        huella = cls.huella(formato, parametros)
+        existente = cls.buscar_en_cache(formato, huella)
+        if existente:
+            return ExportacionPagos.objects.create(
+                usuario=usuario,
+                formato=formato,
+                parametros=parametros,
+                huella=huella,
+                estado='completada',
+                archivo=existente.archivo.name,
+                total_filas=existente.total_filas,
+                fecha_completada=timezone.now(),
+            )
+
+        exportacion = ExportacionPagos.objects.create(
+            usuario=usuario,
+            formato=formato,
+            parametros=parametros,
+            huella=huella,
+        )
+        if getattr(settings, 'PAGOS_EXPORTACION_HILO', True):
+            hilo = threading.Thread(
+                target=cls._procesar_en_hilo,
+                args=(exportacion.pk,),
+                daemon=True,
+            )
+            hilo.start()
+        return exportacion
+
+    @classmethod
+    def _procesar_en_hilo(cls, exportacion_id):
+        try:
+            cls.procesar(ExportacionPagos.objects.get(pk=exportacion_id))
+        except Exception as e:
+            logger.error(f'Error al procesar la exportación {exportacion_id}: {str(e)}')
+        finally:
+            # El hilo abre su propia conexión; cerrarla evita dejarla colgada
+            connection.close()
+
+    @classmethod
+    def procesar(cls, exportacion):
+        """
+        Genera el archivo de una exportación y notifica al usuario.
+
+        Returns:
+            dict: {'success': bool, 'filas': int, 'segundos': float, 'error': str o None}
+        """
+        # Reclamar el trabajo: solo un proceso lo pasa de pendiente a procesando
+        reclamado = ExportacionPagos.objects.filter(
+            pk=exportacion.pk, estado='pendiente'
+        ).update(estado='procesando', fecha_inicio=timezone.now())
+        if not reclamado:
+            return {'success': False, 'filas': 0, 'segundos': 0, 'error': 'La exportación ya fue procesada'}
+
+        inicio = time.monotonic()
+        try:
+            queryset = consultar_pagos(exportacion.parametros)
+            with tempfile.TemporaryFile() as temporal:
+                extension = None
+                if exportacion.formato == 'excel':
+                    filas = escribir_excel(filas_excel(queryset, cls.CHUNK_SIZE), temporal)
+                elif exportacion.formato == 'pdf':
+                    from .reporte_pdf import escribir_reporte_pdf
+
+                    filas, tomos = escribir_reporte_pdf(
+                        filas_pdf(queryset, cls.CHUNK_SIZE),
+                        temporal,
+                        info=info_reporte(exportacion.parametros),
+                        filas_por_tomo=getattr(settings, 'PAGOS_PDF_FILAS_POR_TOMO', 50000),
+                        procesos=getattr(settings, 'PAGOS_PDF_PROCESOS', None),
+                    )
+                    if tomos > 1:
+                        extension = 'zip'
+                else:
+                    raise ValueError(f'Formato no soportado: {exportacion.formato}')
+                temporal.seek(0)
+                exportacion.archivo.save(
+                    nombre_archivo(exportacion.formato, exportacion.pk, extension),
+                    File(temporal),
+                    save=False,
+                )
+            exportacion.estado = 'completada'
+            exportacion.total_filas = filas
+            exportacion.fecha_completada = timezone.now()
+            exportacion.save(update_fields=['archivo', 'estado', 'total_filas', 'fecha_completada'])
+        except Exception as e:
+            logger.error(f'Error al generar la exportación {exportacion.pk}: {str(e)}')
+            exportacion.estado = 'fallida'
+            exportacion.mensaje_error = str(e)
+            exportacion.save(update_fields=['estado', 'mensaje_error'])
+            cls.notificar(exportacion)
+            return {'success': False, 'filas': 0, 'segundos': time.monotonic() - inicio, 'error': str(e)}
+
+        segundos = time.monotonic() - inicio
+        logger.info(f'Exportación {exportacion.pk} completada: {filas} filas en {segundos:.2f}s')
+        cls.notificar(exportacion)
+        return {'success': True, 'filas': filas, 'segundos': segundos, 'error': None}
+
+    @staticmethod
+    def notificar(exportacion):
+        """Avisa por correo al usuario que solicitó la exportación."""
+        usuario = exportacion.usuario
+        if not usuario or not usuario.email:
+            return False
+
+        if exportacion.estado == 'completada':
+            enlace = settings.SITE_URL.rstrip('/') + reverse(
+                'pagos:exportacion_descargar', args=[exportacion.pk]
+            )
+            asunto = 'Tu exportación de pagos está lista'
+            mensaje = (
+                f'La exportación de pagos ({exportacion.get_formato_display()}, '
+                f'{exportacion.total_filas} filas) está lista.\n\nDescárgala en: {enlace}'
+            )
+        else:
+            asunto = 'No se pudo generar tu exportación de pagos'
+            mensaje = f'La exportación de pagos falló: {exportacion.mensaje_error}'
+
+        try:
+            send_mail(asunto, mensaje, settings.DEFAULT_FROM_EMAIL, [usuario.email], fail_silently=False)
+            return True
+        except Exception as e:
+            logger.error(f'Error al notificar la exportación {exportacion.pk}: {str(e)}')
+            return False
@@ -0,0 +1,529 @@
+"""
+Importación de estados de cuenta bancarios y conciliación automática de pagos.
+
+- Los archivos (CSV, OFX o Excel) se leen con generadores, fila por fila.
+- Al importar se construyen una sola vez índices en memoria (dicts) de los pagos
+  abiertos, y cada abono se resuelve con búsquedas directas en ellos. Criterios, de
+  mayor a menor confianza (siempre con el mismo monto):
+  1. referencia: la referencia del abono es la referencia_pago de un pago abierto.
+  2. patron: el concepto menciona el número del pago (PAGOS_EXTRACTO_PATRON).
+  3. telefono: el concepto menciona el teléfono del cliente.
+  4. monto_fecha: pagos con el mismo monto y vencimiento a ± PAGOS_EXTRACTO_VENTANA_DIAS
+     de la fecha del abono.
+- Las coincidencias únicas de los criterios 1 a 3 se aplican en una sola transacción
+  con operaciones masivas. Las demás (varios candidatos, o solo monto y fecha) quedan
+  en la cola de revisión con sus pagos candidatos.
+"""
+import codecs
+import csv
+import hashlib
+import logging
+import re
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from core.busqueda import normalizar
+from .models import ExtractoBancario, MovimientoBancario, Pago
+from .services import PagosMasivosService
+
+logger = logging.getLogger(__name__)
+
+# Encabezados reconocidos por campo (normalizados: minúsculas y sin acentos)
+ALIAS_COLUMNAS = {
+    'fecha': ('fecha', 'fecha operacion', 'fecha de operacion', 'fecha movimiento', 'fecha valor', 'date'),
+    'monto': ('monto', 'importe', 'abono', 'abonos', 'deposito', 'depositos', 'credito', 'creditos', 'amount'),
+    'cargo': ('cargo', 'cargos', 'retiro', 'retiros', 'debito', 'debitos'),
+    'referencia': ('referencia', 'referencia numerica', 'numero de referencia', 'folio', 'clave de rastreo', 'reference'),
+    'descripcion': ('descripcion', 'concepto', 'detalle', 'description', 'memo'),
+}
+
+FORMATOS_FECHA = ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%d/%m/%y', '%d.%m.%Y', '%Y%m%d')
+
+EXTENSIONES = {
+    '.csv': 'csv',
+    '.txt': 'csv',
+    '.ofx': 'ofx',
+    '.qfx': 'ofx',
+    '.xlsx': 'excel',
+    '.xlsm': 'excel',
+}
+
+ESTADOS_ABIERTOS = ('pendiente', 'vencido')
+CRITERIOS_CONFIABLES = ('referencia', 'patron', 'telefono')
+MAX_CANDIDATOS = 10
+
+RE_OFX = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<\r\n]*)')
+RE_NUMEROS = re.compile(r'\d{10,13}')
+
+
+class ErrorExtracto(Exception):
+    """El archivo no tiene el formato esperado."""
+
+
+# ----------------------------------------------------------------------
+# Lectura
+# ----------------------------------------------------------------------
+
+def detectar_formato(nombre_archivo):
+    nombre = (nombre_archivo or '').lower()
+    for extension, formato in EXTENSIONES.items():
+        if nombre.endswith(extension):
+            return formato
+    return None
+
+
+def convertir_monto(valor):
+    """Decimal desde un número o texto como '$1,234.56', '1.234,56' o '(50.00)'; None si no es un monto."""
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, (int, float, Decimal)):
+        return Decimal(str(valor)).quantize(Decimal('0.01'))
+    texto = str(valor).strip().replace('$', '').replace('MXN', '').replace(' ', '')
+    negativo = texto.startswith('(') and texto.endswith(')')
+    texto = texto.strip('()')
+    if ',' in texto and '.' in texto:
+        # El último separador es el decimal
+        if texto.rfind(',') > texto.rfind('.'):
+            texto = texto.replace('.', '').replace(',', '.')
+        else:
+            texto = texto.replace(',', '')
+    elif ',' in texto:
+        entero, _, decimales = texto.rpartition(',')
+        texto = f'{entero.replace(",", "")}.{decimales}' if len(decimales) == 2 else texto.replace(',', '')
+    try:
+        monto = Decimal(texto).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return None
+    return -monto if negativo else monto
+
+
+def convertir_fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = str(valor or '').strip()[:10]
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    return None
+
+
+def mapear_columnas(encabezados):
+    """Índice de cada campo en la fila de encabezados, o None si faltan fecha o monto."""
+    columnas = {}
+    for indice, encabezado in enumerate(encabezados):
+        nombre = normalizar(encabezado).strip(' :')
+        for campo, alias in ALIAS_COLUMNAS.items():
+            if nombre in alias and campo not in columnas:
+                columnas[campo] = indice
+    if 'fecha' in columnas and 'monto' in columnas:
+        return columnas
+    return None
+
+
+def _filas_tabulares(filas):
+    """Movimientos de filas de una tabla (CSV o Excel) con encabezados en alguna de las primeras 20."""
+    columnas = None
+    for numero, valores in enumerate(filas, start=1):
+        if columnas is None:
+            columnas = mapear_columnas(valores)
+            if columnas is None and numero >= 20:
+                raise ErrorExtracto('No se encontraron las columnas de fecha y monto en el archivo')
+            continue
+
+        def valor(campo):
+            indice = columnas.get(campo)
+            return valores[indice] if indice is not None and indice < len(valores) else None
+
+        fecha = convertir_fecha(valor('fecha'))
+        monto = convertir_monto(valor('monto'))
+        if fecha is None or not monto or monto <= 0:
+            # Cargos, filas de totales o líneas en blanco
+            continue
+        yield {
+            'linea': numero,
+            'fecha': fecha,
+            'monto': monto,
+            'referencia': str(valor('referencia') or '').strip()[:100],
+            'descripcion': str(valor('descripcion') or '').strip()[:255],
+        }
+    if columnas is None:
+        raise ErrorExtracto('No se encontraron las columnas de fecha y monto en el archivo')
+
+
+def _lineas_texto(archivo):
+    """Líneas del archivo decodificadas (UTF-8, o Latin-1 si no es UTF-8 válido)."""
+    muestra = archivo.read(8192)
+    archivo.seek(0)
+    codificacion = 'utf-8-sig'
+    try:
+        muestra.decode('utf-8-sig')
+    except UnicodeDecodeError as e:
+        # Un carácter cortado al final de la muestra no indica otra codificación
+        if e.start < len(muestra) - 3:
+            codificacion = 'latin-1'
+    return codecs.iterdecode(iter(archivo), codificacion), muestra.decode(codificacion, errors='ignore')
+
+
+def leer_csv(archivo):
+    lineas, muestra = _lineas_texto(archivo)
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t|')
+    except csv.Error:
+        dialecto = csv.excel
+    yield from _filas_tabulares(csv.reader(lineas, dialecto))
+
+
+def leer_excel(archivo):
+    from openpyxl import load_workbook
+
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        hoja = libro.active
+        yield from _filas_tabulares(
+            [celda if celda is not None else '' for celda in fila]
+            for fila in hoja.iter_rows(values_only=True)
+        )
+    finally:
+        libro.close()
+
+
+def leer_ofx(archivo):
+    """Transacciones STMTTRN de un OFX (SGML o XML, en una o varias líneas)."""
+    lineas, _ = _lineas_texto(archivo)
+    transaccion = None
+    numero = 0
+    for linea in lineas:
+        for cierre, etiqueta, valor in RE_OFX.findall(linea):
+            etiqueta = etiqueta.upper()
+            if etiqueta == 'STMTTRN':
+                if transaccion is not None:
+                    movimiento = _movimiento_ofx(transaccion, numero)
+                    if movimiento:
+                        yield movimiento
+                transaccion = None if cierre else {}
+                numero += not cierre
+            elif transaccion is not None and not cierre:
+                transaccion[etiqueta] = valor.strip()
+    if transaccion is not None:
+        movimiento = _movimiento_ofx(transaccion, numero)
+        if movimiento:
+            yield movimiento
+
+
+def _movimiento_ofx(transaccion, numero):
+    monto = convertir_monto(transaccion.get('TRNAMT'))
+    fecha = convertir_fecha(transaccion.get('DTPOSTED', '')[:8])
+    if fecha is None or not monto or monto <= 0:
+        return None
+    descripcion = ' '.join(filter(None, (transaccion.get('NAME'), transaccion.get('MEMO'))))
+    return {
+        'linea': numero,
+        'fecha': fecha,
+        'monto': monto,
+        'referencia': (transaccion.get('REFNUM') or transaccion.get('CHECKNUM') or transaccion.get('FITID') or '')[:100],
+        'descripcion': descripcion[:255],
+    }
+
+
+LECTORES = {
+    'csv': leer_csv,
+    'ofx': leer_ofx,
+    'excel': leer_excel,
+}
+
+
+def leer_movimientos(archivo, formato):
+    """Generador de abonos del archivo: dicts con linea, fecha, monto, referencia y descripcion."""
+    if formato not in LECTORES:
+        raise ErrorExtracto(f'Formato no soportado: {formato}')
+    return LECTORES[formato](archivo)
+
+
+# ----------------------------------------------------------------------
+# Coincidencias
+# ----------------------------------------------------------------------
+
+def normalizar_referencia(referencia):
+    return re.sub(r'[\s-]', '', str(referencia or '')).upper()
+
+
+def telefonos(texto):
+    """Números de 10 dígitos (últimos 10) mencionados en el texto, ignorando separadores."""
+    continuo = re.sub(r'(?<=\d)[\s.-](?=\d)', '', texto or '')
+    return {numero[-10:] for numero in RE_NUMEROS.findall(continuo)}
+
+
+class IndicePagosAbiertos:
+    """
+    Índices en memoria de los pagos abiertos, construidos con una sola consulta.
+
+    Args:
+        ventana_dias: Días de diferencia aceptados entre el abono y el vencimiento (criterio monto_fecha)
+        patron: Expresión regular cuyo primer grupo es el número de pago en el concepto
+    """
+
+    def __init__(self, ventana_dias=None, patron=None):
+        self.ventana = timedelta(days=ventana_dias if ventana_dias is not None else getattr(
+            settings, 'PAGOS_EXTRACTO_VENTANA_DIAS', 15))
+        self.patron = re.compile(
+            patron or getattr(settings, 'PAGOS_EXTRACTO_PATRON', r'\bPAGO\s*[#:-]?\s*(\d{1,9})\b'),
+            re.IGNORECASE,
+        )
+        self.pagos = {}
+        self.por_referencia = defaultdict(list)
+        self.por_cliente_monto = defaultdict(list)
+        self.clientes_por_telefono = defaultdict(set)
+        self.por_monto = defaultdict(list)
+
+        filas = Pago.objects.filter(estado__in=ESTADOS_ABIERTOS).values_list(
+            'id', 'cliente_id', 'monto', 'fecha_vencimiento', 'referencia_pago', 'cliente__telefono',
+        )
+        for pago_id, cliente_id, monto, vencimiento, referencia, telefono in filas.iterator(chunk_size=5000):
+            self.pagos[pago_id] = (monto, vencimiento)
+            if referencia:
+                self.por_referencia[normalizar_referencia(referencia)].append(pago_id)
+            self.por_cliente_monto[(cliente_id, monto)].append(pago_id)
+            for numero in telefonos(telefono):
+                self.clientes_por_telefono[numero].add(cliente_id)
+            self.por_monto[monto].append(pago_id)
+
+    def resolver(self, movimiento):
+        """
+        Criterio y pagos candidatos de un abono.
+
+        Returns:
+            tuple: (criterio, [ids de pago]); ('', []) si no hay candidatos
+        """
+        monto = movimiento['monto']
+        referencia = normalizar_referencia(movimiento['referencia'])
+        if referencia:
+            ids = [i for i in self.por_referencia.get(referencia, ()) if self.pagos[i][0] == monto]
+            if ids:
+                return 'referencia', ids
+
+        texto = f"{movimiento['referencia']} {movimiento['descripcion']}"
+        ids = []
+        for numero in self.patron.findall(texto):
+            pago = self.pagos.get(int(numero))
+            if pago and pago[0] == monto and int(numero) not in ids:
+                ids.append(int(numero))
+        if ids:
+            return 'patron', ids
+
+        clientes = set()
+        for numero in telefonos(texto):
+            clientes |= self.clientes_por_telefono.get(numero, set())
+        ids = [i for cliente_id in clientes for i in self.por_cliente_monto.get((cliente_id, monto), ())]
+        if ids:
+            return 'telefono', self._por_cercania(ids, movimiento['fecha'])
+
+        fecha = movimiento['fecha']
+        ids = [
+            i for i in self.por_monto.get(monto, ())
+            if self.pagos[i][1] and abs(self.pagos[i][1] - fecha) <= self.ventana
+        ]
+        if ids:
+            return 'monto_fecha', self._por_cercania(ids, fecha)[:MAX_CANDIDATOS]
+        return '', []
+
+    def _por_cercania(self, ids, fecha):
+        return sorted(ids, key=lambda i: abs((self.pagos[i][1] or fecha) - fecha))
+
+
+# ----------------------------------------------------------------------
+# Importación
+# ----------------------------------------------------------------------
+
+def calcular_huella(archivo):
+    sha = hashlib.sha256()
+    for bloque in iter(lambda: archivo.read(65536), b''):
+        sha.update(bloque)
+    archivo.seek(0)
+    return sha.hexdigest()
+
+
+def fecha_pago(fecha):
+    return timezone.make_aware(datetime.combine(fecha, datetime.min.time()))
+
+
+class ImportacionExtractoService:
+    """Servicio para importar estados de cuenta y resolver la cola de revisión."""
+
+    @staticmethod
+    def clasificar(movimientos, indice):
+        """
+        Decide el estado de cada abono.
+
+        Returns:
+            list: MovimientoBancario sin guardar (sin extracto)
+        """
+        resultado = []
+        reclamados = set()
+        for movimiento in movimientos:
+            criterio, ids = indice.resolver(movimiento)
+            objeto = MovimientoBancario(
+                linea=movimiento['linea'],
+                fecha=movimiento['fecha'],
+                monto=movimiento['monto'],
+                referencia=movimiento['referencia'],
+                descripcion=movimiento['descripcion'],
+                criterio=criterio,
+                candidatos=ids,
+            )
+            if criterio in CRITERIOS_CONFIABLES and len(ids) == 1 and ids[0] not in reclamados:
+                objeto.estado = 'aplicado'
+                objeto.pago_id = ids[0]
+                reclamados.add(ids[0])
+            else:
+                objeto.estado = 'revision' if ids else 'sin_coincidencia'
+            resultado.append(objeto)
+        return resultado
+
+    @classmethod
+    def importar(cls, archivo, nombre_archivo, formato=None, usuario=None, aplicar=True):
+        """
+        Importa un estado de cuenta y aplica las coincidencias seguras.
+
+        Args:
+            archivo: Archivo binario (se lee en streaming)
+            nombre_archivo: Nombre original (para detectar el formato)
+            formato: 'csv', 'ofx' o 'excel' (por defecto, según la extensión)
+            aplicar: Si es False, solo clasifica los abonos sin guardar nada
+
+        Returns:
+            dict: {'success', 'extracto', 'total', 'aplicados', 'en_revision', 'sin_coincidencia', 'segundos'}
+                  o {'success': False, 'error'}
+        """
+        inicio = time.monotonic()
+        formato = formato or detectar_formato(nombre_archivo)
+        if not formato:
+            return {'success': False, 'error': 'Formato no reconocido: usa un archivo CSV, OFX o Excel (.xlsx)'}
+
+        huella = calcular_huella(archivo)
+        if aplicar and ExtractoBancario.objects.filter(huella=huella).exists():
+            return {'success': False, 'error': 'Este estado de cuenta ya fue importado'}
+
+        indice = IndicePagosAbiertos()
+        try:
+            movimientos = cls.clasificar(leer_movimientos(archivo, formato), indice)
+        except (ErrorExtracto, csv.Error, UnicodeDecodeError) as e:
+            return {'success': False, 'error': str(e)}
+        except Exception as e:
+            logger.error(f'Error al leer el estado de cuenta {nombre_archivo}: {str(e)}')
+            return {'success': False, 'error': f'No se pudo leer el archivo: {str(e)}'}
+
+        extracto = None
+        if aplicar:
+            with transaction.atomic():
+                cls._aplicar(movimientos)
+                extracto = ExtractoBancario(
+                    usuario=usuario,
+                    nombre_archivo=nombre_archivo[:255],
+                    formato=formato,
+                    huella=huella,
+                )
+                cls._contar(extracto, movimientos)
+                extracto.segundos = round(time.monotonic() - inicio, 2)
+                extracto.save()
+                for movimiento in movimientos:
+                    movimiento.extracto = extracto
+                MovimientoBancario.objects.bulk_create(movimientos, batch_size=1000)
+        else:
+            extracto = ExtractoBancario(nombre_archivo=nombre_archivo, formato=formato, huella=huella)
+            cls._contar(extracto, movimientos)
+
+        segundos = round(time.monotonic() - inicio, 2)
+        logger.info(
+            f'Estado de cuenta {nombre_archivo}: {extracto.total_lineas} abonos, {extracto.aplicados} aplicados, '
+            f'{extracto.en_revision} en revisión, {extracto.sin_coincidencia} sin coincidencia ({segundos}s)'
+        )
+        return {
+            'success': True,
+            'extracto': extracto if aplicar else None,
+            'total': extracto.total_lineas,
+            'aplicados': extracto.aplicados,
+            'en_revision': extracto.en_revision,
+            'sin_coincidencia': extracto.sin_coincidencia,
+            'segundos': segundos,
+        }
+
+    @staticmethod
+    def _contar(extracto, movimientos):
+        extracto.total_lineas = len(movimientos)
+        extracto.aplicados = sum(1 for m in movimientos if m.estado == 'aplicado')
+        extracto.en_revision = sum(1 for m in movimientos if m.estado == 'revision')
+        extracto.sin_coincidencia = sum(1 for m in movimientos if m.estado == 'sin_coincidencia')
+
+    @staticmethod
+    def _aplicar(movimientos):
+        """Marca como pagados los pagos de los abonos aplicados (dentro de la transacción)."""
+        por_pago = {m.pago_id: m for m in movimientos if m.estado == 'aplicado'}
+        if not por_pago:
+            return
+        pagos = list(
+            Pago.objects.select_for_update()
+            .filter(pk__in=list(por_pago), estado__in=ESTADOS_ABIERTOS)
+            .only('pk', 'periodo_anio', 'periodo_mes')
+        )
+        for pago in pagos:
+            movimiento = por_pago.pop(pago.pk)
+            pago.estado = 'pagado'
+            pago.fecha_pago = fecha_pago(movimiento.fecha)
+            pago.metodo_pago = 'transferencia'
+            pago.referencia_pago = movimiento.referencia or f'EXTRACTO-{movimiento.fecha:%Y%m%d}-{movimiento.linea}'
+        # Pagos cerrados mientras se leía el archivo: a revisión
+        for movimiento in por_pago.values():
+            movimiento.estado = 'revision'
+            movimiento.pago_id = None
+        PagosMasivosService.guardar(pagos, ['estado', 'fecha_pago', 'metodo_pago', 'referencia_pago'])
+
+    @staticmethod
+    def resolver(movimiento_id, pago_id=None):
+        """
+        Resuelve un movimiento de la cola de revisión.
+
+        Args:
+            movimiento_id: MovimientoBancario en revisión o sin coincidencia
+            pago_id: Pago al que se aplica el abono; None para descartarlo
+
+        Returns:
+            dict: {'success': bool, 'error': str}
+        """
+        with transaction.atomic():
+            movimiento = MovimientoBancario.objects.select_for_update().filter(pk=movimiento_id).first()
+            if movimiento is None or movimiento.estado not in ('revision', 'sin_coincidencia'):
+                return {'success': False, 'error': 'El movimiento ya fue resuelto'}
+            contador = 'en_revision' if movimiento.estado == 'revision' else 'sin_coincidencia'
+
+            if pago_id is None:
+                movimiento.estado = 'descartado'
+                movimiento.save(update_fields=['estado'])
+                ExtractoBancario.objects.filter(pk=movimiento.extracto_id).update(**{contador: F(contador) - 1})
+                return {'success': True}
+
+            pago = Pago.objects.select_for_update().filter(pk=pago_id).first()
+            if pago is None or pago.estado not in ESTADOS_ABIERTOS:
+                return {'success': False, 'error': 'El pago no existe o ya no está pendiente'}
+            pago.estado = 'pagado'
+            pago.fecha_pago = fecha_pago(movimiento.fecha)
+            pago.metodo_pago = 'transferencia'
+            pago.referencia_pago = movimiento.referencia or f'EXTRACTO-{movimiento.fecha:%Y%m%d}-{movimiento.linea}'
+            pago.save()
+
+            movimiento.estado = 'aplicado'
+            movimiento.criterio = movimiento.criterio if pago.pk in movimiento.candidatos else 'manual'
+            movimiento.pago = pago
+            movimiento.save(update_fields=['estado', 'criterio', 'pago'])
+            ExtractoBancario.objects.filter(pk=movimiento.extracto_id).update(
+                aplicados=F('aplicados') + 1, **{contador: F(contador) - 1}
+            )
+        return {'success': True}
@@ -0,0 +1,69 @@
+"""
+Filtros del listado de pagos.
+
+El listado, las exportaciones y los trabajos en segundo plano aplican exactamente
+los mismos filtros a partir de los parámetros de la URL (q, estado, metodo, anio, mes, orden).
+"""
+from core.busqueda import BusquedaService
+from .models import Pago
+from .vencimientos import VencimientoPagos
+
+PARAMETROS_FILTRO = ('q', 'estado', 'metodo', 'anio', 'mes', 'orden')
+ORDEN_POR_DEFECTO = '-fecha_vencimiento'
+
+# Órdenes permitidos del listado (lista blanca para la paginación por cursor).
+# Cada uno termina en 'id' y está respaldado por un índice compuesto de Pago.
+ORDENES_PAGOS = {
+    '-fecha_vencimiento': ('-fecha_vencimiento', '-id'),
+    'fecha_vencimiento': ('fecha_vencimiento', 'id'),
+    '-fecha_registro': ('-fecha_registro', '-id'),
+    '-monto': ('-monto', '-id'),
+}
+
+
+def parametros_filtro(querydict):
+    """Extrae los parámetros de filtro de request.GET como un dict serializable."""
+    return {
+        clave: querydict.get(clave, '').strip()
+        for clave in PARAMETROS_FILTRO
+        if querydict.get(clave, '').strip()
+    }
+
+
+def filtrar_pagos(parametros, queryset=None):
+    """
+    Aplica los filtros del listado de pagos.
+
+    El filtro por estado usa el estado efectivo (un pendiente ya vencido cuenta como vencido).
+
+    Args:
+        parametros: dict o QueryDict con q, estado, metodo, anio, mes y orden
+        queryset: QuerySet base (por defecto, todos los pagos)
+
+    Returns:
+        QuerySet: Pagos filtrados y ordenados
+    """
+    pagos = queryset if queryset is not None else Pago.objects.all()
+
+    query = parametros.get('q', '')
+    if query:
+        # Documento de búsqueda normalizado e indexado (ver core/busqueda.py)
+        pagos = BusquedaService.filtrar(pagos, 'pago', query)
+
+    estado = parametros.get('estado', '')
+    if estado:
+        pagos = VencimientoPagos.filtrar_por_estado(pagos, estado)
+
+    metodo = parametros.get('metodo', '')
+    if metodo:
+        pagos = pagos.filter(metodo_pago=metodo)
+
+    anio = parametros.get('anio', '')
+    mes = parametros.get('mes', '')
+    if anio:
+        pagos = pagos.filter(periodo_anio=anio)
+    if mes:
+        pagos = pagos.filter(periodo_mes=mes)
+
+    orden = parametros.get('orden', '')
+    return pagos.order_by(*ORDENES_PAGOS.get(orden, ORDENES_PAGOS[ORDEN_POR_DEFECTO]))
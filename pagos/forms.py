@@ -2,7 +2,8 @@ from django import forms
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import date, timedelta
-from .models import Pago, PlanPago
+from .models import Pago, PlanPago, ExtractoBancario
+from .cobranza import leer_lineas, MAX_RECIBOS
 from clientes.models import Cliente
 from instalaciones.models import Instalacion
 
@@ -239,3 +240,56 @@ class PlanPagoForm(forms.ModelForm):
 
 
 
+
+
+class ExtractoBancarioForm(forms.Form):
+    """Formulario para importar un estado de cuenta bancario."""
+    
+    FORMATO_CHOICES = [('', 'Detectar por la extensión')] + ExtractoBancario.FORMATO_CHOICES
+    
+    archivo = forms.FileField(
+        label='Estado de cuenta',
+        help_text='CSV, OFX o Excel (.xlsx) exportado desde la banca en línea',
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'form-control',
+            'accept': '.csv,.txt,.ofx,.qfx,.xlsx,.xlsm',
+        })
+    )
+    formato = forms.ChoiceField(
+        label='Formato',
+        choices=FORMATO_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+
+
+class CapturaCobranzaForm(forms.Form):
+    """Formulario para capturar los recibos de un cobrador."""
+    
+    cobrador = forms.CharField(
+        label='Cobrador',
+        max_length=100,
+        required=False,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Nombre de quien entregó los recibos'
+        })
+    )
+    recibos = forms.CharField(
+        label='Recibos',
+        help_text='Una línea por recibo: número de pago o contrato, monto, método (opcional), referencia (opcional)',
+        widget=forms.Textarea(attrs={
+            'class': 'form-control',
+            'rows': 14,
+            'placeholder': '1520, 450.00, efectivo, R-0001\nINST-20250102-0001, 500.00',
+            'style': 'font-family: monospace;'
+        })
+    )
+    
+    def clean_recibos(self):
+        cobros = leer_lineas(self.cleaned_data['recibos'])
+        if not cobros:
+            raise ValidationError('Captura al menos un recibo.')
+        if len(cobros) > MAX_RECIBOS:
+            raise ValidationError(f'Un lote admite como máximo {MAX_RECIBOS} recibos.')
+        return cobros
@@ -1,10 +1,14 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from pagos.models import Pago
+from pagos.vencimientos import VencimientoPagos
 
 
 class Command(BaseCommand):
-    help = 'Marca automáticamente como vencidos todos los pagos pendientes cuya fecha de vencimiento ya pasó'
+    help = (
+        'Marca automáticamente como vencidos todos los pagos pendientes cuya fecha de vencimiento ya pasó. '
+        'Pensado para ejecutarse una vez al día desde el programador de tareas (cron).'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -12,6 +16,11 @@ class Command(BaseCommand):
             action='store_true',
             help='Muestra cuántos pagos se marcarían como vencidos sin actualizarlos',
         )
+        parser.add_argument(
+            '--si-corresponde',
+            action='store_true',
+            help='Solo ejecuta el barrido si hoy todavía no se realizó',
+        )
 
     def handle(self, *args, **options):
         hoy = timezone.now().date()
@@ -47,7 +56,17 @@ class Command(BaseCommand):
             return
         
         # Actualizar pagos vencidos
-        actualizados = Pago.actualizar_pagos_vencidos()
+        if options['si_corresponde']:
+            actualizados = VencimientoPagos.barrer()
+            if actualizados is None:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f'✓ El barrido de hoy ya se realizó (último: {VencimientoPagos.ultimo_barrido()}).'
+                    )
+                )
+                return
+        else:
+            actualizados = Pago.actualizar_pagos_vencidos()
         
         self.stdout.write(
             self.style.SUCCESS(
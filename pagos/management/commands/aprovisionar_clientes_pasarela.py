@@ -0,0 +1,89 @@
+"""
+Comando de gestión para crear por adelantado los clientes en una pasarela de pago.
+
+Uso:
+    python manage.py aprovisionar_clientes_pasarela
+    python manage.py aprovisionar_clientes_pasarela --hilos 8 --limite 500
+    python manage.py aprovisionar_clientes_pasarela --dry-run
+
+Crea el cliente remoto (ej. Customer de Stripe) de los clientes activos que aún no
+lo tienen, para que el primer checkout del ciclo de facturación no espere esa llamada.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from clientes.models import Cliente
+from pagos.payment_gateway import PaymentGateway
+
+
+class Command(BaseCommand):
+    help = 'Crea en la pasarela de pago los clientes activos que aún no están registrados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pasarela',
+            default='stripe',
+            choices=['stripe'],
+            help='Pasarela de pago (default: stripe)',
+        )
+        parser.add_argument(
+            '--hilos',
+            type=int,
+            default=4,
+            help='Llamadas simultáneas a la pasarela (default: 4)',
+        )
+        parser.add_argument(
+            '--limite',
+            type=int,
+            help='Máximo de clientes a registrar en esta ejecución',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo muestra cuántos clientes se registrarían',
+        )
+
+    def handle(self, *args, **options):
+        pasarela = options['pasarela']
+        faltantes = Cliente.objects.filter(estado_cliente='activo').exclude(
+            clientes_pasarela__pasarela=pasarela
+        ).order_by('pk')
+        if options['limite']:
+            faltantes = faltantes[:options['limite']]
+        clientes = list(faltantes)
+
+        if not clientes:
+            self.stdout.write(self.style.SUCCESS(f'✓ Todos los clientes activos están registrados en {pasarela}.'))
+            return
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'[DRY RUN] Se registrarían {len(clientes)} cliente(s) en {pasarela}.'))
+            return
+
+        try:
+            gateway = PaymentGateway(pasarela=pasarela)
+        except (ImportError, ValueError) as e:
+            raise CommandError(str(e))
+
+        def registrar(cliente):
+            try:
+                return gateway.obtener_o_crear_cliente(cliente)
+            finally:
+                # Cada hilo usa su propia conexión a la base de datos
+                connection.close()
+
+        creados = 0
+        errores = 0
+        with ThreadPoolExecutor(max_workers=max(1, options['hilos'])) as executor:
+            futuros = {executor.submit(registrar, cliente): cliente for cliente in clientes}
+            for futuro in as_completed(futuros):
+                cliente = futuros[futuro]
+                try:
+                    futuro.result()
+                    creados += 1
+                except Exception as e:
+                    errores += 1
+                    self.stdout.write(self.style.ERROR(f'✗ Cliente {cliente.pk}: {str(e)}'))
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Clientes registrados en {pasarela}: {creados}'))
+        if errores:
+            self.stdout.write(self.style.WARNING(f'Clientes con error: {errores}'))
@@ -0,0 +1,243 @@
+"""
+Benchmark de carga del flujo de pago contra el simulador local de pasarelas.
+
+Ejecuta N checkouts concurrentes con el flujo completo:
+crear_intento_pago -> el cliente paga en el simulador -> webhook firmado a la
+aplicación -> bandeja de webhooks -> marcar_como_completada, e informa la latencia
+p50/p95/p99 de la creación del checkout y del flujo completo, y el throughput.
+
+Uso:
+    python manage.py benchmark_checkout
+    python manage.py benchmark_checkout --checkouts 1000 --concurrencia 32 --pasarela mercadopago
+    python manage.py benchmark_checkout --latencia-ms 50 300 --tasa-errores 0.02 --tasa-duplicados 0.1
+
+No necesita red ni sandboxes: el simulador (pagos/simulador.py) y la aplicación se
+levantan en hilos de este proceso. Crea clientes y pagos de prueba en la base de
+datos configurada y los elimina al terminar (salvo --conservar); no lo ejecutes
+contra la base de datos de producción. Con SQLite usa una concurrencia baja y
+'transaction_mode': 'IMMEDIATE' en OPTIONS; si no, las escrituras simultáneas
+fallan con "database is locked".
+"""
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from clientes.models import Cliente
+from pagos.models import EventoWebhook, Pago, TransaccionPago
+from pagos.payment_gateway import CLAVE_ID_SESION, PaymentGateway
+from pagos.simulador import SimuladorPasarelas
+from pagos.webhooks import BandejaWebhooks
+
+SECRETO_STRIPE = 'whsec_simulador'
+SECRETO_MERCADOPAGO = 'mercadopago_simulador'
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano de una lista ordenada."""
+    if not valores:
+        return 0.0
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+
+class ManejadorSilencioso(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Mide latencia y throughput del flujo de pago completo contra el simulador de pasarelas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkouts', type=int, default=200, help='Checkouts a ejecutar (default: 200)')
+        parser.add_argument('--concurrencia', type=int, default=16, help='Checkouts simultáneos (default: 16)')
+        parser.add_argument(
+            '--pasarela', default='stripe', choices=['stripe', 'mercadopago'],
+            help='Pasarela simulada (default: stripe)',
+        )
+        parser.add_argument(
+            '--latencia-ms', type=float, nargs=2, default=[20, 80], metavar=('MIN', 'MAX'),
+            help='Latencia de la API simulada en ms (default: 20 80)',
+        )
+        parser.add_argument('--tasa-errores', type=float, default=0.0, help='Fracción de respuestas 503 (default: 0)')
+        parser.add_argument(
+            '--tasa-duplicados', type=float, default=0.0, help='Fracción de webhooks enviados dos veces (default: 0)',
+        )
+        parser.add_argument(
+            '--retraso-webhook-ms', type=float, default=0, help='Espera entre el pago y el webhook (default: 0)',
+        )
+        parser.add_argument(
+            '--procesadores', type=int, default=2, help='Hilos que procesan la bandeja de webhooks (default: 2)',
+        )
+        parser.add_argument('--timeout', type=int, default=120, help='Segundos máximos de espera (default: 120)')
+        parser.add_argument('--semilla', type=int, help='Semilla de latencias y errores simulados')
+        parser.add_argument('--conservar', action='store_true', help='No elimina los datos de prueba al terminar')
+
+    def handle(self, *args, **options):
+        servidor_app = ThreadedWSGIServer(('127.0.0.1', 0), ManejadorSilencioso, allow_reuse_address=False)
+        servidor_app.set_app(WSGIHandler())
+        threading.Thread(target=servidor_app.serve_forever, daemon=True).start()
+        url_app = f'http://127.0.0.1:{servidor_app.server_port}'
+
+        simulador = SimuladorPasarelas(
+            latencia_ms=tuple(options['latencia_ms']),
+            tasa_errores=options['tasa_errores'],
+            url_webhooks={
+                'stripe': url_app + reverse('pagos:webhook_stripe'),
+                'mercadopago': url_app + reverse('pagos:webhook_mercadopago'),
+            },
+            retraso_webhook_ms=options['retraso_webhook_ms'],
+            tasa_duplicados=options['tasa_duplicados'],
+            secreto_stripe=SECRETO_STRIPE,
+            secreto_mercadopago=SECRETO_MERCADOPAGO,
+            semilla=options['semilla'],
+        )
+        try:
+            with simulador, override_settings(
+                STRIPE_API_URL=simulador.url,
+                STRIPE_SECRET_KEY='sk_test_simulador',
+                STRIPE_WEBHOOK_SECRET=SECRETO_STRIPE,
+                MERCADOPAGO_API_URL=simulador.url,
+                MERCADOPAGO_ACCESS_TOKEN='TEST-simulador',
+                MERCADOPAGO_WEBHOOK_SECRET=SECRETO_MERCADOPAGO,
+                ALLOWED_HOSTS=['127.0.0.1'],
+                SITE_URL=url_app,
+            ):
+                self._ejecutar(simulador, options)
+        finally:
+            servidor_app.shutdown()
+            servidor_app.server_close()
+
+    def _crear_datos(self, cantidad):
+        vencimiento = timezone.now().date() + timedelta(days=30)
+        pagos = []
+        for i in range(cantidad):
+            cliente = Cliente.objects.create(
+                nombre='Benchmark',
+                apellido1=f'Checkout {i}',
+                email=f'benchmark{i}@example.com',
+                telefono=f'55{i:08d}',
+                direccion='Simulador',
+                ciudad='Simulador',
+                estado='Simulador',
+                notas='benchmark_checkout',
+            )
+            pagos.append(Pago.objects.create(
+                cliente=cliente,
+                monto=350 + i % 500,
+                concepto=f'Benchmark checkout {i}',
+                periodo_mes=vencimiento.month,
+                periodo_anio=vencimiento.year,
+                fecha_vencimiento=vencimiento,
+                estado='pendiente',
+            ))
+        return pagos
+
+    def _ejecutar(self, simulador, options):
+        pasarela = options['pasarela']
+        self.stdout.write(f"Creando {options['checkouts']} pagos de prueba...")
+        pagos = self._crear_datos(options['checkouts'])
+        gateway = PaymentGateway(pasarela)
+
+        detener = threading.Event()
+
+        def procesar_webhooks():
+            try:
+                while not detener.is_set():
+                    if not BandejaWebhooks.procesar_pendientes(limite=50):
+                        time.sleep(0.02)
+            finally:
+                connection.close()
+
+        def checkout(pago):
+            try:
+                inicio = time.time()
+                resultado = gateway.crear_intento_pago(pago)
+                duracion = time.time() - inicio
+                if not resultado.get('success'):
+                    return pago.pk, inicio, duracion, resultado.get('error')
+                simulador.pagar(resultado[CLAVE_ID_SESION[pasarela]])
+                return pago.pk, inicio, duracion, None
+            except Exception as e:
+                return pago.pk, time.time(), 0.0, str(e)
+            finally:
+                connection.close()
+
+        procesadores = [threading.Thread(target=procesar_webhooks, daemon=True) for _ in range(max(1, options['procesadores']))]
+        for hilo in procesadores:
+            hilo.start()
+
+        inicio_total = time.time()
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, options['concurrencia'])) as executor:
+                resultados = list(executor.map(checkout, pagos))
+            exitosos = {pago_id: inicio for pago_id, inicio, _, error in resultados if error is None}
+
+            # Esperar a que los webhooks marquen los pagos como pagados
+            limite = time.time() + options['timeout']
+            while time.time() < limite:
+                if Pago.objects.filter(pk__in=list(exitosos), estado='pagado').count() >= len(exitosos):
+                    break
+                time.sleep(0.1)
+            fin_total = time.time()
+        finally:
+            detener.set()
+            for hilo in procesadores:
+                hilo.join()
+
+        completadas = dict(
+            TransaccionPago.objects.filter(pago_id__in=list(exitosos), estado='completada')
+            .values_list('pago_id', 'fecha_completada')
+        )
+        latencias_checkout = sorted(duracion * 1000 for _, _, duracion, error in resultados if error is None)
+        latencias_flujo = sorted(
+            (completadas[pago_id].timestamp() - inicio) * 1000
+            for pago_id, inicio in exitosos.items() if pago_id in completadas
+        )
+        errores = [(pago_id, error) for pago_id, _, _, error in resultados if error is not None]
+        segundos = fin_total - inicio_total
+
+        self.stdout.write('')
+        self.stdout.write(
+            f"Pasarela: {pasarela}  checkouts: {len(pagos)}  concurrencia: {options['concurrencia']}  "
+            f"latencia simulada: {options['latencia_ms'][0]:.0f}-{options['latencia_ms'][1]:.0f} ms  "
+            f"errores simulados: {options['tasa_errores']:.1%}"
+        )
+        for etiqueta, latencias in (('crear_intento_pago', latencias_checkout), ('flujo completo', latencias_flujo)):
+            self.stdout.write(
+                f'{etiqueta:<20} n={len(latencias):>6}  p50 {percentil(latencias, 50):>8.1f} ms  '
+                f'p95 {percentil(latencias, 95):>8.1f} ms  p99 {percentil(latencias, 99):>8.1f} ms'
+            )
+        self.stdout.write(
+            f'Pagos completados: {len(completadas)} en {segundos:.2f}s  '
+            f'({len(completadas) / segundos if segundos else 0:.1f} pagos/s)'
+        )
+        estadisticas = simulador.estadisticas()
+        self.stdout.write(
+            f"Peticiones a la API simulada: {sum(estadisticas['peticiones'].values())}  "
+            f"webhooks enviados: {estadisticas['webhooks']['enviados']}  fallidos: {estadisticas['webhooks']['fallidos']}"
+        )
+
+        if len(completadas) == len(pagos):
+            self.stdout.write(self.style.SUCCESS('✓ Todos los checkouts terminaron con el pago marcado como pagado.'))
+        else:
+            self.stdout.write(self.style.WARNING(f'Checkouts sin completar: {len(pagos) - len(completadas)}'))
+        for pago_id, error in errores[:10]:
+            self.stdout.write(self.style.ERROR(f'✗ Pago {pago_id}: {error}'))
+
+        if not options['conservar']:
+            self._eliminar_datos(pagos)
+
+    def _eliminar_datos(self, pagos):
+        ids_clientes = {pago.cliente_id for pago in pagos}
+        EventoWebhook.objects.filter(id_evento__startswith='evt_sim_').delete()
+        EventoWebhook.objects.filter(id_evento__startswith='sim-').delete()
+        Cliente.objects.filter(pk__in=ids_clientes).delete()
+        self.stdout.write('Datos de prueba eliminados.')
@@ -0,0 +1,126 @@
+"""
+Benchmark de la exportación de pagos a Excel.
+
+Mide tiempo, filas por segundo, memoria y tamaño del archivo al escribir
+N filas sintéticas con el libro write-only (y, opcionalmente, con el
+libro en memoria que se usaba antes, para comparar).
+
+Uso:
+    python manage.py benchmark_exportacion_pagos
+    python manage.py benchmark_exportacion_pagos --filas 100000 1000000
+    python manage.py benchmark_exportacion_pagos --filas 100000 --comparar-en-memoria
+    python manage.py benchmark_exportacion_pagos --filas 100000 --tracemalloc
+
+Sin --tracemalloc se informa el pico de memoria residente del proceso (acumulado
+entre mediciones); con --tracemalloc, el pico de memoria de Python de cada
+medición, a costa de que la escritura sea varias veces más lenta.
+
+Las filas no salen de la base de datos: se mide el costo de escribir el archivo,
+que es lo que crecía con el volumen. Para medir el flujo completo contra datos
+reales usa --desde-bd, que exporta todos los pagos existentes.
+"""
+import resource
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from django.core.management.base import BaseCommand
+from pagos.exportacion import ENCABEZADOS_EXCEL, escribir_excel, filas_excel, consultar_pagos
+
+
+def filas_sinteticas(cantidad):
+    """Genera filas con la misma forma que filas_excel()."""
+    base = date(2024, 1, 1)
+    for i in range(cantidad):
+        vencimiento = base + timedelta(days=i % 365)
+        yield (
+            f'Cliente {i} Apellido Prueba',
+            'Plan Fibra 100 Mbps',
+            f'Mensualidad {vencimiento.month}/{vencimiento.year}',
+            float(350 + i % 500),
+            f'Mes {vencimiento.month} {vencimiento.year}',
+            vencimiento.strftime('%d/%m/%Y'),
+            datetime(2024, 1, 1, 10, 30).strftime('%d/%m/%Y %H:%M') if i % 3 else '',
+            'Pagado' if i % 3 else 'Pendiente',
+            'Efectivo' if i % 3 else '',
+            f'REF-{i:08d}' if i % 3 else '',
+            '',
+        )
+
+
+def escribir_en_memoria(filas, destino):
+    """Escritura con el libro normal de openpyxl (todas las celdas en memoria)."""
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'Pagos'
+    ws.append(ENCABEZADOS_EXCEL)
+    total = 0
+    for fila in filas:
+        ws.append(fila)
+        total += 1
+    wb.save(destino)
+    return total
+
+
+class Command(BaseCommand):
+    help = 'Mide tiempo y memoria de la exportación de pagos a Excel'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--filas',
+            type=int,
+            nargs='+',
+            default=[100000, 1000000],
+            help='Cantidades de filas a medir (default: 100000 1000000)',
+        )
+        parser.add_argument(
+            '--comparar-en-memoria',
+            action='store_true',
+            help='Mide también el libro en memoria (lento y costoso con muchas filas)',
+        )
+        parser.add_argument(
+            '--tracemalloc',
+            action='store_true',
+            help='Mide el pico de memoria de Python de cada escritura (mucho más lento)',
+        )
+        parser.add_argument(
+            '--desde-bd',
+            action='store_true',
+            help='Exporta los pagos reales de la base de datos en lugar de filas sintéticas',
+        )
+
+    def _medir(self, etiqueta, escritor, filas):
+        with tempfile.TemporaryFile() as temporal:
+            if self.usar_tracemalloc:
+                tracemalloc.start()
+            inicio = time.perf_counter()
+            total = escritor(filas, temporal)
+            segundos = time.perf_counter() - inicio
+            if self.usar_tracemalloc:
+                _, pico = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                memoria = f'pico Python {pico / 1024 / 1024:>8.1f} MB'
+            else:
+                # ru_maxrss está en KB en Linux
+                rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                memoria = f'RSS máx. proceso {rss / 1024:>8.1f} MB'
+            tamanio = temporal.tell()
+
+        self.stdout.write(
+            f'{etiqueta:<22} {total:>10,} filas  {segundos:>8.2f}s  '
+            f'{total / segundos if segundos else 0:>10,.0f} filas/s  '
+            f'{memoria}  archivo {tamanio / 1024 / 1024:>7.1f} MB'
+        )
+
+    def handle(self, *args, **options):
+        self.usar_tracemalloc = options['tracemalloc']
+        if options['desde_bd']:
+            self._medir('write-only (BD)', escribir_excel, filas_excel(consultar_pagos({})))
+            return
+
+        for cantidad in options['filas']:
+            self._medir('write-only', escribir_excel, filas_sinteticas(cantidad))
+            if options['comparar_en_memoria']:
+                self._medir('en memoria', escribir_en_memoria, filas_sinteticas(cantidad))
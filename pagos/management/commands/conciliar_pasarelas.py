@@ -0,0 +1,83 @@
+"""
+Comando de gestión para conciliar las transacciones pendientes con las pasarelas de pago.
+
+Uso:
+    python manage.py conciliar_pasarelas
+    python manage.py conciliar_pasarelas --pasarela stripe --hilos 32
+    python manage.py conciliar_pasarelas --dry-run
+
+Consulta en Stripe, Mercado Pago y PayPal las transacciones que siguen pendientes
+y aplica su estado real (ver pagos/conciliacion.py). Pensado para ejecutarse desde
+el programador de tareas (cron) y al cierre de mes.
+"""
+from django.core.management.base import BaseCommand
+from pagos.conciliacion import ConciliacionPasarelas, PASARELAS
+
+
+class Command(BaseCommand):
+    help = 'Concilia las transacciones pendientes con el estado que reportan las pasarelas de pago'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pasarela',
+            action='append',
+            choices=PASARELAS,
+            help='Pasarela a conciliar (se puede repetir; default: todas)',
+        )
+        parser.add_argument(
+            '--hilos',
+            type=int,
+            help='Consultas simultáneas (default: PAGOS_CONCILIACION_HILOS)',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            help='Transacciones por lote (default: PAGOS_CONCILIACION_LOTE)',
+        )
+        parser.add_argument(
+            '--antiguedad',
+            type=int,
+            default=10,
+            help='Solo transacciones creadas hace más de estos minutos (default: 10)',
+        )
+        parser.add_argument(
+            '--limite',
+            type=int,
+            help='Máximo de transacciones a revisar en esta ejecución',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Consulta las pasarelas y muestra el reporte sin actualizar nada',
+        )
+
+    def handle(self, *args, **options):
+        conciliacion = ConciliacionPasarelas(hilos=options['hilos'], lote=options['lote'])
+        reporte = conciliacion.ejecutar(
+            pasarelas=options['pasarela'],
+            antiguedad_minutos=options['antiguedad'],
+            limite=options['limite'],
+            aplicar=not options['dry_run'],
+        )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('[DRY RUN] No se actualizó ninguna transacción.'))
+        self.stdout.write(f"Transacciones revisadas: {reporte['revisadas']} en {reporte['segundos']} s")
+        self.stdout.write(self.style.SUCCESS(f"✓ Coinciden con la pasarela: {reporte['coincide']}"))
+        transiciones = ', '.join(f'{estado}: {cantidad}' for estado, cantidad in reporte['transiciones'].items())
+        self.stdout.write(self.style.SUCCESS(f"✓ Corregidas: {reporte['corregida']} ({transiciones})"))
+
+        for incidencia in reporte['incidencias']:
+            detalle = (
+                f"✗ [{incidencia['resultado']}] Transacción {incidencia['transaccion_id']} "
+                f"(pago {incidencia['pago_id']}, {incidencia['pasarela']} {incidencia['id_externo']})"
+            )
+            if incidencia['resultado'] == 'monto_distinto':
+                detalle += f": local ${incidencia['monto']}, pasarela ${incidencia['monto_pasarela']}"
+            elif incidencia['mensaje']:
+                detalle += f": {incidencia['mensaje']}"
+            self.stdout.write(self.style.ERROR(detalle))
+
+        for resultado, etiqueta in (('huerfana', 'Huérfanas'), ('monto_distinto', 'Con monto distinto'), ('error', 'Con error')):
+            if reporte[resultado]:
+                self.stdout.write(self.style.WARNING(f'{etiqueta}: {reporte[resultado]}'))
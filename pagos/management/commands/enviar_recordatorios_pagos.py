@@ -6,13 +6,18 @@ Uso:
     python manage.py enviar_recordatorios_pagos --dias-antes 3
     python manage.py enviar_recordatorios_pagos --solo-vencidos
     python manage.py enviar_recordatorios_pagos --dry-run
+    python manage.py enviar_recordatorios_pagos --procesos 4
+    python manage.py enviar_recordatorios_pagos --resumen
+
+Los recordatorios se generan por lotes (ver pagos/recordatorios.py): una consulta por
+tipo, plantillas compiladas una vez e inserción con bulk_create. Con --resumen (o
+PAGOS_RECORDATORIOS_RESUMEN) cada cliente recibe un solo mensaje por canal con todos
+sus pagos por vencer y vencidos.
 """
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from datetime import timedelta, date
-from pagos.models import Pago
-from notificaciones.models import TipoNotificacion, Notificacion, ConfiguracionNotificacion
-from pagos.services import RecordatorioPagoService
+from datetime import timedelta
+from pagos.recordatorios import GeneradorRecordatorios
 import logging
 
 logger = logging.getLogger(__name__)
@@ -54,6 +59,16 @@ class Command(BaseCommand):
             action='store_true',
             help='Forzar envío incluso si ya se envió un recordatorio recientemente',
         )
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            help='Procesos para renderizar ejecuciones grandes (default: PAGOS_RECORDATORIOS_PROCESOS; 1 = sin pool)',
+        )
+        parser.add_argument(
+            '--resumen',
+            action='store_true',
+            help='Un solo mensaje por cliente y canal con todos sus pagos (default: PAGOS_RECORDATORIOS_RESUMEN)',
+        )
 
     def handle(self, *args, **options):
         dias_antes = options['dias_antes']
@@ -61,37 +76,14 @@ class Command(BaseCommand):
         solo_vencidos = options['solo_vencidos']
         solo_pendientes = options['solo_pendientes']
         dry_run = options['dry_run']
-        forzar = options['forzar']
-        
-        hoy = timezone.now().date()
+        resumen = options['resumen'] or getattr(settings, 'PAGOS_RECORDATORIOS_RESUMEN', False)
         
-        # Obtener o crear tipos de notificación
-        tipo_recordatorio_antes, _ = TipoNotificacion.objects.get_or_create(
-            codigo='recordatorio_pago_antes',
-            defaults={
-                'nombre': 'Recordatorio de Pago (Antes de Vencimiento)',
-                'descripcion': 'Recordatorio enviado antes de la fecha de vencimiento',
-            }
-        )
-        
-        tipo_recordatorio_vencido, _ = TipoNotificacion.objects.get_or_create(
-            codigo='recordatorio_pago_vencido',
-            defaults={
-                'nombre': 'Recordatorio de Pago Vencido',
-                'descripcion': 'Recordatorio enviado después de la fecha de vencimiento',
-            }
-        )
+        generador = GeneradorRecordatorios(forzar=options['forzar'], procesos=options['procesos'])
+        hoy = generador.hoy
         
-        # Obtener configuración o usar valores por defecto
-        config_antes = ConfiguracionNotificacion.objects.filter(
-            tipo_notificacion=tipo_recordatorio_antes,
-            activa=True
-        ).first()
-        
-        config_vencido = ConfiguracionNotificacion.objects.filter(
-            tipo_notificacion=tipo_recordatorio_vencido,
-            activa=True
-        ).first()
+        # Obtener o crear tipos de notificación y su configuración activa
+        tipo_recordatorio_antes, config_antes = generador.tipo_y_configuracion('antes')
+        tipo_recordatorio_vencido, config_vencido = generador.tipo_y_configuracion('vencido')
         
         # Usar configuración si existe, sino usar valores del comando
         if config_antes:
@@ -113,65 +105,34 @@ class Command(BaseCommand):
             self.stdout.write(
                 self.style.WARNING('\n⚠️  MODO DRY-RUN: No se crearán notificaciones realmente\n')
             )
+        if resumen:
+            self.stdout.write(
+                self.style.WARNING('\n📨 MODO RESUMEN: un solo mensaje por cliente y canal\n')
+            )
+        # Pagos a incluir en los resúmenes: (clave, filas, dias, canal)
+        entradas = []
         
         # Recordatorios de pagos pendientes (antes de vencer)
         recordatorios_antes = 0
         if not solo_vencidos:
-            fecha_limite_antes = hoy + timedelta(days=dias_antes)
-            
-            pagos_pendientes = Pago.objects.filter(
-                estado='pendiente',
-                fecha_vencimiento=fecha_limite_antes,
-                cliente__email__isnull=False
-            ).exclude(cliente__email='').select_related('cliente', 'instalacion')
-            
-            # Excluir pagos que ya tienen recordatorio reciente (a menos que se fuerce)
-            if not forzar:
-                # Obtener IDs de pagos con recordatorios enviados en los últimos 2 días
-                pagos_con_recordatorio = Notificacion.objects.filter(
-                    pago__in=pagos_pendientes,
-                    tipo=tipo_recordatorio_antes,
-                    estado='enviada',
-                    fecha_envio__gte=timezone.now() - timedelta(days=2)
-                ).values_list('pago_id', flat=True)
-                
-                pagos_pendientes = pagos_pendientes.exclude(id__in=pagos_con_recordatorio)
+            filas = generador.filas('antes', dias_antes, tipo_recordatorio_antes)
             
-            total_pendientes = pagos_pendientes.count()
-            
-            if total_pendientes > 0:
+            if filas:
                 self.stdout.write(
                     self.style.WARNING(
                         f'\n📅 Recordatorios ANTES de vencimiento ({dias_antes} días antes):'
                     )
                 )
                 self.stdout.write(
-                    f'   Encontrados {total_pendientes} pago(s) pendiente(s) que vencen el {fecha_limite_antes.strftime("%d/%m/%Y")}'
+                    f'   Encontrados {len(filas)} pago(s) pendiente(s) que vencen el {(hoy + timedelta(days=dias_antes)).strftime("%d/%m/%Y")}'
                 )
-                
-                for pago in pagos_pendientes:
-                    if dry_run:
-                        self.stdout.write(
-                            f'   [DRY-RUN] Se crearía recordatorio para: {pago.cliente.nombre_completo} - ${pago.monto}'
-                        )
-                        recordatorios_antes += 1
-                    else:
-                        resultado = RecordatorioPagoService.crear_recordatorio_antes_vencimiento(
-                            pago, dias_antes, tipo_recordatorio_antes, config_antes
-                        )
-                        if resultado['success']:
-                            self.stdout.write(
-                                self.style.SUCCESS(
-                                    f'   ✓ Recordatorio creado: {pago.cliente.nombre_completo} - ${pago.monto}'
-                                )
-                            )
-                            recordatorios_antes += 1
-                        else:
-                            self.stdout.write(
-                                self.style.ERROR(
-                                    f'   ✗ Error: {pago.cliente.nombre_completo} - {resultado.get("error", "Error desconocido")}'
-                                )
-                            )
+                if resumen:
+                    entradas.append(('antes', filas, dias_antes, self._canal(config_antes)))
+                    recordatorios_antes = len(filas)
+                else:
+                    recordatorios_antes = self._crear(
+                        generador, 'antes', filas, dias_antes, tipo_recordatorio_antes, config_antes, dry_run,
+                    )
             else:
                 self.stdout.write(
                     self.style.SUCCESS(
@@ -182,63 +143,24 @@ class Command(BaseCommand):
         # Recordatorios de pagos vencidos
         recordatorios_vencidos = 0
         if not solo_pendientes:
-            fecha_limite_vencido = hoy - timedelta(days=dias_despues)
-            
-            pagos_vencidos = Pago.objects.filter(
-                estado__in=['vencido', 'pendiente'],
-                fecha_vencimiento__lte=fecha_limite_vencido,
-                cliente__email__isnull=False
-            ).exclude(cliente__email='').exclude(estado='pagado').select_related('cliente', 'instalacion')
-            
-            # Excluir pagos que ya tienen recordatorio reciente (a menos que se fuerce)
-            if not forzar:
-                # Obtener IDs de pagos con recordatorios enviados en los últimos 7 días
-                pagos_con_recordatorio = Notificacion.objects.filter(
-                    pago__in=pagos_vencidos,
-                    tipo=tipo_recordatorio_vencido,
-                    estado='enviada',
-                    fecha_envio__gte=timezone.now() - timedelta(days=7)
-                ).values_list('pago_id', flat=True)
-                
-                pagos_vencidos = pagos_vencidos.exclude(id__in=pagos_con_recordatorio)
-            
-            total_vencidos = pagos_vencidos.count()
+            filas = generador.filas('vencido', dias_despues, tipo_recordatorio_vencido)
             
-            if total_vencidos > 0:
+            if filas:
                 self.stdout.write(
                     self.style.WARNING(
                         f'\n⚠️  Recordatorios de pagos VENCIDOS ({dias_despues} días después):'
                     )
                 )
                 self.stdout.write(
-                    f'   Encontrados {total_vencidos} pago(s) vencido(s) o pendiente(s) desde el {fecha_limite_vencido.strftime("%d/%m/%Y")}'
+                    f'   Encontrados {len(filas)} pago(s) vencido(s) o pendiente(s) desde el {(hoy - timedelta(days=dias_despues)).strftime("%d/%m/%Y")}'
                 )
-                
-                for pago in pagos_vencidos:
-                    if dry_run:
-                        dias = (hoy - pago.fecha_vencimiento).days
-                        self.stdout.write(
-                            f'   [DRY-RUN] Se crearía recordatorio para: {pago.cliente.nombre_completo} - ${pago.monto} (Vencido hace {dias} días)'
-                        )
-                        recordatorios_vencidos += 1
-                    else:
-                        resultado = RecordatorioPagoService.crear_recordatorio_vencido(
-                            pago, dias_despues, tipo_recordatorio_vencido, config_vencido
-                        )
-                        if resultado['success']:
-                            dias = (hoy - pago.fecha_vencimiento).days
-                            self.stdout.write(
-                                self.style.SUCCESS(
-                                    f'   ✓ Recordatorio creado: {pago.cliente.nombre_completo} - ${pago.monto} (Vencido hace {dias} días)'
-                                )
-                            )
-                            recordatorios_vencidos += 1
-                        else:
-                            self.stdout.write(
-                                self.style.ERROR(
-                                    f'   ✗ Error: {pago.cliente.nombre_completo} - {resultado.get("error", "Error desconocido")}'
-                                )
-                            )
+                if resumen:
+                    entradas.append(('vencido', filas, dias_despues, self._canal(config_vencido)))
+                    recordatorios_vencidos = len(filas)
+                else:
+                    recordatorios_vencidos = self._crear(
+                        generador, 'vencido', filas, dias_despues, tipo_recordatorio_vencido, config_vencido, dry_run,
+                    )
             else:
                 self.stdout.write(
                     self.style.SUCCESS(
@@ -246,9 +168,12 @@ class Command(BaseCommand):
                     )
                 )
         
-        # Resumen
         total_recordatorios = recordatorios_antes + recordatorios_vencidos
+        mensajes = total_recordatorios
+        if resumen and entradas:
+            mensajes = self._crear_resumenes(generador, entradas, dry_run)
         
+        # Resumen
         self.stdout.write('\n' + '='*60)
         self.stdout.write(
             self.style.SUCCESS(
@@ -256,10 +181,11 @@ class Command(BaseCommand):
                 f'   • Recordatorios antes de vencimiento: {recordatorios_antes}\n'
                 f'   • Recordatorios de pagos vencidos: {recordatorios_vencidos}\n'
                 f'   • Total de recordatorios: {total_recordatorios}'
+                + (f'\n   • Mensajes de resumen (uno por cliente y canal): {mensajes}' if resumen else '')
             )
         )
         
-        if not dry_run and total_recordatorios > 0:
+        if not dry_run and mensajes > 0:
             self.stdout.write(
                 self.style.SUCCESS(
                     '\n💡 Tip: Ejecuta "python manage.py send_notifications" para enviar las notificaciones creadas.'
@@ -267,4 +193,58 @@ class Command(BaseCommand):
             )
         
         self.stdout.write('='*60 + '\n')
-
+    
+    def _crear(self, generador, clave, filas, dias, tipo, configuracion, dry_run):
+        """Crea (o simula) los recordatorios de las filas; devuelve cuántos se crearon."""
+        if dry_run:
+            for fila in filas:
+                nombre = ' '.join(filter(None, fila[6:9]))
+                detalle = '' if clave == 'antes' else f' (Vencido hace {(generador.hoy - fila[4]).days} días)'
+                self.stdout.write(
+                    f'   [DRY-RUN] Se crearía recordatorio para: {nombre} - ${fila[3]}{detalle}'
+                )
+            return len(filas)
+        
+        canal = self._canal(configuracion)
+        try:
+            resultado = generador.crear(clave, filas, dias, tipo, canal=canal)
+        except Exception as e:
+            logger.error(f'Error al crear recordatorios ({clave}): {str(e)}')
+            self.stdout.write(self.style.ERROR(f'   ✗ Error: {str(e)}'))
+            return 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"   ✓ {resultado['creados']} recordatorio(s) creado(s) en {resultado['segundos']}s"
+            )
+        )
+        return resultado['creados']
+    
+    @staticmethod
+    def _canal(configuracion):
+        return configuracion.canal_preferido if configuracion else 'email'
+    
+    def _crear_resumenes(self, generador, entradas, dry_run):
+        """Crea (o simula) un resumen por cliente y canal; devuelve cuántos mensajes se crearon."""
+        if dry_run:
+            grupos = generador.resumenes(entradas)
+            for (_, canal), grupo in grupos.items():
+                self.stdout.write(
+                    f"   [DRY-RUN] Se crearía resumen para: {grupo['nombre']} - {len(grupo['pagos'])} pago(s), "
+                    f"${grupo['total']} ({canal})"
+                )
+            return len(grupos)
+        
+        tipo_resumen, _ = generador.tipo_y_configuracion('resumen')
+        try:
+            resultado = generador.crear_resumenes(entradas, tipo_resumen)
+        except Exception as e:
+            logger.error(f'Error al crear resúmenes de recordatorios: {str(e)}')
+            self.stdout.write(self.style.ERROR(f'   ✗ Error: {str(e)}'))
+            return 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n   ✓ {resultado['creados']} resumen(es) creado(s) con {resultado['pagos']} pago(s) "
+                f"en {resultado['segundos']}s"
+            )
+        )
+        return resultado['creados']
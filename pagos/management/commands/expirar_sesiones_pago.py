@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from pagos.sesiones_checkout import SesionesCheckoutService
+
+
+class Command(BaseCommand):
+    help = (
+        'Cancela las sesiones de checkout pendientes cuya vigencia ya pasó. '
+        'Pensado para ejecutarse periódicamente desde el programador de tareas (cron).'
+    )
+
+    def handle(self, *args, **options):
+        canceladas = SesionesCheckoutService.expirar_vencidas()
+        if canceladas:
+            self.stdout.write(self.style.SUCCESS(f'✓ {canceladas} sesión(es) de pago vencida(s) cancelada(s).'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✓ No hay sesiones de pago vencidas.'))
@@ -4,14 +4,24 @@ Comando de gestión para generar pagos automáticamente desde PlanPago activos.
 Uso:
     python manage.py generar_pagos
     python manage.py generar_pagos --mes 12 --anio 2024
-    python manage.py generar_pagos --solo-pendientes
+    python manage.py generar_pagos --desde 2024-01 --hasta 2024-12
+    python manage.py generar_pagos --dry-run
+
+La generación es idempotente: los períodos que ya tienen un pago activo se omiten,
+por lo que el comando puede ejecutarse varias veces sin crear duplicados.
 """
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from datetime import date, timedelta
-from calendar import monthrange
-from pagos.models import Pago, PlanPago
-from instalaciones.models import Instalacion
+from datetime import date
+from pagos.services import GeneradorPagosService
+
+
+def _parse_periodo(valor):
+    """Convierte 'YYYY-MM' en una tupla (anio, mes)."""
+    try:
+        anio, mes = valor.split('-')
+        return int(anio), int(mes)
+    except (ValueError, AttributeError):
+        raise ValueError(f'Período inválido: {valor}. Usa el formato YYYY-MM.')
 
 
 class Command(BaseCommand):
@@ -28,10 +38,26 @@ class Command(BaseCommand):
             type=int,
             help='Año para generar pagos. Por defecto, año actual.',
         )
+        parser.add_argument(
+            '--desde',
+            type=str,
+            help='Período inicial (YYYY-MM) para generar pagos de un rango de meses.',
+        )
+        parser.add_argument(
+            '--hasta',
+            type=str,
+            help='Período final (YYYY-MM) del rango. Por defecto, igual a --desde.',
+        )
         parser.add_argument(
             '--solo-pendientes',
             action='store_true',
-            help='Solo generar pagos para instalaciones que no tienen pago en el período',
+            help='Se mantiene por compatibilidad: los períodos ya facturados siempre se omiten',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=GeneradorPagosService.BATCH_SIZE,
+            help=f'Pagos por bloque de inserción (default: {GeneradorPagosService.BATCH_SIZE})',
         )
         parser.add_argument(
             '--dry-run',
@@ -40,103 +66,61 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
-        # Obtener mes y año
         hoy = date.today()
-        mes = options.get('mes') or hoy.month
-        anio = options.get('anio') or hoy.year
-        solo_pendientes = options.get('solo_pendientes', False)
         dry_run = options.get('dry_run', False)
-        
+
+        # Determinar los períodos a generar
+        if options.get('desde'):
+            try:
+                desde = _parse_periodo(options['desde'])
+                hasta = _parse_periodo(options['hasta']) if options.get('hasta') else desde
+            except ValueError as e:
+                self.stdout.write(self.style.ERROR(str(e)))
+                return
+        else:
+            desde = hasta = (options.get('anio') or hoy.year, options.get('mes') or hoy.month)
+
         # Validar mes y año
-        if mes < 1 or mes > 12:
-            self.stdout.write(self.style.ERROR(f'Mes inválido: {mes}. Debe ser entre 1 y 12.'))
-            return
-        
-        if anio < 2000 or anio > 2100:
-            self.stdout.write(self.style.ERROR(f'Año inválido: {anio}. Debe ser entre 2000 y 2100.'))
+        for anio, mes in (desde, hasta):
+            if mes < 1 or mes > 12:
+                self.stdout.write(self.style.ERROR(f'Mes inválido: {mes}. Debe ser entre 1 y 12.'))
+                return
+            if anio < 2000 or anio > 2100:
+                self.stdout.write(self.style.ERROR(f'Año inválido: {anio}. Debe ser entre 2000 y 2100.'))
+                return
+
+        if hasta < desde:
+            self.stdout.write(self.style.ERROR('El período final no puede ser anterior al inicial.'))
             return
-        
-        self.stdout.write(self.style.SUCCESS(f'Generando pagos para {mes}/{anio}...'))
-        
-        # Obtener todos los PlanPago activos
-        planes_pago = PlanPago.objects.filter(activo=True).select_related('instalacion', 'instalacion__cliente')
-        
-        if not planes_pago.exists():
+
+        periodos = GeneradorPagosService.rango_periodos(desde, hasta)
+        if len(periodos) == 1:
+            self.stdout.write(self.style.SUCCESS(f'Generando pagos para {desde[1]}/{desde[0]}...'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Generando pagos de {desde[1]}/{desde[0]} a {hasta[1]}/{hasta[0]} ({len(periodos)} meses)...'
+            ))
+
+        resultado = GeneradorPagosService.generar(
+            periodos,
+            dry_run=dry_run,
+            batch_size=options['batch_size'],
+        )
+
+        if resultado['planes'] == 0:
             self.stdout.write(self.style.WARNING('No hay PlanPago activos.'))
             return
-        
-        pagos_creados = 0
-        pagos_existentes = 0
-        errores = 0
-        
-        for plan_pago in planes_pago:
-            instalacion = plan_pago.instalacion
-            cliente = instalacion.cliente
-            
-            # Verificar si ya existe un pago para este período
-            if solo_pendientes:
-                pago_existente = Pago.objects.filter(
-                    cliente=cliente,
-                    instalacion=instalacion,
-                    periodo_mes=mes,
-                    periodo_anio=anio
-                ).exists()
-                
-                if pago_existente:
-                    pagos_existentes += 1
-                    continue
-            
-            # Calcular fecha de vencimiento
-            # Usar el día de vencimiento del plan, pero ajustar si es mayor que los días del mes
-            dias_en_mes = monthrange(anio, mes)[1]
-            dia_vencimiento = min(plan_pago.dia_vencimiento, dias_en_mes)
-            
-            try:
-                fecha_vencimiento = date(anio, mes, dia_vencimiento)
-            except ValueError:
-                # Si el día no es válido para el mes (ej: 31 de febrero), usar el último día del mes
-                fecha_vencimiento = date(anio, mes, dias_en_mes)
-            
-            # Crear concepto
-            meses = ['', 'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
-                    'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
-            concepto = f"Pago mensual de servicio - {meses[mes]} {anio}"
-            
-            if not dry_run:
-                # Crear el pago
-                pago = Pago.objects.create(
-                    cliente=cliente,
-                    instalacion=instalacion,
-                    monto=plan_pago.monto_mensual,
-                    concepto=concepto,
-                    periodo_mes=mes,
-                    periodo_anio=anio,
-                    fecha_vencimiento=fecha_vencimiento,
-                    estado='pendiente'
-                )
-                pagos_creados += 1
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f'✓ Pago creado: {cliente.nombre_completo} - ${plan_pago.monto_mensual} - {fecha_vencimiento}'
-                    )
-                )
-            else:
-                # Simulación
-                pagos_creados += 1
-                self.stdout.write(
-                    self.style.WARNING(
-                        f'[SIMULACIÓN] Pago a crear: {cliente.nombre_completo} - ${plan_pago.monto_mensual} - {fecha_vencimiento}'
-                    )
-                )
-        
+
         # Resumen
         self.stdout.write('')
         self.stdout.write(self.style.SUCCESS('=' * 50))
         if dry_run:
             self.stdout.write(self.style.SUCCESS('SIMULACIÓN - No se crearon pagos reales'))
+            self.stdout.write(self.style.WARNING(f'Pagos a crear: {resultado["creados"]}'))
         else:
-            self.stdout.write(self.style.SUCCESS(f'Pagos creados: {pagos_creados}'))
-        if solo_pendientes:
-            self.stdout.write(self.style.WARNING(f'Pagos existentes (omitidos): {pagos_existentes}'))
+            self.stdout.write(self.style.SUCCESS(f'Pagos creados: {resultado["creados"]}'))
+        self.stdout.write(self.style.WARNING(f'Pagos existentes (omitidos): {resultado["existentes"]}'))
+        self.stdout.write(
+            f'Tiempo: {resultado["segundos"]:.2f}s ({resultado["filas_por_segundo"]:,.0f} pagos/s)'
+        )
         self.stdout.write(self.style.SUCCESS('=' * 50))
-
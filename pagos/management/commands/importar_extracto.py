@@ -0,0 +1,58 @@
+"""
+Comando de gestión para importar un estado de cuenta bancario.
+
+Uso:
+    python manage.py importar_extracto movimientos_octubre.csv
+    python manage.py importar_extracto estado.ofx --dry-run
+    python manage.py importar_extracto estado.xls.txt --formato csv
+
+Aplica los abonos que coinciden sin ambigüedad con un pago pendiente y deja los
+demás en la cola de revisión (ver pagos/extractos.py).
+"""
+import os
+from django.core.management.base import BaseCommand, CommandError
+from pagos.extractos import ImportacionExtractoService, LECTORES
+
+
+class Command(BaseCommand):
+    help = 'Importa un estado de cuenta bancario (CSV, OFX o Excel) y concilia los pagos pendientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del estado de cuenta')
+        parser.add_argument(
+            '--formato',
+            choices=sorted(LECTORES),
+            help='Formato del archivo (default: según la extensión)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Muestra cuántos abonos se aplicarían sin guardar nada',
+        )
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        if not os.path.isfile(ruta):
+            raise CommandError(f'No existe el archivo {ruta}')
+
+        with open(ruta, 'rb') as archivo:
+            resultado = ImportacionExtractoService.importar(
+                archivo,
+                os.path.basename(ruta),
+                formato=options['formato'],
+                aplicar=not options['dry_run'],
+            )
+
+        if not resultado['success']:
+            raise CommandError(resultado['error'])
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('[DRY RUN] No se actualizó ningún pago.'))
+        self.stdout.write(f"Abonos leídos: {resultado['total']} en {resultado['segundos']} s")
+        self.stdout.write(self.style.SUCCESS(f"✓ Aplicados: {resultado['aplicados']}"))
+        if resultado['en_revision']:
+            self.stdout.write(self.style.WARNING(f"En revisión: {resultado['en_revision']}"))
+        if resultado['sin_coincidencia']:
+            self.stdout.write(self.style.WARNING(f"Sin coincidencia: {resultado['sin_coincidencia']}"))
+        if resultado['extracto']:
+            self.stdout.write(f"Revisa el extracto #{resultado['extracto'].pk} en Pagos > Estados de cuenta.")
@@ -0,0 +1,64 @@
+"""
+Comando de gestión para procesar exportaciones de pagos pendientes.
+
+Uso:
+    python manage.py procesar_exportaciones_pagos
+    python manage.py procesar_exportaciones_pagos --limite 5
+
+Pensado para ejecutarse desde cron cuando PAGOS_EXPORTACION_HILO está desactivado,
+o para recuperar trabajos que quedaron pendientes si el proceso web se reinició.
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from pagos.models import ExportacionPagos
+from pagos.exportacion import ExportacionPagosService
+
+
+class Command(BaseCommand):
+    help = 'Genera los archivos de las exportaciones de pagos pendientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limite',
+            type=int,
+            default=10,
+            help='Máximo de exportaciones a procesar (default: 10)',
+        )
+        parser.add_argument(
+            '--reintentar-atascadas',
+            type=int,
+            default=60,
+            metavar='MINUTOS',
+            help='Devuelve a pendiente las exportaciones en proceso hace más de MINUTOS (default: 60)',
+        )
+
+    def handle(self, *args, **options):
+        limite_atascadas = timezone.now() - timedelta(minutes=options['reintentar_atascadas'])
+        # Se mide desde que se reclamó el trabajo, no desde que se creó: uno que esperó
+        # en la cola y recién empezó no está atascado (sin fecha_inicio: trabajos anteriores)
+        atascadas = ExportacionPagos.objects.filter(
+            Q(fecha_inicio__lt=limite_atascadas) | Q(fecha_inicio__isnull=True, fecha_creacion__lt=limite_atascadas),
+            estado='procesando',
+        ).update(estado='pendiente')
+        if atascadas:
+            self.stdout.write(self.style.WARNING(f'Exportaciones atascadas reintentadas: {atascadas}'))
+
+        pendientes = list(
+            ExportacionPagos.objects.filter(estado='pendiente').order_by('fecha_creacion')[:options['limite']]
+        )
+        if not pendientes:
+            self.stdout.write(self.style.SUCCESS('✓ No hay exportaciones pendientes.'))
+            return
+
+        for exportacion in pendientes:
+            resultado = ExportacionPagosService.procesar(exportacion)
+            if resultado['success']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'✓ Exportación {exportacion.pk}: {resultado["filas"]} filas en {resultado["segundos"]:.2f}s'
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(
+                    f'✗ Exportación {exportacion.pk}: {resultado["error"]}'
+                ))
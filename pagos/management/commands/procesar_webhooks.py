@@ -0,0 +1,79 @@
+"""
+Comando de gestión para aplicar los eventos pendientes de la bandeja de webhooks.
+
+Uso:
+    python manage.py procesar_webhooks
+    python manage.py procesar_webhooks --lote 200
+    python manage.py procesar_webhooks --continuo --intervalo 5
+
+Sin --continuo procesa los pendientes en lotes hasta vaciar la bandeja (para cron).
+Con --continuo queda en ejecución como worker y revisa la bandeja cada INTERVALO segundos.
+"""
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from pagos.models import EventoWebhook
+from pagos.webhooks import BandejaWebhooks
+
+
+class Command(BaseCommand):
+    help = 'Aplica a transacciones y pagos los eventos pendientes de la bandeja de webhooks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=None,
+            help='Eventos por lote (default: PAGOS_WEBHOOK_LOTE)',
+        )
+        parser.add_argument(
+            '--continuo',
+            action='store_true',
+            help='Seguir en ejecución revisando la bandeja periódicamente',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=5,
+            help='Segundos de espera entre revisiones con --continuo (default: 5)',
+        )
+        parser.add_argument(
+            '--reintentar-atascados',
+            type=int,
+            default=30,
+            metavar='MINUTOS',
+            help='Devuelve a pendiente los eventos en proceso recibidos hace más de MINUTOS (default: 30)',
+        )
+
+    def handle(self, *args, **options):
+        limite_atascados = timezone.now() - timedelta(minutes=options['reintentar_atascados'])
+        atascados = EventoWebhook.objects.filter(
+            estado='procesando',
+            fecha_recepcion__lt=limite_atascados,
+        ).update(estado='pendiente')
+        if atascados:
+            self.stdout.write(self.style.WARNING(f'Eventos atascados reintentados: {atascados}'))
+
+        while True:
+            total = self._vaciar_bandeja(options['lote'])
+            if not options['continuo']:
+                if not total:
+                    self.stdout.write(self.style.SUCCESS('✓ No hay eventos pendientes.'))
+                return
+            time.sleep(options['intervalo'])
+
+    def _vaciar_bandeja(self, lote):
+        total = 0
+        while True:
+            resumen = BandejaWebhooks.procesar_pendientes(limite=lote)
+            procesados = sum(resumen.values())
+            if not procesados:
+                return total
+            total += procesados
+            detalle = ', '.join(f'{estado}: {cantidad}' for estado, cantidad in sorted(resumen.items()))
+            estilo = self.style.WARNING if resumen.get('fallido') or resumen.get('pendiente') else self.style.SUCCESS
+            self.stdout.write(estilo(f'✓ Lote de {procesados} evento(s) ({detalle})'))
+            if resumen.get('pendiente'):
+                # Hubo eventos que fallaron y volvieron a pendiente: reintentarlos en la siguiente ejecución
+                return total
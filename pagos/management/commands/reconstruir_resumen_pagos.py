@@ -0,0 +1,60 @@
+"""
+Comando de gestión para reconstruir el resumen mensual de pagos.
+
+Uso:
+    python manage.py reconstruir_resumen_pagos
+    python manage.py reconstruir_resumen_pagos --anio 2024
+    python manage.py reconstruir_resumen_pagos --verificar
+
+El resumen se mantiene de forma incremental; este comando lo recalcula desde los
+pagos (por ejemplo, después de cargas masivas o de forma periódica desde cron).
+"""
+from django.core.management.base import BaseCommand
+from pagos.models import Pago, ResumenMensualPagos
+from pagos.resumen import ResumenPagosService
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el resumen mensual de pagos usado por los reportes financieros'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--anio',
+            type=int,
+            help='Reconstruir solo el año indicado',
+        )
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Solo compara el resumen con los pagos y muestra las diferencias',
+        )
+
+    def handle(self, *args, **options):
+        anio = options.get('anio')
+
+        if options['verificar']:
+            pagos = Pago.objects.all()
+            resumen = ResumenMensualPagos.objects.all()
+            if anio:
+                pagos = pagos.filter(periodo_anio=anio)
+                resumen = resumen.filter(anio=anio)
+            esperado = ResumenPagosService.agrupar(pagos)
+            actual = {
+                (r.anio, r.mes, r.estado, r.metodo_pago): (r.cantidad, r.monto)
+                for r in resumen if r.cantidad or r.monto
+            }
+            diferencias = sorted(
+                clave for clave in set(esperado) | set(actual)
+                if esperado.get(clave) != actual.get(clave)
+            )
+            if not diferencias:
+                self.stdout.write(self.style.SUCCESS('✓ El resumen coincide con los pagos.'))
+                return
+            self.stdout.write(self.style.WARNING(f'Diferencias encontradas: {len(diferencias)}'))
+            for clave in diferencias[:20]:
+                self.stdout.write(f'  {clave}: esperado {esperado.get(clave)} / resumen {actual.get(clave)}')
+            return
+
+        filas = ResumenPagosService.reconstruir(anio=anio)
+        alcance = f'del año {anio}' if anio else 'completo'
+        self.stdout.write(self.style.SUCCESS(f'✓ Resumen {alcance} reconstruido: {filas} fila(s).'))
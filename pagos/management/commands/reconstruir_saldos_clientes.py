@@ -0,0 +1,47 @@
+"""
+Comando de gestión para reconstruir el saldo por cliente.
+
+Uso:
+    python manage.py reconstruir_saldos_clientes
+    python manage.py reconstruir_saldos_clientes --verificar
+
+El saldo se recalcula al cambiar los pagos de cada cliente; este comando debe
+ejecutarse cada noche desde cron para mover los montos vencidos entre los rangos
+de antigüedad y corregir cualquier diferencia.
+"""
+from django.core.management.base import BaseCommand
+from pagos.saldos import SaldosClienteService
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el saldo y la antigüedad de la deuda de cada cliente'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Solo compara los saldos con los pagos y muestra las diferencias',
+        )
+
+    def handle(self, *args, **options):
+        if options['verificar']:
+            diferencias = SaldosClienteService.verificar()
+            if not diferencias:
+                self.stdout.write(self.style.SUCCESS('✓ Los saldos coinciden con los pagos.'))
+                return
+            clientes = {diferencia['cliente_id'] for diferencia in diferencias}
+            self.stdout.write(self.style.WARNING(
+                f'Diferencias encontradas: {len(diferencias)} en {len(clientes)} cliente(s)'
+            ))
+            for diferencia in diferencias[:20]:
+                if diferencia['campo'] == '*':
+                    self.stdout.write(f"  Cliente {diferencia['cliente_id']}: sin saldo")
+                else:
+                    self.stdout.write(
+                        f"  Cliente {diferencia['cliente_id']} {diferencia['campo']}: "
+                        f"guardado {diferencia['guardado']} / calculado {diferencia['calculado']}"
+                    )
+            return
+
+        guardados = SaldosClienteService.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f'✓ Saldos reconstruidos: {guardados} cliente(s).'))
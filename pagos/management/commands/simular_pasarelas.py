@@ -0,0 +1,75 @@
+"""
+Comando de gestión para levantar el simulador local de pasarelas de pago.
+
+Uso:
+    python manage.py simular_pasarelas
+    python manage.py simular_pasarelas --puerto 8765 --latencia-ms 50 200 --tasa-errores 0.02
+
+Con el simulador en marcha, arranca la aplicación apuntando a él (ver las variables
+que imprime el comando) y paga una sesión con:
+    curl -X POST http://127.0.0.1:8765/_simulador/pagar/<id de la sesión o preferencia>
+El simulador envía el webhook firmado a SITE_URL, como lo haría la pasarela.
+"""
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+from pagos.simulador import SimuladorPasarelas
+
+
+class Command(BaseCommand):
+    help = 'Levanta un simulador HTTP de Stripe, Mercado Pago y PayPal para desarrollo y pruebas de carga'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Dirección de escucha (default: 127.0.0.1)')
+        parser.add_argument('--puerto', type=int, default=8765, help='Puerto (default: 8765)')
+        parser.add_argument(
+            '--latencia-ms', type=float, nargs=2, default=[0, 0], metavar=('MIN', 'MAX'),
+            help='Latencia añadida a cada petición en ms (default: 0 0)',
+        )
+        parser.add_argument('--tasa-errores', type=float, default=0.0, help='Fracción de respuestas 503 (default: 0)')
+        parser.add_argument(
+            '--tasa-duplicados', type=float, default=0.0, help='Fracción de webhooks enviados dos veces (default: 0)',
+        )
+        parser.add_argument(
+            '--retraso-webhook-ms', type=float, default=0, help='Espera entre el pago y el webhook (default: 0)',
+        )
+        parser.add_argument(
+            '--url-app', default=None,
+            help='URL base de la aplicación que recibe los webhooks (default: SITE_URL)',
+        )
+
+    def handle(self, *args, **options):
+        url_app = (options['url_app'] or settings.SITE_URL).rstrip('/')
+        simulador = SimuladorPasarelas(
+            host=options['host'],
+            puerto=options['puerto'],
+            latencia_ms=tuple(options['latencia_ms']),
+            tasa_errores=options['tasa_errores'],
+            url_webhooks={
+                'stripe': url_app + reverse('pagos:webhook_stripe'),
+                'mercadopago': url_app + reverse('pagos:webhook_mercadopago'),
+            },
+            retraso_webhook_ms=options['retraso_webhook_ms'],
+            tasa_duplicados=options['tasa_duplicados'],
+            secreto_stripe=getattr(settings, 'STRIPE_WEBHOOK_SECRET', '') or 'whsec_simulador',
+            secreto_mercadopago=getattr(settings, 'MERCADOPAGO_WEBHOOK_SECRET', '') or 'mercadopago_simulador',
+        )
+        with simulador:
+            self.stdout.write(self.style.SUCCESS(f'✓ Simulador de pasarelas escuchando en {simulador.url}'))
+            self.stdout.write('Configura la aplicación con:')
+            for variable in ('STRIPE_API_URL', 'MERCADOPAGO_API_URL', 'PAYPAL_API_URL'):
+                self.stdout.write(f'  {variable}={simulador.url}')
+            self.stdout.write(f'  STRIPE_WEBHOOK_SECRET={simulador.secreto_stripe}')
+            self.stdout.write(f'  MERCADOPAGO_WEBHOOK_SECRET={simulador.secreto_mercadopago}')
+            self.stdout.write(f'Webhooks hacia {url_app}. Ctrl+C para detener.')
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                self.stdout.write('')
+        estadisticas = simulador.estadisticas()
+        self.stdout.write(
+            f"Peticiones atendidas: {sum(estadisticas['peticiones'].values())}  "
+            f"webhooks enviados: {estadisticas['webhooks']['enviados']}  fallidos: {estadisticas['webhooks']['fallidos']}"
+        )
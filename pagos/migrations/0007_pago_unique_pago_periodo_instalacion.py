@@ -0,0 +1,50 @@
+from django.db import migrations, models
+
+
+def cancelar_pagos_duplicados(apps, schema_editor):
+    """
+    Cancela los pagos duplicados por (cliente, instalación, período) antes de
+    crear la restricción única. Se conserva el pago pagado (o el más antiguo)
+    y el resto queda como cancelado con una nota, sin borrar información.
+    """
+    Pago = apps.get_model('pagos', 'Pago')
+
+    pagos = Pago.objects.filter(
+        instalacion__isnull=False,
+        estado__in=['pendiente', 'pagado', 'vencido'],
+    ).order_by('cliente_id', 'instalacion_id', 'periodo_anio', 'periodo_mes', 'id').values_list(
+        'id', 'cliente_id', 'instalacion_id', 'periodo_anio', 'periodo_mes', 'estado'
+    )
+
+    grupos = {}
+    for pago_id, cliente_id, instalacion_id, anio, mes, estado in pagos.iterator():
+        grupos.setdefault((cliente_id, instalacion_id, anio, mes), []).append((pago_id, estado))
+
+    duplicados = []
+    for filas in grupos.values():
+        if len(filas) < 2:
+            continue
+        pagados = [pago_id for pago_id, estado in filas if estado == 'pagado']
+        conservar = pagados[0] if pagados else filas[0][0]
+        duplicados.extend(pago_id for pago_id, _ in filas if pago_id != conservar)
+
+    if duplicados:
+        Pago.objects.filter(id__in=duplicados).update(
+            estado='cancelado',
+            notas='Cancelado automáticamente: pago duplicado para el mismo período.',
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagos', '0006_remove_pago_unique_periodo_por_cliente_instalacion_activo_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(cancelar_pagos_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='pago',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado__in', ['pendiente', 'pagado', 'vencido']), ('instalacion__isnull', False)), fields=('cliente', 'instalacion', 'periodo_mes', 'periodo_anio'), name='unique_pago_periodo_instalacion'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagos', '0007_pago_unique_pago_periodo_instalacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportacionPagos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('formato', models.CharField(choices=[('excel', 'Excel'), ('pdf', 'PDF')], max_length=10, verbose_name='Formato')),
+                ('parametros', models.JSONField(blank=True, default=dict, help_text='Filtros del listado de pagos aplicados a la exportación', verbose_name='Parámetros')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completada', 'Completada'), ('fallida', 'Fallida')], default='pendiente', max_length=20, verbose_name='Estado')),
+                ('archivo', models.FileField(blank=True, upload_to='exportaciones/pagos/', verbose_name='Archivo')),
+                ('total_filas', models.PositiveIntegerField(default=0, verbose_name='Filas exportadas')),
+                ('mensaje_error', models.TextField(blank=True, null=True, verbose_name='Mensaje de error')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('fecha_completada', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de completación')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='exportaciones_pagos', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Exportación de Pagos',
+                'verbose_name_plural': 'Exportaciones de Pagos',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['estado', 'fecha_creacion'], name='pagos_expor_estado_eba5ae_idx')],
+            },
+        ),
+    ]
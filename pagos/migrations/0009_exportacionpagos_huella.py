@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagos', '0008_exportacionpagos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportacionpagos',
+            name='huella',
+            field=models.CharField(blank=True, db_index=True, help_text='Formato, filtros y versión de datos; permite reutilizar el archivo generado', max_length=64, verbose_name='Huella'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:48
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def poblar_resumen(apps, schema_editor):
+    """Construye el resumen mensual a partir de los pagos existentes."""
+    Pago = apps.get_model('pagos', 'Pago')
+    ResumenMensualPagos = apps.get_model('pagos', 'ResumenMensualPagos')
+    grupos = Pago.objects.order_by().values(
+        'periodo_anio', 'periodo_mes', 'estado', 'metodo_pago'
+    ).annotate(total_cantidad=Count('pk'), total_monto=Sum('monto'))
+
+    # NULL y '' en metodo_pago comparten la fila "sin método"
+    resumen = {}
+    for g in grupos:
+        clave = (g['periodo_anio'], g['periodo_mes'], g['estado'], g['metodo_pago'] or '')
+        cantidad, monto = resumen.get(clave, (0, 0))
+        resumen[clave] = (cantidad + g['total_cantidad'], monto + (g['total_monto'] or 0))
+
+    ResumenMensualPagos.objects.bulk_create([
+        ResumenMensualPagos(
+            anio=anio, mes=mes, estado=estado, metodo_pago=metodo,
+            cantidad=cantidad, monto=monto,
+        )
+        for (anio, mes, estado, metodo), (cantidad, monto) in resumen.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagos', '0009_exportacionpagos_huella'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenMensualPagos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anio', models.IntegerField(verbose_name='Año')),
+                ('mes', models.IntegerField(verbose_name='Mes')),
+                ('estado', models.CharField(max_length=20, verbose_name='Estado')),
+                ('metodo_pago', models.CharField(blank=True, default='', help_text='Vacío para pagos sin método registrado', max_length=20, verbose_name='Método de pago')),
+                ('cantidad', models.IntegerField(default=0, verbose_name='Cantidad de pagos')),
+                ('monto', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Monto total')),
+            ],
+            options={
+                'verbose_name': 'Resumen Mensual de Pagos',
+                'verbose_name_plural': 'Resúmenes Mensuales de Pagos',
+                'ordering': ['anio', 'mes', 'estado', 'metodo_pago'],
+                'constraints': [models.UniqueConstraint(fields=('anio', 'mes', 'estado', 'metodo_pago'), name='unique_resumen_mensual_pagos')],
+            },
+        ),
+        migrations.RunPython(poblar_resumen, migrations.RunPython.noop),
+    ]
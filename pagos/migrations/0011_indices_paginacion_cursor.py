@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0014_indices_paginacion_cursor'),
+        ('instalaciones', '0011_indices_paginacion_cursor'),
+        ('pagos', '0010_resumenmensualpagos'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='pago',
+            name='pagos_pago_fecha_v_9d409c_idx',
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['fecha_vencimiento', 'id'], name='pagos_pago_fecha_v_68ed16_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['fecha_registro', 'id'], name='pagos_pago_fecha_r_ad72c9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['monto', 'id'], name='pagos_pago_monto_76887f_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagos', '0011_indices_paginacion_cursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoWebhook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pasarela', models.CharField(choices=[('stripe', 'Stripe'), ('mercadopago', 'Mercado Pago'), ('paypal', 'PayPal'), ('conekta', 'Conekta')], max_length=20, verbose_name='Pasarela de pago')),
+                ('id_evento', models.CharField(help_text='ID del evento o notificación en la pasarela', max_length=200, verbose_name='ID del evento')),
+                ('tipo', models.CharField(blank=True, max_length=100, verbose_name='Tipo de evento')),
+                ('datos', models.JSONField(blank=True, default=dict, verbose_name='Datos del evento')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('procesado', 'Procesado'), ('ignorado', 'Ignorado'), ('fallido', 'Fallido')], default='pendiente', max_length=20, verbose_name='Estado')),
+                ('intentos', models.PositiveIntegerField(default=0, verbose_name='Intentos')),
+                ('resultado', models.TextField(blank=True, null=True, verbose_name='Resultado o error')),
+                ('fecha_recepcion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de recepción')),
+                ('fecha_procesado', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de procesamiento')),
+            ],
+            options={
+                'verbose_name': 'Evento de Webhook',
+                'verbose_name_plural': 'Eventos de Webhook',
+                'ordering': ['-fecha_recepcion'],
+                'indexes': [models.Index(fields=['estado', 'fecha_recepcion'], name='pagos_event_estado_f69c7c_idx')],
+                'constraints': [models.UniqueConstraint(fields=('pasarela', 'id_evento'), name='unique_evento_webhook')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0014_indices_paginacion_cursor'),
+        ('pagos', '0012_eventowebhook'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientePasarela',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pasarela', models.CharField(choices=[('stripe', 'Stripe'), ('mercadopago', 'Mercado Pago'), ('paypal', 'PayPal'), ('conekta', 'Conekta')], max_length=20, verbose_name='Pasarela de pago')),
+                ('id_cliente_pasarela', models.CharField(help_text='ID del cliente en la pasarela de pago (ej. cus_... en Stripe)', max_length=200, verbose_name='ID del cliente (pasarela)')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='clientes_pasarela', to='clientes.cliente', verbose_name='Cliente')),
+            ],
+            options={
+                'verbose_name': 'Cliente en Pasarela',
+                'verbose_name_plural': 'Clientes en Pasarelas',
+                'constraints': [models.UniqueConstraint(fields=('cliente', 'pasarela'), name='unique_cliente_pasarela')],
+            },
+        ),
+    ]
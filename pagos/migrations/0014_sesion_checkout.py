@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagos', '0013_clientepasarela'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaccionpago',
+            name='fecha_expiracion',
+            field=models.DateTimeField(blank=True, help_text='Hasta cuándo se puede reutilizar la sesión de checkout', null=True, verbose_name='Vigencia de la sesión'),
+        ),
+        migrations.AddField(
+            model_name='transaccionpago',
+            name='url_checkout',
+            field=models.URLField(blank=True, help_text='URL de la pasarela a la que se redirige al cliente para pagar', max_length=500, null=True, verbose_name='URL de checkout'),
+        ),
+        migrations.AddIndex(
+            model_name='transaccionpago',
+            index=models.Index(fields=['estado', 'fecha_expiracion'], name='pagos_trans_estado_ab3972_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagos', '0014_sesion_checkout'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractoBancario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre_archivo', models.CharField(max_length=255, verbose_name='Archivo')),
+                ('formato', models.CharField(choices=[('csv', 'CSV'), ('ofx', 'OFX'), ('excel', 'Excel')], max_length=10, verbose_name='Formato')),
+                ('huella', models.CharField(db_index=True, help_text='SHA-256 del archivo; evita importar dos veces el mismo estado de cuenta', max_length=64, verbose_name='Huella')),
+                ('total_lineas', models.PositiveIntegerField(default=0, verbose_name='Abonos leídos')),
+                ('aplicados', models.PositiveIntegerField(default=0, verbose_name='Aplicados')),
+                ('en_revision', models.PositiveIntegerField(default=0, verbose_name='En revisión')),
+                ('sin_coincidencia', models.PositiveIntegerField(default=0, verbose_name='Sin coincidencia')),
+                ('segundos', models.FloatField(default=0, verbose_name='Duración (s)')),
+                ('fecha_importacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de importación')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='extractos_bancarios', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Extracto Bancario',
+                'verbose_name_plural': 'Extractos Bancarios',
+                'ordering': ['-fecha_importacion'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoBancario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('linea', models.PositiveIntegerField(verbose_name='Línea')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Monto')),
+                ('referencia', models.CharField(blank=True, max_length=100, verbose_name='Referencia')),
+                ('descripcion', models.CharField(blank=True, max_length=255, verbose_name='Descripción')),
+                ('estado', models.CharField(choices=[('aplicado', 'Aplicado'), ('revision', 'En revisión'), ('sin_coincidencia', 'Sin coincidencia'), ('descartado', 'Descartado')], max_length=20, verbose_name='Estado')),
+                ('criterio', models.CharField(blank=True, choices=[('referencia', 'Referencia de pago'), ('patron', 'Número de pago en el concepto'), ('telefono', 'Teléfono del cliente'), ('monto_fecha', 'Monto y fecha'), ('manual', 'Manual')], max_length=20, verbose_name='Criterio')),
+                ('candidatos', models.JSONField(blank=True, default=list, help_text='IDs de los pagos que podrían corresponder al movimiento (cola de revisión)', verbose_name='Pagos candidatos')),
+                ('extracto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos', to='pagos.extractobancario', verbose_name='Extracto')),
+                ('pago', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_bancarios', to='pagos.pago', verbose_name='Pago')),
+            ],
+            options={
+                'verbose_name': 'Movimiento Bancario',
+                'verbose_name_plural': 'Movimientos Bancarios',
+                'ordering': ['extracto', 'linea'],
+                'indexes': [models.Index(fields=['extracto', 'estado', 'linea'], name='pagos_movim_extract_8b2a07_idx'), models.Index(fields=['estado', 'id'], name='pagos_movim_estado_d300ec_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagos', '0015_extractos_bancarios'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoteCobranza',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cobrador', models.CharField(blank=True, max_length=100, verbose_name='Cobrador')),
+                ('origen', models.CharField(choices=[('pantalla', 'Pantalla de captura'), ('api', 'API'), ('admin', 'Administración')], default='pantalla', max_length=10, verbose_name='Origen')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Recibos')),
+                ('aplicados', models.PositiveIntegerField(default=0, verbose_name='Aplicados')),
+                ('rechazados', models.PositiveIntegerField(default=0, verbose_name='Rechazados')),
+                ('monto_aplicado', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Monto aplicado')),
+                ('segundos', models.FloatField(default=0, verbose_name='Duración (s)')),
+                ('fecha_captura', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de captura')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lotes_cobranza', to=settings.AUTH_USER_MODEL, verbose_name='Capturado por')),
+            ],
+            options={
+                'verbose_name': 'Lote de Cobranza',
+                'verbose_name_plural': 'Lotes de Cobranza',
+                'ordering': ['-fecha_captura'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CobroCapturado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('linea', models.PositiveIntegerField(verbose_name='Línea')),
+                ('contrato', models.CharField(blank=True, max_length=50, verbose_name='Contrato')),
+                ('monto', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Monto')),
+                ('metodo_pago', models.CharField(blank=True, max_length=20, verbose_name='Método de pago')),
+                ('referencia', models.CharField(blank=True, max_length=100, verbose_name='Referencia')),
+                ('fecha_pago', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de pago')),
+                ('resultado', models.CharField(choices=[('aplicado', 'Aplicado'), ('rechazado', 'Rechazado')], max_length=10, verbose_name='Resultado')),
+                ('error', models.CharField(blank=True, max_length=255, verbose_name='Motivo del rechazo')),
+                ('pago', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cobros_capturados', to='pagos.pago', verbose_name='Pago')),
+                ('lote', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cobros', to='pagos.lotecobranza', verbose_name='Lote')),
+            ],
+            options={
+                'verbose_name': 'Cobro Capturado',
+                'verbose_name_plural': 'Cobros Capturados',
+                'ordering': ['lote', 'linea'],
+            },
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:31
+
+from datetime import timedelta
+from decimal import Decimal
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def poblar_saldos(apps, schema_editor):
+    """Calcula el saldo de cada cliente a partir de sus pagos (misma lógica que pagos/saldos.py)."""
+    Cliente = apps.get_model('clientes', 'Cliente')
+    Pago = apps.get_model('pagos', 'Pago')
+    SaldoCliente = apps.get_model('pagos', 'SaldoCliente')
+    hoy = timezone.now().date()
+    abierto = Q(estado__in=['pendiente', 'vencido'])
+    vencido = Q(estado='vencido') | Q(estado='pendiente', fecha_vencimiento__lt=hoy)
+    cero = Decimal('0')
+    rangos = {
+        'monto_0_30': Q(fecha_vencimiento__gte=hoy - timedelta(days=30)),
+        'monto_31_60': Q(fecha_vencimiento__lt=hoy - timedelta(days=30), fecha_vencimiento__gte=hoy - timedelta(days=60)),
+        'monto_61_90': Q(fecha_vencimiento__lt=hoy - timedelta(days=60), fecha_vencimiento__gte=hoy - timedelta(days=90)),
+        'monto_90_mas': Q(fecha_vencimiento__lt=hoy - timedelta(days=90)),
+    }
+    filas = Pago.objects.order_by().values('cliente_id').annotate(
+        pagos_pendientes=Count('pk', filter=abierto),
+        monto_pendiente=Coalesce(Sum('monto', filter=abierto), cero),
+        pagos_vencidos=Count('pk', filter=vencido),
+        monto_vencido=Coalesce(Sum('monto', filter=vencido), cero),
+        vencimiento_mas_antiguo=Min('fecha_vencimiento', filter=abierto),
+        ultimo_pago=Max('fecha_pago', filter=Q(estado='pagado')),
+        **{campo: Coalesce(Sum('monto', filter=vencido & rango), cero) for campo, rango in rangos.items()},
+    )
+    saldos = {cliente_id: SaldoCliente(cliente_id=cliente_id, fecha_corte=hoy)
+              for cliente_id in Cliente.objects.values_list('pk', flat=True)}
+    for fila in filas:
+        saldo = saldos.get(fila.pop('cliente_id'))
+        if saldo is not None:
+            for campo, valor in fila.items():
+                setattr(saldo, campo, valor)
+    SaldoCliente.objects.bulk_create(saldos.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0014_indices_paginacion_cursor'),
+        ('pagos', '0016_lotes_cobranza'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoCliente',
+            fields=[
+                ('cliente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='saldo', serialize=False, to='clientes.cliente', verbose_name='Cliente')),
+                ('pagos_pendientes', models.PositiveIntegerField(default=0, verbose_name='Pagos sin pagar')),
+                ('monto_pendiente', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Saldo pendiente')),
+                ('pagos_vencidos', models.PositiveIntegerField(default=0, verbose_name='Pagos vencidos')),
+                ('monto_vencido', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Saldo vencido')),
+                ('monto_0_30', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Vencido 0-30 días')),
+                ('monto_31_60', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Vencido 31-60 días')),
+                ('monto_61_90', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Vencido 61-90 días')),
+                ('monto_90_mas', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Vencido más de 90 días')),
+                ('vencimiento_mas_antiguo', models.DateField(blank=True, null=True, verbose_name='Vencimiento más antiguo sin pagar')),
+                ('ultimo_pago', models.DateTimeField(blank=True, null=True, verbose_name='Último pago')),
+                ('fecha_corte', models.DateField(verbose_name='Fecha de corte')),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True, verbose_name='Actualizado')),
+            ],
+            options={
+                'verbose_name': 'Saldo de Cliente',
+                'verbose_name_plural': 'Saldos de Clientes',
+                'indexes': [models.Index(fields=['-monto_vencido'], name='pagos_saldo_monto_v_ca0214_idx'), models.Index(fields=['vencimiento_mas_antiguo'], name='pagos_saldo_vencimi_00ec65_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_saldos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagos', '0017_saldos_clientes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportacionpagos',
+            name='fecha_inicio',
+            field=models.DateTimeField(blank=True, help_text='Cuándo un proceso reclamó el trabajo; sirve para detectar los atascados', null=True, verbose_name='Inicio del procesamiento'),
+        ),
+    ]
@@ -1,8 +1,10 @@
 from django.db import models
+from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from clientes.models import Cliente
 from instalaciones.models import Instalacion
+from .vencimientos import VencimientoPagos
 
 
 class Pago(models.Model):
@@ -107,10 +109,25 @@ class Pago(models.Model):
         ordering = ['-fecha_vencimiento', '-fecha_registro']
         indexes = [
             models.Index(fields=['cliente', 'estado']),
-            models.Index(fields=['fecha_vencimiento']),
             models.Index(fields=['periodo_anio', 'periodo_mes']),
+            # Órdenes del listado con paginación por cursor (ver pagos/filtros.py)
+            models.Index(fields=['fecha_vencimiento', 'id']),
+            models.Index(fields=['fecha_registro', 'id']),
+            models.Index(fields=['monto', 'id']),
         ]
-    
+        constraints = [
+            # Un solo pago activo por instalación y período; respalda la generación
+            # masiva idempotente (ver GeneradorPagosService).
+            models.UniqueConstraint(
+                fields=['cliente', 'instalacion', 'periodo_mes', 'periodo_anio'],
+                condition=models.Q(
+                    instalacion__isnull=False,
+                    estado__in=['pendiente', 'pagado', 'vencido'],
+                ),
+                name='unique_pago_periodo_instalacion',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.cliente.nombre_completo} - ${self.monto} - {self.get_estado_display()}"
     
@@ -140,20 +157,13 @@ class Pago(models.Model):
     
     def save(self, *args, **kwargs):
         """Actualiza el estado a vencido si corresponde."""
-        if self.estado == 'pendiente' and self.fecha_vencimiento < timezone.now().date():
-            self.estado = 'vencido'
+        self.estado = VencimientoPagos.estado_para(self.estado, self.fecha_vencimiento)
         super().save(*args, **kwargs)
     
     @classmethod
     def actualizar_pagos_vencidos(cls):
         """Marca automáticamente como vencidos todos los pagos pendientes cuya fecha de vencimiento ya pasó."""
-        hoy = timezone.now().date()
-        pagos_vencidos = cls.objects.filter(
-            estado='pendiente',
-            fecha_vencimiento__lt=hoy
-        )
-        cantidad = pagos_vencidos.update(estado='vencido')
-        return cantidad
+        return VencimientoPagos.barrer(forzar=True) or 0
 
 
 class PlanPago(models.Model):
@@ -294,6 +304,21 @@ class TransaccionPago(models.Model):
         help_text='Mensaje de error si la transacción falló'
     )
     
+    # Sesión de checkout (se reutiliza mientras siga pendiente y vigente)
+    url_checkout = models.URLField(
+        max_length=500,
+        blank=True,
+        null=True,
+        verbose_name='URL de checkout',
+        help_text='URL de la pasarela a la que se redirige al cliente para pagar'
+    )
+    fecha_expiracion = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Vigencia de la sesión',
+        help_text='Hasta cuándo se puede reutilizar la sesión de checkout'
+    )
+    
     # Fechas
     fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
     fecha_actualizacion = models.DateTimeField(auto_now=True, verbose_name='Última actualización')
@@ -311,6 +336,7 @@ class TransaccionPago(models.Model):
             models.Index(fields=['pago', 'estado']),
             models.Index(fields=['id_transaccion_pasarela']),
             models.Index(fields=['fecha_creacion']),
+            models.Index(fields=['estado', 'fecha_expiracion']),
         ]
     
     def __str__(self):
@@ -345,3 +371,451 @@ class TransaccionPago(models.Model):
         """Marca la transacción como reembolsada."""
         self.estado = 'reembolsada'
         self.save()
+
+
+
+class ClientePasarela(models.Model):
+    """
+    ID de un cliente en una pasarela de pago (ej. el Customer de Stripe).
+
+    Se crea la primera vez que el cliente paga por la pasarela, o por adelantado con
+    el comando `aprovisionar_clientes_pasarela`, y se reutiliza en los siguientes
+    pagos (ver pagos/clientes_pasarela.py).
+    """
+
+    cliente = models.ForeignKey(
+        Cliente,
+        on_delete=models.CASCADE,
+        related_name='clientes_pasarela',
+        verbose_name='Cliente'
+    )
+    pasarela = models.CharField(
+        max_length=20,
+        choices=TransaccionPago.PASARELA_CHOICES,
+        verbose_name='Pasarela de pago'
+    )
+    id_cliente_pasarela = models.CharField(
+        max_length=200,
+        verbose_name='ID del cliente (pasarela)',
+        help_text='ID del cliente en la pasarela de pago (ej. cus_... en Stripe)'
+    )
+    fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
+
+    class Meta:
+        verbose_name = 'Cliente en Pasarela'
+        verbose_name_plural = 'Clientes en Pasarelas'
+        constraints = [
+            models.UniqueConstraint(fields=['cliente', 'pasarela'], name='unique_cliente_pasarela'),
+        ]
+
+    def __str__(self):
+        return f"{self.cliente} - {self.get_pasarela_display()}: {self.id_cliente_pasarela}"
+
+class ExportacionPagos(models.Model):
+    """
+    Trabajo de exportación de pagos en segundo plano.
+
+    Las exportaciones que superan el límite síncrono se generan fuera del ciclo
+    de la petición, el archivo se guarda en MEDIA_ROOT y se avisa al usuario.
+    """
+
+    FORMATO_CHOICES = [
+        ('excel', 'Excel'),
+        ('pdf', 'PDF'),
+    ]
+
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('completada', 'Completada'),
+        ('fallida', 'Fallida'),
+    ]
+
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='exportaciones_pagos',
+        verbose_name='Usuario'
+    )
+    formato = models.CharField(max_length=10, choices=FORMATO_CHOICES, verbose_name='Formato')
+    parametros = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Parámetros',
+        help_text='Filtros del listado de pagos aplicados a la exportación'
+    )
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADO_CHOICES,
+        default='pendiente',
+        verbose_name='Estado'
+    )
+    archivo = models.FileField(
+        upload_to='exportaciones/pagos/',
+        blank=True,
+        verbose_name='Archivo'
+    )
+    huella = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        verbose_name='Huella',
+        help_text='Formato, filtros y versión de datos; permite reutilizar el archivo generado'
+    )
+    total_filas = models.PositiveIntegerField(default=0, verbose_name='Filas exportadas')
+    mensaje_error = models.TextField(blank=True, null=True, verbose_name='Mensaje de error')
+    fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
+    fecha_inicio = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Inicio del procesamiento',
+        help_text='Cuándo un proceso reclamó el trabajo; sirve para detectar los atascados'
+    )
+    fecha_completada = models.DateTimeField(blank=True, null=True, verbose_name='Fecha de completación')
+
+    class Meta:
+        verbose_name = 'Exportación de Pagos'
+        verbose_name_plural = 'Exportaciones de Pagos'
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_formato_display()} - {self.get_estado_display()} - {self.fecha_creacion:%d/%m/%Y %H:%M}"
+
+
+class ResumenMensualPagos(models.Model):
+    """
+    Resumen materializado de pagos por período, estado y método de pago.
+
+    Se mantiene de forma incremental al crear, modificar o eliminar pagos
+    (ver pagos/resumen.py) y se puede reconstruir con el comando
+    `reconstruir_resumen_pagos`. Los reportes financieros leen de esta tabla.
+    """
+
+    anio = models.IntegerField(verbose_name='Año')
+    mes = models.IntegerField(verbose_name='Mes')
+    estado = models.CharField(max_length=20, verbose_name='Estado')
+    metodo_pago = models.CharField(
+        max_length=20,
+        blank=True,
+        default='',
+        verbose_name='Método de pago',
+        help_text='Vacío para pagos sin método registrado'
+    )
+    cantidad = models.IntegerField(default=0, verbose_name='Cantidad de pagos')
+    monto = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Monto total')
+
+    class Meta:
+        verbose_name = 'Resumen Mensual de Pagos'
+        verbose_name_plural = 'Resúmenes Mensuales de Pagos'
+        ordering = ['anio', 'mes', 'estado', 'metodo_pago']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['anio', 'mes', 'estado', 'metodo_pago'],
+                name='unique_resumen_mensual_pagos',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.mes}/{self.anio} - {self.estado} - {self.metodo_pago or 'sin método'}: {self.cantidad} (${self.monto})"
+
+
+class EventoWebhook(models.Model):
+    """
+    Evento recibido de una pasarela de pago (bandeja de entrada de webhooks).
+
+    El endpoint solo verifica la firma, guarda el evento y responde 200; los
+    eventos se aplican después en lotes (ver pagos/webhooks.py). La restricción
+    única (pasarela, id_evento) descarta los reintentos de la pasarela.
+    """
+
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('procesado', 'Procesado'),
+        ('ignorado', 'Ignorado'),
+        ('fallido', 'Fallido'),
+    ]
+
+    pasarela = models.CharField(
+        max_length=20,
+        choices=TransaccionPago.PASARELA_CHOICES,
+        verbose_name='Pasarela de pago'
+    )
+    id_evento = models.CharField(
+        max_length=200,
+        verbose_name='ID del evento',
+        help_text='ID del evento o notificación en la pasarela'
+    )
+    tipo = models.CharField(max_length=100, blank=True, verbose_name='Tipo de evento')
+    datos = models.JSONField(default=dict, blank=True, verbose_name='Datos del evento')
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADO_CHOICES,
+        default='pendiente',
+        verbose_name='Estado'
+    )
+    intentos = models.PositiveIntegerField(default=0, verbose_name='Intentos')
+    resultado = models.TextField(blank=True, null=True, verbose_name='Resultado o error')
+    fecha_recepcion = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de recepción')
+    fecha_procesado = models.DateTimeField(blank=True, null=True, verbose_name='Fecha de procesamiento')
+
+    class Meta:
+        verbose_name = 'Evento de Webhook'
+        verbose_name_plural = 'Eventos de Webhook'
+        ordering = ['-fecha_recepcion']
+        constraints = [
+            models.UniqueConstraint(fields=['pasarela', 'id_evento'], name='unique_evento_webhook'),
+        ]
+        indexes = [
+            models.Index(fields=['estado', 'fecha_recepcion']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_pasarela_display()} {self.tipo} ({self.id_evento}) - {self.get_estado_display()}"
+
+
+class ExtractoBancario(models.Model):
+    """
+    Estado de cuenta bancario importado para conciliar pagos en efectivo y transferencias.
+
+    Cada abono se guarda como MovimientoBancario: los que coinciden con un pago
+    abierto sin ambigüedad se aplican al importar; los demás quedan en la cola de
+    revisión (ver pagos/extractos.py).
+    """
+
+    FORMATO_CHOICES = [
+        ('csv', 'CSV'),
+        ('ofx', 'OFX'),
+        ('excel', 'Excel'),
+    ]
+
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='extractos_bancarios',
+        verbose_name='Usuario'
+    )
+    nombre_archivo = models.CharField(max_length=255, verbose_name='Archivo')
+    formato = models.CharField(max_length=10, choices=FORMATO_CHOICES, verbose_name='Formato')
+    huella = models.CharField(
+        max_length=64,
+        db_index=True,
+        verbose_name='Huella',
+        help_text='SHA-256 del archivo; evita importar dos veces el mismo estado de cuenta'
+    )
+    total_lineas = models.PositiveIntegerField(default=0, verbose_name='Abonos leídos')
+    aplicados = models.PositiveIntegerField(default=0, verbose_name='Aplicados')
+    en_revision = models.PositiveIntegerField(default=0, verbose_name='En revisión')
+    sin_coincidencia = models.PositiveIntegerField(default=0, verbose_name='Sin coincidencia')
+    segundos = models.FloatField(default=0, verbose_name='Duración (s)')
+    fecha_importacion = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de importación')
+
+    class Meta:
+        verbose_name = 'Extracto Bancario'
+        verbose_name_plural = 'Extractos Bancarios'
+        ordering = ['-fecha_importacion']
+
+    def __str__(self):
+        return f"{self.nombre_archivo} - {self.fecha_importacion:%d/%m/%Y %H:%M}"
+
+
+class MovimientoBancario(models.Model):
+    """Abono de un estado de cuenta y su coincidencia con un pago."""
+
+    ESTADO_CHOICES = [
+        ('aplicado', 'Aplicado'),
+        ('revision', 'En revisión'),
+        ('sin_coincidencia', 'Sin coincidencia'),
+        ('descartado', 'Descartado'),
+    ]
+
+    CRITERIO_CHOICES = [
+        ('referencia', 'Referencia de pago'),
+        ('patron', 'Número de pago en el concepto'),
+        ('telefono', 'Teléfono del cliente'),
+        ('monto_fecha', 'Monto y fecha'),
+        ('manual', 'Manual'),
+    ]
+
+    extracto = models.ForeignKey(
+        ExtractoBancario,
+        on_delete=models.CASCADE,
+        related_name='movimientos',
+        verbose_name='Extracto'
+    )
+    linea = models.PositiveIntegerField(verbose_name='Línea')
+    fecha = models.DateField(verbose_name='Fecha')
+    monto = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='Monto')
+    referencia = models.CharField(max_length=100, blank=True, verbose_name='Referencia')
+    descripcion = models.CharField(max_length=255, blank=True, verbose_name='Descripción')
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, verbose_name='Estado')
+    criterio = models.CharField(max_length=20, choices=CRITERIO_CHOICES, blank=True, verbose_name='Criterio')
+    pago = models.ForeignKey(
+        Pago,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='movimientos_bancarios',
+        verbose_name='Pago'
+    )
+    candidatos = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name='Pagos candidatos',
+        help_text='IDs de los pagos que podrían corresponder al movimiento (cola de revisión)'
+    )
+
+    class Meta:
+        verbose_name = 'Movimiento Bancario'
+        verbose_name_plural = 'Movimientos Bancarios'
+        ordering = ['extracto', 'linea']
+        indexes = [
+            models.Index(fields=['extracto', 'estado', 'linea']),
+            models.Index(fields=['estado', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha:%d/%m/%Y} ${self.monto} {self.referencia} - {self.get_estado_display()}"
+
+
+class LoteCobranza(models.Model):
+    """
+    Captura masiva de cobros (recibos de cobradores de campo, acción del admin o API).
+
+    Cada recibo se guarda como CobroCapturado, aplicado o rechazado con su motivo,
+    como registro de auditoría (ver pagos/cobranza.py).
+    """
+
+    ORIGEN_CHOICES = [
+        ('pantalla', 'Pantalla de captura'),
+        ('api', 'API'),
+        ('admin', 'Administración'),
+    ]
+
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='lotes_cobranza',
+        verbose_name='Capturado por'
+    )
+    cobrador = models.CharField(max_length=100, blank=True, verbose_name='Cobrador')
+    origen = models.CharField(max_length=10, choices=ORIGEN_CHOICES, default='pantalla', verbose_name='Origen')
+    total = models.PositiveIntegerField(default=0, verbose_name='Recibos')
+    aplicados = models.PositiveIntegerField(default=0, verbose_name='Aplicados')
+    rechazados = models.PositiveIntegerField(default=0, verbose_name='Rechazados')
+    monto_aplicado = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Monto aplicado')
+    segundos = models.FloatField(default=0, verbose_name='Duración (s)')
+    fecha_captura = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de captura')
+
+    class Meta:
+        verbose_name = 'Lote de Cobranza'
+        verbose_name_plural = 'Lotes de Cobranza'
+        ordering = ['-fecha_captura']
+
+    def __str__(self):
+        cobrador = f" - {self.cobrador}" if self.cobrador else ''
+        return f"Lote {self.pk}{cobrador} ({self.aplicados}/{self.total})"
+
+
+class CobroCapturado(models.Model):
+    """Recibo de un lote de cobranza y el resultado de aplicarlo."""
+
+    RESULTADO_CHOICES = [
+        ('aplicado', 'Aplicado'),
+        ('rechazado', 'Rechazado'),
+    ]
+
+    lote = models.ForeignKey(
+        LoteCobranza,
+        on_delete=models.CASCADE,
+        related_name='cobros',
+        verbose_name='Lote'
+    )
+    linea = models.PositiveIntegerField(verbose_name='Línea')
+    pago = models.ForeignKey(
+        Pago,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='cobros_capturados',
+        verbose_name='Pago'
+    )
+    contrato = models.CharField(max_length=50, blank=True, verbose_name='Contrato')
+    monto = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name='Monto')
+    metodo_pago = models.CharField(max_length=20, blank=True, verbose_name='Método de pago')
+    referencia = models.CharField(max_length=100, blank=True, verbose_name='Referencia')
+    fecha_pago = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de pago')
+    resultado = models.CharField(max_length=10, choices=RESULTADO_CHOICES, verbose_name='Resultado')
+    error = models.CharField(max_length=255, blank=True, verbose_name='Motivo del rechazo')
+
+    class Meta:
+        verbose_name = 'Cobro Capturado'
+        verbose_name_plural = 'Cobros Capturados'
+        ordering = ['lote', 'linea']
+
+    def __str__(self):
+        return f"Lote {self.lote_id} línea {self.linea} - {self.get_resultado_display()}"
+
+
+class SaldoCliente(models.Model):
+    """
+    Saldo y antigüedad de la deuda de un cliente (desnormalizado).
+
+    Se recalcula en la misma transacción cuando cambian los pagos del cliente y
+    cada noche con el comando reconstruir_saldos_clientes, que además mueve los
+    montos entre rangos de antigüedad al pasar los días (ver pagos/saldos.py).
+    Los rangos reparten el monto vencido según los días transcurridos desde el
+    vencimiento a la fecha de corte.
+    """
+
+    cliente = models.OneToOneField(
+        Cliente,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='saldo',
+        verbose_name='Cliente'
+    )
+    pagos_pendientes = models.PositiveIntegerField(default=0, verbose_name='Pagos sin pagar')
+    monto_pendiente = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Saldo pendiente')
+    pagos_vencidos = models.PositiveIntegerField(default=0, verbose_name='Pagos vencidos')
+    monto_vencido = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Saldo vencido')
+    monto_0_30 = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Vencido 0-30 días')
+    monto_31_60 = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Vencido 31-60 días')
+    monto_61_90 = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Vencido 61-90 días')
+    monto_90_mas = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Vencido más de 90 días')
+    vencimiento_mas_antiguo = models.DateField(null=True, blank=True, verbose_name='Vencimiento más antiguo sin pagar')
+    ultimo_pago = models.DateTimeField(null=True, blank=True, verbose_name='Último pago')
+    fecha_corte = models.DateField(verbose_name='Fecha de corte')
+    fecha_actualizacion = models.DateTimeField(auto_now=True, verbose_name='Actualizado')
+
+    class Meta:
+        verbose_name = 'Saldo de Cliente'
+        verbose_name_plural = 'Saldos de Clientes'
+        indexes = [
+            # Ranking de morosos y cola de cobranza
+            models.Index(fields=['-monto_vencido']),
+            models.Index(fields=['vencimiento_mas_antiguo']),
+        ]
+
+    def __str__(self):
+        return f"{self.cliente_id}: ${self.monto_pendiente} (vencido ${self.monto_vencido})"
+
+    @property
+    def monto_por_vencer(self):
+        return self.monto_pendiente - self.monto_vencido
+
+    @property
+    def dias_mayor_atraso(self):
+        """Días desde el vencimiento más antiguo sin pagar hasta la fecha de corte (0 si no hay atraso)."""
+        if not self.vencimiento_mas_antiguo:
+            return 0
+        return max((self.fecha_corte - self.vencimiento_mas_antiguo).days, 0)
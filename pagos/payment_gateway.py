@@ -4,11 +4,23 @@ Soporta múltiples pasarelas: Stripe, Mercado Pago, PayPal, etc.
 """
 import logging
 import json
-import requests
 import re
+import uuid
 from django.conf import settings
 from django.utils import timezone
-from .models import TransaccionPago
+from django.db import transaction
+from .models import Pago, TransaccionPago
+from .webhooks import BandejaWebhooks
+from .clientes_pasarela import ClientesPasarelaService
+from .paypal import obtener_cliente_paypal
+from .sesiones_checkout import SesionesCheckoutService
+
+# Clave del ID de la sesión en la respuesta de crear_intento_pago, por pasarela
+CLAVE_ID_SESION = {
+    'stripe': 'session_id',
+    'mercadopago': 'preference_id',
+    'paypal': 'order_id',
+}
 
 # Import opcional de Stripe
 try:
@@ -21,13 +33,30 @@ except ImportError:
 # Import opcional de Mercado Pago
 try:
     import mercadopago
+    from mercadopago.http import HttpClient as HttpClientMercadoPago
     MERCADOPAGO_AVAILABLE = True
 except ImportError:
     MERCADOPAGO_AVAILABLE = False
     mercadopago = None
+    HttpClientMercadoPago = object
 
 logger = logging.getLogger(__name__)
 
+URL_API_STRIPE = 'https://api.stripe.com'
+URL_API_MERCADOPAGO = 'https://api.mercadopago.com'
+
+
+class ClienteHttpRedirigido(HttpClientMercadoPago):
+    """Cliente HTTP del SDK de Mercado Pago que envía las peticiones a otra URL base (MERCADOPAGO_API_URL)."""
+
+    def __init__(self, api_url):
+        self.api_url = api_url.rstrip('/')
+
+    def request(self, method, url, **kwargs):
+        if url.startswith(URL_API_MERCADOPAGO):
+            url = self.api_url + url[len(URL_API_MERCADOPAGO):]
+        return super().request(method, url, **kwargs)
+
 
 class PaymentGateway:
     """Clase base para pasarelas de pago."""
@@ -42,6 +71,7 @@ class PaymentGateway:
             if not STRIPE_AVAILABLE:
                 raise ImportError("stripe no está instalado. Ejecuta: pip install stripe")
             stripe.api_key = getattr(settings, 'STRIPE_SECRET_KEY', '')
+            stripe.api_base = getattr(settings, 'STRIPE_API_URL', '') or URL_API_STRIPE
             if not stripe.api_key:
                 logger.warning("STRIPE_SECRET_KEY no configurada en settings")
         elif self.pasarela == 'mercadopago':
@@ -52,7 +82,9 @@ class PaymentGateway:
                 logger.error("MERCADOPAGO_ACCESS_TOKEN no configurada en settings")
                 raise ValueError("MERCADOPAGO_ACCESS_TOKEN no está configurada. Agrega tu Access Token en .env")
             try:
-                self.mp = mercadopago.SDK(access_token)
+                api_url = getattr(settings, 'MERCADOPAGO_API_URL', '') or URL_API_MERCADOPAGO
+                http_client = ClienteHttpRedirigido(api_url) if api_url.rstrip('/') != URL_API_MERCADOPAGO else None
+                self.mp = mercadopago.SDK(access_token, http_client=http_client)
             except Exception as e:
                 logger.error(f"Error al inicializar SDK de Mercado Pago: {str(e)}")
                 raise ValueError(f"No se pudo inicializar el SDK de Mercado Pago: {str(e)}. Verifica tu Access Token.")
@@ -62,10 +94,25 @@ class PaymentGateway:
             self.paypal_mode = getattr(settings, 'PAYPAL_MODE', 'sandbox')  # sandbox o live
             if not self.paypal_client_id or not self.paypal_secret:
                 logger.warning("PAYPAL_CLIENT_ID o PAYPAL_SECRET no configuradas en settings")
+            # Cliente compartido por el proceso: token en caché y conexiones reutilizadas
+            self.paypal = obtener_cliente_paypal(
+                self.paypal_client_id,
+                self.paypal_secret,
+                self.paypal_mode,
+                timeout=getattr(settings, 'PAYPAL_TIMEOUT', 15),
+                reintentos=getattr(settings, 'PAYPAL_REINTENTOS', 3),
+                api_url=getattr(settings, 'PAYPAL_API_URL', ''),
+            )
     
     def crear_intento_pago(self, pago, return_url=None, cancel_url=None):
         """
-        Crea un intento de pago en la pasarela.
+        Crea un intento de pago en la pasarela, o reutiliza la sesión abierta del pago.
+        
+        Si el pago ya tiene una sesión pendiente y vigente en esta pasarela con el
+        mismo monto, se devuelve esa sesión sin llamar a la pasarela. La fila del
+        pago se bloquea solo para buscar y para registrar la sesión (no durante la
+        llamada a la pasarela): si otro clic registró una sesión mientras tanto, se
+        devuelve esa y la recién creada se cancela y se expira en la pasarela.
         
         Args:
             pago: Instancia del modelo Pago
@@ -73,19 +120,99 @@ class PaymentGateway:
             cancel_url: URL de cancelación
         
         Returns:
-            dict: Información del intento de pago
+            dict: Información del intento de pago ('reutilizada' indica si ya existía)
         """
+        if self.pasarela not in ('stripe', 'mercadopago', 'paypal'):
+            raise ValueError(f"Pasarela {self.pasarela} no soportada")
+        
+        with transaction.atomic():
+            pago = Pago.objects.select_for_update().get(pk=pago.pk)
+            obsoletas = SesionesCheckoutService.cancelar_obsoletas(pago, self.pasarela)
+            abierta = SesionesCheckoutService.buscar_abierta(pago, self.pasarela)
+        self.expirar_sesiones(obsoletas)
+        if abierta:
+            return self._sesion_reutilizada(pago, abierta)
+        
+        fecha_expiracion = SesionesCheckoutService.vencimiento(self.pasarela)
         if self.pasarela == 'stripe':
-            return self._crear_intento_stripe(pago, return_url, cancel_url)
+            resultado = self._crear_intento_stripe(pago, return_url, cancel_url, fecha_expiracion)
         elif self.pasarela == 'mercadopago':
-            return self._crear_intento_mercadopago(pago, return_url, cancel_url)
-        elif self.pasarela == 'paypal':
-            return self._crear_intento_paypal(pago, return_url, cancel_url)
+            resultado = self._crear_intento_mercadopago(pago, return_url, cancel_url, fecha_expiracion)
         else:
-            raise ValueError(f"Pasarela {self.pasarela} no soportada")
+            resultado = self._crear_intento_paypal(pago, return_url, cancel_url)
+        if not resultado.get('success'):
+            return resultado
+        
+        with transaction.atomic():
+            pago = Pago.objects.select_for_update().get(pk=pago.pk)
+            nueva = TransaccionPago.objects.get(pk=resultado['transaccion_id'])
+            abierta = SesionesCheckoutService.buscar_abierta(pago, self.pasarela)
+            if abierta is None and nueva.monto == pago.monto:
+                SesionesCheckoutService.registrar(nueva.pk, resultado.get('url'), fecha_expiracion)
+                resultado['reutilizada'] = False
+                return resultado
+            SesionesCheckoutService.cancelar(
+                [nueva],
+                'Sesión de pago duplicada' if abierta else 'Sesión de pago reemplazada: el monto del pago cambió',
+            )
+        self.expirar_sesiones([nueva])
+        if abierta:
+            return self._sesion_reutilizada(pago, abierta)
+        return {
+            'success': False,
+            'error': 'El monto del pago cambió mientras se creaba la sesión de pago. Intenta de nuevo.',
+        }
+    
+    def _sesion_reutilizada(self, pago, abierta):
+        logger.info(f"Reutilizando sesión de {self.pasarela} {abierta.id_transaccion_pasarela} para pago {pago.id}")
+        return {
+            'success': True,
+            CLAVE_ID_SESION[self.pasarela]: abierta.id_transaccion_pasarela,
+            'url': abierta.url_checkout,
+            'transaccion_id': abierta.id,
+            'reutilizada': True,
+        }
+    
+    def expirar_sesiones(self, transacciones):
+        """
+        Expira en la pasarela sesiones ya canceladas localmente, para que no se puedan pagar.
+        
+        Stripe expira la Checkout Session y Mercado Pago cierra la vigencia de la
+        preferencia. PayPal no permite anular una orden sin aprobar (vence sola a las
+        3 horas); si se llega a pagar, el webhook detecta el monto distinto.
+        Los errores solo se registran: la sesión ya quedó cancelada en la base de datos.
+        
+        Returns:
+            int: Sesiones expiradas en la pasarela
+        """
+        expiradas = 0
+        for transaccion in transacciones:
+            try:
+                if transaccion.pasarela == 'stripe':
+                    stripe.checkout.Session.expire(transaccion.id_transaccion_pasarela)
+                elif transaccion.pasarela == 'mercadopago':
+                    respuesta = self.mp.preference().update(transaccion.id_transaccion_pasarela, {
+                        'expires': True,
+                        'expiration_date_to': timezone.now().isoformat(timespec='milliseconds'),
+                    })
+                    if respuesta.get('status') not in (200, 201):
+                        raise ValueError(f"Mercado Pago respondió {respuesta.get('status')}")
+                else:
+                    logger.info(
+                        f"La orden de PayPal {transaccion.id_transaccion_pasarela} no se puede anular; vence sola"
+                    )
+                    continue
+                expiradas += 1
+            except Exception as e:
+                logger.warning(
+                    f"No se pudo expirar la sesión {transaccion.id_transaccion_pasarela} "
+                    f"en {transaccion.pasarela}: {str(e)}"
+                )
+        return expiradas
     
-    def _crear_intento_stripe(self, pago, return_url, cancel_url):
+    def _crear_intento_stripe(self, pago, return_url, cancel_url, fecha_expiracion=None):
         """Crea un intento de pago con Stripe."""
+        customer_id = None
         try:
             # Crear o recuperar cliente en Stripe
             customer_id = self._obtener_o_crear_cliente_stripe(pago.cliente)
@@ -128,6 +255,8 @@ class PaymentGateway:
                     'pago_id': str(pago.id),
                     'cliente_id': str(pago.cliente.id),
                 },
+                # La sesión vence junto con su registro local (ver pagos/sesiones_checkout.py)
+                expires_at=int(fecha_expiracion.timestamp()) if fecha_expiracion else None,
             )
             
             # Guardar transacción
@@ -154,6 +283,9 @@ class PaymentGateway:
             }
             
         except stripe.error.StripeError as e:
+            if getattr(e, 'code', None) == 'resource_missing' and getattr(e, 'param', None) == 'customer':
+                # El Customer guardado ya no existe en Stripe: el siguiente intento lo vuelve a crear
+                ClientesPasarelaService.invalidar(pago.cliente_id, 'stripe', customer_id)
             logger.error(f"Error de Stripe: {str(e)}")
             return {
                 'success': False,
@@ -166,17 +298,38 @@ class PaymentGateway:
                 'error': str(e),
             }
     
+    def obtener_o_crear_cliente(self, cliente):
+        """
+        Obtiene el ID del cliente en la pasarela, creándolo la primera vez.
+        
+        Args:
+            cliente: Instancia del modelo Cliente
+        
+        Returns:
+            str: ID del cliente en la pasarela
+        """
+        if self.pasarela == 'stripe':
+            return self._obtener_o_crear_cliente_stripe(cliente)
+        else:
+            raise ValueError(f"La pasarela {self.pasarela} no registra clientes")
+    
     def _obtener_o_crear_cliente_stripe(self, cliente):
-        """Obtiene o crea un cliente en Stripe."""
-        # Buscar si el cliente ya tiene un ID de Stripe guardado
-        # Por ahora, creamos uno nuevo cada vez (se puede optimizar guardando el ID)
+        """Obtiene el Customer de Stripe guardado del cliente o lo crea si no existe."""
+        return ClientesPasarelaService.obtener_id(cliente, 'stripe', self._crear_cliente_stripe)
+    
+    def _crear_cliente_stripe(self, cliente):
+        """Crea un cliente en Stripe."""
         try:
             customer = stripe.Customer.create(
                 email=cliente.email if hasattr(cliente, 'email') and cliente.email else None,
                 name=cliente.nombre_completo,
                 metadata={
                     'cliente_id': str(cliente.id),
-                }
+                },
+                # Una clave por intento de creación: los reintentos de red de esta petición
+                # devuelven el mismo Customer, pero tras invalidar (Customer borrado) o cambiar
+                # el email o el nombre se crea uno nuevo en lugar de repetir la respuesta anterior
+                idempotency_key=f"adminired-cliente-{cliente.id}-{uuid.uuid4().hex}",
             )
             return customer.id
         except Exception as e:
@@ -257,95 +410,23 @@ class PaymentGateway:
     
     def procesar_webhook(self, payload, signature):
         """
-        Procesa un webhook de la pasarela.
+        Recibe un webhook de la pasarela: verifica la firma y lo guarda en la bandeja.
+        
+        El evento se aplica después, en lote (ver pagos/webhooks.py).
         
         Args:
             payload: Cuerpo del webhook
             signature: Firma del webhook
         
         Returns:
-            dict: Resultado del procesamiento
+            dict: Resultado de la recepción
         """
         if self.pasarela == 'stripe':
-            return self._procesar_webhook_stripe(payload, signature)
+            return BandejaWebhooks.recibir_stripe(payload, signature)
         else:
             raise ValueError(f"Pasarela {self.pasarela} no soportada")
     
-    def _procesar_webhook_stripe(self, payload, signature):
-        """Procesa un webhook de Stripe."""
-        try:
-            webhook_secret = getattr(settings, 'STRIPE_WEBHOOK_SECRET', '')
-            if not webhook_secret:
-                logger.warning("STRIPE_WEBHOOK_SECRET no configurada")
-                return {'success': False, 'error': 'Webhook secret no configurado'}
-            
-            event = stripe.Webhook.construct_event(
-                payload, signature, webhook_secret
-            )
-            
-            # Procesar diferentes tipos de eventos
-            if event['type'] == 'checkout.session.completed':
-                session = event['data']['object']
-                return self._procesar_checkout_completado(session)
-            elif event['type'] == 'payment_intent.succeeded':
-                payment_intent = event['data']['object']
-                return self._procesar_pago_exitoso(payment_intent)
-            elif event['type'] == 'payment_intent.payment_failed':
-                payment_intent = event['data']['object']
-                return self._procesar_pago_fallido(payment_intent)
-            else:
-                logger.info(f"Evento de Stripe no procesado: {event['type']}")
-                return {'success': True, 'message': 'Evento no procesado'}
-                
-        except ValueError as e:
-            logger.error(f"Payload inválido: {str(e)}")
-            return {'success': False, 'error': 'Payload inválido'}
-        except stripe.error.SignatureVerificationError as e:
-            logger.error(f"Firma inválida: {str(e)}")
-            return {'success': False, 'error': 'Firma inválida'}
-        except Exception as e:
-            logger.error(f"Error al procesar webhook: {str(e)}")
-            return {'success': False, 'error': str(e)}
-    
-    def _procesar_checkout_completado(self, session):
-        """Procesa un checkout completado."""
-        try:
-            transaccion = TransaccionPago.objects.get(
-                id_transaccion_pasarela=session['id']
-            )
-            transaccion.marcar_como_completada()
-            return {'success': True, 'transaccion_id': transaccion.id}
-        except TransaccionPago.DoesNotExist:
-            logger.error(f"Transacción no encontrada para session {session['id']}")
-            return {'success': False, 'error': 'Transacción no encontrada'}
-    
-    def _procesar_pago_exitoso(self, payment_intent):
-        """Procesa un pago exitoso."""
-        try:
-            transaccion = TransaccionPago.objects.get(
-                id_pago_intento=payment_intent['id']
-            )
-            transaccion.marcar_como_completada()
-            return {'success': True, 'transaccion_id': transaccion.id}
-        except TransaccionPago.DoesNotExist:
-            logger.error(f"Transacción no encontrada para payment_intent {payment_intent['id']}")
-            return {'success': False, 'error': 'Transacción no encontrada'}
-    
-    def _procesar_pago_fallido(self, payment_intent):
-        """Procesa un pago fallido."""
-        try:
-            transaccion = TransaccionPago.objects.get(
-                id_pago_intento=payment_intent['id']
-            )
-            transaccion.marcar_como_fallida(
-                mensaje_error=payment_intent.get('last_payment_error', {}).get('message', 'Pago fallido')
-            )
-            return {'success': True, 'transaccion_id': transaccion.id}
-        except TransaccionPago.DoesNotExist:
-            logger.error(f"Transacción no encontrada para payment_intent {payment_intent['id']}")
-            return {'success': False, 'error': 'Transacción no encontrada'}
-    
-    def _crear_intento_mercadopago(self, pago, return_url, cancel_url):
+    def _crear_intento_mercadopago(self, pago, return_url, cancel_url, fecha_expiracion=None):
         """Crea un intento de pago con Mercado Pago."""
         try:
             # Validar que el SDK esté inicializado
@@ -516,6 +597,11 @@ class PaymentGateway:
                 "statement_descriptor": "AdminiRed"
             }
             
+            # La preferencia vence junto con su registro local (ver pagos/sesiones_checkout.py)
+            if fecha_expiracion:
+                preference_data["expires"] = True
+                preference_data["expiration_date_to"] = fecha_expiracion.isoformat(timespec='milliseconds')
+            
             # Solo agregar auto_return si NO estamos usando localhost
             # Mercado Pago rechaza URLs locales cuando auto_return está presente
             if use_auto_return:
@@ -670,7 +756,7 @@ class PaymentGateway:
             success_url = return_url or f"{base_url}/pagos/{pago.pk}/pago-exitoso/?token={{token}}&PayerID={{PayerID}}"
             cancel_url = cancel_url or f"{base_url}/pagos/{pago.pk}/pago-cancelado/"
             
-            # Obtener access token de PayPal
+            # Obtener access token de PayPal (en caché: solo se solicita cuando está por vencer)
             access_token = self._obtener_paypal_access_token()
             if not access_token:
                 return {
@@ -679,8 +765,6 @@ class PaymentGateway:
                 }
             
             # Crear orden de pago
-            api_url = 'https://api-m.sandbox.paypal.com' if self.paypal_mode == 'sandbox' else 'https://api-m.paypal.com'
-            
             order_data = {
                 "intent": "CAPTURE",
                 "purchase_units": [
@@ -702,15 +786,9 @@ class PaymentGateway:
                 }
             }
             
-            headers = {
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {access_token}'
-            }
-            
-            response = requests.post(
-                f'{api_url}/v2/checkout/orders',
+            response = self.paypal.solicitud(
+                'POST', '/v2/checkout/orders', 'orders.create',
                 json=order_data,
-                headers=headers
             )
             
             if response.status_code == 201:
@@ -756,29 +834,9 @@ class PaymentGateway:
             }
     
     def _obtener_paypal_access_token(self):
-        """Obtiene un access token de PayPal."""
+        """Obtiene un access token de PayPal (en caché hasta poco antes de que venza)."""
         try:
-            api_url = 'https://api-m.sandbox.paypal.com' if self.paypal_mode == 'sandbox' else 'https://api-m.paypal.com'
-            
-            auth = (self.paypal_client_id, self.paypal_secret)
-            headers = {
-                'Accept': 'application/json',
-                'Accept-Language': 'en_US'
-            }
-            data = {'grant_type': 'client_credentials'}
-            
-            response = requests.post(
-                f'{api_url}/v1/oauth2/token',
-                auth=auth,
-                headers=headers,
-                data=data
-            )
-            
-            if response.status_code == 200:
-                return response.json().get('access_token')
-            else:
-                logger.error(f"Error al obtener access token de PayPal: {response.text}")
-                return None
+            return self.paypal.access_token()
         except Exception as e:
             logger.error(f"Error inesperado al obtener access token de PayPal: {str(e)}")
             return None
@@ -935,18 +993,9 @@ class PaymentGateway:
             
             # Obtener el capture_id de la orden
             order_id = transaccion.id_transaccion_pasarela
-            api_url = 'https://api-m.sandbox.paypal.com' if self.paypal_mode == 'sandbox' else 'https://api-m.paypal.com'
-            
-            headers = {
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {access_token}'
-            }
             
             # Obtener detalles de la orden para encontrar el capture_id
-            order_response = requests.get(
-                f'{api_url}/v2/checkout/orders/{order_id}',
-                headers=headers
-            )
+            order_response = self.paypal.solicitud('GET', f'/v2/checkout/orders/{order_id}', 'orders.get')
             
             if order_response.status_code != 200:
                 return {
@@ -983,10 +1032,9 @@ class PaymentGateway:
                     "currency_code": "MXN"
                 }
             
-            refund_response = requests.post(
-                f'{api_url}/v2/payments/captures/{capture_id}/refund',
+            refund_response = self.paypal.solicitud(
+                'POST', f'/v2/payments/captures/{capture_id}/refund', 'captures.refund',
                 json=refund_data,
-                headers=headers
             )
             
             if refund_response.status_code == 201:
@@ -0,0 +1,205 @@
+"""
+Cliente HTTP de la API REST de PayPal.
+
+- Un cliente por credenciales y modo, compartido por todo el proceso
+  (`obtener_cliente_paypal`).
+- El access token OAuth se guarda hasta poco antes de `expires_in`; cuando vence, un
+  solo hilo lo renueva mientras los demás esperan el mismo token.
+- Una requests.Session con pool de conexiones reutiliza las conexiones TLS, con
+  timeouts y reintentos acotados (errores de conexión, 429 y 5xx, respetando
+  Retry-After). Los POST llevan PayPal-Request-Id para que un reintento no
+  duplique órdenes ni reembolsos.
+- Se registra la latencia de cada endpoint (`ClientePayPal.metricas.resumen()`).
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+URL_API = {
+    'sandbox': 'https://api-m.sandbox.paypal.com',
+    'live': 'https://api-m.paypal.com',
+}
+
+# Segundos antes de expires_in en los que el token se considera vencido
+MARGEN_TOKEN = 60
+
+
+class ErrorPayPal(Exception):
+    """Error al comunicarse con la API de PayPal."""
+
+
+class MetricasLatencia:
+    """Latencia por endpoint (en memoria del proceso, con las últimas N muestras)."""
+
+    def __init__(self, muestras=500):
+        self._lock = threading.Lock()
+        self._muestras = muestras
+        self._datos = {}
+
+    def registrar(self, endpoint, milisegundos, error=False):
+        with self._lock:
+            datos = self._datos.setdefault(endpoint, {
+                'llamadas': 0, 'errores': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                'recientes': deque(maxlen=self._muestras),
+            })
+            datos['llamadas'] += 1
+            datos['errores'] += int(error)
+            datos['total_ms'] += milisegundos
+            datos['max_ms'] = max(datos['max_ms'], milisegundos)
+            datos['recientes'].append(milisegundos)
+
+    def resumen(self):
+        """
+        Returns:
+            dict: endpoint -> {'llamadas', 'errores', 'promedio_ms', 'p50_ms', 'p95_ms', 'max_ms'}
+        """
+        with self._lock:
+            resultado = {}
+            for endpoint, datos in self._datos.items():
+                recientes = sorted(datos['recientes'])
+                resultado[endpoint] = {
+                    'llamadas': datos['llamadas'],
+                    'errores': datos['errores'],
+                    'promedio_ms': round(datos['total_ms'] / datos['llamadas'], 1),
+                    'p50_ms': round(recientes[len(recientes) // 2], 1),
+                    'p95_ms': round(recientes[min(len(recientes) - 1, int(len(recientes) * 0.95))], 1),
+                    'max_ms': round(datos['max_ms'], 1),
+                }
+            return resultado
+
+
+class ClientePayPal:
+    """
+    Cliente de la API de PayPal con token en caché y conexiones reutilizables.
+
+    Args:
+        client_id: PAYPAL_CLIENT_ID
+        secret: PAYPAL_SECRET
+        modo: 'sandbox' o 'live'
+        timeout: Segundos máximos por petición (conexión y lectura)
+        reintentos: Reintentos por petición ante errores transitorios
+        api_url: URL base de la API (por defecto, la del modo)
+    """
+
+    def __init__(self, client_id, secret, modo='sandbox', timeout=15, reintentos=3, api_url=None):
+        self.client_id = client_id
+        self.secret = secret
+        self.api_url = (api_url or URL_API.get(modo, URL_API['sandbox'])).rstrip('/')
+        self.timeout = (min(5, timeout), timeout)
+        self.metricas = MetricasLatencia()
+
+        self._token = None
+        self._token_expira = 0.0
+        self._token_lock = threading.Lock()
+
+        reintento = Retry(
+            total=reintentos,
+            backoff_factor=0.3,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({'GET', 'POST'}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=20, max_retries=reintento)
+        self.session = requests.Session()
+        self.session.mount('https://', adaptador)
+        self.session.mount('http://', adaptador)
+        self.session.headers.update({'Accept': 'application/json', 'Accept-Language': 'en_US'})
+
+    def _medir(self, endpoint, metodo, url, **kwargs):
+        inicio = time.perf_counter()
+        error = True
+        try:
+            response = self.session.request(metodo, url, timeout=self.timeout, **kwargs)
+            error = response.status_code >= 400
+            return response
+        finally:
+            milisegundos = (time.perf_counter() - inicio) * 1000
+            self.metricas.registrar(endpoint, milisegundos, error=error)
+            logger.debug(f'PayPal {endpoint}: {milisegundos:.0f} ms')
+
+    def access_token(self):
+        """Access token vigente; lo renueva un solo hilo cuando está por vencer."""
+        if self._token and time.monotonic() < self._token_expira:
+            return self._token
+        with self._token_lock:
+            if self._token and time.monotonic() < self._token_expira:
+                return self._token
+            response = self._medir(
+                'oauth2.token', 'POST', f'{self.api_url}/v1/oauth2/token',
+                auth=(self.client_id, self.secret),
+                data={'grant_type': 'client_credentials'},
+            )
+            if response.status_code != 200:
+                raise ErrorPayPal(f'Error al obtener access token de PayPal: {response.text}')
+            datos = response.json()
+            self._token = datos['access_token']
+            self._token_expira = time.monotonic() + max(0, int(datos.get('expires_in', 0)) - MARGEN_TOKEN)
+            return self._token
+
+    def invalidar_token(self, token=None):
+        """Descarta el token en caché (solo si sigue siendo `token`, cuando se indica)."""
+        with self._token_lock:
+            if token is None or self._token == token:
+                self._token = None
+                self._token_expira = 0.0
+
+    def solicitud(self, metodo, ruta, endpoint, headers=None, **kwargs):
+        """
+        Petición autenticada a la API.
+
+        Si PayPal responde 401 (token revocado antes de tiempo), se renueva el token
+        y se repite una vez.
+
+        Args:
+            metodo: 'GET' o 'POST'
+            ruta: Ruta de la API (ej. '/v2/checkout/orders')
+            endpoint: Nombre para las métricas (ej. 'orders.create')
+
+        Returns:
+            requests.Response
+        """
+        headers = dict(headers or {})
+        if metodo == 'POST':
+            headers.setdefault('Content-Type', 'application/json')
+            headers.setdefault('PayPal-Request-Id', str(uuid.uuid4()))
+        url = f'{self.api_url}{ruta}'
+        for intento in range(2):
+            token = self.access_token()
+            headers['Authorization'] = f'Bearer {token}'
+            response = self._medir(endpoint, metodo, url, headers=headers, **kwargs)
+            if response.status_code != 401 or intento:
+                return response
+            self.invalidar_token(token)
+        return response
+
+
+_clientes = {}
+_clientes_lock = threading.Lock()
+
+
+def obtener_cliente_paypal(client_id, secret, modo='sandbox', timeout=15, reintentos=3, api_url=None):
+    """Cliente compartido por el proceso para estas credenciales, modo y URL."""
+    clave = (client_id, secret, modo, api_url or None)
+    cliente = _clientes.get(clave)
+    if cliente is None:
+        with _clientes_lock:
+            cliente = _clientes.get(clave)
+            if cliente is None:
+                cliente = ClientePayPal(
+                    client_id, secret, modo, timeout=timeout, reintentos=reintentos, api_url=api_url,
+                )
+                _clientes[clave] = cliente
+    return cliente
+
+
+def metricas_paypal():
+    """Métricas de latencia de todos los clientes PayPal del proceso."""
+    return {modo: cliente.metricas.resumen() for (_, _, modo, _), cliente in _clientes.items()}
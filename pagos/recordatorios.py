@@ -0,0 +1,411 @@
+"""
+Generación por lotes de recordatorios de pago.
+
+- Los pagos a recordar se leen con una sola consulta de valores (sin instancias de
+  modelo) y los que ya tienen un recordatorio reciente se excluyen con un NOT EXISTS
+  correlacionado, en lugar de una lista id__in.
+- Cada plantilla se compila una sola vez por proceso y se renderiza en un ciclo con
+  contextos de diccionarios simples; el texto plano solo se arma si la plantilla no
+  se pudo cargar.
+- Las notificaciones se insertan con bulk_create por bloques dentro de una
+  transacción. En ejecuciones muy grandes los bloques se renderizan en un pool de
+  procesos; los procesos solo renderizan, no tocan la base de datos.
+- En modo resumen, los pagos que necesitan recordatorio solo deciden qué clientes
+  reciben uno: el resumen lista todos los pagos abiertos por vencer y vencidos del
+  cliente (así el total es lo que debe), en una sola notificación por canal (un solo
+  render por cliente), y los pagos incluidos quedan en la tabla intermedia
+  NotificacionPago. Un cliente con un resumen reciente no recibe otro.
+"""
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.template import Context
+from django.template.loader import get_template
+from django.utils import timezone
+from notificaciones.models import ConfiguracionNotificacion, Notificacion, NotificacionPago, TipoNotificacion
+from .models import Pago
+
+logger = logging.getLogger(__name__)
+
+PLANTILLAS = {
+    'antes': 'pagos/emails/recordatorio_antes_vencimiento.html',
+    'vencido': 'pagos/emails/recordatorio_vencido.html',
+    'resumen': 'pagos/emails/recordatorio_resumen.html',
+    'resumen_texto': 'pagos/emails/recordatorio_resumen.txt',
+}
+ASUNTOS = {
+    'antes': 'Recordatorio: Pago próximo a vencer - {concepto}',
+    'vencido': '⚠️ Pago Vencido - {concepto}',
+}
+TIPOS_NOTIFICACION = {
+    'antes': ('recordatorio_pago_antes', 'Recordatorio de Pago (Antes de Vencimiento)',
+              'Recordatorio enviado antes de la fecha de vencimiento'),
+    'vencido': ('recordatorio_pago_vencido', 'Recordatorio de Pago Vencido',
+                'Recordatorio enviado después de la fecha de vencimiento'),
+    'resumen': ('recordatorio_pago_resumen', 'Resumen de Recordatorios de Pago',
+                'Un solo mensaje por cliente y canal con sus pagos por vencer y vencidos'),
+}
+# Días durante los que un recordatorio enviado evita crear otro del mismo tipo
+# ('resumen' se cuenta por cliente: el resumen ya lista todos sus pagos)
+DIAS_RECIENTE = {'antes': 2, 'vencido': 7, 'resumen': 2}
+CAMPOS = (
+    'id', 'cliente_id', 'concepto', 'monto', 'fecha_vencimiento', 'instalacion_id',
+    'cliente__nombre', 'cliente__apellido1', 'cliente__apellido2', 'instalacion__numero_contrato',
+)
+# Con menos filas que esto no compensa arrancar el pool de procesos
+MINIMO_FILAS_POOL = 20000
+
+_compiladas = {}
+
+
+def plantilla(clave):
+    """Plantilla compilada del recordatorio (una vez por proceso); None si no se pudo cargar."""
+    if clave not in _compiladas:
+        try:
+            _compiladas[clave] = get_template(PLANTILLAS[clave]).template
+        except Exception as e:
+            logger.warning(f'No se pudo cargar plantilla HTML, usando texto plano: {str(e)}')
+            _compiladas[clave] = None
+    return _compiladas[clave]
+
+
+def _nombre_completo(nombre, apellido1, apellido2):
+    apellidos = f'{apellido1}'
+    if apellido2:
+        apellidos += f' {apellido2}'
+    return f'{nombre} {apellidos}'.strip()
+
+
+def contexto(clave, fila, dias, hoy):
+    """Contexto de la plantilla a partir de una fila de CAMPOS (solo diccionarios)."""
+    (_, _, concepto, monto, fecha_vencimiento, instalacion_id,
+     nombre, apellido1, apellido2, numero_contrato) = fila
+    datos = {
+        'cliente': {'nombre_completo': _nombre_completo(nombre, apellido1, apellido2)},
+        'pago': {
+            'concepto': concepto,
+            'monto': monto,
+            'instalacion': {'numero_contrato': numero_contrato} if instalacion_id else None,
+        },
+        'fecha_vencimiento': fecha_vencimiento.strftime('%d de %B de %Y'),
+    }
+    if clave == 'antes':
+        datos['dias_antes'] = dias
+    else:
+        datos['dias_vencido'] = (hoy - fecha_vencimiento).days
+    return datos
+
+
+def texto_plano(clave, datos):
+    """Mensaje en texto plano (solo si la plantilla HTML no está disponible)."""
+    pago = datos['pago']
+    if clave == 'antes':
+        aviso = (
+            'Le recordamos que tiene un pago próximo a vencer:\n\n'
+            f"DETALLES DEL PAGO:\n• Concepto: {pago['concepto']}\n• Monto: ${pago['monto']:,.2f}\n"
+            f"• Fecha de vencimiento: {datos['fecha_vencimiento']}\n• Días restantes: {datos['dias_antes']} día(s)\n\n"
+            'IMPORTANTE:\nPor favor, realice el pago antes de la fecha de vencimiento para evitar '
+            'interrupciones en su servicio.'
+        )
+    else:
+        aviso = (
+            'ATENCIÓN: Su pago está vencido\n\n'
+            f"DETALLES DEL PAGO:\n• Concepto: {pago['concepto']}\n• Monto: ${pago['monto']:,.2f}\n"
+            f"• Fecha de vencimiento: {datos['fecha_vencimiento']}\n• Días vencido: {datos['dias_vencido']} día(s)\n\n"
+            'URGENTE:\nSu pago está vencido. Por favor, realice el pago lo antes posible para evitar '
+            'interrupciones en su servicio o recargos por mora.'
+        )
+    return (
+        f"Estimado/a {datos['cliente']['nombre_completo']},\n\n{aviso}\n\n"
+        'Si tiene alguna pregunta o necesita asistencia, no dude en contactarnos.\n\n'
+        'Saludos cordiales,\nEquipo AdminiRed\n'
+    )
+
+
+def fila_de_pago(pago):
+    """Fila con la forma de CAMPOS a partir de una instancia de Pago."""
+    cliente = pago.cliente
+    instalacion = pago.instalacion
+    return (
+        pago.pk, pago.cliente_id, pago.concepto, pago.monto, pago.fecha_vencimiento, pago.instalacion_id,
+        cliente.nombre, cliente.apellido1, cliente.apellido2, instalacion.numero_contrato if instalacion else None,
+    )
+
+
+def renderizar_bloque(clave, filas, dias, hoy):
+    """Renderiza los mensajes de un bloque de filas; se puede ejecutar en un proceso del pool."""
+    compilada = plantilla(clave)
+    if compilada is None:
+        return [texto_plano(clave, contexto(clave, fila, dias, hoy)) for fila in filas]
+    ctx = Context(autoescape=True)
+    mensajes = []
+    for fila in filas:
+        with ctx.push(contexto(clave, fila, dias, hoy)):
+            mensajes.append(compilada.render(ctx))
+    return mensajes
+
+
+def _iniciar_proceso():
+    """Con el método spawn el proceso hijo no hereda Django configurado."""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+class GeneradorRecordatorios:
+    """
+    Crea los recordatorios de pagos por vencer y vencidos en operaciones por lotes.
+
+    Args:
+        hoy: Fecha de referencia (default: hoy)
+        forzar: Crear recordatorios aunque ya exista uno reciente
+        procesos: Procesos para renderizar ejecuciones grandes (default: PAGOS_RECORDATORIOS_PROCESOS; 1 = sin pool)
+    """
+
+    BATCH_SIZE = 1000
+
+    def __init__(self, hoy=None, forzar=False, procesos=None):
+        self.hoy = hoy or timezone.now().date()
+        self.forzar = forzar
+        self.procesos = procesos or getattr(settings, 'PAGOS_RECORDATORIOS_PROCESOS', None) or min(4, os.cpu_count() or 1)
+
+    @staticmethod
+    def tipo_y_configuracion(clave):
+        """TipoNotificacion del recordatorio (se crea si no existe) y su configuración activa."""
+        codigo, nombre, descripcion = TIPOS_NOTIFICACION[clave]
+        tipo, _ = TipoNotificacion.objects.get_or_create(
+            codigo=codigo, defaults={'nombre': nombre, 'descripcion': descripcion},
+        )
+        configuracion = ConfiguracionNotificacion.objects.filter(tipo_notificacion=tipo, activa=True).first()
+        return tipo, configuracion
+
+    def pagos(self, clave, dias, tipo):
+        """
+        Pagos que necesitan recordatorio, con el cliente con email.
+
+        'antes': pendientes que vencen dentro de `dias` días exactos.
+        'vencido': vencidos o pendientes desde hace al menos `dias` días.
+        """
+        if clave == 'antes':
+            pagos = Pago.objects.filter(estado='pendiente', fecha_vencimiento=self.hoy + timedelta(days=dias))
+        else:
+            pagos = Pago.objects.filter(
+                estado__in=['vencido', 'pendiente'], fecha_vencimiento__lte=self.hoy - timedelta(days=dias),
+            )
+        pagos = pagos.filter(cliente__email__isnull=False).exclude(cliente__email='')
+        if not self.forzar:
+            # Anti-join: ya tiene un recordatorio de este tipo, o un resumen que lo incluye,
+            # por enviar o enviado recientemente
+            desde = timezone.now() - timedelta(days=DIAS_RECIENTE[clave])
+            pagos = pagos.filter(
+                ~Exists(
+                    Notificacion.objects.filter(pago=OuterRef('pk'), tipo=tipo).filter(
+                        Q(estado='pendiente') | Q(estado='enviada', fecha_envio__gte=desde)
+                    )
+                ),
+                ~Exists(
+                    NotificacionPago.objects.filter(
+                        pago=OuterRef('pk'), notificacion__tipo__codigo=TIPOS_NOTIFICACION['resumen'][0],
+                    ).filter(
+                        Q(notificacion__estado='pendiente')
+                        | Q(notificacion__estado='enviada', notificacion__fecha_envio__gte=desde)
+                    )
+                ),
+            )
+        return pagos.order_by('fecha_vencimiento', 'id')
+
+    def filas(self, clave, dias, tipo):
+        """Filas (CAMPOS) de los pagos a recordar."""
+        return list(self.pagos(clave, dias, tipo).values_list(*CAMPOS))
+
+    def _bloques_renderizados(self, clave, filas, dias):
+        """Genera (bloque, mensajes) en orden; con muchas filas renderiza en un pool de procesos."""
+        bloques = [filas[i:i + self.BATCH_SIZE] for i in range(0, len(filas), self.BATCH_SIZE)]
+        if self.procesos <= 1 or len(filas) < MINIMO_FILAS_POOL:
+            for bloque in bloques:
+                yield bloque, renderizar_bloque(clave, bloque, dias, self.hoy)
+            return
+
+        # Como mucho 2 bloques por proceso en vuelo, para no acumular todos los mensajes en memoria
+        with ProcessPoolExecutor(max_workers=self.procesos, initializer=_iniciar_proceso) as pool:
+            pendientes = deque()
+            for bloque in bloques:
+                pendientes.append((bloque, pool.submit(renderizar_bloque, clave, bloque, dias, self.hoy)))
+                if len(pendientes) >= self.procesos * 2:
+                    bloque_listo, futuro = pendientes.popleft()
+                    yield bloque_listo, futuro.result()
+            while pendientes:
+                bloque_listo, futuro = pendientes.popleft()
+                yield bloque_listo, futuro.result()
+
+    def crear(self, clave, filas, dias, tipo, canal='email'):
+        """
+        Renderiza e inserta los recordatorios de las filas indicadas.
+
+        Returns:
+            dict: {'creados': int, 'segundos': float}
+        """
+        inicio = time.monotonic()
+        ahora = timezone.now()
+        creados = 0
+        with transaction.atomic():
+            for bloque, mensajes in self._bloques_renderizados(clave, filas, dias):
+                Notificacion.objects.bulk_create(
+                    [
+                        Notificacion(
+                            cliente_id=fila[1],
+                            pago_id=fila[0],
+                            tipo=tipo,
+                            asunto=ASUNTOS[clave].format(concepto=fila[2])[:200],
+                            mensaje=mensaje,
+                            canal=canal,
+                            estado='pendiente',
+                            fecha_programada=ahora,
+                        )
+                        for fila, mensaje in zip(bloque, mensajes)
+                    ],
+                    batch_size=self.BATCH_SIZE,
+                )
+                creados += len(bloque)
+        segundos = round(time.monotonic() - inicio, 3)
+        logger.info(f'Recordatorios de pago ({clave}): {creados} creados en {segundos}s')
+        return {'creados': creados, 'segundos': segundos}
+
+    def _clientes_con_resumen_reciente(self, clientes):
+        """Clientes con un resumen por enviar o enviado en los últimos DIAS_RECIENTE['resumen'] días."""
+        desde = timezone.now() - timedelta(days=DIAS_RECIENTE['resumen'])
+        recientes = set()
+        clientes = list(clientes)
+        for i in range(0, len(clientes), self.BATCH_SIZE):
+            recientes.update(
+                Notificacion.objects.filter(
+                    cliente_id__in=clientes[i:i + self.BATCH_SIZE], tipo__codigo=TIPOS_NOTIFICACION['resumen'][0],
+                ).filter(
+                    Q(estado='pendiente') | Q(estado='enviada', fecha_envio__gte=desde)
+                ).values_list('cliente_id', flat=True)
+            )
+        return recientes
+
+    def resumenes(self, entradas):
+        """
+        Agrupa por cliente y canal todos los pagos abiertos de los clientes a recordar.
+
+        Las filas de las entradas solo indican qué clientes necesitan recordatorio (se
+        omiten los que tienen un resumen reciente, salvo con forzar); cada resumen lista
+        todos sus pagos vencidos y los que vencen dentro de los días de 'antes'.
+
+        Args:
+            entradas: Lista de (clave, filas, dias, canal), con clave 'antes' o 'vencido'
+
+        Returns:
+            dict: {(cliente_id, canal): {'nombre', 'pagos': [...], 'total', 'vencidos'}}
+        """
+        canales = {clave: canal for clave, _, _, canal in entradas}
+        clientes = {fila[1] for _, filas, _, _ in entradas for fila in filas}
+        if not self.forzar:
+            clientes -= self._clientes_con_resumen_reciente(clientes)
+        clientes = sorted(clientes)
+
+        abiertos = Q(estado__in=['pendiente', 'vencido'])
+        if 'vencido' not in canales:
+            abiertos &= Q(fecha_vencimiento__gte=self.hoy)
+        if 'antes' in canales:
+            dias_antes = next(dias for clave, _, dias, _ in entradas if clave == 'antes')
+            abiertos &= Q(fecha_vencimiento__lte=self.hoy + timedelta(days=dias_antes))
+        else:
+            abiertos &= Q(fecha_vencimiento__lt=self.hoy)
+
+        grupos = {}
+        for i in range(0, len(clientes), self.BATCH_SIZE):
+            filas = Pago.objects.filter(abiertos, cliente_id__in=clientes[i:i + self.BATCH_SIZE]).values_list(*CAMPOS)
+            for fila in filas:
+                vencido = fila[4] < self.hoy
+                canal = canales['vencido' if vencido else 'antes']
+                grupo = grupos.get((fila[1], canal))
+                if grupo is None:
+                    grupo = grupos[(fila[1], canal)] = {
+                        'nombre': _nombre_completo(*fila[6:9]), 'pagos': [], 'total': 0, 'vencidos': 0,
+                    }
+                grupo['pagos'].append({
+                    'id': fila[0],
+                    'concepto': fila[2],
+                    'monto': fila[3],
+                    'fecha': fila[4],
+                    'fecha_vencimiento': fila[4].strftime('%d de %B de %Y'),
+                    'numero_contrato': fila[9] if fila[5] else '',
+                    'vencido': vencido,
+                    'dias': abs((self.hoy - fila[4]).days),
+                })
+                grupo['total'] += fila[3]
+                grupo['vencidos'] += vencido
+        for grupo in grupos.values():
+            grupo['pagos'].sort(key=lambda pago: (pago['fecha'], pago['id']))
+        return grupos
+
+    def crear_resumenes(self, entradas, tipo):
+        """
+        Crea una notificación por cliente y canal con todos sus pagos, y registra los pagos incluidos.
+
+        Args:
+            entradas: Lista de (clave, filas, dias, canal), con clave 'antes' o 'vencido'
+            tipo: TipoNotificacion de los resúmenes
+
+        Returns:
+            dict: {'creados': int, 'pagos': int, 'segundos': float}
+        """
+        inicio = time.monotonic()
+        ahora = timezone.now()
+        grupos = self.resumenes(entradas)
+        html = plantilla('resumen')
+        texto = plantilla('resumen_texto')
+        ctx = Context(autoescape=True)
+
+        notificaciones = []
+        pagos_por_notificacion = []
+        for (cliente_id, canal), grupo in grupos.items():
+            compilada = (html or texto) if canal == 'email' else (texto or html)
+            with ctx.push(cliente={'nombre_completo': grupo['nombre']}, pagos=grupo['pagos'],
+                          total=grupo['total'], vencidos=grupo['vencidos']):
+                mensaje = compilada.render(ctx)
+            cantidad = len(grupo['pagos'])
+            if grupo['vencidos']:
+                asunto = f"⚠️ Resumen de pagos: {grupo['vencidos']} vencido(s) de {cantidad}"
+            else:
+                asunto = f'Recordatorio: {cantidad} pago(s) próximo(s) a vencer'
+            notificaciones.append(Notificacion(
+                cliente_id=cliente_id,
+                tipo=tipo,
+                asunto=asunto,
+                mensaje=mensaje,
+                canal=canal,
+                estado='pendiente',
+                fecha_programada=ahora,
+            ))
+            pagos_por_notificacion.append([pago['id'] for pago in grupo['pagos']])
+
+        with transaction.atomic():
+            if connection.features.can_return_rows_from_bulk_insert:
+                Notificacion.objects.bulk_create(notificaciones, batch_size=self.BATCH_SIZE)
+            else:
+                for notificacion in notificaciones:
+                    notificacion.save()
+            NotificacionPago.objects.bulk_create(
+                [
+                    NotificacionPago(notificacion_id=notificacion.pk, pago_id=pago_id)
+                    for notificacion, pagos in zip(notificaciones, pagos_por_notificacion)
+                    for pago_id in pagos
+                ],
+                batch_size=self.BATCH_SIZE,
+            )
+
+        incluidos = sum(len(pagos) for pagos in pagos_por_notificacion)
+        segundos = round(time.monotonic() - inicio, 3)
+        logger.info(f'Resúmenes de recordatorios: {len(notificaciones)} con {incluidos} pagos en {segundos}s')
+        return {'creados': len(notificaciones), 'pagos': incluidos, 'segundos': segundos}
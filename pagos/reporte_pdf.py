@@ -0,0 +1,171 @@
+"""
+Renderizado del reporte de pagos en PDF.
+
+- Cada página es una tabla independiente de tamaño fijo que se dibuja directamente
+  en el canvas y se cierra con showPage(): el documento se construye de forma
+  incremental, sin acumular una lista de flowables ni una tabla con todas las filas.
+- Los reportes muy grandes se dividen en tomos que se renderizan en paralelo en un
+  pool de procesos y se empaquetan en un ZIP.
+
+El módulo no importa Django para que las funciones puedan ejecutarse en los
+procesos del pool. El pool usa el método spawn: la exportación corre en un hilo
+dentro del worker web, y hacer fork de un proceso con varios hilos puede dejar
+al hijo bloqueado en un lock tomado por otro hilo (por ejemplo, el de logging).
+"""
+import multiprocessing
+import os
+import tempfile
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Table, TableStyle
+
+ENCABEZADOS_PDF = ['Cliente', 'Concepto', 'Monto', 'Período', 'Vencimiento', 'Estado']
+ANCHOS_COLUMNAS = [140, 115, 55, 80, 60, 55]
+ALTO_FILA = 16
+FILAS_POR_PAGINA = 42
+FILAS_PRIMERA_PAGINA = 34
+MARGEN = 0.6 * inch
+COLOR_PRINCIPAL = colors.HexColor('#667eea')
+
+ESTILO_TABLA = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), COLOR_PRINCIPAL),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 9),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ('FONTSIZE', (0, 1), (-1, -1), 7.5),
+])
+
+
+def _dibujar_encabezado(c, alto_pagina, titulo, info):
+    """Dibuja título e información del reporte; devuelve la coordenada Y disponible."""
+    y = alto_pagina - MARGEN
+    c.setFont('Helvetica-Bold', 18)
+    c.setFillColor(COLOR_PRINCIPAL)
+    c.drawString(MARGEN, y - 18, titulo)
+    c.setFillColor(colors.black)
+    y -= 40
+    c.setFont('Helvetica', 9)
+    for linea in info or []:
+        c.drawString(MARGEN, y, linea)
+        y -= 13
+    return y - 10
+
+
+def _dibujar_pagina(c, bloque, y_superior, numero_pagina, pie):
+    tabla = Table([ENCABEZADOS_PDF] + bloque, colWidths=ANCHOS_COLUMNAS, rowHeights=ALTO_FILA)
+    tabla.setStyle(ESTILO_TABLA)
+    _, alto = tabla.wrap(0, 0)
+    tabla.drawOn(c, MARGEN, y_superior - alto)
+    c.setFont('Helvetica', 8)
+    c.drawRightString(A4[0] - MARGEN, MARGEN / 2, f'{pie}Página {numero_pagina}')
+    return y_superior - alto
+
+
+def escribir_pdf(filas, destino, titulo='Reporte de Pagos', info=None, tomo=None):
+    """
+    Escribe el reporte página a página.
+
+    Args:
+        filas: Iterable de tuplas con las columnas de ENCABEZADOS_PDF
+        destino: Ruta o archivo binario abierto
+        titulo: Título de la primera página
+        info: Líneas de información bajo el título (fecha, filtros...)
+        tomo: Número de tomo si el reporte está dividido
+
+    Returns:
+        int: Cantidad de filas escritas
+    """
+    c = canvas.Canvas(destino, pagesize=A4)
+    _, alto_pagina = A4
+    pie = f'Tomo {tomo} - ' if tomo else ''
+    if tomo:
+        titulo = f'{titulo} (tomo {tomo})'
+
+    filas = iter(filas)
+    total = 0
+    numero_pagina = 1
+    y = _dibujar_encabezado(c, alto_pagina, titulo, info)
+    bloque = list(islice(filas, FILAS_PRIMERA_PAGINA))
+    while True:
+        total += len(bloque)
+        y_final = _dibujar_pagina(c, bloque, y, numero_pagina, pie)
+        siguiente = list(islice(filas, FILAS_POR_PAGINA))
+        if not siguiente:
+            break
+        c.showPage()
+        numero_pagina += 1
+        y = alto_pagina - MARGEN
+        bloque = siguiente
+
+    # Resumen al final: el total se conoce al terminar de recorrer las filas
+    c.setFont('Helvetica-Bold', 9)
+    c.drawString(MARGEN, y_final - 16, f'Total de pagos: {total}')
+    c.showPage()
+    c.save()
+    return total
+
+
+def renderizar_tomo(filas, ruta, titulo, info, tomo):
+    """Renderiza un tomo en un archivo; se ejecuta en un proceso del pool."""
+    return ruta, escribir_pdf(filas, ruta, titulo=titulo, info=info, tomo=tomo)
+
+
+def escribir_reporte_pdf(filas, destino, titulo='Reporte de Pagos', info=None,
+                         filas_por_tomo=50000, procesos=None):
+    """
+    Escribe el reporte completo, dividiéndolo en tomos si es muy grande.
+
+    Si las filas caben en un tomo se escribe un único PDF en el proceso actual.
+    Si no, cada tomo se renderiza en un pool de procesos y el destino recibe un
+    ZIP con todos los tomos. Como mucho hay `procesos` tomos en memoria a la vez.
+
+    Returns:
+        tuple: (filas escritas, cantidad de tomos)
+    """
+    filas = iter(filas)
+    primero = list(islice(filas, filas_por_tomo))
+    segundo = list(islice(filas, filas_por_tomo))
+    if not segundo:
+        return escribir_pdf(primero, destino, titulo=titulo, info=info), 1
+
+    procesos = procesos or min(4, os.cpu_count() or 1)
+    total = 0
+    tomos = 0
+    with tempfile.TemporaryDirectory() as directorio, \
+            ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context('spawn')) as pool, \
+            zipfile.ZipFile(destino, 'w', zipfile.ZIP_DEFLATED) as zf:
+        pendientes = deque()
+
+        def recoger():
+            nonlocal total
+            ruta, cantidad = pendientes.popleft().result()
+            zf.write(ruta, os.path.basename(ruta))
+            os.remove(ruta)
+            total += cantidad
+
+        bloque = primero
+        while bloque:
+            tomos += 1
+            ruta = os.path.join(directorio, f'pagos_tomo_{tomos:03d}.pdf')
+            pendientes.append(pool.submit(renderizar_tomo, bloque, ruta, titulo, info, tomos))
+            if tomos == 1:
+                bloque = segundo
+                continue
+            while len(pendientes) >= procesos:
+                recoger()
+            bloque = list(islice(filas, filas_por_tomo))
+
+        while pendientes:
+            recoger()
+
+    return total, tomos
@@ -0,0 +1,221 @@
+"""
+Mantenimiento del resumen mensual de pagos (ResumenMensualPagos).
+
+Cada fila acumula cantidad y monto de los pagos de un (año, mes, estado, método).
+- Pago.save()/delete() aplican la diferencia entre el estado anterior y el nuevo
+  del pago (señales en pagos/signals.py).
+- Las operaciones masivas que no pasan por save() (barrido de vencidos, generación
+  con bulk_create, acciones del admin) aplican deltas agrupados o recalculan los
+  períodos afectados.
+- `reconstruir()` recalcula todo el resumen con un único GROUP BY.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Sum, F
+from django.db.models.functions import Coalesce
+from .models import Pago, ResumenMensualPagos
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_CLAVE = ('periodo_anio', 'periodo_mes', 'estado', 'metodo_pago')
+
+
+def clave_pago(anio, mes, estado, metodo_pago):
+    """Clave del resumen; los pagos sin método se agrupan con metodo_pago=''."""
+    return (anio, mes, estado, metodo_pago or '')
+
+
+class ResumenPagosService:
+    """Servicio para mantener y consultar el resumen mensual de pagos."""
+
+    @staticmethod
+    def valores_pago(pago):
+        """Clave y monto de un pago (instancia o dict de values())."""
+        if isinstance(pago, dict):
+            return clave_pago(*(pago[c] for c in CAMPOS_CLAVE)), pago['monto']
+        # La instancia puede tener el monto sin convertir (ej. float asignado antes de guardar)
+        return (
+            clave_pago(pago.periodo_anio, pago.periodo_mes, pago.estado, pago.metodo_pago),
+            Decimal(str(pago.monto)),
+        )
+
+    @classmethod
+    def aplicar(cls, deltas):
+        """
+        Suma los deltas al resumen.
+
+        Args:
+            deltas: dict clave -> (cantidad, monto); las claves son (anio, mes, estado, metodo)
+        """
+        with transaction.atomic():
+            for (anio, mes, estado, metodo), (cantidad, monto) in deltas.items():
+                if not cantidad and not monto:
+                    continue
+                filtro = {'anio': anio, 'mes': mes, 'estado': estado, 'metodo_pago': metodo}
+                actualizados = ResumenMensualPagos.objects.filter(**filtro).update(
+                    cantidad=F('cantidad') + cantidad,
+                    monto=F('monto') + monto,
+                )
+                if actualizados:
+                    continue
+                try:
+                    with transaction.atomic():
+                        ResumenMensualPagos.objects.create(cantidad=cantidad, monto=monto, **filtro)
+                except IntegrityError:
+                    # Otro proceso creó la fila a la vez: sumar sobre la existente
+                    ResumenMensualPagos.objects.filter(**filtro).update(
+                        cantidad=F('cantidad') + cantidad,
+                        monto=F('monto') + monto,
+                    )
+
+    @classmethod
+    def registrar_cambio(cls, anterior=None, actual=None):
+        """
+        Aplica el cambio de un pago: resta sus valores anteriores y suma los actuales.
+
+        Args:
+            anterior: dict de values() del pago antes de guardarlo (None si es nuevo)
+            actual: Pago guardado (None si se eliminó)
+        """
+        deltas = defaultdict(lambda: [0, Decimal('0')])
+        if anterior:
+            clave, monto = cls.valores_pago(anterior)
+            deltas[clave][0] -= 1
+            deltas[clave][1] -= monto
+        if actual:
+            clave, monto = cls.valores_pago(actual)
+            deltas[clave][0] += 1
+            deltas[clave][1] += monto
+        cls.aplicar(deltas)
+
+    @staticmethod
+    def agrupar(queryset):
+        """Cantidad y monto por clave del resumen, en una sola consulta agrupada."""
+        filas = queryset.order_by().values(*CAMPOS_CLAVE).annotate(
+            total_cantidad=Count('pk'),
+            total_monto=Coalesce(Sum('monto'), Decimal('0')),
+        )
+        grupos = {}
+        for fila in filas:
+            # NULL y '' en metodo_pago caen en la misma clave
+            clave = clave_pago(*(fila[c] for c in CAMPOS_CLAVE))
+            cantidad, monto = grupos.get(clave, (0, Decimal('0')))
+            grupos[clave] = (cantidad + fila['total_cantidad'], monto + fila['total_monto'])
+        return grupos
+
+    @classmethod
+    def mover_estado(cls, queryset, nuevo_estado):
+        """
+        Traslada en el resumen los pagos del queryset a otro estado.
+
+        Se llama justo antes de un queryset.update(estado=...), dentro de la misma transacción.
+        """
+        deltas = defaultdict(lambda: [0, Decimal('0')])
+        for (anio, mes, estado, metodo), (cantidad, monto) in cls.agrupar(queryset).items():
+            deltas[(anio, mes, estado, metodo)][0] -= cantidad
+            deltas[(anio, mes, estado, metodo)][1] -= monto
+            deltas[(anio, mes, nuevo_estado, metodo)][0] += cantidad
+            deltas[(anio, mes, nuevo_estado, metodo)][1] += monto
+        cls.aplicar(deltas)
+
+    @classmethod
+    def recalcular(cls, periodos):
+        """
+        Recalcula el resumen de los períodos indicados desde los pagos.
+
+        Args:
+            periodos: Iterable de tuplas (anio, mes)
+        """
+        periodos = set(periodos)
+        if not periodos:
+            return 0
+        anios = {anio for anio, _ in periodos}
+        pagos = Pago.objects.filter(periodo_anio__in=anios)
+        with transaction.atomic():
+            grupos = {
+                clave: valores for clave, valores in cls.agrupar(pagos).items()
+                if (clave[0], clave[1]) in periodos
+            }
+            for anio, mes in periodos:
+                ResumenMensualPagos.objects.filter(anio=anio, mes=mes).delete()
+            ResumenMensualPagos.objects.bulk_create([
+                ResumenMensualPagos(
+                    anio=anio, mes=mes, estado=estado, metodo_pago=metodo,
+                    cantidad=cantidad, monto=monto,
+                )
+                for (anio, mes, estado, metodo), (cantidad, monto) in grupos.items()
+            ])
+        return len(grupos)
+
+    @classmethod
+    def reconstruir(cls, anio=None):
+        """
+        Reconstruye el resumen completo (o de un año) con un único GROUP BY.
+
+        Returns:
+            int: Filas del resumen creadas
+        """
+        pagos = Pago.objects.all()
+        resumen = ResumenMensualPagos.objects.all()
+        if anio:
+            pagos = pagos.filter(periodo_anio=anio)
+            resumen = resumen.filter(anio=anio)
+        with transaction.atomic():
+            grupos = cls.agrupar(pagos)
+            resumen.delete()
+            ResumenMensualPagos.objects.bulk_create([
+                ResumenMensualPagos(
+                    anio=anio_grupo, mes=mes, estado=estado, metodo_pago=metodo,
+                    cantidad=cantidad, monto=monto,
+                )
+                for (anio_grupo, mes, estado, metodo), (cantidad, monto) in grupos.items()
+            ], batch_size=1000)
+        logger.info(f'Resumen mensual de pagos reconstruido: {len(grupos)} fila(s)')
+        return len(grupos)
+
+    @staticmethod
+    def reporte_anual(anio):
+        """
+        Totales del año leídos del resumen (como máximo 12 meses x estados x métodos filas).
+
+        Returns:
+            dict: total_pagos, total_monto, monto_pagado, monto_pendiente, cantidad_pagados,
+                  promedio_pago, por_mes (mes -> {'monto', 'cantidad'} de pagados) y
+                  metodos_pago (lista de {'metodo_pago', 'total', 'cantidad'})
+        """
+        reporte = {
+            'total_pagos': 0,
+            'total_monto': Decimal('0'),
+            'monto_pagado': Decimal('0'),
+            'monto_pendiente': Decimal('0'),
+            'cantidad_pagados': 0,
+            'por_mes': {mes: {'monto': Decimal('0'), 'cantidad': 0} for mes in range(1, 13)},
+        }
+        metodos = defaultdict(lambda: {'total': Decimal('0'), 'cantidad': 0})
+
+        for fila in ResumenMensualPagos.objects.filter(anio=anio):
+            reporte['total_pagos'] += fila.cantidad
+            reporte['total_monto'] += fila.monto
+            if fila.estado == 'pagado':
+                reporte['monto_pagado'] += fila.monto
+                reporte['cantidad_pagados'] += fila.cantidad
+                if fila.mes in reporte['por_mes']:
+                    reporte['por_mes'][fila.mes]['monto'] += fila.monto
+                    reporte['por_mes'][fila.mes]['cantidad'] += fila.cantidad
+                if fila.metodo_pago:
+                    metodos[fila.metodo_pago]['total'] += fila.monto
+                    metodos[fila.metodo_pago]['cantidad'] += fila.cantidad
+            elif fila.estado in ('pendiente', 'vencido'):
+                reporte['monto_pendiente'] += fila.monto
+
+        reporte['promedio_pago'] = (
+            reporte['monto_pagado'] / reporte['cantidad_pagados'] if reporte['cantidad_pagados'] else 0
+        )
+        reporte['metodos_pago'] = sorted(
+            ({'metodo_pago': metodo, **valores} for metodo, valores in metodos.items() if valores['cantidad']),
+            key=lambda m: m['total'],
+            reverse=True,
+        )
+        return reporte
@@ -0,0 +1,180 @@
+"""
+Mantenimiento del saldo por cliente (SaldoCliente).
+
+- Pago.save()/delete() recalculan el saldo del cliente del pago en la misma
+  transacción (señales en pagos/signals.py); si el pago cambió de cliente,
+  también el del cliente anterior.
+- Las operaciones masivas (PagosMasivosService.guardar, generación de pagos)
+  recalculan los clientes afectados por bloques: una consulta agrupada y un
+  upsert por bloque.
+- El comando reconstruir_saldos_clientes recalcula todos los saldos cada noche
+  (los rangos de antigüedad cambian con la fecha) y con --verificar solo informa
+  las diferencias.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce
+from clientes.models import Cliente
+from .models import Pago, SaldoCliente
+from .vencimientos import VencimientoPagos
+
+logger = logging.getLogger(__name__)
+
+ESTADOS_ABIERTOS = ('pendiente', 'vencido')
+CAMPOS_SALDO = (
+    'pagos_pendientes', 'monto_pendiente', 'pagos_vencidos', 'monto_vencido',
+    'monto_0_30', 'monto_31_60', 'monto_61_90', 'monto_90_mas',
+    'vencimiento_mas_antiguo', 'ultimo_pago',
+)
+
+
+class SaldosClienteService:
+    """Servicio para mantener y consultar el saldo de cada cliente."""
+
+    BLOQUE = 500
+
+    @staticmethod
+    def agregados(hoy):
+        """Agregados de SaldoCliente para un values('cliente_id').annotate(...)."""
+        abierto = Q(estado__in=ESTADOS_ABIERTOS)
+        vencido = VencimientoPagos.condicion_vencido(hoy)
+        hace_30 = hoy - timedelta(days=30)
+        hace_60 = hoy - timedelta(days=60)
+        hace_90 = hoy - timedelta(days=90)
+        cero = Decimal('0')
+        return {
+            'pagos_pendientes': Count('pk', filter=abierto),
+            'monto_pendiente': Coalesce(Sum('monto', filter=abierto), cero),
+            'pagos_vencidos': Count('pk', filter=vencido),
+            'monto_vencido': Coalesce(Sum('monto', filter=vencido), cero),
+            'monto_0_30': Coalesce(Sum('monto', filter=vencido & Q(fecha_vencimiento__gte=hace_30)), cero),
+            'monto_31_60': Coalesce(Sum('monto', filter=vencido & Q(
+                fecha_vencimiento__lt=hace_30, fecha_vencimiento__gte=hace_60)), cero),
+            'monto_61_90': Coalesce(Sum('monto', filter=vencido & Q(
+                fecha_vencimiento__lt=hace_60, fecha_vencimiento__gte=hace_90)), cero),
+            'monto_90_mas': Coalesce(Sum('monto', filter=vencido & Q(fecha_vencimiento__lt=hace_90)), cero),
+            'vencimiento_mas_antiguo': Min('fecha_vencimiento', filter=abierto),
+            'ultimo_pago': Max('fecha_pago', filter=Q(estado='pagado')),
+        }
+
+    @classmethod
+    def calcular(cls, cliente_ids, hoy=None):
+        """
+        Calcula (sin guardar) los saldos de los clientes indicados con una consulta agrupada.
+
+        Returns:
+            dict: cliente_id -> SaldoCliente sin guardar (en cero si el cliente no tiene pagos)
+        """
+        hoy = hoy or VencimientoPagos.hoy()
+        saldos = {cliente_id: SaldoCliente(cliente_id=cliente_id, fecha_corte=hoy) for cliente_id in cliente_ids}
+        filas = (
+            Pago.objects.filter(cliente_id__in=list(saldos))
+            .order_by().values('cliente_id').annotate(**cls.agregados(hoy))
+        )
+        for fila in filas:
+            saldo = saldos[fila.pop('cliente_id')]
+            for campo, valor in fila.items():
+                setattr(saldo, campo, valor)
+        return saldos
+
+    @classmethod
+    def recalcular(cls, cliente_ids, hoy=None):
+        """
+        Recalcula y guarda los saldos de los clientes indicados.
+
+        Returns:
+            int: Saldos guardados
+        """
+        ids = sorted({cliente_id for cliente_id in cliente_ids if cliente_id})
+        guardados = 0
+        with transaction.atomic():
+            for inicio in range(0, len(ids), cls.BLOQUE):
+                bloque = ids[inicio:inicio + cls.BLOQUE]
+                # Un cliente eliminado en esta misma transacción no debe recibir saldo
+                existentes = Cliente.objects.filter(pk__in=bloque).values_list('pk', flat=True)
+                saldos = cls.calcular(existentes, hoy).values()
+                SaldoCliente.objects.bulk_create(
+                    saldos,
+                    update_conflicts=True,
+                    unique_fields=['cliente'],
+                    update_fields=[*CAMPOS_SALDO, 'fecha_corte', 'fecha_actualizacion'],
+                )
+                guardados += len(saldos)
+        return guardados
+
+    @classmethod
+    def recalcular_pagos(cls, pago_ids, hoy=None):
+        """Recalcula los saldos de los clientes de los pagos indicados."""
+        ids = list(pago_ids)
+        cliente_ids = set()
+        for inicio in range(0, len(ids), cls.BLOQUE):
+            cliente_ids.update(
+                Pago.objects.filter(pk__in=ids[inicio:inicio + cls.BLOQUE])
+                .values_list('cliente_id', flat=True).distinct()
+            )
+        return cls.recalcular(cliente_ids, hoy)
+
+    @classmethod
+    def reconstruir(cls, hoy=None):
+        """
+        Recalcula el saldo de todos los clientes y elimina los huérfanos.
+
+        Returns:
+            int: Saldos guardados
+        """
+        ids = list(Cliente.objects.order_by('pk').values_list('pk', flat=True))
+        with transaction.atomic():
+            SaldoCliente.objects.exclude(cliente_id__in=Cliente.objects.values('pk')).delete()
+            guardados = cls.recalcular(ids, hoy)
+        logger.info(f'Saldos de clientes reconstruidos: {guardados}')
+        return guardados
+
+    @classmethod
+    def verificar(cls, hoy=None):
+        """
+        Compara los saldos guardados con los calculados desde los pagos, sin modificar nada.
+
+        Returns:
+            list: dicts {'cliente_id', 'campo', 'guardado', 'calculado'} de las diferencias
+                  (campo '*' si falta el saldo del cliente)
+        """
+        hoy = hoy or VencimientoPagos.hoy()
+        ids = list(Cliente.objects.order_by('pk').values_list('pk', flat=True))
+        diferencias = []
+        for inicio in range(0, len(ids), cls.BLOQUE):
+            bloque = ids[inicio:inicio + cls.BLOQUE]
+            guardados = SaldoCliente.objects.in_bulk(bloque)
+            # Cada saldo se compara a su propia fecha de corte (los rangos se mueven con los días)
+            por_fecha = defaultdict(list)
+            for cliente_id in bloque:
+                por_fecha[guardados[cliente_id].fecha_corte if cliente_id in guardados else hoy].append(cliente_id)
+            calculados = {}
+            for fecha, clientes in por_fecha.items():
+                calculados.update(cls.calcular(clientes, fecha))
+            for cliente_id, calculado in calculados.items():
+                guardado = guardados.get(cliente_id)
+                if guardado is None:
+                    diferencias.append({'cliente_id': cliente_id, 'campo': '*', 'guardado': None, 'calculado': None})
+                    continue
+                for campo in CAMPOS_SALDO:
+                    if getattr(guardado, campo) != getattr(calculado, campo):
+                        diferencias.append({
+                            'cliente_id': cliente_id,
+                            'campo': campo,
+                            'guardado': getattr(guardado, campo),
+                            'calculado': getattr(calculado, campo),
+                        })
+        return diferencias
+
+    @classmethod
+    def de_cliente(cls, cliente):
+        """Saldo del cliente (lectura directa); si aún no existe, lo calcula y lo guarda."""
+        try:
+            return cliente.saldo
+        except SaldoCliente.DoesNotExist:
+            cls.recalcular([cliente.pk])
+            return SaldoCliente.objects.get(pk=cliente.pk)
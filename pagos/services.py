@@ -2,12 +2,22 @@
 Servicios para el módulo de pagos.
 """
 from django.utils import timezone
-from django.template.loader import render_to_string
 from django.core.mail import EmailMultiAlternatives
 from decouple import config
-from datetime import timedelta
+from django.db import transaction
+from django.db.models import Q
+from datetime import timedelta, date
+from calendar import monthrange
 from notificaciones.models import Notificacion, ConfiguracionNotificacion
+from .models import Pago, PlanPago
+from .vencimientos import VencimientoPagos
+from .recordatorios import fila_de_pago, renderizar_bloque
+from .resumen import ResumenPagosService
+from .saldos import SaldosClienteService
+from core.estadisticas import invalidar_estadisticas
+from core.busqueda import BusquedaService
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -147,78 +157,200 @@ class RecordatorioPagoService:
     @staticmethod
     def _generar_mensaje_antes_vencimiento(pago, dias_antes):
         """Genera el mensaje de recordatorio antes de vencimiento."""
-        cliente = pago.cliente
-        fecha_vencimiento = pago.fecha_vencimiento.strftime('%d de %B de %Y')
-        
-        # Mensaje en texto plano
-        mensaje_texto = f"""Estimado/a {cliente.nombre_completo},
+        return renderizar_bloque('antes', [fila_de_pago(pago)], dias_antes, timezone.now().date())[0]
+    
+    @staticmethod
+    def _generar_mensaje_vencido(pago, dias_vencido):
+        """Genera el mensaje de recordatorio para pago vencido."""
+        hoy = pago.fecha_vencimiento + timedelta(days=dias_vencido)
+        return renderizar_bloque('vencido', [fila_de_pago(pago)], None, hoy)[0]
 
-Le recordamos que tiene un pago próximo a vencer:
 
-DETALLES DEL PAGO:
-• Concepto: {pago.concepto}
-• Monto: ${pago.monto:,.2f}
-• Fecha de vencimiento: {fecha_vencimiento}
-• Días restantes: {dias_antes} día(s)
 
-IMPORTANTE:
-Por favor, realice el pago antes de la fecha de vencimiento para evitar interrupciones en su servicio.
+MESES_NOMBRES = ['', 'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
+                 'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
 
-Si tiene alguna pregunta o necesita asistencia, no dude en contactarnos.
 
-Saludos cordiales,
-Equipo AdminiRed
-"""
+class GeneradorPagosService:
+    """
+    Genera los pagos mensuales de todos los PlanPago activos en operaciones por lotes.
+    
+    Los planes se cargan una sola vez, los períodos ya facturados se obtienen con
+    una única consulta y los pagos nuevos se insertan con bulk_create por bloques
+    dentro de una transacción. La restricción única por período hace que volver a
+    ejecutar la generación no cree duplicados.
+    """
+    
+    BATCH_SIZE = 1000
+    
+    @staticmethod
+    def rango_periodos(desde, hasta):
+        """
+        Devuelve la lista de períodos (anio, mes) entre dos períodos, ambos incluidos.
         
-        # Intentar generar mensaje HTML
-        try:
-            mensaje_html = render_to_string('pagos/emails/recordatorio_antes_vencimiento.html', {
-                'cliente': cliente,
-                'pago': pago,
-                'fecha_vencimiento': fecha_vencimiento,
-                'dias_antes': dias_antes,
-            })
-            return mensaje_html
-        except Exception as e:
-            logger.warning(f'No se pudo cargar plantilla HTML, usando texto plano: {str(e)}')
-            return mensaje_texto
+        Args:
+            desde: Tupla (anio, mes) inicial
+            hasta: Tupla (anio, mes) final
+        """
+        anio, mes = desde
+        periodos = []
+        while (anio, mes) <= tuple(hasta):
+            periodos.append((anio, mes))
+            mes += 1
+            if mes > 12:
+                mes = 1
+                anio += 1
+        return periodos
     
     @staticmethod
-    def _generar_mensaje_vencido(pago, dias_vencido):
-        """Genera el mensaje de recordatorio para pago vencido."""
-        cliente = pago.cliente
-        fecha_vencimiento = pago.fecha_vencimiento.strftime('%d de %B de %Y')
+    def calcular_fecha_vencimiento(anio, mes, dia_vencimiento):
+        """Ajusta el día de vencimiento del plan al último día del mes si es necesario."""
+        dias_en_mes = monthrange(anio, mes)[1]
+        return date(anio, mes, min(dia_vencimiento, dias_en_mes))
+    
+    @staticmethod
+    def periodos_existentes(periodos):
+        """
+        Obtiene en una sola consulta las tuplas (cliente, instalacion, anio, mes)
+        que ya tienen un pago activo en los períodos indicados.
+        """
+        filtro_periodos = Q()
+        for anio, mes in periodos:
+            filtro_periodos |= Q(periodo_anio=anio, periodo_mes=mes)
         
-        # Mensaje en texto plano
-        mensaje_texto = f"""Estimado/a {cliente.nombre_completo},
-
-ATENCIÓN: Su pago está vencido
-
-DETALLES DEL PAGO:
-• Concepto: {pago.concepto}
-• Monto: ${pago.monto:,.2f}
-• Fecha de vencimiento: {fecha_vencimiento}
-• Días vencido: {dias_vencido} día(s)
-
-URGENTE:
-Su pago está vencido. Por favor, realice el pago lo antes posible para evitar interrupciones en su servicio o recargos por mora.
+        return set(
+            Pago.objects.filter(filtro_periodos, instalacion__isnull=False)
+            .exclude(estado='cancelado')
+            .values_list('cliente_id', 'instalacion_id', 'periodo_anio', 'periodo_mes')
+        )
+    
+    @classmethod
+    def construir_pagos(cls, periodos, planes=None, existentes=None):
+        """
+        Construye en memoria los pagos que faltan para los períodos indicados.
+        
+        Returns:
+            tuple: (lista de Pago sin guardar, cantidad de pagos ya existentes)
+        """
+        if planes is None:
+            planes = list(
+                PlanPago.objects.filter(activo=True).values_list(
+                    'instalacion_id', 'instalacion__cliente_id', 'monto_mensual', 'dia_vencimiento'
+                )
+            )
+        if existentes is None:
+            existentes = cls.periodos_existentes(periodos)
+        
+        hoy = timezone.now().date()
+        nuevos = []
+        omitidos = 0
+        for anio, mes in periodos:
+            concepto = f"Pago mensual de servicio - {MESES_NOMBRES[mes]} {anio}"
+            for instalacion_id, cliente_id, monto, dia_vencimiento in planes:
+                if (cliente_id, instalacion_id, anio, mes) in existentes:
+                    omitidos += 1
+                    continue
+                fecha_vencimiento = cls.calcular_fecha_vencimiento(anio, mes, dia_vencimiento)
+                nuevos.append(Pago(
+                    cliente_id=cliente_id,
+                    instalacion_id=instalacion_id,
+                    monto=monto,
+                    concepto=concepto,
+                    periodo_mes=mes,
+                    periodo_anio=anio,
+                    fecha_vencimiento=fecha_vencimiento,
+                    # bulk_create no pasa por Pago.save(): aplicar aquí la misma regla de vencimiento
+                    estado=VencimientoPagos.estado_para('pendiente', fecha_vencimiento, hoy),
+                ))
+        return nuevos, omitidos
+    
+    @classmethod
+    def generar(cls, periodos, dry_run=False, batch_size=None):
+        """
+        Genera los pagos de los períodos indicados.
+        
+        Args:
+            periodos: Lista de tuplas (anio, mes)
+            dry_run: Si es True, solo calcula los pagos sin guardarlos
+            batch_size: Tamaño de cada bloque de bulk_create
+        
+        Returns:
+            dict: {'planes', 'creados', 'existentes', 'segundos', 'filas_por_segundo'}
+        """
+        batch_size = batch_size or cls.BATCH_SIZE
+        inicio = time.monotonic()
+        
+        planes = list(
+            PlanPago.objects.filter(activo=True).values_list(
+                'instalacion_id', 'instalacion__cliente_id', 'monto_mensual', 'dia_vencimiento'
+            )
+        )
+        nuevos, omitidos = cls.construir_pagos(periodos, planes=planes)
+        creados = len(nuevos)
+        
+        if not dry_run and nuevos:
+            en_periodos = Q(pk__in=[])
+            for anio, mes in periodos:
+                en_periodos |= Q(periodo_anio=anio, periodo_mes=mes)
+            with transaction.atomic():
+                previos = Pago.objects.filter(en_periodos).count()
+                for i in range(0, len(nuevos), batch_size):
+                    # ignore_conflicts cubre ejecuciones concurrentes: la restricción única descarta duplicados
+                    Pago.objects.bulk_create(nuevos[i:i + batch_size], ignore_conflicts=True)
+                # Los descartados no se informan: contar las filas que realmente se insertaron
+                creados = Pago.objects.filter(en_periodos).count() - previos
+                omitidos += len(nuevos) - creados
+                # bulk_create no emite post_save: recalcular el resumen de los períodos generados
+                ResumenPagosService.recalcular(periodos)
+                # ... y el saldo de los clientes con plan activo
+                SaldosClienteService.recalcular({cliente_id for _, cliente_id, _, _ in planes})
+                # ... ni las señales que mantienen los documentos de búsqueda
+                BusquedaService.indexar_faltantes('pago', Pago.objects.filter(en_periodos))
+            invalidar_estadisticas('pagos')
+        
+        segundos = time.monotonic() - inicio
+        return {
+            'planes': len(planes),
+            'creados': creados,
+            'existentes': omitidos,
+            'segundos': segundos,
+            'filas_por_segundo': creados / segundos if segundos > 0 else 0,
+        }
 
-Si tiene alguna pregunta o necesita asistencia, no dude en contactarnos.
 
-Saludos cordiales,
-Equipo AdminiRed
-"""
+class PagosMasivosService:
+    """Cambios de varios pagos a la vez con bulk_update (sin pasar por Pago.save())."""
+    
+    @staticmethod
+    def guardar(pagos, campos, batch_size=500):
+        """
+        Guarda los pagos modificados en memoria y mantiene lo que en save() hacen las
+        señales: resumen mensual, saldo de los clientes, documentos de búsqueda y estadísticas.
         
-        # Intentar generar mensaje HTML
-        try:
-            mensaje_html = render_to_string('pagos/emails/recordatorio_vencido.html', {
-                'cliente': cliente,
-                'pago': pago,
-                'fecha_vencimiento': fecha_vencimiento,
-                'dias_vencido': dias_vencido,
-            })
-            return mensaje_html
-        except Exception as e:
-            logger.warning(f'No se pudo cargar plantilla HTML, usando texto plano: {str(e)}')
-            return mensaje_texto
-
+        Debe llamarse dentro de transaction.atomic(); las instancias deben tener
+        cargados periodo_anio y periodo_mes.
+        
+        Returns:
+            int: Pagos guardados
+        """
+        if not pagos:
+            return 0
+        ids = [pago.pk for pago in pagos]
+        # Los campos con el mismo valor en todos los pagos van en un UPDATE simple;
+        # bulk_update solo para los que varían (genera un CASE por fila)
+        comunes = {}
+        for campo in campos:
+            valores = {getattr(pago, campo) for pago in pagos}
+            if len(valores) == 1:
+                comunes[campo] = valores.pop()
+        if comunes:
+            for inicio in range(0, len(ids), batch_size):
+                Pago.objects.filter(pk__in=ids[inicio:inicio + batch_size]).update(**comunes)
+        variables = [campo for campo in campos if campo not in comunes]
+        if variables:
+            Pago.objects.bulk_update(pagos, variables, batch_size=batch_size)
+        ResumenPagosService.recalcular({(pago.periodo_anio, pago.periodo_mes) for pago in pagos})
+        SaldosClienteService.recalcular_pagos(ids)
+        transaction.on_commit(lambda: BusquedaService.indexar('pago', Pago.objects.filter(pk__in=ids)))
+        transaction.on_commit(lambda: invalidar_estadisticas('pagos'))
+        return len(pagos)
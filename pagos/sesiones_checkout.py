@@ -0,0 +1,116 @@
+"""
+Registro de sesiones de checkout abiertas (TransaccionPago pendientes y vigentes).
+
+Cuando el cliente pulsa "Pagar" varias veces, o vuelve al portal, se reutiliza la
+sesión abierta del mismo pago y pasarela en lugar de crear otra en la pasarela:
+- Solo se reutiliza si sigue pendiente, no ha vencido y el monto no cambió; las
+  sesiones con otro monto se cancelan aquí y también se expiran en la pasarela
+  (`PaymentGateway.expirar_sesiones`), para que no se puedan pagar con el monto viejo.
+- `PaymentGateway.crear_intento_pago` bloquea la fila del Pago solo para buscar y
+  para registrar la sesión, no durante la llamada a la pasarela. Si dos clics
+  simultáneos crean dos sesiones, al registrar se conserva la primera y la otra se
+  cancela y se expira.
+- Si una sesión se paga con un monto distinto del pago, el webhook no marca el
+  pago como pagado: la transacción queda en revisión (ver BandejaWebhooks.completar).
+- `expirar_vencidas()` cancela en bloque las sesiones vencidas (comando
+  expirar_sesiones_pago). Si una sesión cancelada se paga igualmente, el webhook
+  la completa.
+"""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .models import TransaccionPago
+
+logger = logging.getLogger(__name__)
+
+# Vigencia máxima de una sesión abierta por pasarela, en minutos
+# (Stripe: entre 30 minutos y 24 horas; las órdenes de PayPal sin aprobar vencen a las 3 horas)
+VIGENCIA_MAXIMA = {
+    'stripe': 24 * 60,
+    'paypal': 3 * 60,
+}
+VIGENCIA_MINIMA = {
+    'stripe': 30,
+}
+
+
+class SesionesCheckoutService:
+    """Servicio para reutilizar y expirar sesiones de checkout."""
+
+    @staticmethod
+    def vigencia_minutos(pasarela):
+        minutos = getattr(settings, 'PAGOS_CHECKOUT_VIGENCIA_MINUTOS', 60)
+        minutos = min(minutos, VIGENCIA_MAXIMA.get(pasarela, minutos))
+        return max(minutos, VIGENCIA_MINIMA.get(pasarela, 1))
+
+    @classmethod
+    def vencimiento(cls, pasarela):
+        """Fecha hasta la que una sesión nueva de la pasarela se puede reutilizar."""
+        return timezone.now() + timedelta(minutes=cls.vigencia_minutos(pasarela))
+
+    @staticmethod
+    def _abiertas(pago, pasarela):
+        """Sesiones registradas, pendientes y vigentes del pago en la pasarela."""
+        return TransaccionPago.objects.filter(
+            pago=pago,
+            pasarela=pasarela,
+            estado='pendiente',
+            fecha_expiracion__gt=timezone.now(),
+        ).exclude(url_checkout__isnull=True).exclude(url_checkout='')
+
+    @classmethod
+    def buscar_abierta(cls, pago, pasarela):
+        """
+        Sesión pendiente y vigente del pago en la pasarela con su monto actual.
+
+        Returns:
+            TransaccionPago o None
+        """
+        return cls._abiertas(pago, pasarela).filter(monto=pago.monto).order_by('-fecha_creacion').first()
+
+    @classmethod
+    def cancelar_obsoletas(cls, pago, pasarela):
+        """
+        Cancela las sesiones pendientes del pago con otro monto.
+
+        Solo las cancela en la base de datos: quien llama debe expirarlas en la
+        pasarela (fuera del bloqueo del pago).
+
+        Returns:
+            list: TransaccionPago canceladas
+        """
+        obsoletas = list(cls._abiertas(pago, pasarela).exclude(monto=pago.monto))
+        if obsoletas:
+            cls.cancelar(obsoletas, 'Sesión de pago reemplazada: el monto del pago cambió')
+            logger.info(f'Sesiones de pago canceladas por cambio de monto (pago {pago.pk}): {len(obsoletas)}')
+        return obsoletas
+
+    @staticmethod
+    def cancelar(transacciones, mensaje):
+        """Cancela sesiones que siguen pendientes."""
+        TransaccionPago.objects.filter(
+            pk__in=[transaccion.pk for transaccion in transacciones],
+            estado='pendiente',
+        ).update(estado='cancelada', mensaje_error=mensaje)
+
+    @classmethod
+    def registrar(cls, transaccion_id, url, fecha_expiracion):
+        """Guarda la URL y la vigencia de una sesión recién creada."""
+        TransaccionPago.objects.filter(pk=transaccion_id).update(
+            url_checkout=url or None,
+            fecha_expiracion=fecha_expiracion,
+        )
+
+    @staticmethod
+    def expirar_vencidas():
+        """
+        Cancela en bloque las sesiones pendientes vencidas.
+
+        Returns:
+            int: Sesiones canceladas
+        """
+        return TransaccionPago.objects.filter(
+            estado='pendiente',
+            fecha_expiracion__lt=timezone.now(),
+        ).update(estado='cancelada', mensaje_error='Sesión de pago vencida')
@@ -0,0 +1,69 @@
+"""Señales para el modelo Pago."""
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from core.estadisticas import invalidar_estadisticas
+from clientes.models import Cliente
+from instalaciones.models import Instalacion
+from .models import Pago
+from .resumen import ResumenPagosService, CAMPOS_CLAVE
+from .saldos import SaldosClienteService
+
+
+@receiver(post_save, sender=Pago)
+@receiver(post_delete, sender=Pago)
+def invalidar_estadisticas_pagos(sender, instance, **kwargs):
+    """Invalida las estadísticas en caché de los listados de pagos."""
+    invalidar_estadisticas('pagos')
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_save, sender=Instalacion)
+@receiver(post_delete, sender=Instalacion)
+def invalidar_estadisticas_pagos_relacionados(sender, instance, **kwargs):
+    """Los listados, reportes y exportaciones de pagos muestran datos del cliente y del plan."""
+    invalidar_estadisticas('pagos')
+
+
+@receiver(pre_save, sender=Pago)
+def guardar_valores_resumen(sender, instance, raw=False, **kwargs):
+    """Guarda los valores que el pago aporta al resumen antes de modificarlo."""
+    instance._resumen_anterior = None
+    if instance.pk and not raw:
+        instance._resumen_anterior = Pago.objects.filter(pk=instance.pk).values(
+            *CAMPOS_CLAVE, 'monto', 'cliente_id'
+        ).first()
+
+
+@receiver(post_save, sender=Pago)
+def actualizar_resumen_al_guardar(sender, instance, raw=False, **kwargs):
+    """Aplica al resumen mensual la diferencia entre los valores anteriores y los nuevos."""
+    if raw:
+        return
+    ResumenPagosService.registrar_cambio(
+        anterior=getattr(instance, '_resumen_anterior', None),
+        actual=instance,
+    )
+
+
+@receiver(post_delete, sender=Pago)
+def actualizar_resumen_al_eliminar(sender, instance, **kwargs):
+    """Descuenta del resumen mensual un pago eliminado."""
+    ResumenPagosService.registrar_cambio(anterior=instance)
+
+
+@receiver(post_save, sender=Pago)
+def actualizar_saldo_al_guardar(sender, instance, raw=False, **kwargs):
+    """Recalcula el saldo del cliente (y el del anterior si el pago cambió de cliente)."""
+    if raw:
+        return
+    anterior = getattr(instance, '_resumen_anterior', None)
+    SaldosClienteService.recalcular({instance.cliente_id, anterior['cliente_id'] if anterior else None})
+
+
+@receiver(post_delete, sender=Pago)
+def actualizar_saldo_al_eliminar(sender, instance, origin=None, **kwargs):
+    """Recalcula el saldo del cliente de un pago eliminado (salvo si se elimina el cliente)."""
+    if isinstance(origin, Cliente) or getattr(origin, 'model', None) is Cliente:
+        return
+    SaldosClienteService.recalcular([instance.cliente_id])
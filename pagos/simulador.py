@@ -0,0 +1,451 @@
+"""
+Simulador HTTP local de las API de Stripe, Mercado Pago y PayPal.
+
+Implementa los endpoints que usan pagos/payment_gateway.py y pagos/conciliacion.py,
+con latencia y tasa de errores configurables, y emite los webhooks firmados que
+recibe la aplicación. Sirve para pruebas de carga y desarrollo sin sandboxes
+(comandos simular_pasarelas y benchmark_checkout):
+
+    with SimuladorPasarelas(latencia_ms=(20, 80), tasa_errores=0.01) as simulador:
+        # STRIPE_API_URL, MERCADOPAGO_API_URL y PAYPAL_API_URL = simulador.url
+        ...
+        simulador.pagar(session_id)   # el cliente paga: se emite el webhook
+
+El pago también se puede simular con POST {url}/_simulador/pagar/<id>, y
+GET {url}/_simulador/estadisticas devuelve las peticiones atendidas por endpoint.
+PayPal no emite webhooks: la aplicación no tiene receptor para ellos.
+"""
+import hashlib
+import hmac
+import itertools
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+def _firma(secreto, mensaje):
+    return hmac.new(secreto.encode('utf-8'), mensaje.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+class ManejadorSimulador(BaseHTTPRequestHandler):
+    """Atiende una petición y la delega en el SimuladorPasarelas del servidor."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _atender(self, metodo):
+        partes = urlsplit(self.path)
+        longitud = int(self.headers.get('Content-Length') or 0)
+        cuerpo = self.rfile.read(longitud).decode('utf-8') if longitud else ''
+        estado, datos = self.server.simulador.atender(
+            metodo, partes.path, parse_qs(partes.query), cuerpo, self.headers.get('Content-Type', ''),
+        )
+        respuesta = json.dumps(datos).encode('utf-8')
+        self.send_response(estado)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(respuesta)))
+        self.end_headers()
+        self.wfile.write(respuesta)
+
+    def do_GET(self):
+        self._atender('GET')
+
+    def do_POST(self):
+        self._atender('POST')
+
+    def do_PUT(self):
+        self._atender('PUT')
+
+
+class SimuladorPasarelas:
+    """
+    Servidor HTTP que imita las API de las pasarelas de pago.
+
+    Args:
+        host, puerto: Dirección de escucha (puerto 0 = uno libre)
+        latencia_ms: (mínimo, máximo) de la latencia añadida a cada petición de API
+        tasa_errores: Fracción de peticiones de API que responden 503
+        url_webhooks: dict pasarela -> URL a la que se envían sus webhooks
+        retraso_webhook_ms: Espera entre el pago y el envío del webhook
+        tasa_duplicados: Fracción de webhooks que se envían dos veces
+        secreto_stripe: Secreto con el que se firman los webhooks de Stripe
+        secreto_mercadopago: Secreto con el que se firman las notificaciones de Mercado Pago
+        semilla: Semilla del generador aleatorio (para ejecuciones reproducibles)
+    """
+
+    def __init__(self, host='127.0.0.1', puerto=0, latencia_ms=(0, 0), tasa_errores=0.0,
+                 url_webhooks=None, retraso_webhook_ms=0, tasa_duplicados=0.0,
+                 secreto_stripe='', secreto_mercadopago='', semilla=None):
+        self.host = host
+        self.puerto = puerto
+        self.latencia_ms = latencia_ms
+        self.tasa_errores = tasa_errores
+        self.url_webhooks = dict(url_webhooks or {})
+        self.retraso_webhook_ms = retraso_webhook_ms
+        self.tasa_duplicados = tasa_duplicados
+        self.secreto_stripe = secreto_stripe
+        self.secreto_mercadopago = secreto_mercadopago
+
+        self._random = random.Random(semilla)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.sesiones = {}      # Stripe: checkout sessions
+        self.preferencias = {}  # Mercado Pago: preferencias
+        self.pagos_mp = {}      # Mercado Pago: pagos
+        self.ordenes = {}       # PayPal: órdenes
+        self.peticiones = {}
+        self.webhooks = {'enviados': 0, 'fallidos': 0}
+        self._servidor = None
+        self._hilo = None
+        self._rutas = [
+            ('POST', r'/v1/customers', self._stripe_cliente),
+            ('POST', r'/v1/payment_intents', self._stripe_intento),
+            ('POST', r'/v1/checkout/sessions', self._stripe_crear_sesion),
+            ('GET', r'/v1/checkout/sessions/(?P<id>[^/]+)', self._stripe_sesion),
+            ('POST', r'/v1/checkout/sessions/(?P<id>[^/]+)/expire', self._stripe_expirar_sesion),
+            ('POST', r'/v1/refunds', self._stripe_reembolso),
+            ('POST', r'/checkout/preferences', self._mp_crear_preferencia),
+            ('PUT', r'/checkout/preferences/(?P<id>[^/]+)', self._mp_actualizar_preferencia),
+            ('GET', r'/v1/payments/search', self._mp_buscar_pagos),
+            ('GET', r'/v1/payments/(?P<id>[^/]+)', self._mp_pago),
+            ('POST', r'/v1/payments/(?P<id>[^/]+)/refunds', self._mp_reembolso),
+            ('POST', r'/v1/oauth2/token', self._paypal_token),
+            ('POST', r'/v2/checkout/orders', self._paypal_crear_orden),
+            ('GET', r'/v2/checkout/orders/(?P<id>[^/]+)', self._paypal_orden),
+            ('POST', r'/v2/payments/captures/(?P<id>[^/]+)/refund', self._paypal_reembolso),
+        ]
+
+    # ------------------------------------------------------------------
+    # Servidor
+    # ------------------------------------------------------------------
+
+    @property
+    def url(self):
+        return f'http://{self.host}:{self._servidor.server_port}'
+
+    def iniciar(self):
+        self._servidor = ThreadingHTTPServer((self.host, self.puerto), ManejadorSimulador)
+        self._servidor.daemon_threads = True
+        self._servidor.simulador = self
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._hilo.start()
+        return self.url
+
+    def detener(self):
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+    def __enter__(self):
+        self.iniciar()
+        return self
+
+    def __exit__(self, *exc):
+        self.detener()
+
+    def _nuevo_id(self, prefijo):
+        with self._lock:
+            return f'{prefijo}{next(self._ids)}'
+
+    def atender(self, metodo, ruta, parametros, cuerpo, content_type):
+        """Resuelve una petición: (código HTTP, datos JSON)."""
+        if ruta.startswith('/_simulador/'):
+            return self._control(metodo, ruta)
+
+        for metodo_ruta, patron, funcion in self._rutas:
+            coincidencia = re.fullmatch(patron, ruta)
+            if metodo_ruta == metodo and coincidencia:
+                break
+        else:
+            return 404, {'error': {'message': f'Ruta no simulada: {metodo} {ruta}'}}
+
+        with self._lock:
+            self.peticiones[patron] = self.peticiones.get(patron, 0) + 1
+            minimo, maximo = self.latencia_ms
+            latencia = self._random.uniform(minimo, maximo) / 1000
+            falla = self._random.random() < self.tasa_errores
+        if latencia:
+            time.sleep(latencia)
+        if falla:
+            return 503, {'error': {'message': 'Error simulado'}, 'message': 'Error simulado'}
+
+        if 'json' in content_type and cuerpo:
+            datos = json.loads(cuerpo)
+        else:
+            datos = {clave: valores[-1] for clave, valores in parse_qs(cuerpo).items()}
+        return funcion(datos, parametros, **coincidencia.groupdict())
+
+    def _control(self, metodo, ruta):
+        if metodo == 'GET' and ruta == '/_simulador/estadisticas':
+            return 200, self.estadisticas()
+        coincidencia = re.fullmatch(r'/_simulador/pagar/(?P<id>[^/]+)', ruta)
+        if metodo == 'POST' and coincidencia:
+            resultado = self.pagar(coincidencia['id'])
+            return (200 if resultado['success'] else 404), resultado
+        return 404, {'error': {'message': f'Ruta de control desconocida: {ruta}'}}
+
+    def estadisticas(self):
+        with self._lock:
+            return {'peticiones': dict(self.peticiones), 'webhooks': dict(self.webhooks)}
+
+    # ------------------------------------------------------------------
+    # Pago del cliente y webhooks
+    # ------------------------------------------------------------------
+
+    def pagar(self, id_externo):
+        """
+        Simula que el cliente completa el pago de una sesión, preferencia u orden.
+
+        Returns:
+            dict: {'success': bool, 'pasarela': str}
+        """
+        with self._lock:
+            sesion = self.sesiones.get(id_externo)
+            preferencia = self.preferencias.get(id_externo)
+            orden = self.ordenes.get(id_externo)
+            if (sesion and sesion['status'] != 'open') or (preferencia and preferencia.get('_expirada')):
+                return {'success': False, 'error': f'{id_externo} está vencida'}
+            if sesion:
+                sesion.update(payment_status='paid', status='complete')
+            elif preferencia:
+                pago_mp = {
+                    'id': int(time.time() * 1000) * 1000 + next(self._ids) % 1000,
+                    'status': 'approved',
+                    'status_detail': 'accredited',
+                    'transaction_amount': preferencia['items'][0]['unit_price'],
+                    'external_reference': preferencia.get('external_reference'),
+                    'preference_id': id_externo,
+                }
+                self.pagos_mp[str(pago_mp['id'])] = pago_mp
+            elif orden:
+                orden['status'] = 'COMPLETED'
+                orden['purchase_units'][0]['payments'] = {
+                    'captures': [{'id': f'CAP-{id_externo}', 'status': 'COMPLETED'}],
+                }
+            else:
+                return {'success': False, 'error': f'{id_externo} no existe en el simulador'}
+
+        if sesion:
+            evento = {
+                'id': self._nuevo_id('evt_sim_'),
+                'object': 'event',
+                'type': 'checkout.session.completed',
+                'data': {'object': dict(sesion)},
+            }
+            self._emitir('stripe', evento)
+            return {'success': True, 'pasarela': 'stripe'}
+        if preferencia:
+            self._emitir('mercadopago', pago_mp)
+            return {'success': True, 'pasarela': 'mercadopago'}
+        return {'success': True, 'pasarela': 'paypal'}
+
+    def _emitir(self, pasarela, datos):
+        url = self.url_webhooks.get(pasarela)
+        if not url:
+            return
+        with self._lock:
+            veces = 2 if self._random.random() < self.tasa_duplicados else 1
+        hilo = threading.Timer(self.retraso_webhook_ms / 1000, self._enviar, args=(pasarela, url, datos, veces))
+        hilo.daemon = True
+        hilo.start()
+
+    def _enviar(self, pasarela, url, datos, veces):
+        for _ in range(veces):
+            timestamp = int(time.time())
+            if pasarela == 'stripe':
+                cuerpo = json.dumps(datos)
+                headers = {
+                    'Content-Type': 'application/json',
+                    'Stripe-Signature': f't={timestamp},v1={_firma(self.secreto_stripe, f"{timestamp}.{cuerpo}")}',
+                }
+                destino = url
+            else:
+                recurso_id = str(datos['id'])
+                request_id = str(uuid.uuid4())
+                cuerpo = json.dumps({
+                    'id': f'sim-{recurso_id}-payment.created',
+                    'type': 'payment',
+                    'action': 'payment.created',
+                    'data': {'id': recurso_id},
+                })
+                manifiesto = f'id:{recurso_id};request-id:{request_id};ts:{timestamp};'
+                headers = {
+                    'Content-Type': 'application/json',
+                    'x-request-id': request_id,
+                    'x-signature': f'ts={timestamp},v1={_firma(self.secreto_mercadopago, manifiesto)}',
+                }
+                destino = f"{url}?{urlencode({'data.id': recurso_id, 'type': 'payment'})}"
+            try:
+                response = requests.post(destino, data=cuerpo.encode('utf-8'), headers=headers, timeout=10)
+                enviado = response.status_code < 300
+            except requests.RequestException as e:
+                logger.warning(f'Simulador: no se pudo entregar el webhook de {pasarela}: {e}')
+                enviado = False
+            with self._lock:
+                self.webhooks['enviados' if enviado else 'fallidos'] += 1
+
+    # ------------------------------------------------------------------
+    # Stripe (form-urlencoded)
+    # ------------------------------------------------------------------
+
+    def _stripe_cliente(self, datos, parametros):
+        return 200, {'id': self._nuevo_id('cus_sim_'), 'object': 'customer', 'email': datos.get('email')}
+
+    def _stripe_intento(self, datos, parametros):
+        return 200, {
+            'id': self._nuevo_id('pi_sim_'),
+            'object': 'payment_intent',
+            'amount': int(datos.get('amount', 0)),
+            'currency': datos.get('currency', 'mxn'),
+            'status': 'requires_payment_method',
+        }
+
+    def _stripe_crear_sesion(self, datos, parametros):
+        session_id = self._nuevo_id('cs_sim_')
+        monto = int(datos.get('line_items[0][price_data][unit_amount]', 0)) * int(datos.get('line_items[0][quantity]', 1))
+        sesion = {
+            'id': session_id,
+            'object': 'checkout.session',
+            'url': f'{self.url}/checkout/{session_id}',
+            'status': 'open',
+            'payment_status': 'unpaid',
+            'amount_total': monto,
+            'currency': 'mxn',
+            'customer': datos.get('customer'),
+            'payment_intent': self._nuevo_id('pi_sim_'),
+            'expires_at': int(datos['expires_at']) if datos.get('expires_at') else None,
+            'metadata': {
+                clave[len('metadata['):-1]: valor for clave, valor in datos.items() if clave.startswith('metadata[')
+            },
+        }
+        with self._lock:
+            self.sesiones[session_id] = sesion
+        return 200, sesion
+
+    def _stripe_sesion(self, datos, parametros, id):
+        with self._lock:
+            sesion = self.sesiones.get(id)
+            if sesion and sesion['status'] == 'open' and sesion['expires_at'] and sesion['expires_at'] < time.time():
+                sesion['status'] = 'expired'
+            sesion = dict(sesion) if sesion else None
+        if sesion is None:
+            return 404, {'error': {'code': 'resource_missing', 'message': f'No such checkout.session: {id}'}}
+        return 200, sesion
+
+    def _stripe_expirar_sesion(self, datos, parametros, id):
+        with self._lock:
+            sesion = self.sesiones.get(id)
+            if sesion and sesion['status'] == 'open':
+                sesion['status'] = 'expired'
+            sesion = dict(sesion) if sesion else None
+        if sesion is None:
+            return 404, {'error': {'code': 'resource_missing', 'message': f'No such checkout.session: {id}'}}
+        if sesion['status'] != 'expired':
+            return 400, {'error': {'message': f'Only open sessions can be expired: {id}'}}
+        return 200, sesion
+
+    def _stripe_reembolso(self, datos, parametros):
+        return 200, {
+            'id': self._nuevo_id('re_sim_'),
+            'object': 'refund',
+            'payment_intent': datos.get('payment_intent'),
+            'amount': int(datos['amount']) if datos.get('amount') else None,
+            'status': 'succeeded',
+        }
+
+    # ------------------------------------------------------------------
+    # Mercado Pago (JSON)
+    # ------------------------------------------------------------------
+
+    def _mp_crear_preferencia(self, datos, parametros):
+        preference_id = self._nuevo_id('pref-sim-')
+        preferencia = dict(datos, id=preference_id, init_point=f'{self.url}/checkout/{preference_id}')
+        with self._lock:
+            self.preferencias[preference_id] = preferencia
+        return 201, preferencia
+
+    def _mp_actualizar_preferencia(self, datos, parametros, id):
+        with self._lock:
+            preferencia = self.preferencias.get(id)
+            if preferencia is not None:
+                preferencia.update(datos)
+                # expiration_date_to ya pasó: la preferencia no se puede pagar
+                preferencia['_expirada'] = bool(datos.get('expires'))
+                preferencia = dict(preferencia)
+        if preferencia is None:
+            return 404, {'message': 'Preference not found', 'status': 404}
+        return 200, preferencia
+
+    def _mp_buscar_pagos(self, datos, parametros):
+        referencia = (parametros.get('external_reference') or [''])[-1]
+        with self._lock:
+            resultados = [dict(p) for p in self.pagos_mp.values() if str(p.get('external_reference')) == referencia]
+        resultados.sort(key=lambda p: p['id'], reverse=True)
+        return 200, {'results': resultados, 'paging': {'total': len(resultados)}}
+
+    def _mp_pago(self, datos, parametros, id):
+        with self._lock:
+            pago_mp = self.pagos_mp.get(id)
+        if pago_mp is None:
+            return 404, {'message': 'Payment not found', 'status': 404}
+        return 200, pago_mp
+
+    def _mp_reembolso(self, datos, parametros, id):
+        with self._lock:
+            pago_mp = self.pagos_mp.get(id)
+            if pago_mp:
+                pago_mp['status'] = 'refunded'
+        if pago_mp is None:
+            return 404, {'message': 'Payment not found', 'status': 404}
+        return 201, {'id': next(self._ids), 'payment_id': id, 'amount': datos.get('amount'), 'status': 'approved'}
+
+    # ------------------------------------------------------------------
+    # PayPal (JSON)
+    # ------------------------------------------------------------------
+
+    def _paypal_token(self, datos, parametros):
+        return 200, {'access_token': self._nuevo_id('A21AA-sim-'), 'token_type': 'Bearer', 'expires_in': 32400}
+
+    def _paypal_crear_orden(self, datos, parametros):
+        order_id = self._nuevo_id('SIM-ORDER-')
+        orden = {
+            'id': order_id,
+            'status': 'CREATED',
+            'purchase_units': [
+                {'reference_id': unidad.get('reference_id'), 'amount': unidad.get('amount')}
+                for unidad in datos.get('purchase_units') or [{}]
+            ],
+            'links': [{'rel': 'approve', 'href': f'{self.url}/checkout/{order_id}', 'method': 'GET'}],
+        }
+        with self._lock:
+            self.ordenes[order_id] = orden
+        return 201, orden
+
+    def _paypal_orden(self, datos, parametros, id):
+        with self._lock:
+            orden = self.ordenes.get(id)
+            orden = json.loads(json.dumps(orden)) if orden else None
+        if orden is None:
+            return 404, {'name': 'RESOURCE_NOT_FOUND', 'message': f'Order {id} not found'}
+        return 200, orden
+
+    def _paypal_reembolso(self, datos, parametros, id):
+        monto = (datos.get('amount') or {}).get('value')
+        return 201, {
+            'id': self._nuevo_id('SIM-REFUND-'),
+            'status': 'COMPLETED',
+            'amount': {'value': str(Decimal(monto)) if monto else None, 'currency_code': 'MXN'},
+        }
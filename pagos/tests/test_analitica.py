@@ -0,0 +1,92 @@
+"""
+Tests para la analítica de ingresos recurrentes.
+"""
+from datetime import timedelta
+from decimal import Decimal
+import numpy as np
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from instalaciones.models import CambioEstadoInstalacion
+from pagos.analitica import (
+    SIN_FIN, AnaliticaIngresos, cargar_suscripciones, pronostico_cobranza, retencion_cohortes, serie_mrr,
+)
+from pagos.models import PlanPago
+
+
+class TestCalculosVectorizados:
+    """Tests de los cálculos sobre arreglos (sin base de datos)."""
+
+    def test_serie_mrr(self):
+        # Meses 10..13: una suscripción previa vigente, una alta en 11 que se da de baja en 13
+        montos = np.array([100.0, 50.0, 30.0])
+        inicio = np.array([5, 11, 12])
+        fin = np.array([SIN_FIN, 13, 12])  # la tercera empieza y termina en el mismo mes: no cuenta
+
+        serie = serie_mrr(montos, inicio, fin, desde=10, meses=4)
+
+        assert serie['mrr'].tolist() == [100, 150, 150, 100]
+        assert serie['nuevo'].tolist() == [0, 50, 0, 0]
+        assert serie['perdido'].tolist() == [0, 0, 0, 50]
+        assert serie['neto'].tolist() == [0, 50, 0, -50]
+        assert serie['clientes'].tolist() == [1, 2, 2, 1]
+        assert serie['tasa_bajas'].tolist() == [0, 0, 0, 0.5]
+
+    def test_retencion_cohortes(self):
+        inicio = np.array([0, 0, 1])
+        fin = np.array([2, SIN_FIN, SIN_FIN])
+
+        tamanos, retencion = retencion_cohortes(inicio, fin, desde=0, actual=2, meses=3)
+
+        assert tamanos.tolist() == [2, 1, 0]
+        assert retencion[0].tolist() == [1, 1, 0.5]
+        assert retencion[1, :2].tolist() == [1, 1]
+        assert np.isnan(retencion[1, 2])
+
+    def test_pronostico_cobranza(self):
+        mrr, cobranza = pronostico_cobranza(1000.0, 0.0, 0.1, 0.9, meses=2)
+
+        assert mrr.round(2).tolist() == [900, 810]
+        assert cobranza.round(2).tolist() == [810, 729]
+
+
+@pytest.mark.django_db
+class TestAnaliticaIngresos:
+    """Tests de la lectura por columnas, la caché y el tablero."""
+
+    def test_suscripciones_con_bajas_del_historial(self, instalacion):
+        PlanPago.objects.create(instalacion=instalacion, monto_mensual=Decimal('500.00'), dia_vencimiento=5)
+        hoy = timezone.now().date()
+
+        _, montos, inicio, fin = cargar_suscripciones()
+        assert montos.tolist() == [500.0]
+        assert fin.tolist() == [SIN_FIN]
+
+        # Cancelada sin historial: no se conoce el mes de baja y queda fuera del cálculo
+        instalacion.estado = 'cancelada'
+        instalacion.save()
+        _, _, inicio, fin = cargar_suscripciones()
+        assert (fin == inicio).all()
+
+        CambioEstadoInstalacion.objects.create(
+            instalacion=instalacion, estado_anterior='activa', estado_nuevo='cancelada',
+        )
+        _, _, inicio, fin = cargar_suscripciones()
+        assert fin.tolist() == [hoy.year * 12 + hoy.month - 1]
+
+    def test_tablero_en_cache_por_dia(self, client, superuser, instalacion, pago):
+        PlanPago.objects.create(instalacion=instalacion, monto_mensual=Decimal('500.00'), dia_vencimiento=5)
+        hoy = timezone.now().date()
+
+        resultado = AnaliticaIngresos(hoy).generar()
+        assert resultado['mrr_actual'] == 500
+        assert resultado['meses'][-1]['clientes'] == 1
+
+        PlanPago.objects.update(monto_mensual=Decimal('800.00'))
+        assert AnaliticaIngresos(hoy).generar()['mrr_actual'] == 500
+        assert AnaliticaIngresos(hoy + timedelta(days=1)).generar()['mrr_actual'] == 800
+
+        client.force_login(superuser)
+        response = client.get(reverse('pagos:pago_analitica'))
+        assert response.status_code == 200
+        assert 'Retención por Cohorte' in response.content.decode()
@@ -0,0 +1,94 @@
+"""
+Tests para el reporte de antigüedad de saldos.
+"""
+import csv
+import io
+from datetime import timedelta
+from decimal import Decimal
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from pagos.antiguedad import ReporteAntiguedad
+from pagos.models import Pago
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    # La versión persistente vuelve a 1 con cada test (rollback); la caché no
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def cartera(cliente, instalacion):
+    """Pagos sin pagar del cliente en distintos rangos de atraso, y uno pagado."""
+    hoy = timezone.now().date()
+    for mes, (dias, monto) in enumerate([(-5, '100.00'), (10, '200.00'), (45, '300.00'), (120, '400.00')], start=1):
+        Pago.objects.create(
+            cliente=cliente, instalacion=instalacion, monto=Decimal(monto), concepto=f'Mes {mes}',
+            periodo_mes=mes, periodo_anio=2025, fecha_vencimiento=hoy - timedelta(days=dias),
+        )
+    Pago.objects.create(
+        cliente=cliente, instalacion=instalacion, monto=Decimal('999.00'), concepto='Pagado',
+        periodo_mes=6, periodo_anio=2025, fecha_vencimiento=hoy - timedelta(days=200),
+        estado='pagado', fecha_pago=timezone.now(),
+    )
+    return cliente
+
+
+@pytest.mark.django_db
+class TestReporteAntiguedad:
+    """Tests de los rangos, la caché y la exportación."""
+
+    def test_rangos_por_cliente_y_plan(self, cartera):
+        reporte = ReporteAntiguedad('cliente').generar()
+
+        assert reporte['grupos'] == 1
+        fila = reporte['filas'][0]
+        assert fila['etiqueta'] == 'Juan Pérez'
+        assert fila['montos'] == [Decimal('100'), Decimal('200'), Decimal('300'), 0, Decimal('400')]
+        assert (fila['vencido'], fila['total'], fila['pagos']) == (Decimal('900'), Decimal('1000'), 4)
+        assert fila['dias_atraso'] == 120
+
+        plan = ReporteAntiguedad('plan').generar()
+        assert plan['filas'][0]['etiqueta'] == 'Plan Básico'
+        assert plan['totales']['vencido'] == Decimal('900')
+
+    def test_cache_se_invalida_al_cambiar_un_pago(self, cartera, django_capture_on_commit_callbacks):
+        assert ReporteAntiguedad('ciudad').generar()['totales']['total'] == Decimal('1000')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Pago.objects.get(concepto='Mes 4').marcar_como_pagado(metodo_pago='efectivo')
+        # La versión es la de la base de datos: no depende de la caché del proceso que cambió el pago
+        cache.delete('estadisticas_version_pagos')
+
+        reporte = ReporteAntiguedad('ciudad').generar()
+        assert reporte['totales']['total'] == Decimal('600')
+        assert reporte['totales']['dias_90_mas'] == 0
+
+    def test_cache_se_invalida_al_cambiar_un_cliente(self, cartera, django_capture_on_commit_callbacks):
+        assert ReporteAntiguedad('ciudad').generar()['filas'][0]['etiqueta'] == cartera.ciudad
+
+        with django_capture_on_commit_callbacks(execute=True):
+            cartera.ciudad = 'Puebla'
+            cartera.save()
+
+        assert ReporteAntiguedad('ciudad').generar()['filas'][0]['etiqueta'] == 'Puebla'
+
+    def test_vistas_y_csv_en_streaming(self, client, superuser, cartera):
+        client.force_login(superuser)
+        response = client.get(reverse('pagos:pago_antiguedad'), {'agrupar': 'ciudad'})
+        assert response.status_code == 200
+        assert 'Ciudad de México' in response.content.decode()
+
+        response = client.get(reverse('pagos:pago_antiguedad_csv'), {'agrupar': 'cliente'})
+        assert response.status_code == 200
+        assert response.streaming
+        contenido = b''.join(response.streaming_content).decode('utf-8-sig')
+        filas = list(csv.reader(io.StringIO(contenido)))
+        assert filas[0][:2] == ['Cliente', 'ID cliente']
+        assert len(filas) == 2
+        assert filas[1][0] == 'Juan Pérez'
+        assert filas[1][-1] == '120'
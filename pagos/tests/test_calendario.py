@@ -0,0 +1,90 @@
+"""
+Tests para el calendario de pagos.
+"""
+from datetime import timedelta
+from decimal import Decimal
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from pagos.calendario import CalendarioPagos
+from pagos.models import Pago
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    # La versión persistente vuelve a 1 con cada test (rollback); la caché no
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def pagos_dia(cliente, instalacion):
+    """Cinco pagos que vencen el mismo día (uno pagado) y uno al día siguiente."""
+    fecha = timezone.now().date().replace(day=10) + timedelta(days=40)
+    for mes in range(1, 6):
+        Pago.objects.create(
+            cliente=cliente, instalacion=instalacion, monto=Decimal('100.00'), concepto=f'Mes {mes}',
+            periodo_mes=mes, periodo_anio=2025, fecha_vencimiento=fecha,
+            **({'estado': 'pagado', 'fecha_pago': timezone.now()} if mes == 1 else {}),
+        )
+    Pago.objects.create(
+        cliente=cliente, monto=Decimal('50.00'), concepto='Otro día',
+        periodo_mes=6, periodo_anio=2025, fecha_vencimiento=fecha + timedelta(days=1),
+    )
+    return fecha
+
+
+@pytest.mark.django_db
+class TestCalendarioPagos:
+    """Tests del resumen mensual agrupado y del detalle por día."""
+
+    def test_resumen_mes_en_una_consulta(self, pagos_dia, django_capture_on_commit_callbacks):
+        fecha = pagos_dia
+        with CaptureQueriesContext(connection) as consultas:
+            resumen = CalendarioPagos.resumen_mes(fecha.year, fecha.month)
+        assert len([c for c in consultas.captured_queries if 'pagos_pago' in c['sql']]) == 1
+
+        dia = resumen['dias'][fecha.day]
+        assert (dia['cantidad'], dia['monto']) == (5, Decimal('500.00'))
+        assert dia['estados']['pagado']['cantidad'] == 1
+        assert dia['estados']['pendiente'] == {'cantidad': 4, 'monto': Decimal('400.00')}
+
+        # En caché hasta que cambia un pago
+        with CaptureQueriesContext(connection) as consultas:
+            CalendarioPagos.resumen_mes(fecha.year, fecha.month)
+        assert not [c for c in consultas.captured_queries if 'pagos_pago' in c['sql']]
+        with django_capture_on_commit_callbacks(execute=True):
+            Pago.objects.filter(concepto='Mes 2').get().marcar_como_pagado(metodo_pago='efectivo')
+        resumen = CalendarioPagos.resumen_mes(fecha.year, fecha.month)
+        assert resumen['dias'][fecha.day]['estados']['pagado']['cantidad'] == 2
+
+    def test_api_dia_paginada(self, client, superuser, pagos_dia):
+        client.force_login(superuser)
+        url = reverse('pagos:api_calendario_dia')
+
+        primera = client.get(url, {'fecha': pagos_dia.isoformat()}, HTTP_ACCEPT='application/json').json()
+        assert len(primera['pagos']) == 5
+        assert primera['pagos'][0]['cliente'] == 'Juan Pérez García'
+
+        respuesta = CalendarioPagos.pagos_dia(pagos_dia, estado='pendiente', por_pagina=3)
+        assert len(respuesta['pagos']) == 3
+        siguiente = CalendarioPagos.pagos_dia(
+            pagos_dia, estado='pendiente', cursor=respuesta['cursor_siguiente'], por_pagina=3,
+        )
+        assert [p['concepto'] for p in siguiente['pagos']] == ['Mes 5']
+        assert siguiente['cursor_siguiente'] is None
+
+        assert client.get(url, {'fecha': 'ayer'}).status_code == 400
+
+    def test_vista_calendario(self, client, superuser, pagos_dia):
+        client.force_login(superuser)
+        response = client.get(reverse('pagos:pago_calendario'), {'anio': pagos_dia.year, 'mes': pagos_dia.month})
+
+        assert response.status_code == 200
+        assert response.context['total_pagos'] == 6
+        assert response.context['pagos_pagados'] == 1
+        assert f'data-fecha="{pagos_dia.isoformat()}"' in response.content.decode()
@@ -0,0 +1,74 @@
+"""
+Tests para los IDs de clientes en pasarelas de pago.
+"""
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from pagos.clientes_pasarela import ClientesPasarelaService, clave_cache
+from pagos.payment_gateway import PaymentGateway
+from pagos.models import ClientePasarela
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.mark.django_db
+class TestClientesPasarela:
+    """Tests para ClientesPasarelaService."""
+
+    def test_crea_una_sola_vez(self, cliente):
+        """Test: El cliente remoto se crea una vez y después se lee de caché sin consultas."""
+        llamadas = []
+
+        def crear(c):
+            llamadas.append(c.pk)
+            return f'cus_{c.pk}'
+
+        assert ClientesPasarelaService.obtener_id(cliente, 'stripe', crear) == f'cus_{cliente.pk}'
+        with CaptureQueriesContext(connection) as consultas:
+            assert ClientesPasarelaService.obtener_id(cliente, 'stripe', crear) == f'cus_{cliente.pk}'
+        assert len(consultas) == 0
+
+        cache.clear()
+        assert ClientesPasarelaService.obtener_id(cliente, 'stripe', crear) == f'cus_{cliente.pk}'
+        assert llamadas == [cliente.pk]
+        assert ClientePasarela.objects.filter(cliente=cliente, pasarela='stripe').count() == 1
+
+    def test_invalidar(self, cliente):
+        """Test: Tras invalidar, el siguiente checkout vuelve a crear el cliente remoto."""
+        ids = iter(['cus_viejo', 'cus_nuevo'])
+        ClientesPasarelaService.obtener_id(cliente, 'stripe', lambda c: next(ids))
+
+        ClientesPasarelaService.invalidar(cliente.pk, 'stripe', 'cus_viejo')
+        assert ClientesPasarelaService.obtener_id(cliente, 'stripe', lambda c: next(ids)) == 'cus_nuevo'
+
+    def test_invalidar_con_id_viejo_en_cache_conserva_el_nuevo(self, cliente):
+        """Test: Un proceso con el ID muerto en caché no borra el que otro ya recreó."""
+        ClientePasarela.objects.create(cliente=cliente, pasarela='stripe', id_cliente_pasarela='cus_nuevo')
+        cache.set(clave_cache('stripe', cliente.pk), 'cus_viejo')
+
+        assert not ClientesPasarelaService.invalidar(cliente.pk, 'stripe', 'cus_viejo')
+        assert ClientesPasarelaService.obtener_id(cliente, 'stripe', lambda c: 'cus_otro') == 'cus_nuevo'
+
+    def test_clave_de_idempotencia_por_intento(self, cliente, monkeypatch):
+        """Test: Al recrear un Customer invalidado, Stripe recibe otra clave de idempotencia."""
+        claves = []
+
+        def crear_customer(**kwargs):
+            claves.append(kwargs['idempotency_key'])
+            return type('Customer', (), {'id': f'cus_{len(claves)}'})()
+
+        monkeypatch.setattr('stripe.Customer.create', crear_customer)
+        gateway = PaymentGateway('stripe')
+
+        assert gateway.obtener_o_crear_cliente(cliente) == 'cus_1'
+        ClientesPasarelaService.invalidar(cliente.pk, 'stripe', 'cus_1')
+        assert gateway.obtener_o_crear_cliente(cliente) == 'cus_2'
+
+        assert claves[0] != claves[1]
+        assert all(clave.startswith(f'adminired-cliente-{cliente.pk}-') for clave in claves)
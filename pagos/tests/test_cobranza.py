@@ -0,0 +1,82 @@
+"""
+Tests para la captura masiva de cobros.
+"""
+from datetime import date
+from decimal import Decimal
+import pytest
+from pagos.cobranza import CapturaCobranzaService, leer_lineas
+from pagos.models import CobroCapturado, Pago
+
+
+def test_leer_lineas():
+    cobros = leer_lineas('#15, 450.00\nINST-1; 500; deposito; R-9\n\n')
+
+    assert cobros == [
+        {'monto': '450.00', 'metodo': 'efectivo', 'referencia': '', 'pago': 15},
+        {'monto': '500', 'metodo': 'deposito', 'referencia': 'R-9', 'contrato': 'INST-1'},
+    ]
+
+
+@pytest.mark.django_db
+class TestCapturaCobranza:
+    """Tests de validación y aplicación de lotes."""
+
+    def test_aplica_validos_y_reporta_rechazos_por_linea(self, pago, user):
+        contrato = pago.instalacion.numero_contrato
+        cobros = [
+            {'contrato': contrato, 'monto': '500.00', 'referencia': 'R-1', 'fecha': '2025-01-20'},
+            {'pago': pago.pk, 'monto': '500.00'},
+            {'pago': 999999, 'monto': '100'},
+            {'pago': pago.pk, 'monto': '10', 'metodo': 'cheque'},
+        ]
+
+        resultado = CapturaCobranzaService.capturar(cobros, usuario=user, cobrador='Luis')
+
+        assert (resultado['aplicados'], resultado['rechazados']) == (1, 3)
+        assert resultado['monto_aplicado'] == Decimal('500.00')
+        errores = [fila['error'] for fila in resultado['resultados']]
+        assert errores[0] == ''
+        assert 'línea 1' in errores[1]
+        assert 'no existe' in errores[2]
+        assert 'Método' in errores[3]
+
+        pago.refresh_from_db()
+        assert pago.estado == 'pagado'
+        assert pago.metodo_pago == 'efectivo'
+        assert pago.referencia_pago == 'R-1'
+        assert pago.fecha_pago.date() == date(2025, 1, 20)
+        assert CobroCapturado.objects.filter(lote=resultado['lote']).count() == 4
+
+    def test_referencia_repetida_en_el_lote(self, pago):
+        otro = Pago.objects.create(
+            cliente=pago.cliente, instalacion=pago.instalacion, monto=Decimal('500.00'), concepto='Febrero',
+            periodo_mes=2, periodo_anio=2025, fecha_vencimiento=date(2025, 2, 28),
+        )
+        cobros = [
+            {'pago': pago.pk, 'monto': '500.00', 'metodo': 'deposito', 'referencia': 'R-7'},
+            {'pago': otro.pk, 'monto': '500.00', 'metodo': 'deposito', 'referencia': 'R-7'},
+        ]
+
+        filas = CapturaCobranzaService.validar(cobros)
+
+        assert filas[0]['error'] == ''
+        assert 'línea 1' in filas[1]['error']
+
+    def test_validar_no_guarda(self, pago):
+        resultado = CapturaCobranzaService.capturar([{'pago': pago.pk, 'monto': '450'}], aplicar=False)
+
+        assert resultado['lote'] is None
+        assert 'no coincide' in resultado['resultados'][0]['error']
+        assert Pago.objects.get(pk=pago.pk).estado != 'pagado'
+
+    def test_api(self, client, user, pago):
+        client.force_login(user)
+
+        respuesta = client.post(
+            '/pagos/api/cobranza/',
+            {'cobros': [{'pago': pago.pk, 'monto': 500}]},
+            content_type='application/json',
+        )
+
+        assert respuesta.status_code == 200
+        assert respuesta.json()['aplicados'] == 1
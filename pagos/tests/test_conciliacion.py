@@ -0,0 +1,111 @@
+"""
+Tests para la conciliación de transacciones pendientes contra un servidor de pasarela falso.
+"""
+import json
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from django.utils import timezone
+from pagos.conciliacion import ConciliacionPasarelas, LimitadorTasa
+from pagos.models import Pago, TransaccionPago
+
+
+class ServidorStripe(BaseHTTPRequestHandler):
+    """API falsa de Stripe: sesiones de checkout por id."""
+
+    sesiones = {}
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        sesion = type(self).sesiones.get(self.path.rsplit('/', 1)[-1])
+        estado, datos = (200, sesion) if sesion else (404, {'error': {'code': 'resource_missing'}})
+        cuerpo = json.dumps(datos).encode()
+        self.send_response(estado)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+
+@pytest.fixture
+def api_stripe(settings):
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), ServidorStripe)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    settings.STRIPE_API_URL = f'http://127.0.0.1:{servidor.server_port}'
+    yield ServidorStripe.sesiones
+    servidor.shutdown()
+    servidor.server_close()
+    ServidorStripe.sesiones = {}
+
+
+def transaccion(pago, id_externo, **kwargs):
+    transaccion = TransaccionPago.objects.create(
+        pago=pago, pasarela='stripe', id_transaccion_pasarela=id_externo, monto=pago.monto, **kwargs
+    )
+    TransaccionPago.objects.filter(pk=transaccion.pk).update(fecha_creacion=timezone.now() - timedelta(hours=1))
+    return transaccion
+
+
+@pytest.mark.django_db
+class TestConciliacionPasarelas:
+    """Tests para ConciliacionPasarelas."""
+
+    def test_reporte_y_transiciones(self, api_stripe, pago):
+        """Test: Cada transacción pendiente se clasifica según la pasarela y se aplican las transiciones."""
+        pagada = transaccion(pago, 'cs_pagada')
+        abierta = transaccion(pago, 'cs_abierta')
+        vencida = transaccion(pago, 'cs_vencida')
+        distinta = transaccion(pago, 'cs_distinta')
+        huerfana = transaccion(pago, 'cs_huerfana')
+        api_stripe.update({
+            'cs_pagada': {'payment_status': 'paid', 'status': 'complete', 'amount_total': 50000, 'payment_intent': 'pi_1'},
+            'cs_abierta': {'payment_status': 'unpaid', 'status': 'open', 'amount_total': 50000},
+            'cs_vencida': {'payment_status': 'unpaid', 'status': 'expired', 'amount_total': 50000},
+            'cs_distinta': {'payment_status': 'paid', 'status': 'complete', 'amount_total': 45000},
+        })
+
+        reporte = ConciliacionPasarelas(hilos=4, lote=2, tasas={'stripe': 1000}).ejecutar()
+
+        assert reporte['revisadas'] == 5
+        assert reporte['coincide'] == 1
+        assert reporte['corregida'] == 2
+        assert reporte['transiciones'] == {'completada': 1, 'fallida': 0, 'cancelada': 1}
+        assert reporte['huerfana'] == 1
+        assert reporte['monto_distinto'] == 1
+        assert {i['transaccion_id'] for i in reporte['incidencias']} == {distinta.pk, huerfana.pk}
+
+        estados = dict(TransaccionPago.objects.values_list('pk', 'estado'))
+        assert estados[pagada.pk] == 'completada'
+        assert estados[abierta.pk] == 'pendiente'
+        assert estados[vencida.pk] == 'cancelada'
+        assert estados[distinta.pk] == 'pendiente'
+        assert TransaccionPago.objects.get(pk=pagada.pk).id_pago_intento == 'pi_1'
+        pago = Pago.objects.get(pk=pago.pk)
+        assert pago.estado == 'pagado'
+        assert pago.referencia_pago == 'cs_pagada'
+
+    def test_dry_run_y_recientes(self, api_stripe, pago):
+        """Test: En dry-run no se escribe, y las transacciones recientes no se revisan."""
+        pagada = transaccion(pago, 'cs_pagada')
+        TransaccionPago.objects.create(pago=pago, pasarela='stripe', id_transaccion_pasarela='cs_nueva', monto=pago.monto)
+        api_stripe['cs_pagada'] = {'payment_status': 'paid', 'status': 'complete', 'amount_total': 50000}
+
+        reporte = ConciliacionPasarelas(tasas={'stripe': 1000}).ejecutar(aplicar=False)
+
+        assert reporte['revisadas'] == 1
+        assert reporte['corregida'] == 1
+        assert TransaccionPago.objects.get(pk=pagada.pk).estado == 'pendiente'
+
+
+def test_limitador_tasa():
+    """Test: El token bucket no deja pasar más de `tasa` peticiones por segundo tras la ráfaga."""
+    limitador = LimitadorTasa(tasa=50, capacidad=1)
+    inicio = time.monotonic()
+    for _ in range(6):
+        limitador.adquirir()
+    assert time.monotonic() - inicio >= 0.09
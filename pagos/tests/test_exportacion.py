@@ -0,0 +1,142 @@
+"""
+Tests para la exportación de pagos a Excel y PDF.
+"""
+import io
+import zipfile
+from datetime import timedelta
+import pytest
+from openpyxl import load_workbook
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from pagos.models import ExportacionPagos
+from pagos.exportacion import ExportacionPagosService, consultar_pagos
+from pagos.reporte_pdf import escribir_reporte_pdf
+
+
+@pytest.fixture
+def media_temporal(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    settings.PAGOS_EXPORTACION_HILO = False
+    return tmp_path
+
+
+@pytest.mark.django_db
+class TestExportacionPagos:
+    """Tests para ExportacionPagosService y las vistas de exportación."""
+    
+    def test_exportacion_en_streaming(self, client, superuser, pago):
+        """Test: Una exportación pequeña se envía en streaming con una fila por pago."""
+        client.force_login(superuser)
+        response = client.get(reverse('pagos:pago_exportar_excel'), {'estado': 'vencido'})
+        
+        assert response.status_code == 200
+        assert response.streaming
+        hoja = load_workbook(io.BytesIO(b''.join(response.streaming_content)))['Pagos']
+        filas = list(hoja.iter_rows(values_only=True))
+        assert filas[0][0] == 'Cliente'
+        assert len(filas) == 2
+        assert filas[1][0] == pago.cliente.nombre_completo
+        assert filas[1][7] == 'Vencido'
+    
+    def test_exportacion_grande_en_segundo_plano(self, client, superuser, pago, settings, media_temporal):
+        """Test: Por encima del límite se crea un trabajo que guarda el archivo y avisa."""
+        settings.PAGOS_EXPORTACION_LIMITE_SINCRONO = 0
+        superuser.email = 'admin@test.com'
+        superuser.save()
+        client.force_login(superuser)
+        
+        response = client.get(reverse('pagos:pago_exportar_excel'), {'q': pago.cliente.nombre})
+        assert response.status_code == 302
+        exportacion = ExportacionPagos.objects.get()
+        assert exportacion.estado == 'pendiente'
+        assert exportacion.parametros == {'q': pago.cliente.nombre}
+        
+        resultado = ExportacionPagosService.procesar(exportacion)
+        exportacion.refresh_from_db()
+        assert resultado['success'] is True
+        assert exportacion.estado == 'completada'
+        assert exportacion.total_filas == 1
+        assert len(mail.outbox) == 1
+        
+        # Un segundo procesamiento no repite el trabajo
+        assert ExportacionPagosService.procesar(exportacion)['success'] is False
+        
+        descarga = client.get(reverse('pagos:exportacion_descargar', args=[exportacion.pk]))
+        assert descarga.status_code == 200
+        hoja = load_workbook(io.BytesIO(b''.join(descarga.streaming_content)))['Pagos']
+        assert hoja.max_row == 2
+    
+    def test_filtros_compartidos_con_listado(self, pago):
+        """Test: La exportación aplica el estado efectivo igual que el listado."""
+        assert consultar_pagos({'estado': 'vencido'}).count() == 1
+        assert consultar_pagos({'estado': 'pendiente'}).count() == 0
+
+
+@pytest.mark.django_db
+class TestReportePdf:
+    """Tests para el reporte de pagos en PDF."""
+    
+    def test_pdf_en_la_peticion(self, client, superuser, pago):
+        """Test: Un reporte pequeño se genera en la petición y se envía en streaming."""
+        client.force_login(superuser)
+        response = client.get(reverse('pagos:pago_exportar_pdf'))
+        
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'application/pdf'
+        assert b''.join(response.streaming_content).startswith(b'%PDF')
+    
+    def test_reporte_grande_en_tomos(self, tmp_path):
+        """Test: Sin truncar filas, un reporte mayor a un tomo se divide en un ZIP."""
+        filas = [[f'Cliente {i}', 'Mensualidad', '$100.00', 'Enero 2025', '01/01/2025', 'Pagado']
+                 for i in range(250)]
+        destino = tmp_path / 'reporte.zip'
+        
+        total, tomos = escribir_reporte_pdf(filas, str(destino), filas_por_tomo=100, procesos=2)
+        
+        assert total == 250
+        assert tomos == 3
+        with zipfile.ZipFile(destino) as zf:
+            assert len(zf.namelist()) == 3
+    
+    def test_pdf_reutiliza_archivo_en_cache(self, client, superuser, pago, settings, media_temporal,
+                                           django_capture_on_commit_callbacks):
+        """Test: Con los mismos filtros y datos se reutiliza el archivo ya generado."""
+        settings.PAGOS_EXPORTACION_PDF_LIMITE_SINCRONO = 0
+        client.force_login(superuser)
+        
+        client.get(reverse('pagos:pago_exportar_pdf'))
+        primera = ExportacionPagos.objects.get()
+        ExportacionPagosService.procesar(primera)
+        
+        response = client.get(reverse('pagos:pago_exportar_pdf'))
+        segunda = ExportacionPagos.objects.exclude(pk=primera.pk).get()
+        assert segunda.estado == 'completada'
+        assert segunda.archivo.name == ExportacionPagos.objects.get(pk=primera.pk).archivo.name
+        assert response.url == reverse('pagos:exportacion_descargar', args=[segunda.pk])
+        
+        # Un cambio en los pagos invalida la huella, aunque la caché del proceso se pierda
+        with django_capture_on_commit_callbacks(execute=True):
+            pago.notas = 'Actualizado'
+            pago.save()
+        cache.clear()
+        client.get(reverse('pagos:pago_exportar_pdf'))
+        assert ExportacionPagos.objects.filter(estado='pendiente').count() == 1
+
+    def test_atascadas_se_miden_desde_el_inicio(self, superuser, media_temporal):
+        """Test: Solo vuelve a pendiente la exportación que lleva mucho procesándose, no la que esperó en cola."""
+        hace_dos_horas = timezone.now() - timedelta(hours=2)
+        recien_iniciada = ExportacionPagos.objects.create(
+            usuario=superuser, formato='excel', parametros={}, estado='procesando', fecha_inicio=timezone.now(),
+        )
+        atascada = ExportacionPagos.objects.create(
+            usuario=superuser, formato='excel', parametros={}, estado='procesando', fecha_inicio=hace_dos_horas,
+        )
+        ExportacionPagos.objects.update(fecha_creacion=hace_dos_horas)
+
+        call_command('procesar_exportaciones_pagos', '--limite', '0', stdout=io.StringIO())
+
+        assert ExportacionPagos.objects.get(pk=recien_iniciada.pk).estado == 'procesando'
+        assert ExportacionPagos.objects.get(pk=atascada.pk).estado == 'pendiente'
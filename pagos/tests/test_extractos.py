@@ -0,0 +1,116 @@
+"""
+Tests para la importación de estados de cuenta bancarios.
+"""
+import io
+from datetime import date
+from decimal import Decimal
+import pytest
+from pagos.extractos import ImportacionExtractoService, leer_movimientos
+from pagos.models import MovimientoBancario, Pago
+
+
+CSV = (
+    'Banco Ejemplo - Estado de cuenta\n'
+    'Fecha;Concepto;Referencia;Cargo;Abono\n'
+    '03/01/2025;SPEI RECIBIDO PAGO 0;REF-001;;"1.234,50"\n'
+    '04/01/2025;COMISION;;15,00;\n'
+)
+
+OFX = (
+    'OFXHEADER:100\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n'
+    '<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20250110120000<TRNAMT>500.00<FITID>A1<NAME>DEPOSITO<MEMO>Juan</STMTTRN>\n'
+    '<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250111<TRNAMT>-20.00<FITID>A2<NAME>CARGO</STMTTRN>\n'
+    '</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n'
+)
+
+
+def archivo(texto):
+    return io.BytesIO(texto.encode('latin-1'))
+
+
+def test_leer_csv_con_encabezado_desplazado():
+    movimientos = list(leer_movimientos(archivo(CSV), 'csv'))
+
+    assert movimientos == [{
+        'linea': 3,
+        'fecha': date(2025, 1, 3),
+        'monto': Decimal('1234.50'),
+        'referencia': 'REF-001',
+        'descripcion': 'SPEI RECIBIDO PAGO 0',
+    }]
+
+
+def test_leer_ofx_solo_abonos():
+    movimientos = list(leer_movimientos(archivo(OFX), 'ofx'))
+
+    assert len(movimientos) == 1
+    assert movimientos[0]['fecha'] == date(2025, 1, 10)
+    assert movimientos[0]['monto'] == Decimal('500.00')
+    assert movimientos[0]['referencia'] == 'A1'
+    assert movimientos[0]['descripcion'] == 'DEPOSITO Juan'
+
+
+@pytest.mark.django_db
+class TestImportacionExtracto:
+    """Tests de la conciliación de abonos con pagos abiertos."""
+
+    def crear_pago(self, pago, mes):
+        return Pago.objects.create(
+            cliente=pago.cliente,
+            instalacion=pago.instalacion,
+            monto=Decimal('500.00'),
+            concepto=f'Mensualidad {mes}',
+            periodo_mes=mes,
+            periodo_anio=2025,
+            fecha_vencimiento=date(2025, mes, 15),
+            estado='pendiente',
+        )
+
+    def test_aplica_coincidencias_seguras_y_deja_ambiguas_en_revision(self, pago):
+        otro = self.crear_pago(pago, 2)
+        texto = (
+            'fecha,monto,concepto\n'
+            f'2025-01-14,500.00,Transferencia PAGO #{pago.pk}\n'
+            '2025-02-10,500.00,Deposito en efectivo\n'
+            '2025-02-11,999.00,Deposito sin identificar\n'
+        )
+
+        resultado = ImportacionExtractoService.importar(archivo(texto), 'enero.csv')
+
+        assert resultado['success'] is True
+        assert (resultado['aplicados'], resultado['en_revision'], resultado['sin_coincidencia']) == (1, 1, 1)
+        pago.refresh_from_db()
+        otro.refresh_from_db()
+        assert pago.estado == 'pagado'
+        assert pago.metodo_pago == 'transferencia'
+        assert otro.estado != 'pagado'
+        revision = MovimientoBancario.objects.get(estado='revision')
+        assert revision.criterio == 'monto_fecha'
+        assert revision.candidatos == [otro.pk]
+
+        # El operador confirma el candidato desde la cola de revisión
+        assert ImportacionExtractoService.resolver(revision.pk, otro.pk)['success'] is True
+        otro.refresh_from_db()
+        assert otro.estado == 'pagado'
+        extracto = resultado['extracto']
+        extracto.refresh_from_db()
+        assert (extracto.aplicados, extracto.en_revision) == (2, 0)
+
+    def test_telefono_con_varios_pagos_va_a_revision(self, pago):
+        self.crear_pago(pago, 2)
+        texto = 'fecha,monto,concepto\n2025-01-20,500.00,Pago de tel 123 456 7890\n'
+
+        resultado = ImportacionExtractoService.importar(archivo(texto), 'enero.csv')
+
+        assert resultado['aplicados'] == 0
+        movimiento = MovimientoBancario.objects.get()
+        assert movimiento.criterio == 'telefono'
+        assert movimiento.candidatos[0] == pago.pk
+
+    def test_rechaza_archivo_ya_importado(self, pago):
+        texto = 'fecha,monto,referencia\n2025-01-14,500.00,X\n'
+
+        assert ImportacionExtractoService.importar(archivo(texto), 'a.csv')['success'] is True
+        resultado = ImportacionExtractoService.importar(archivo(texto), 'copia.csv')
+
+        assert resultado['success'] is False
@@ -0,0 +1,76 @@
+"""
+Tests para la generación masiva de pagos desde PlanPago.
+"""
+import pytest
+from decimal import Decimal
+from django.core.management import call_command
+from pagos.models import Pago, PlanPago
+from pagos.services import GeneradorPagosService
+
+
+@pytest.fixture
+def plan_pago(db, instalacion):
+    """Crea un plan de pago activo."""
+    return PlanPago.objects.create(
+        instalacion=instalacion,
+        monto_mensual=Decimal('500.00'),
+        dia_vencimiento=31,
+        activo=True
+    )
+
+
+@pytest.mark.django_db
+class TestGeneradorPagosService:
+    """Tests para GeneradorPagosService."""
+    
+    def test_rango_periodos_cruza_anio(self):
+        """Test: El rango de períodos cruza el cambio de año."""
+        periodos = GeneradorPagosService.rango_periodos((2024, 11), (2025, 2))
+        assert periodos == [(2024, 11), (2024, 12), (2025, 1), (2025, 2)]
+    
+    def test_fecha_vencimiento_ajustada_al_fin_de_mes(self):
+        """Test: El día 31 se ajusta al último día de febrero."""
+        fecha = GeneradorPagosService.calcular_fecha_vencimiento(2025, 2, 31)
+        assert fecha.day == 28
+    
+    def test_generar_es_idempotente(self, plan_pago):
+        """Test: Ejecutar dos veces no crea pagos duplicados."""
+        periodos = GeneradorPagosService.rango_periodos((2025, 1), (2025, 3))
+        
+        resultado = GeneradorPagosService.generar(periodos)
+        assert resultado['creados'] == 3
+        
+        resultado = GeneradorPagosService.generar(periodos)
+        assert resultado['creados'] == 0
+        assert resultado['existentes'] == 3
+        assert Pago.objects.filter(instalacion=plan_pago.instalacion).count() == 3
+    
+    def test_creados_descuenta_los_insertados_por_otro_proceso(self, plan_pago, monkeypatch):
+        """Test: Los pagos que otra ejecución insertó en paralelo no se cuentan como creados."""
+        construir = GeneradorPagosService.construir_pagos
+        
+        def construir_y_competir(periodos, planes=None):
+            nuevos, omitidos = construir(periodos, planes=planes)
+            # Otra ejecución guarda el mismo pago entre el cálculo y el bulk_create
+            Pago.objects.bulk_create([nuevos[0]])
+            nuevos[0].pk = None
+            return nuevos, omitidos
+        
+        monkeypatch.setattr(GeneradorPagosService, 'construir_pagos', construir_y_competir)
+        resultado = GeneradorPagosService.generar([(2025, 1), (2025, 2)])
+        
+        assert resultado['creados'] == 1
+        assert resultado['existentes'] == 1
+        assert Pago.objects.filter(instalacion=plan_pago.instalacion).count() == 2
+    
+    def test_dry_run_no_crea_pagos(self, plan_pago):
+        """Test: En modo simulación no se guardan pagos."""
+        resultado = GeneradorPagosService.generar([(2025, 1)], dry_run=True)
+        assert resultado['creados'] == 1
+        assert not Pago.objects.exists()
+    
+    def test_comando_rango(self, plan_pago):
+        """Test: El comando genera un rango de meses."""
+        call_command('generar_pagos', desde='2024-12', hasta='2025-01')
+        periodos = set(Pago.objects.values_list('periodo_anio', 'periodo_mes'))
+        assert periodos == {(2024, 12), (2025, 1)}
@@ -0,0 +1,91 @@
+"""
+Tests para el cliente de la API de PayPal.
+"""
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from pagos.paypal import ClientePayPal
+
+
+class ServidorPayPal(BaseHTTPRequestHandler):
+    """API falsa: cuenta las peticiones y responde según la ruta."""
+
+    llamadas = {}
+    tokens_revocados = set()
+    fallos_pendientes = 0
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, estado, datos):
+        cuerpo = json.dumps(datos).encode()
+        self.send_response(estado)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_POST(self):
+        longitud = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(longitud)
+        cls = type(self)
+        cls.llamadas[self.path] = cls.llamadas.get(self.path, 0) + 1
+        if self.path == '/v1/oauth2/token':
+            numero = cls.llamadas[self.path]
+            return self._responder(200, {'access_token': f'token-{numero}', 'expires_in': 32400})
+        if cls.fallos_pendientes:
+            cls.fallos_pendientes -= 1
+            return self._responder(503, {'message': 'no disponible'})
+        token = self.headers['Authorization'].split()[-1]
+        if token in cls.tokens_revocados:
+            return self._responder(401, {'message': 'token revocado'})
+        return self._responder(201, {'id': 'ORDER-1', 'token': token})
+
+
+@pytest.fixture
+def api():
+    ServidorPayPal.llamadas = {}
+    ServidorPayPal.tokens_revocados = set()
+    ServidorPayPal.fallos_pendientes = 0
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), ServidorPayPal)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    cliente = ClientePayPal('id', 'secreto', reintentos=2)
+    cliente.api_url = f'http://127.0.0.1:{servidor.server_port}'
+    yield cliente
+    servidor.shutdown()
+    servidor.server_close()
+
+
+class TestClientePayPal:
+    """Tests para ClientePayPal."""
+
+    def test_token_compartido_entre_hilos(self, api):
+        """Test: Muchas órdenes simultáneas solicitan un solo token."""
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            respuestas = list(executor.map(
+                lambda _: api.solicitud('POST', '/v2/checkout/orders', 'orders.create', json={}),
+                range(20),
+            ))
+        assert all(r.status_code == 201 for r in respuestas)
+        assert ServidorPayPal.llamadas['/v1/oauth2/token'] == 1
+        metricas = api.metricas.resumen()
+        assert metricas['orders.create']['llamadas'] == 20
+        assert metricas['oauth2.token']['llamadas'] == 1
+
+    def test_renueva_token_revocado(self, api):
+        """Test: Un 401 renueva el token y repite la petición una vez."""
+        ServidorPayPal.tokens_revocados.add(api.access_token())
+        response = api.solicitud('POST', '/v2/checkout/orders', 'orders.create', json={})
+        assert response.status_code == 201
+        assert response.json()['token'] == 'token-2'
+
+    def test_reintenta_errores_transitorios(self, api):
+        """Test: Un 503 se reintenta dentro del límite de reintentos."""
+        api.access_token()
+        ServidorPayPal.fallos_pendientes = 1
+        response = api.solicitud('POST', '/v2/checkout/orders', 'orders.create', json={})
+        assert response.status_code == 201
+        assert ServidorPayPal.llamadas['/v2/checkout/orders'] == 2
@@ -0,0 +1,128 @@
+"""
+Tests para la generación por lotes de recordatorios de pago.
+"""
+from datetime import timedelta
+from decimal import Decimal
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from notificaciones.models import Notificacion, NotificacionPago
+from pagos.models import Pago
+from pagos.recordatorios import GeneradorRecordatorios
+from pagos.services import RecordatorioPagoService
+
+
+@pytest.mark.django_db
+class TestGeneradorRecordatorios:
+    """Tests del comando por lotes y de la exclusión de pagos ya recordados."""
+
+    def test_comando_crea_recordatorios_una_vez(self, cliente, instalacion):
+        hoy = timezone.now().date()
+        for mes in range(1, 4):
+            Pago.objects.create(
+                cliente=cliente, instalacion=instalacion, monto=Decimal('350.00'), concepto=f'Mensualidad {mes}',
+                periodo_mes=mes, periodo_anio=2025, fecha_vencimiento=hoy - timedelta(days=5), estado='vencido',
+            )
+        Pago.objects.create(
+            cliente=cliente, monto=Decimal('120.00'), concepto='Por vencer', periodo_mes=4, periodo_anio=2025,
+            fecha_vencimiento=hoy + timedelta(days=3),
+        )
+        # Recordado hace un día: no se repite
+        tipo, _ = GeneradorRecordatorios.tipo_y_configuracion('vencido')
+        Notificacion.objects.create(
+            cliente=cliente, pago=Pago.objects.get(concepto='Mensualidad 1'), tipo=tipo, asunto='Previo',
+            mensaje='Hola', estado='enviada', fecha_envio=timezone.now() - timedelta(days=1),
+        )
+
+        call_command('enviar_recordatorios_pagos')
+
+        nuevas = Notificacion.objects.exclude(asunto='Previo')
+        assert sorted(nuevas.values_list('pago__concepto', flat=True)) == ['Mensualidad 2', 'Mensualidad 3', 'Por vencer']
+        vencida = nuevas.get(pago__concepto='Mensualidad 2')
+        assert vencida.asunto == '⚠️ Pago Vencido - Mensualidad 2'
+        assert (vencida.estado, vencida.canal, vencida.cliente) == ('pendiente', 'email', cliente)
+        assert 'Juan Pérez García' in vencida.mensaje
+        assert 'Días vencido: 5 día(s)' in vencida.mensaje
+        assert instalacion.numero_contrato in vencida.mensaje
+
+        # Los recordatorios aún por enviar también cuentan como recientes
+        call_command('enviar_recordatorios_pagos')
+        assert Notificacion.objects.count() == 4
+
+    def test_mismo_mensaje_que_el_servicio(self, pago, django_assert_max_num_queries):
+        Pago.objects.filter(pk=pago.pk).update(fecha_vencimiento=timezone.now().date() - timedelta(days=2))
+        pago.refresh_from_db()
+        generador = GeneradorRecordatorios(procesos=1)
+        tipo, _ = generador.tipo_y_configuracion('vencido')
+
+        filas = generador.filas('vencido', 1, tipo)
+        with django_assert_max_num_queries(4):
+            assert generador.crear('vencido', filas, 1, tipo)['creados'] == 1
+
+        individual = RecordatorioPagoService.crear_recordatorio_vencido(pago, 1, tipo)['notificacion']
+        assert individual.mensaje == Notificacion.objects.exclude(pk=individual.pk).get().mensaje
+
+    def test_resumen_por_cliente(self, cliente, instalacion, client, superuser):
+        hoy = timezone.now().date()
+        for mes in range(1, 5):
+            Pago.objects.create(
+                cliente=cliente, instalacion=instalacion, monto=Decimal('350.00'), concepto=f'Mensualidad {mes}',
+                periodo_mes=mes, periodo_anio=2025, fecha_vencimiento=hoy - timedelta(days=40 - mes), estado='vencido',
+            )
+        Pago.objects.create(
+            cliente=cliente, monto=Decimal('120.00'), concepto='Por vencer', periodo_mes=5, periodo_anio=2025,
+            fecha_vencimiento=hoy + timedelta(days=3),
+        )
+
+        call_command('enviar_recordatorios_pagos', '--resumen')
+
+        resumen = Notificacion.objects.get()
+        assert resumen.asunto == '⚠️ Resumen de pagos: 4 vencido(s) de 5'
+        assert (resumen.canal, resumen.pago, resumen.tipo.codigo) == ('email', None, 'recordatorio_pago_resumen')
+        assert resumen.pagos.count() == 5
+        assert 'Mensualidad 4' in resumen.mensaje and 'Total: $1520,00' in resumen.mensaje
+
+        # Los pagos ya incluidos en un resumen pendiente no se vuelven a recordar, ni uno por uno
+        call_command('enviar_recordatorios_pagos', '--resumen')
+        call_command('enviar_recordatorios_pagos')
+        assert Notificacion.objects.count() == 1
+
+        client.force_login(superuser)
+        response = client.get(f'/notificaciones/{resumen.pk}/')
+        assert 'Mensualidad 3 - $350,00' in response.content.decode()
+
+    def test_resumen_lista_todos_los_pagos_del_cliente(self, cliente, instalacion):
+        hoy = timezone.now().date()
+        viejos = [
+            Pago.objects.create(
+                cliente=cliente, instalacion=instalacion, monto=Decimal('350.00'), concepto=f'Mensualidad {mes}',
+                periodo_mes=mes, periodo_anio=2025, fecha_vencimiento=hoy - timedelta(days=40 - mes), estado='vencido',
+            )
+            for mes in (1, 2)
+        ]
+        tipo, _ = GeneradorRecordatorios.tipo_y_configuracion('resumen')
+        previo = Notificacion.objects.create(
+            cliente=cliente, tipo=tipo, asunto='Previo', mensaje='Hola', estado='enviada',
+            fecha_envio=timezone.now() - timedelta(days=3),
+        )
+        NotificacionPago.objects.bulk_create([NotificacionPago(notificacion=previo, pago=pago) for pago in viejos])
+        Pago.objects.create(
+            cliente=cliente, instalacion=instalacion, monto=Decimal('350.00'), concepto='Mensualidad 3',
+            periodo_mes=3, periodo_anio=2025, fecha_vencimiento=hoy - timedelta(days=2), estado='vencido',
+        )
+
+        call_command('enviar_recordatorios_pagos', '--resumen')
+
+        # Solo el pago nuevo necesitaba recordatorio, pero el resumen lista lo que el cliente debe
+        resumen = Notificacion.objects.exclude(pk=previo.pk).get()
+        assert resumen.pagos.count() == 3
+        assert 'Total: $1050,00' in resumen.mensaje
+
+        # Con un resumen reciente, el cliente no recibe otro aunque venza un pago más
+        Pago.objects.create(
+            cliente=cliente, instalacion=instalacion, monto=Decimal('350.00'), concepto='Mensualidad 4',
+            periodo_mes=4, periodo_anio=2025, fecha_vencimiento=hoy - timedelta(days=1), estado='vencido',
+        )
+        Notificacion.objects.filter(pk=resumen.pk).update(estado='enviada', fecha_envio=timezone.now())
+        call_command('enviar_recordatorios_pagos', '--resumen')
+        assert Notificacion.objects.count() == 2
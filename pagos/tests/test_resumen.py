@@ -0,0 +1,102 @@
+"""
+Tests para el resumen mensual de pagos.
+"""
+import pytest
+from datetime import date, timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.urls import reverse
+from pagos.models import Pago, ResumenMensualPagos
+from pagos.resumen import ResumenPagosService
+from pagos.vencimientos import VencimientoPagos
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    # La versión persistente vuelve a 1 al revertirse cada test; la caché local no
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def resumen_actual():
+    return {
+        (r.anio, r.mes, r.estado, r.metodo_pago): (r.cantidad, r.monto)
+        for r in ResumenMensualPagos.objects.all() if r.cantidad or r.monto
+    }
+
+
+def resumen_esperado():
+    return ResumenPagosService.agrupar(Pago.objects.all())
+
+
+@pytest.mark.django_db
+class TestResumenMensualPagos:
+    """Tests para ResumenPagosService y su mantenimiento incremental."""
+    
+    def test_se_mantiene_al_guardar_y_eliminar(self, pago):
+        """Test: Crear, pagar, cambiar el monto y eliminar actualizan el resumen."""
+        assert resumen_actual() == {(2025, 1, 'vencido', ''): (1, Decimal('500.00'))}
+        
+        pago.marcar_como_pagado(metodo_pago='efectivo')
+        assert resumen_actual() == {(2025, 1, 'pagado', 'efectivo'): (1, Decimal('500.00'))}
+        
+        pago.monto = Decimal('450.00')
+        pago.save()
+        assert resumen_actual() == {(2025, 1, 'pagado', 'efectivo'): (1, Decimal('450.00'))}
+        
+        pago.delete()
+        assert resumen_actual() == {}
+    
+    def test_barrido_traslada_pendientes_a_vencidos(self, pago):
+        """Test: El UPDATE del barrido de vencidos mueve el resumen al nuevo estado."""
+        cache.clear()
+        Pago.objects.filter(pk=pago.pk).update(estado='pendiente')
+        ResumenPagosService.reconstruir()
+        
+        VencimientoPagos.barrer(forzar=True)
+        
+        assert resumen_actual() == resumen_esperado()
+        assert resumen_actual() == {(2025, 1, 'vencido', ''): (1, Decimal('500.00'))}
+    
+    def test_reconstruir_coincide_con_incremental(self, cliente, instalacion):
+        """Test: La reconstrucción completa da el mismo resultado que el mantenimiento incremental."""
+        hoy = date.today()
+        for mes in range(1, 4):
+            Pago.objects.create(
+                cliente=cliente, monto=Decimal('100.00'), concepto=f'Pago {mes}',
+                periodo_mes=mes, periodo_anio=2024, fecha_vencimiento=hoy + timedelta(days=mes),
+                estado='pagado', metodo_pago='transferencia' if mes % 2 else None,
+            )
+        incremental = resumen_actual()
+        
+        ResumenPagosService.reconstruir()
+        
+        assert resumen_actual() == incremental == resumen_esperado()
+    
+    def test_reportes_leen_del_resumen(self, client, superuser, pago):
+        """Test: La vista de reportes muestra los totales del resumen."""
+        pago.marcar_como_pagado(metodo_pago='efectivo')
+        client.force_login(superuser)
+        
+        response = client.get(reverse('pagos:pago_reportes'), {'anio': 2025})
+        
+        assert response.status_code == 200
+        assert response.context['total_pagos'] == 1
+        assert response.context['monto_pagado'] == Decimal('500.00')
+        assert response.context['ingresos_por_mes'][0]['cantidad'] == 1
+        assert response.context['metodos_pago'][0]['metodo_pago'] == 'efectivo'
+    
+    def test_rankings_se_invalidan_desde_otro_proceso(self, client, superuser, pago, django_capture_on_commit_callbacks):
+        """Test: Un cambio de pagos hecho por otro proceso (cron, otro worker) renueva los rankings."""
+        client.force_login(superuser)
+        assert client.get(reverse('pagos:pago_reportes'), {'anio': 2025}).context['top_clientes'] == []
+        
+        version_local = cache.get('estadisticas_version_pagos')
+        with django_capture_on_commit_callbacks(execute=True):
+            pago.marcar_como_pagado(metodo_pago='efectivo')
+        # Otro proceso: el incremento de su caché local no llega a la de este
+        cache.set('estadisticas_version_pagos', version_local, None)
+        
+        top_clientes = client.get(reverse('pagos:pago_reportes'), {'anio': 2025}).context['top_clientes']
+        assert [cliente['cliente__id'] for cliente in top_clientes] == [pago.cliente_id]
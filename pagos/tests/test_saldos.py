@@ -0,0 +1,56 @@
+"""
+Tests para el saldo por cliente.
+"""
+from datetime import timedelta
+from decimal import Decimal
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from pagos.models import Pago, SaldoCliente
+from pagos.saldos import SaldosClienteService
+
+
+@pytest.mark.django_db
+class TestSaldosCliente:
+    """Tests del mantenimiento incremental y la reconstrucción."""
+
+    def test_se_actualiza_al_guardar_y_eliminar(self, cliente, instalacion):
+        hoy = timezone.now().date()
+        vencido = Pago.objects.create(
+            cliente=cliente, instalacion=instalacion, monto=Decimal('300.00'), concepto='Atrasado',
+            periodo_mes=1, periodo_anio=2025, fecha_vencimiento=hoy - timedelta(days=45),
+        )
+        Pago.objects.create(
+            cliente=cliente, monto=Decimal('200.00'), concepto='Por vencer',
+            periodo_mes=2, periodo_anio=2025, fecha_vencimiento=hoy + timedelta(days=5),
+        )
+
+        saldo = SaldoCliente.objects.get(cliente=cliente)
+        assert (saldo.pagos_pendientes, saldo.monto_pendiente) == (2, Decimal('500.00'))
+        assert (saldo.pagos_vencidos, saldo.monto_vencido) == (1, Decimal('300.00'))
+        assert saldo.monto_31_60 == Decimal('300.00')
+        assert saldo.vencimiento_mas_antiguo == vencido.fecha_vencimiento
+
+        vencido.marcar_como_pagado(metodo_pago='efectivo')
+        saldo.refresh_from_db()
+        assert (saldo.monto_pendiente, saldo.monto_vencido) == (Decimal('200.00'), 0)
+        assert saldo.ultimo_pago is not None
+
+        Pago.objects.filter(cliente=cliente, estado='pendiente').get().delete()
+        saldo.refresh_from_db()
+        assert saldo.pagos_pendientes == 0
+
+    def test_verificar_y_reconstruir(self, pago):
+        SaldoCliente.objects.filter(cliente=pago.cliente).update(monto_pendiente=0)
+
+        diferencias = SaldosClienteService.verificar()
+        assert [d['campo'] for d in diferencias] == ['monto_pendiente']
+
+        call_command('reconstruir_saldos_clientes')
+        assert SaldosClienteService.verificar() == []
+        assert SaldoCliente.objects.get(cliente=pago.cliente).monto_pendiente == Decimal('500.00')
+
+    def test_eliminar_cliente(self, pago):
+        pago.cliente.delete()
+
+        assert not SaldoCliente.objects.exists()
@@ -0,0 +1,112 @@
+"""
+Tests para la reutilización de sesiones de checkout.
+"""
+from datetime import timedelta
+from decimal import Decimal
+import pytest
+from django.utils import timezone
+from pagos.models import TransaccionPago
+from pagos.payment_gateway import PaymentGateway
+from pagos.sesiones_checkout import SesionesCheckoutService
+
+
+@pytest.fixture
+def gateway():
+    """Gateway de PayPal cuya creación de órdenes no sale a la red."""
+    gateway = PaymentGateway('paypal')
+    creadas = []
+
+    def crear(pago, return_url, cancel_url):
+        transaccion = TransaccionPago.objects.create(
+            pago=pago,
+            pasarela='paypal',
+            id_transaccion_pasarela=f'ORDEN-{len(creadas) + 1}',
+            monto=pago.monto,
+        )
+        creadas.append(transaccion.id)
+        return {
+            'success': True,
+            'order_id': transaccion.id_transaccion_pasarela,
+            'url': f'https://paypal.test/aprobar/{transaccion.id}',
+            'transaccion_id': transaccion.id,
+        }
+
+    def expirar(transacciones):
+        expiradas.extend(transaccion.id for transaccion in transacciones)
+        return len(transacciones)
+
+    expiradas = []
+    gateway._crear_intento_paypal = crear
+    gateway.expirar_sesiones = expirar
+    gateway.creadas = creadas
+    gateway.expiradas = expiradas
+    return gateway
+
+
+@pytest.mark.django_db
+class TestSesionesCheckout:
+    """Tests para SesionesCheckoutService y PaymentGateway.crear_intento_pago."""
+
+    def test_reutiliza_sesion_abierta(self, gateway, pago):
+        """Test: Un segundo clic devuelve la misma sesión sin crear otra en la pasarela."""
+        primero = gateway.crear_intento_pago(pago)
+        segundo = gateway.crear_intento_pago(pago)
+
+        assert primero['reutilizada'] is False
+        assert segundo['reutilizada'] is True
+        assert segundo['transaccion_id'] == primero['transaccion_id']
+        assert segundo['url'] == primero['url']
+        assert segundo['order_id'] == 'ORDEN-1'
+        assert len(gateway.creadas) == 1
+
+    def test_cambio_de_monto_crea_sesion_nueva(self, gateway, pago):
+        """Test: Si el monto cambia, la sesión anterior se cancela y se crea otra."""
+        primero = gateway.crear_intento_pago(pago)
+        pago.monto = Decimal('550.00')
+        pago.save()
+
+        segundo = gateway.crear_intento_pago(pago)
+
+        assert segundo['transaccion_id'] != primero['transaccion_id']
+        assert TransaccionPago.objects.get(pk=primero['transaccion_id']).estado == 'cancelada'
+        assert gateway.expiradas == [primero['transaccion_id']]
+
+    def test_clics_simultaneos_conservan_la_primera(self, gateway, pago):
+        """Test: Si otro clic registró una sesión durante la llamada a la pasarela, se devuelve esa."""
+        crear = gateway._crear_intento_paypal
+        otro_clic = {}
+
+        def crear_con_otro_clic(pago, return_url, cancel_url):
+            if not otro_clic:
+                otro_clic.update(crear(pago, return_url, cancel_url))
+                SesionesCheckoutService.registrar(
+                    otro_clic['transaccion_id'], otro_clic['url'], SesionesCheckoutService.vencimiento('paypal')
+                )
+            return crear(pago, return_url, cancel_url)
+
+        gateway._crear_intento_paypal = crear_con_otro_clic
+        resultado = gateway.crear_intento_pago(pago)
+
+        assert resultado['reutilizada'] is True
+        assert resultado['transaccion_id'] == otro_clic['transaccion_id']
+        duplicada = gateway.creadas[1]
+        assert TransaccionPago.objects.get(pk=duplicada).estado == 'cancelada'
+        assert gateway.expiradas == [duplicada]
+
+    def test_expirar_vencidas(self, gateway, pago):
+        """Test: Las sesiones vencidas se cancelan en bloque y ya no se reutilizan."""
+        primero = gateway.crear_intento_pago(pago)
+        TransaccionPago.objects.filter(pk=primero['transaccion_id']).update(
+            fecha_expiracion=timezone.now() - timedelta(minutes=1)
+        )
+
+        assert SesionesCheckoutService.expirar_vencidas() == 1
+        assert TransaccionPago.objects.get(pk=primero['transaccion_id']).estado == 'cancelada'
+        assert gateway.crear_intento_pago(pago)['reutilizada'] is False
+
+    def test_vigencia_respeta_limites_de_pasarela(self, settings):
+        settings.PAGOS_CHECKOUT_VIGENCIA_MINUTOS = 10
+        assert SesionesCheckoutService.vigencia_minutos('stripe') == 30
+        settings.PAGOS_CHECKOUT_VIGENCIA_MINUTOS = 600
+        assert SesionesCheckoutService.vigencia_minutos('paypal') == 180
+        assert SesionesCheckoutService.vigencia_minutos('mercadopago') == 600
@@ -0,0 +1,104 @@
+"""
+Tests para el simulador local de pasarelas de pago.
+"""
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+import pytest
+from pagos.models import Pago
+from pagos.payment_gateway import PaymentGateway
+from pagos.simulador import SimuladorPasarelas
+from pagos.webhooks import BandejaWebhooks
+
+
+class Receptor(BaseHTTPRequestHandler):
+    """Recibe los webhooks del simulador y los deja en una cola."""
+
+    recibidos = queue.Queue()
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        cuerpo = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        type(self).recibidos.put((self.path, dict(self.headers), cuerpo))
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+@pytest.fixture
+def simulador(settings):
+    receptor = ThreadingHTTPServer(('127.0.0.1', 0), Receptor)
+    threading.Thread(target=receptor.serve_forever, daemon=True).start()
+    url_receptor = f'http://127.0.0.1:{receptor.server_port}'
+    Receptor.recibidos = queue.Queue()
+
+    simulador = SimuladorPasarelas(
+        url_webhooks={'stripe': f'{url_receptor}/stripe/', 'mercadopago': f'{url_receptor}/mercadopago/'},
+        secreto_stripe='whsec_sim',
+        secreto_mercadopago='mp_sim',
+    )
+    with simulador:
+        settings.STRIPE_API_URL = settings.MERCADOPAGO_API_URL = settings.PAYPAL_API_URL = simulador.url
+        settings.STRIPE_SECRET_KEY = 'sk_test_sim'
+        settings.STRIPE_WEBHOOK_SECRET = 'whsec_sim'
+        settings.MERCADOPAGO_ACCESS_TOKEN = 'TEST-sim'
+        settings.MERCADOPAGO_WEBHOOK_SECRET = 'mp_sim'
+        settings.PAYPAL_CLIENT_ID = 'sim'
+        settings.PAYPAL_SECRET = 'sim'
+        yield simulador
+    receptor.shutdown()
+    receptor.server_close()
+
+
+def recibir_webhook(ruta, headers, cuerpo):
+    if ruta.startswith('/stripe/'):
+        return BandejaWebhooks.recibir_stripe(cuerpo, headers['Stripe-Signature'])
+    return BandejaWebhooks.recibir_mercadopago(
+        cuerpo, headers['x-signature'], headers['x-request-id'], dict(parse_qsl(urlsplit(ruta).query)),
+    )
+
+
+@pytest.mark.django_db
+class TestSimuladorPasarelas:
+    """Tests del flujo checkout -> pago -> webhook contra el simulador."""
+
+    @pytest.mark.parametrize('pasarela, clave_id', [('stripe', 'session_id'), ('mercadopago', 'preference_id')])
+    def test_checkout_webhook_y_pago(self, simulador, pago, pasarela, clave_id):
+        resultado = PaymentGateway(pasarela).crear_intento_pago(pago)
+        assert resultado['success'], resultado
+        assert resultado['url'].startswith(simulador.url)
+
+        assert simulador.pagar(resultado[clave_id])['success']
+        webhook = Receptor.recibidos.get(timeout=5)
+        assert recibir_webhook(*webhook)['success']
+        assert BandejaWebhooks.procesar_pendientes() == {'procesado': 1}
+
+        assert Pago.objects.get(pk=pago.pk).estado == 'pagado'
+
+    @pytest.mark.parametrize('pasarela, clave_id', [('stripe', 'session_id'), ('mercadopago', 'preference_id')])
+    def test_cambio_de_monto_expira_la_sesion_vieja(self, simulador, pago, pasarela, clave_id):
+        """Test: La sesión con el monto anterior se expira en la pasarela y ya no se puede pagar."""
+        gateway = PaymentGateway(pasarela)
+        vieja = gateway.crear_intento_pago(pago)
+        pago.monto += 50
+        pago.save()
+
+        nueva = gateway.crear_intento_pago(pago)
+
+        assert nueva['success'] and nueva[clave_id] != vieja[clave_id]
+        assert simulador.pagar(vieja[clave_id])['success'] is False
+        assert simulador.pagar(nueva[clave_id])['success']
+
+    def test_errores_simulados(self, simulador, pago, settings):
+        """Test: Con tasa de errores 1 la pasarela responde 503 y el checkout falla sin excepción."""
+        settings.PAYPAL_REINTENTOS = 0
+        simulador.tasa_errores = 1.0
+        simulador.ordenes.clear()
+
+        resultado = PaymentGateway('paypal').crear_intento_pago(pago)
+
+        assert resultado['success'] is False
+        assert not simulador.ordenes
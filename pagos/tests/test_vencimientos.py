@@ -0,0 +1,70 @@
+"""
+Tests para el mantenimiento del estado vencido de los pagos.
+"""
+import pytest
+from datetime import date, timedelta
+from django.core.cache import cache
+from pagos.models import Pago
+from pagos.vencimientos import VencimientoPagos
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.mark.django_db
+class TestVencimientoPagos:
+    """Tests para VencimientoPagos."""
+    
+    def test_estado_para(self):
+        """Test: Un pago pendiente con fecha pasada está vencido."""
+        hoy = date(2025, 6, 10)
+        assert VencimientoPagos.estado_para('pendiente', date(2025, 6, 9), hoy) == 'vencido'
+        assert VencimientoPagos.estado_para('pendiente', date(2025, 6, 10), hoy) == 'pendiente'
+        assert VencimientoPagos.estado_para('pagado', date(2025, 6, 1), hoy) == 'pagado'
+    
+    def test_estado_efectivo_sin_escribir(self, pago):
+        """Test: El estado efectivo se calcula en SQL aunque la fila siga pendiente."""
+        Pago.objects.filter(pk=pago.pk).update(estado='pendiente')
+        
+        anotado = VencimientoPagos.con_estado_efectivo(Pago.objects.all()).get(pk=pago.pk)
+        assert anotado.estado == 'pendiente'
+        assert anotado.estado_efectivo == 'vencido'
+        assert VencimientoPagos.filtrar_por_estado(Pago.objects.all(), 'vencido').count() == 1
+        assert VencimientoPagos.filtrar_por_estado(Pago.objects.all(), 'pendiente').count() == 0
+    
+    def test_barrido_una_vez_al_dia(self, pago):
+        """Test: El barrido se ejecuta solo una vez por día salvo que se fuerce."""
+        Pago.objects.filter(pk=pago.pk).update(estado='pendiente')
+        
+        assert VencimientoPagos.barrer() == 1
+        assert VencimientoPagos.ultimo_barrido() == VencimientoPagos.hoy()
+        
+        Pago.objects.filter(pk=pago.pk).update(estado='pendiente')
+        assert VencimientoPagos.barrer() is None
+        assert VencimientoPagos.barrer(forzar=True) == 1
+    
+    def test_marca_compartida_entre_procesos(self, pago):
+        """Test: La marca del barrido está en la base de datos, no en la caché del proceso."""
+        Pago.objects.filter(pk=pago.pk).update(estado='pendiente')
+        assert VencimientoPagos.barrer() == 1
+        
+        cache.clear()
+        Pago.objects.filter(pk=pago.pk).update(estado='pendiente')
+        assert not VencimientoPagos.barrido_pendiente()
+        assert VencimientoPagos.barrer() is None
+    
+    def test_save_no_vence_pagos_futuros(self, cliente):
+        """Test: Pago.save() conserva pendiente si aún no vence."""
+        pago = Pago.objects.create(
+            cliente=cliente,
+            monto=100,
+            concepto='Futuro',
+            periodo_mes=1,
+            periodo_anio=2030,
+            fecha_vencimiento=date.today() + timedelta(days=5),
+        )
+        assert pago.estado == 'pendiente'
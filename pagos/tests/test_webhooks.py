@@ -0,0 +1,143 @@
+"""
+Tests para la bandeja de entrada de webhooks de pasarelas.
+"""
+import hashlib
+import hmac
+import json
+import time
+import pytest
+from django.urls import reverse
+from pagos.models import EventoWebhook, TransaccionPago
+from pagos.webhooks import BandejaWebhooks, verificar_firma_mercadopago
+
+SECRETO = 'whsec_test'
+
+
+def firmar_stripe(payload, secreto=SECRETO, timestamp=None):
+    timestamp = timestamp or int(time.time())
+    firma = hmac.new(secreto.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={firma}'
+
+
+def evento_stripe(id_evento, tipo, objeto):
+    return json.dumps({'id': id_evento, 'type': tipo, 'data': {'object': objeto}})
+
+
+@pytest.fixture
+def transaccion(pago):
+    return TransaccionPago.objects.create(
+        pago=pago,
+        pasarela='stripe',
+        id_transaccion_pasarela='cs_test_1',
+        id_pago_intento='pi_test_1',
+        monto=pago.monto,
+    )
+
+
+@pytest.mark.django_db
+class TestBandejaWebhooks:
+    """Tests para la recepción y el procesamiento de webhooks."""
+
+    def test_stripe_se_guarda_sin_aplicar(self, client, settings, transaccion):
+        """Test: El endpoint solo verifica y guarda; el evento repetido no se duplica."""
+        settings.STRIPE_WEBHOOK_SECRET = SECRETO
+        payload = evento_stripe('evt_1', 'checkout.session.completed', {'id': 'cs_test_1'})
+        url = reverse('pagos:webhook_stripe')
+
+        for _ in range(2):
+            response = client.post(
+                url, payload, content_type='application/json', HTTP_STRIPE_SIGNATURE=firmar_stripe(payload)
+            )
+            assert response.status_code == 200
+
+        assert EventoWebhook.objects.filter(pasarela='stripe', id_evento='evt_1').count() == 1
+        transaccion.refresh_from_db()
+        assert transaccion.estado == 'pendiente'
+
+    def test_stripe_firma_invalida(self, client, settings):
+        """Test: Una firma incorrecta o vencida se rechaza con 400."""
+        settings.STRIPE_WEBHOOK_SECRET = SECRETO
+        payload = evento_stripe('evt_2', 'payment_intent.succeeded', {'id': 'pi_x'})
+        url = reverse('pagos:webhook_stripe')
+
+        response = client.post(
+            url, payload, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=firmar_stripe(payload, secreto='otro'),
+        )
+        assert response.status_code == 400
+        response = client.post(
+            url, payload, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=firmar_stripe(payload, timestamp=int(time.time()) - 3600),
+        )
+        assert response.status_code == 400
+        assert not EventoWebhook.objects.exists()
+
+    def test_procesar_es_idempotente(self, transaccion):
+        """Test: Dos eventos del mismo pago lo marcan como pagado una sola vez."""
+        BandejaWebhooks.registrar('stripe', 'evt_a', 'checkout.session.completed', json.loads(
+            evento_stripe('evt_a', 'checkout.session.completed', {'id': 'cs_test_1'})
+        ))
+        BandejaWebhooks.registrar('stripe', 'evt_b', 'payment_intent.succeeded', json.loads(
+            evento_stripe('evt_b', 'payment_intent.succeeded', {'id': 'pi_test_1'})
+        ))
+        BandejaWebhooks.registrar('stripe', 'evt_c', 'payment_intent.payment_failed', json.loads(
+            evento_stripe('evt_c', 'payment_intent.payment_failed', {'id': 'pi_test_1'})
+        ))
+
+        assert BandejaWebhooks.procesar_pendientes() == {'procesado': 1, 'ignorado': 2}
+        assert BandejaWebhooks.procesar_pendientes() == {}
+
+        transaccion.refresh_from_db()
+        assert transaccion.estado == 'completada'
+        assert transaccion.pago.estado == 'pagado'
+
+    def test_monto_distinto_queda_en_revision(self, transaccion):
+        """Test: Si se cobró otro monto (sesión vieja), el pago no se marca como pagado."""
+        centavos = int(transaccion.pago.monto * 100) - 5000
+        BandejaWebhooks.registrar('stripe', 'evt_m', 'checkout.session.completed', json.loads(
+            evento_stripe('evt_m', 'checkout.session.completed', {'id': 'cs_test_1', 'amount_total': centavos})
+        ))
+
+        assert BandejaWebhooks.procesar_pendientes() == {'procesado': 1}
+
+        transaccion.refresh_from_db()
+        assert transaccion.estado == 'procesando'
+        assert 'revisión' in transaccion.mensaje_error
+        assert transaccion.pago.estado != 'pagado'
+
+    def test_error_reintenta_y_luego_falla(self, settings, monkeypatch):
+        """Test: Un evento que falla vuelve a pendiente hasta agotar los intentos."""
+        settings.PAGOS_WEBHOOK_MAX_INTENTOS = 2
+
+        def consulta_fallida(payment_id):
+            raise ValueError('Mercado Pago no disponible')
+
+        monkeypatch.setattr(BandejaWebhooks, 'consultar_pago_mercadopago', staticmethod(consulta_fallida))
+        BandejaWebhooks.registrar('mercadopago', '1', 'payment', {'recurso_id': '99'})
+
+        assert BandejaWebhooks.procesar_pendientes() == {'pendiente': 1}
+        assert BandejaWebhooks.procesar_pendientes() == {'fallido': 1}
+        evento = EventoWebhook.objects.get()
+        assert evento.intentos == 2
+        assert 'no disponible' in evento.resultado
+
+    def test_mercadopago_cada_cambio_de_estado_se_encola(self):
+        """Test: Las notificaciones IPN del mismo pago no se descartan como duplicadas."""
+        parametros = {'topic': 'payment', 'id': '99'}
+        primera = BandejaWebhooks.recibir_mercadopago(b'', '', 'req-1', parametros)
+        segunda = BandejaWebhooks.recibir_mercadopago(b'', '', 'req-2', parametros)
+        assert not primera['duplicado'] and not segunda['duplicado']
+
+        # Sin x-request-id, la repetida vuelve a encolar el evento ya aplicado
+        BandejaWebhooks.recibir_mercadopago(b'', '', '', parametros)
+        EventoWebhook.objects.update(estado='procesado')
+        assert BandejaWebhooks.recibir_mercadopago(b'', '', '', parametros)['duplicado']
+        assert EventoWebhook.objects.filter(estado='pendiente').count() == 1
+
+    def test_firma_mercadopago(self):
+        """Test: Verificación del manifiesto firmado de Mercado Pago."""
+        manifiesto = 'id:123;request-id:req-1;ts:1700000000;'
+        firma = hmac.new(SECRETO.encode(), manifiesto.encode(), hashlib.sha256).hexdigest()
+        cabecera = f'ts=1700000000,v1={firma}'
+        assert verificar_firma_mercadopago(cabecera, 'req-1', '123', SECRETO)
+        assert not verificar_firma_mercadopago(cabecera, 'req-2', '123', SECRETO)
@@ -11,16 +11,31 @@ urlpatterns = [
     path('<int:pk>/editar/', views.pago_update, name='pago_update'),
     path('<int:pk>/eliminar/', views.pago_delete, name='pago_delete'),
     path('<int:pk>/marcar-pagado/', views.pago_marcar_pagado, name='pago_marcar_pagado'),
+    path('cobranza/', views.cobranza_captura, name='cobranza_captura'),
+    path('extractos/', views.extracto_importar, name='extracto_importar'),
+    path('extractos/<int:pk>/', views.extracto_detalle, name='extracto_detalle'),
+    path('extractos/movimientos/<int:pk>/resolver/', views.movimiento_resolver, name='movimiento_resolver'),
     
     # Exportación
     path('exportar/excel/', views.pago_exportar_excel, name='pago_exportar_excel'),
     path('exportar/pdf/', views.pago_exportar_pdf, name='pago_exportar_pdf'),
+    path('exportaciones/<int:pk>/descargar/', views.exportacion_descargar, name='exportacion_descargar'),
     
     # Calendario y Reportes
     path('calendario/', views.pago_calendario, name='pago_calendario'),
+    path('api/calendario/dia/', views.pago_calendario_dia, name='api_calendario_dia'),
     path('reportes/', views.pago_reportes, name='pago_reportes'),
+    path('reportes/antiguedad/', views.pago_antiguedad, name='pago_antiguedad'),
+    path('reportes/antiguedad/csv/', views.pago_antiguedad_csv, name='pago_antiguedad_csv'),
+    path('reportes/analitica/', views.pago_analitica, name='pago_analitica'),
+    
+    # Webhooks de pasarelas (bandeja de entrada)
+    path('webhook/stripe/', views.webhook_stripe, name='webhook_stripe'),
+    path('webhook/mercadopago/', views.webhook_mercadopago, name='webhook_mercadopago'),
+    path('api/paypal/metricas/', views.paypal_metricas, name='api_paypal_metricas'),
     
     # API para búsqueda de clientes
+    path('api/cobranza/', views.api_cobranza, name='api_cobranza'),
     path('api/buscar-clientes/', views.buscar_clientes, name='api_buscar_clientes'),
     path('api/cliente/<int:cliente_id>/instalaciones/', views.obtener_instalaciones_cliente, name='api_instalaciones_cliente'),
 ]
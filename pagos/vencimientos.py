@@ -0,0 +1,147 @@
+"""
+Mantenimiento del estado 'vencido' de los pagos.
+
+Centraliza la regla "un pago pendiente cuya fecha de vencimiento ya pasó está vencido":
+- Las vistas de lectura calculan el estado efectivo con una expresión SQL, sin escribir.
+- El barrido que persiste el estado se ejecuta como máximo una vez al día, usando
+  una marca de "último barrido" en la base de datos (core.MarcaTarea), compartida por
+  los workers web y el comando programado; su fila bloqueada serializa los barridos.
+- Pago.save() aplica la misma regla mediante estado_para().
+"""
+import logging
+from django.db import transaction
+from django.db.models import Case, When, Value, F, Q, CharField
+from django.utils import timezone
+from core.estadisticas import invalidar_estadisticas
+
+logger = logging.getLogger(__name__)
+
+TAREA_BARRIDO = 'pagos_vencidos'
+
+
+class VencimientoPagos:
+    """Regla de vencimiento y barrido diario de pagos pendientes vencidos."""
+
+    # Pagos por cada UPDATE del barrido
+    LOTE = 500
+
+    @staticmethod
+    def hoy():
+        return timezone.now().date()
+
+    @classmethod
+    def estado_para(cls, estado, fecha_vencimiento, hoy=None):
+        """Devuelve el estado que corresponde a un pago según su fecha de vencimiento."""
+        hoy = hoy or cls.hoy()
+        if estado == 'pendiente' and fecha_vencimiento and fecha_vencimiento < hoy:
+            return 'vencido'
+        return estado
+
+    @classmethod
+    def condicion_vencido(cls, hoy=None):
+        """Q que selecciona los pagos efectivamente vencidos (persistidos o no)."""
+        hoy = hoy or cls.hoy()
+        return Q(estado='vencido') | Q(estado='pendiente', fecha_vencimiento__lt=hoy)
+
+    @classmethod
+    def condicion_estado(cls, estado, hoy=None):
+        """Q equivalente a filtrar por estado efectivo."""
+        hoy = hoy or cls.hoy()
+        if estado == 'vencido':
+            return cls.condicion_vencido(hoy)
+        if estado == 'pendiente':
+            return Q(estado='pendiente', fecha_vencimiento__gte=hoy)
+        return Q(estado=estado)
+
+    @classmethod
+    def expresion_estado(cls, hoy=None):
+        """Expresión SQL con el estado efectivo de cada pago."""
+        hoy = hoy or cls.hoy()
+        return Case(
+            When(estado='pendiente', fecha_vencimiento__lt=hoy, then=Value('vencido')),
+            default=F('estado'),
+            output_field=CharField(),
+        )
+
+    @classmethod
+    def con_estado_efectivo(cls, queryset, hoy=None):
+        """Anota `estado_efectivo` en el queryset de pagos."""
+        return queryset.annotate(estado_efectivo=cls.expresion_estado(hoy))
+
+    @classmethod
+    def filtrar_por_estado(cls, queryset, estado, hoy=None):
+        """Filtra un queryset de pagos por estado efectivo."""
+        return queryset.filter(cls.condicion_estado(estado, hoy))
+
+    @classmethod
+    def ultimo_barrido(cls):
+        """Fecha del último barrido registrado o None."""
+        from core.models import MarcaTarea
+
+        return MarcaTarea.objects.filter(tarea=TAREA_BARRIDO).values_list('fecha', flat=True).first()
+
+    @classmethod
+    def barrido_pendiente(cls, hoy=None):
+        """Indica si hoy todavía no se han marcado los pagos vencidos."""
+        hoy = hoy or cls.hoy()
+        ultimo = cls.ultimo_barrido()
+        return ultimo is None or ultimo < hoy
+
+    @classmethod
+    def barrer(cls, forzar=False):
+        """
+        Marca como vencidos los pagos pendientes cuya fecha de vencimiento ya pasó.
+
+        Se ejecuta como máximo una vez al día salvo que se indique forzar=True.
+
+        Returns:
+            int o None: Cantidad de pagos actualizados, o None si no se ejecutó.
+        """
+        from core.models import MarcaTarea
+        from .models import Pago
+        from .resumen import ResumenPagosService
+
+        hoy = cls.hoy()
+        if not forzar and not cls.barrido_pendiente(hoy):
+            return None
+
+        with transaction.atomic():
+            # La fila de la marca bloqueada serializa los barridos de todos los procesos;
+            # el que esperaba vuelve a leer la fecha y no repite el de hoy
+            MarcaTarea.objects.get_or_create(tarea=TAREA_BARRIDO)
+            marca = MarcaTarea.objects.select_for_update().get(tarea=TAREA_BARRIDO)
+            if not forzar and marca.fecha and marca.fecha >= hoy:
+                return None
+
+            # Bloquear los pagos antes de leerlos: el resumen se traslada con exactamente
+            # las filas que cambia el UPDATE (update() no emite señales)
+            ids = list(
+                Pago.objects.select_for_update()
+                .filter(estado='pendiente', fecha_vencimiento__lt=hoy)
+                .values_list('pk', flat=True)
+            )
+            cantidad = 0
+            for i in range(0, len(ids), cls.LOTE):
+                lote = Pago.objects.filter(pk__in=ids[i:i + cls.LOTE])
+                ResumenPagosService.mover_estado(lote, 'vencido')
+                cantidad += lote.update(estado='vencido')
+            marca.fecha = hoy
+            marca.save(update_fields=['fecha'])
+
+        if cantidad:
+            invalidar_estadisticas('pagos')
+            logger.info(f'Barrido de vencimientos: {cantidad} pago(s) marcados como vencidos')
+        return cantidad
+
+    @classmethod
+    def barrer_si_corresponde(cls):
+        """
+        Disparador perezoso para rutas de lectura: solo consulta la marca
+        y ejecuta el barrido si hoy aún no se hizo.
+        """
+        if cls.barrido_pendiente():
+            try:
+                return cls.barrer()
+            except Exception as e:
+                logger.error(f'Error en el barrido de pagos vencidos: {str(e)}')
+        return None
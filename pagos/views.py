@@ -1,15 +1,34 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Sum, Count, Avg
+from django.db.models import Q, Sum, Count, F
 from django.utils import timezone
-from django.http import JsonResponse, HttpResponse
-from django.core.paginator import Paginator
+from django.http import JsonResponse, FileResponse, Http404, StreamingHttpResponse
+from django.urls import reverse
+from django.core.cache import cache
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from datetime import timedelta, date, datetime
 from calendar import monthrange
 import json
-from .models import Pago, PlanPago
-from .forms import PagoForm, PlanPagoForm
+import os
+from .models import Pago, PlanPago, ExportacionPagos, ExtractoBancario, MovimientoBancario, SaldoCliente
+from .vencimientos import VencimientoPagos
+from .filtros import filtrar_pagos, parametros_filtro, ORDEN_POR_DEFECTO, ORDENES_PAGOS
+from .exportacion import ExportacionPagosService
+from .webhooks import BandejaWebhooks
+from .paypal import metricas_paypal
+from core.decorators import staff_required
+from core.estadisticas import calcular_estadisticas, Conteo, Suma, version_persistente
+from core.busqueda import BusquedaService
+from core.paginacion import PaginadorKeyset
+from .resumen import ResumenPagosService
+from .services import MESES_NOMBRES
+from .forms import PagoForm, PlanPagoForm, ExtractoBancarioForm, CapturaCobranzaForm
+from .cobranza import CapturaCobranzaService, MAX_RECIBOS
+from .antiguedad import ReporteAntiguedad, AGRUPACIONES, RANGOS
+from .calendario import CalendarioPagos
+from .extractos import ImportacionExtractoService
 from clientes.models import Cliente
 from instalaciones.models import Instalacion
 
@@ -17,57 +36,44 @@ from instalaciones.models import Instalacion
 @login_required
 def pago_list(request):
     """Lista todos los pagos con búsqueda y filtros."""
-    # Actualizar automáticamente pagos vencidos
-    Pago.actualizar_pagos_vencidos()
+    # Persistir pagos vencidos como máximo una vez al día (el estado mostrado se calcula en SQL)
+    VencimientoPagos.barrer_si_corresponde()
     
-    pagos = Pago.objects.select_related('cliente', 'instalacion').all()
-    
-    # Búsqueda
+    # Búsqueda, filtros y ordenamiento (compartidos con las exportaciones)
     query = request.GET.get('q', '')
-    if query:
-        pagos = pagos.filter(
-            Q(cliente__nombre__icontains=query) |
-            Q(cliente__apellido1__icontains=query) |
-            Q(cliente__apellido2__icontains=query) |
-            Q(cliente__telefono__icontains=query) |
-            Q(concepto__icontains=query) |
-            Q(referencia_pago__icontains=query)
-        )
-    
-    # Filtro por estado
     estado_filter = request.GET.get('estado', '')
-    if estado_filter:
-        pagos = pagos.filter(estado=estado_filter)
-    
-    # Filtro por método de pago
     metodo_filter = request.GET.get('metodo', '')
-    if metodo_filter:
-        pagos = pagos.filter(metodo_pago=metodo_filter)
-    
-    # Filtro por período
     periodo_anio = request.GET.get('anio', '')
     periodo_mes = request.GET.get('mes', '')
-    if periodo_anio:
-        pagos = pagos.filter(periodo_anio=periodo_anio)
-    if periodo_mes:
-        pagos = pagos.filter(periodo_mes=periodo_mes)
-    
-    # Ordenamiento
-    orden = request.GET.get('orden', '-fecha_vencimiento')
-    pagos = pagos.order_by(orden)
-    
-    # Calcular estadísticas
-    total_pagos = pagos.count()
-    total_monto = pagos.aggregate(Sum('monto'))['monto__sum'] or 0
-    pagos_pendientes = pagos.filter(estado='pendiente').count()
-    pagos_vencidos = pagos.filter(estado='vencido').count()
-    pagos_pagados = pagos.filter(estado='pagado').count()
-    
-    # Paginación
-    from django.core.paginator import Paginator
-    paginator = Paginator(pagos, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    orden = request.GET.get('orden', ORDEN_POR_DEFECTO)
+    pagos = filtrar_pagos(
+        request.GET,
+        VencimientoPagos.con_estado_efectivo(
+            Pago.objects.select_related('cliente', 'instalacion').all()
+        ),
+    )
+    
+    # Calcular estadísticas (una sola consulta, en caché por filtros)
+    hoy = VencimientoPagos.hoy()
+    stats = calcular_estadisticas(
+        pagos,
+        {
+            'total_pagos': Conteo(),
+            'total_monto': Suma('monto'),
+            'pagos_pendientes': Conteo(VencimientoPagos.condicion_estado('pendiente', hoy)),
+            'pagos_vencidos': Conteo(VencimientoPagos.condicion_vencido(hoy)),
+            'pagos_pagados': Conteo(Q(estado='pagado')),
+        },
+        cache_grupo='pagos',
+        cache_parametros={
+            'vista': 'pago_list', 'q': query, 'estado': estado_filter, 'metodo': metodo_filter,
+            'anio': periodo_anio, 'mes': periodo_mes, 'hoy': hoy,
+        },
+    )
+    
+    # Paginación por cursor (sin COUNT ni OFFSET; el total exacto ya está en las estadísticas)
+    paginador = PaginadorKeyset(pagos, ORDENES_PAGOS, orden, por_pagina=20)
+    page_obj = paginador.pagina(request.GET.get('cursor'), parametros=request.GET)
     
     context = {
         'page_obj': page_obj,
@@ -76,14 +82,14 @@ def pago_list(request):
         'metodo_filter': metodo_filter,
         'periodo_anio': periodo_anio,
         'periodo_mes': periodo_mes,
-        'orden': orden,
+        'orden': paginador.orden,
         'estados': Pago.ESTADO_CHOICES,
         'metodos': Pago.METODO_PAGO_CHOICES,
-        'total_pagos': total_pagos,
-        'total_monto': total_monto,
-        'pagos_pendientes': pagos_pendientes,
-        'pagos_vencidos': pagos_vencidos,
-        'pagos_pagados': pagos_pagados,
+        'total_pagos': stats['total_pagos'],
+        'total_monto': stats['total_monto'],
+        'pagos_pendientes': stats['pagos_pendientes'],
+        'pagos_vencidos': stats['pagos_vencidos'],
+        'pagos_pagados': stats['pagos_pagados'],
     }
     
     return render(request, 'pagos/pago_list.html', context)
@@ -206,6 +212,217 @@ def pago_marcar_pagado(request, pk):
     return render(request, 'pagos/pago_marcar_pagado.html', context)
 
 
+# ============================================
+# Captura masiva de cobros
+# ============================================
+
+@login_required
+def cobranza_captura(request):
+    """Captura los recibos de un cobrador: valida el lote y aplica los válidos."""
+    resultado = None
+    if request.method == 'POST':
+        form = CapturaCobranzaForm(request.POST)
+        if form.is_valid():
+            aplicar = request.POST.get('accion') != 'validar'
+            resultado = CapturaCobranzaService.capturar(
+                form.cleaned_data['recibos'],
+                usuario=request.user,
+                cobrador=form.cleaned_data['cobrador'],
+                aplicar=aplicar,
+            )
+            if aplicar:
+                messages.success(
+                    request,
+                    f"{resultado['aplicados']} de {resultado['total']} recibos aplicados "
+                    f"(${resultado['monto_aplicado']:,.2f})."
+                )
+            resultado['aplicado'] = aplicar
+            resultado['rechazos'] = [fila for fila in resultado['resultados'] if not fila['aplicado']]
+    else:
+        form = CapturaCobranzaForm()
+    
+    context = {
+        'form': form,
+        'resultado': resultado,
+        'metodos': Pago.METODO_PAGO_CHOICES,
+    }
+    
+    return render(request, 'pagos/cobranza_captura.html', context)
+
+
+@login_required
+@require_POST
+def api_cobranza(request):
+    """
+    API de captura masiva de cobros.
+    
+    Recibe JSON {"cobrador": "...", "validar": false, "cobros": [{"pago": 1520, "monto": "450.00",
+    "metodo": "efectivo", "referencia": "R-0001", "fecha": "2025-01-20"}, {"contrato": "...", ...}]}
+    y devuelve el resultado de cada línea.
+    """
+    try:
+        datos = json.loads(request.body)
+        cobros = datos['cobros']
+        if not isinstance(cobros, list) or not all(isinstance(cobro, dict) for cobro in cobros):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'error': 'JSON inválido: se espera {"cobros": [...]}'}, status=400)
+    if len(cobros) > MAX_RECIBOS:
+        return JsonResponse(
+            {'success': False, 'error': f'Un lote admite como máximo {MAX_RECIBOS} recibos'}, status=400
+        )
+    
+    resultado = CapturaCobranzaService.capturar(
+        cobros,
+        usuario=request.user,
+        cobrador=str(datos.get('cobrador') or ''),
+        origen='api',
+        aplicar=not datos.get('validar'),
+    )
+    return JsonResponse({
+        'success': True,
+        'lote_id': resultado['lote'].pk if resultado['lote'] else None,
+        'total': resultado['total'],
+        'aplicados': resultado['aplicados'],
+        'rechazados': resultado['rechazados'],
+        'monto_aplicado': str(resultado['monto_aplicado']),
+        'segundos': resultado['segundos'],
+        'resultados': resultado['resultados'],
+    })
+
+
+# ============================================
+# Estados de cuenta bancarios
+# ============================================
+
+ORDENES_MOVIMIENTOS = {
+    'linea': ('linea', 'id'),
+    '-monto': ('-monto', '-id'),
+}
+
+
+@login_required
+def extracto_importar(request):
+    """Importa un estado de cuenta y aplica los abonos que coinciden con un pago."""
+    if request.method == 'POST':
+        form = ExtractoBancarioForm(request.POST, request.FILES)
+        if form.is_valid():
+            archivo = form.cleaned_data['archivo']
+            resultado = ImportacionExtractoService.importar(
+                archivo,
+                archivo.name,
+                formato=form.cleaned_data['formato'] or None,
+                usuario=request.user,
+            )
+            if resultado['success']:
+                messages.success(
+                    request,
+                    f"Estado de cuenta importado: {resultado['aplicados']} pagos aplicados, "
+                    f"{resultado['en_revision']} en revisión y {resultado['sin_coincidencia']} sin coincidencia "
+                    f"({resultado['segundos']} s)."
+                )
+                return redirect('pagos:extracto_detalle', pk=resultado['extracto'].pk)
+            messages.error(request, resultado['error'])
+    else:
+        form = ExtractoBancarioForm()
+    
+    context = {
+        'form': form,
+        'extractos': ExtractoBancario.objects.select_related('usuario')[:20],
+    }
+    
+    return render(request, 'pagos/extracto_importar.html', context)
+
+
+@login_required
+def extracto_detalle(request, pk):
+    """Movimientos de un estado de cuenta; por defecto, la cola de revisión."""
+    extracto = get_object_or_404(ExtractoBancario, pk=pk)
+    estado = request.GET.get('estado', 'revision')
+    movimientos = extracto.movimientos.select_related('pago__cliente')
+    if estado in dict(MovimientoBancario.ESTADO_CHOICES):
+        movimientos = movimientos.filter(estado=estado)
+    else:
+        estado = ''
+    
+    paginador = PaginadorKeyset(movimientos, ORDENES_MOVIMIENTOS, request.GET.get('orden'), por_pagina=50)
+    page_obj = paginador.pagina(request.GET.get('cursor'), parametros=request.GET)
+    
+    # Pagos candidatos de toda la página en una sola consulta
+    ids = {pago_id for movimiento in page_obj for pago_id in movimiento.candidatos}
+    pagos = Pago.objects.select_related('cliente').in_bulk(ids)
+    for movimiento in page_obj:
+        movimiento.pagos_candidatos = [pagos[i] for i in movimiento.candidatos if i in pagos]
+    
+    context = {
+        'extracto': extracto,
+        'page_obj': page_obj,
+        'estado_filter': estado,
+        'estados': MovimientoBancario.ESTADO_CHOICES,
+    }
+    
+    return render(request, 'pagos/extracto_detalle.html', context)
+
+
+@login_required
+@require_POST
+def movimiento_resolver(request, pk):
+    """Aplica un movimiento en revisión a un pago o lo descarta."""
+    movimiento = get_object_or_404(MovimientoBancario, pk=pk)
+    accion = request.POST.get('accion')
+    
+    if accion == 'aplicar':
+        try:
+            pago_id = int(request.POST.get('pago_id', ''))
+        except ValueError:
+            messages.error(request, 'Indica el número del pago al que corresponde el abono.')
+            return redirect('pagos:extracto_detalle', pk=movimiento.extracto_id)
+        resultado = ImportacionExtractoService.resolver(movimiento.pk, pago_id)
+        mensaje = f'Abono de la línea {movimiento.linea} aplicado al pago #{pago_id}.'
+    elif accion == 'descartar':
+        resultado = ImportacionExtractoService.resolver(movimiento.pk)
+        mensaje = f'Abono de la línea {movimiento.linea} descartado.'
+    else:
+        resultado = {'success': False, 'error': 'Acción no válida.'}
+    
+    if resultado['success']:
+        messages.success(request, mensaje)
+    else:
+        messages.error(request, resultado['error'])
+    return redirect(f"{reverse('pagos:extracto_detalle', args=[movimiento.extracto_id])}?estado={movimiento.estado}")
+
+
+# ============================================
+# Webhooks de pasarelas de pago
+# ============================================
+
+@csrf_exempt
+@require_POST
+def webhook_stripe(request):
+    """Recibe un webhook de Stripe: verifica la firma, lo guarda y responde de inmediato."""
+    resultado = BandejaWebhooks.recibir_stripe(request.body, request.META.get('HTTP_STRIPE_SIGNATURE', ''))
+    return JsonResponse(resultado, status=200 if resultado['success'] else 400)
+
+
+@csrf_exempt
+@require_POST
+def webhook_mercadopago(request):
+    """Recibe una notificación de Mercado Pago: verifica la firma, la guarda y responde de inmediato."""
+    resultado = BandejaWebhooks.recibir_mercadopago(
+        request.body,
+        request.META.get('HTTP_X_SIGNATURE', ''),
+        request.META.get('HTTP_X_REQUEST_ID', ''),
+        request.GET,
+    )
+    return JsonResponse(resultado, status=200 if resultado['success'] else 400)
+
+
+@staff_required
+def paypal_metricas(request):
+    """Latencia de la API de PayPal por endpoint, medida en este proceso."""
+    return JsonResponse({'metricas': metricas_paypal()})
+
+
 # ============================================
 # API para búsqueda de clientes
 # ============================================
@@ -218,13 +435,8 @@ def buscar_clientes(request):
     if len(query) < 2:
         return JsonResponse({'clientes': []})
     
-    clientes = Cliente.objects.filter(
-        Q(nombre__icontains=query) |
-        Q(apellido1__icontains=query) |
-        Q(apellido2__icontains=query) |
-        Q(telefono__icontains=query) |
-        Q(email__icontains=query)
-    ).order_by('nombre', 'apellido1')[:15]
+    # Resultados ordenados por relevancia
+    clientes = BusquedaService.buscar(Cliente.objects.all(), 'cliente', query, limite=15)
     
     data = {
         'clientes': [
@@ -296,206 +508,82 @@ def obtener_instalaciones_cliente(request, cliente_id):
 
 @login_required
 def pago_exportar_excel(request):
-    """Exporta los pagos filtrados a Excel."""
+    """
+    Exporta los pagos filtrados a Excel.
+    
+    Las exportaciones pequeñas se envían en streaming; las grandes se generan en
+    segundo plano y se avisa al usuario cuando el archivo está listo.
+    """
     try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment
-        from openpyxl.utils import get_column_letter
+        import openpyxl  # noqa: F401
     except ImportError:
         messages.error(request, 'La librería openpyxl no está instalada. Ejecuta: pip install openpyxl')
         return redirect('pagos:pago_list')
     
-    # Obtener los mismos filtros que en pago_list
-    pagos = Pago.objects.select_related('cliente', 'instalacion').all()
+    parametros = parametros_filtro(request.GET)
+    pagos = filtrar_pagos(parametros, VencimientoPagos.con_estado_efectivo(Pago.objects.all()))
     
-    query = request.GET.get('q', '')
-    if query:
-        pagos = pagos.filter(
-            Q(cliente__nombre__icontains=query) |
-            Q(cliente__apellido1__icontains=query) |
-            Q(cliente__apellido2__icontains=query) |
-            Q(cliente__telefono__icontains=query) |
-            Q(concepto__icontains=query) |
-            Q(referencia_pago__icontains=query)
-        )
-    
-    estado_filter = request.GET.get('estado', '')
-    if estado_filter:
-        pagos = pagos.filter(estado=estado_filter)
+    if ExportacionPagosService.en_segundo_plano(pagos, 'excel'):
+        return _exportar_en_segundo_plano(request, 'excel', parametros)
     
-    metodo_filter = request.GET.get('metodo', '')
-    if metodo_filter:
-        pagos = pagos.filter(metodo_pago=metodo_filter)
+    return ExportacionPagosService.respuesta_excel(pagos)
+
+
+@login_required
+def exportacion_descargar(request, pk):
+    """Descarga el archivo de una exportación en segundo plano."""
+    exportacion = get_object_or_404(ExportacionPagos, pk=pk)
+    if exportacion.usuario_id != request.user.id and not request.user.is_superuser:
+        raise Http404
+    
+    if exportacion.estado != 'completada' or not exportacion.archivo:
+        messages.warning(request, 'La exportación todavía no está lista.')
+        return redirect('pagos:pago_list')
     
-    periodo_anio = request.GET.get('anio', '')
-    periodo_mes = request.GET.get('mes', '')
-    if periodo_anio:
-        pagos = pagos.filter(periodo_anio=periodo_anio)
-    if periodo_mes:
-        pagos = pagos.filter(periodo_mes=periodo_mes)
-    
-    orden = request.GET.get('orden', '-fecha_vencimiento')
-    pagos = pagos.order_by(orden)
-    
-    # Crear workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Pagos"
-    
-    # Estilos
-    header_fill = PatternFill(start_color="667eea", end_color="667eea", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
-    
-    # Encabezados
-    headers = ['Cliente', 'Instalación', 'Concepto', 'Monto', 'Período', 
-               'Fecha Vencimiento', 'Fecha Pago', 'Estado', 'Método Pago', 
-               'Referencia', 'Notas']
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-    
-    # Datos
-    for row, pago in enumerate(pagos, 2):
-        ws.cell(row=row, column=1, value=pago.cliente.nombre_completo)
-        ws.cell(row=row, column=2, value=pago.instalacion.plan_nombre if pago.instalacion else '')
-        ws.cell(row=row, column=3, value=pago.concepto)
-        ws.cell(row=row, column=4, value=float(pago.monto))
-        ws.cell(row=row, column=5, value=f"{pago.get_periodo_mes_display()} {pago.periodo_anio}")
-        ws.cell(row=row, column=6, value=pago.fecha_vencimiento.strftime('%d/%m/%Y'))
-        ws.cell(row=row, column=7, value=pago.fecha_pago.strftime('%d/%m/%Y %H:%M') if pago.fecha_pago else '')
-        ws.cell(row=row, column=8, value=pago.get_estado_display())
-        ws.cell(row=row, column=9, value=pago.get_metodo_pago_display() if pago.metodo_pago else '')
-        ws.cell(row=row, column=10, value=pago.referencia_pago or '')
-        ws.cell(row=row, column=11, value=pago.notas or '')
-    
-    # Ajustar ancho de columnas
-    for col in range(1, len(headers) + 1):
-        ws.column_dimensions[get_column_letter(col)].width = 20
-    
-    # Crear respuesta
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    return FileResponse(
+        exportacion.archivo.open('rb'),
+        as_attachment=True,
+        filename=os.path.basename(exportacion.archivo.name),
     )
-    filename = f'pagos_export_{date.today().strftime("%Y%m%d")}.xlsx'
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    wb.save(response)
-    return response
 
 
 @login_required
 def pago_exportar_pdf(request):
-    """Exporta los pagos filtrados a PDF."""
+    """
+    Exporta los pagos filtrados a PDF, sin límite de filas.
+    
+    Los reportes pequeños se generan en la petición; el resto se genera en
+    segundo plano (en tomos paralelos si es muy grande) y se avisa al usuario.
+    """
     try:
-        from reportlab.lib.pagesizes import letter, A4
-        from reportlab.lib import colors
-        from reportlab.lib.units import inch
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        import reportlab  # noqa: F401
     except ImportError:
         messages.error(request, 'La librería reportlab no está instalada. Ejecuta: pip install reportlab')
         return redirect('pagos:pago_list')
     
-    # Obtener los mismos filtros que en pago_list
-    pagos = Pago.objects.select_related('cliente', 'instalacion').all()
+    parametros = parametros_filtro(request.GET)
+    pagos = filtrar_pagos(parametros, VencimientoPagos.con_estado_efectivo(Pago.objects.all()))
     
-    query = request.GET.get('q', '')
-    if query:
-        pagos = pagos.filter(
-            Q(cliente__nombre__icontains=query) |
-            Q(cliente__apellido1__icontains=query) |
-            Q(cliente__apellido2__icontains=query) |
-            Q(cliente__telefono__icontains=query) |
-            Q(concepto__icontains=query) |
-            Q(referencia_pago__icontains=query)
-        )
-    
-    estado_filter = request.GET.get('estado', '')
-    if estado_filter:
-        pagos = pagos.filter(estado=estado_filter)
+    if ExportacionPagosService.en_segundo_plano(pagos, 'pdf'):
+        return _exportar_en_segundo_plano(request, 'pdf', parametros)
     
-    metodo_filter = request.GET.get('metodo', '')
-    if metodo_filter:
-        pagos = pagos.filter(metodo_pago=metodo_filter)
-    
-    periodo_anio = request.GET.get('anio', '')
-    periodo_mes = request.GET.get('mes', '')
-    if periodo_anio:
-        pagos = pagos.filter(periodo_anio=periodo_anio)
-    if periodo_mes:
-        pagos = pagos.filter(periodo_mes=periodo_mes)
-    
-    orden = request.GET.get('orden', '-fecha_vencimiento')
-    pagos = pagos.order_by(orden)
-    
-    # Crear respuesta PDF
-    response = HttpResponse(content_type='application/pdf')
-    filename = f'pagos_export_{date.today().strftime("%Y%m%d")}.pdf'
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    # Crear documento
-    doc = SimpleDocTemplate(response, pagesize=A4)
-    elements = []
-    
-    # Estilos
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.HexColor('#667eea'),
-        spaceAfter=30,
-    )
-    
-    # Título
-    elements.append(Paragraph('Reporte de Pagos', title_style))
-    elements.append(Spacer(1, 0.2*inch))
-    
-    # Información del reporte
-    info_text = f"<b>Fecha de generación:</b> {date.today().strftime('%d/%m/%Y')}<br/>"
-    info_text += f"<b>Total de pagos:</b> {pagos.count()}<br/>"
-    if query:
-        info_text += f"<b>Búsqueda:</b> {query}<br/>"
-    if estado_filter:
-        info_text += f"<b>Estado:</b> {dict(Pago.ESTADO_CHOICES).get(estado_filter, estado_filter)}<br/>"
-    
-    elements.append(Paragraph(info_text, styles['Normal']))
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Preparar datos de la tabla
-    data = [['Cliente', 'Concepto', 'Monto', 'Período', 'Vencimiento', 'Estado']]
-    
-    for pago in pagos[:100]:  # Limitar a 100 para no sobrecargar el PDF
-        data.append([
-            pago.cliente.nombre_completo[:30],  # Truncar nombres largos
-            pago.concepto[:25],
-            f"${pago.monto:.2f}",
-            f"{pago.get_periodo_mes_display()} {pago.periodo_anio}",
-            pago.fecha_vencimiento.strftime('%d/%m/%Y'),
-            pago.get_estado_display()
-        ])
-    
-    # Crear tabla
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-    ]))
-    
-    elements.append(table)
-    
-    # Construir PDF
-    doc.build(elements)
-    return response
+    return ExportacionPagosService.respuesta_pdf(pagos, parametros)
+
+
+def _exportar_en_segundo_plano(request, formato, parametros):
+    """Encola la exportación (o reutiliza un archivo ya generado) y vuelve al listado."""
+    exportacion = ExportacionPagosService.encolar(request.user, formato, parametros)
+    if exportacion.estado == 'completada':
+        return redirect('pagos:exportacion_descargar', pk=exportacion.pk)
+    
+    if request.user.email:
+        messages.info(request, f'La exportación es grande y se está generando en segundo plano. Te avisaremos a {request.user.email} cuando esté lista.')
+    else:
+        messages.info(request, 'La exportación es grande y se está generando en segundo plano.')
+    url = reverse('pagos:pago_list')
+    if request.GET:
+        url += f'?{request.GET.urlencode()}'
+    return redirect(url)
 
 
 # ============================================
@@ -520,20 +608,6 @@ def pago_calendario(request):
     if anio < 2000 or anio > 2100:
         anio = hoy.year
     
-    # Obtener pagos del mes
-    pagos = Pago.objects.filter(
-        fecha_vencimiento__year=anio,
-        fecha_vencimiento__month=mes
-    ).select_related('cliente', 'instalacion').order_by('fecha_vencimiento')
-    
-    # Organizar pagos por día
-    pagos_por_dia = {}
-    for pago in pagos:
-        dia = pago.fecha_vencimiento.day
-        if dia not in pagos_por_dia:
-            pagos_por_dia[dia] = []
-        pagos_por_dia[dia].append(pago)
-    
     # Calcular días del mes y primer día de la semana
     dias_en_mes = monthrange(anio, mes)[1]
     primer_dia = date(anio, mes, 1)
@@ -558,12 +632,12 @@ def pago_calendario(request):
         mes_siguiente = mes + 1
         anio_siguiente = anio
     
-    # Estadísticas del mes
-    total_pagos = pagos.count()
-    total_monto = pagos.aggregate(Sum('monto'))['monto__sum'] or 0
-    pagos_pendientes = pagos.filter(estado='pendiente').count()
-    pagos_vencidos = pagos.filter(estado='vencido').count()
-    pagos_pagados = pagos.filter(estado='pagado').count()
+    # Cantidad y monto por día y estado (una sola consulta agrupada, en caché por mes)
+    resumen = CalendarioPagos.resumen_mes(anio, mes, hoy)
+    dias = [
+        {'numero': numero, 'fecha': date(anio, mes, numero), 'resumen': resumen['dias'].get(numero)}
+        for numero in range(1, dias_en_mes + 1)
+    ]
     
     context = {
         'anio': anio,
@@ -571,29 +645,47 @@ def pago_calendario(request):
         'mes_nombre': meses[mes],
         'dias_en_mes': dias_en_mes,
         'primer_dia_semana': primer_dia_semana,
-        'pagos_por_dia': pagos_por_dia,
+        'dias': dias,
         'mes_anterior': mes_anterior,
         'anio_anterior': anio_anterior,
         'mes_siguiente': mes_siguiente,
         'anio_siguiente': anio_siguiente,
-        'total_pagos': total_pagos,
-        'total_monto': total_monto,
-        'pagos_pendientes': pagos_pendientes,
-        'pagos_vencidos': pagos_vencidos,
-        'pagos_pagados': pagos_pagados,
+        'total_pagos': resumen['total_pagos'],
+        'total_monto': resumen['total_monto'],
+        'pagos_pendientes': resumen['pagos_pendientes'],
+        'pagos_vencidos': resumen['pagos_vencidos'],
+        'pagos_pagados': resumen['pagos_pagados'],
         'hoy': hoy,
     }
     
     return render(request, 'pagos/pago_calendario.html', context)
 
 
+@login_required
+def pago_calendario_dia(request):
+    """API con los pagos de un día del calendario (paginada por cursor)."""
+    try:
+        fecha = date.fromisoformat(request.GET.get('fecha', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Fecha inválida (formato AAAA-MM-DD)'}, status=400)
+    
+    return JsonResponse(CalendarioPagos.pagos_dia(
+        fecha, estado=request.GET.get('estado'), cursor=request.GET.get('cursor'),
+    ))
+
+
 # ============================================
 # Reportes Financieros
 # ============================================
 
 @login_required
 def pago_reportes(request):
-    """Vista de reportes financieros."""
+    """
+    Vista de reportes financieros.
+    
+    Los totales, ingresos por mes y métodos de pago se leen de ResumenMensualPagos,
+    por lo que el costo no depende de la cantidad de pagos históricos.
+    """
     # Obtener año de la URL o usar el actual
     hoy = date.today()
     try:
@@ -608,68 +700,96 @@ def pago_reportes(request):
     if anio < 2000 or anio > 2100:
         anio = hoy.year
     
-    # Obtener todos los pagos del año
-    pagos = Pago.objects.filter(periodo_anio=anio).select_related('cliente', 'instalacion')
-    
-    # Estadísticas generales
-    total_pagos = pagos.count()
-    total_monto = pagos.aggregate(Sum('monto'))['monto__sum'] or 0
-    monto_pagado = pagos.filter(estado='pagado').aggregate(Sum('monto'))['monto__sum'] or 0
-    monto_pendiente = pagos.filter(estado__in=['pendiente', 'vencido']).aggregate(Sum('monto'))['monto__sum'] or 0
-    
-    # Ingresos por mes
-    ingresos_por_mes = []
-    for mes in range(1, 13):
-        pagos_mes = pagos.filter(periodo_mes=mes, estado='pagado')
-        monto_mes = pagos_mes.aggregate(Sum('monto'))['monto__sum'] or 0
-        cantidad_mes = pagos_mes.count()
-        ingresos_por_mes.append({
+    # Totales, ingresos por mes y métodos de pago desde el resumen mensual
+    resumen = ResumenPagosService.reporte_anual(anio)
+    ingresos_por_mes = [
+        {
             'mes': mes,
-            'mes_nombre': ['', 'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
-                          'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre'][mes],
-            'monto': monto_mes,
-            'cantidad': cantidad_mes
-        })
-    
-    # Top 10 clientes por monto pagado
-    top_clientes = pagos.filter(estado='pagado').values(
-        'cliente__nombre', 'cliente__apellido1', 'cliente__id'
-    ).annotate(
-        total_pagado=Sum('monto'),
-        cantidad_pagos=Count('id')
-    ).order_by('-total_pagado')[:10]
-    
-    # Clientes morosos (con pagos vencidos)
-    clientes_morosos = pagos.filter(estado='vencido').values(
-        'cliente__nombre', 'cliente__apellido1', 'cliente__id'
-    ).annotate(
-        total_vencido=Sum('monto'),
-        cantidad_vencidos=Count('id')
-    ).order_by('-total_vencido')[:10]
-    
-    # Métodos de pago más usados
-    metodos_pago = pagos.filter(estado='pagado', metodo_pago__isnull=False).values(
-        'metodo_pago'
-    ).annotate(
-        total=Sum('monto'),
-        cantidad=Count('id')
-    ).order_by('-total')
-    
-    # Promedio de pago
-    promedio_pago = pagos.filter(estado='pagado').aggregate(Avg('monto'))['monto__avg'] or 0
+            'mes_nombre': MESES_NOMBRES[mes],
+            'monto': resumen['por_mes'][mes]['monto'],
+            'cantidad': resumen['por_mes'][mes]['cantidad'],
+        }
+        for mes in range(1, 13)
+    ]
+    
+    # Los rankings por cliente no caben en el resumen: se calculan sobre el año
+    # y se guardan en caché hasta que cambien los pagos
+    clave_rankings = f'pago_reportes_rankings_{anio}_v{version_persistente("pagos")}'
+    rankings = cache.get(clave_rankings)
+    if rankings is None:
+        pagos = Pago.objects.filter(periodo_anio=anio)
+        rankings = {
+            # Top 10 clientes por monto pagado
+            'top_clientes': list(pagos.filter(estado='pagado').values(
+                'cliente__nombre', 'cliente__apellido1', 'cliente__id'
+            ).annotate(
+                total_pagado=Sum('monto'),
+                cantidad_pagos=Count('id')
+            ).order_by('-total_pagado')[:10]),
+        }
+        cache.set(clave_rankings, rankings, 300)
+    
+    # Clientes morosos: saldo vencido actual desde el saldo por cliente (índice por monto vencido)
+    clientes_morosos = SaldoCliente.objects.filter(monto_vencido__gt=0).order_by('-monto_vencido').values(
+        'cliente__nombre', 'cliente__apellido1', 'cliente__id',
+        'monto_90_mas', total_vencido=F('monto_vencido'), cantidad_vencidos=F('pagos_vencidos'),
+    )[:10]
     
     context = {
         'anio': anio,
         'años_disponibles': años_disponibles,
-        'total_pagos': total_pagos,
-        'total_monto': total_monto,
-        'monto_pagado': monto_pagado,
-        'monto_pendiente': monto_pendiente,
+        'total_pagos': resumen['total_pagos'],
+        'total_monto': resumen['total_monto'],
+        'monto_pagado': resumen['monto_pagado'],
+        'monto_pendiente': resumen['monto_pendiente'],
         'ingresos_por_mes': ingresos_por_mes,
-        'top_clientes': top_clientes,
+        'top_clientes': rankings['top_clientes'],
         'clientes_morosos': clientes_morosos,
-        'metodos_pago': metodos_pago,
-        'promedio_pago': promedio_pago,
+        'metodos_pago': resumen['metodos_pago'],
+        'promedio_pago': resumen['promedio_pago'],
     }
     
     return render(request, 'pagos/pago_reportes.html', context)
+
+
+@login_required
+def pago_antiguedad(request):
+    """Reporte de antigüedad de saldos de toda la cartera, por cliente, ciudad o plan."""
+    reporte = ReporteAntiguedad(request.GET.get('agrupar', 'cliente')).generar()
+    
+    context = {
+        'reporte': reporte,
+        'agrupacion': reporte['agrupacion'],
+        'agrupaciones': [(clave, valor['nombre']) for clave, valor in AGRUPACIONES.items()],
+        'rangos': [nombre for _, nombre in RANGOS],
+    }
+    
+    return render(request, 'pagos/pago_antiguedad.html', context)
+
+
+@login_required
+def pago_antiguedad_csv(request):
+    """Exporta el reporte de antigüedad completo en CSV (en streaming)."""
+    reporte = ReporteAntiguedad(request.GET.get('agrupar', 'cliente'))
+    response = StreamingHttpResponse(reporte.lineas_csv(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = (
+        f'attachment; filename="antiguedad_saldos_{reporte.agrupacion}_{reporte.hoy:%Y%m%d}.csv"'
+    )
+    return response
+
+
+@login_required
+def pago_analitica(request):
+    """Tablero de ingresos recurrentes: MRR, bajas, retención por cohorte y pronóstico de cobranza."""
+    try:
+        from .analitica import AnaliticaIngresos
+    except ImportError:
+        messages.error(request, 'La librería numpy no está instalada. Ejecuta: pip install numpy')
+        return redirect('pagos:pago_reportes')
+    
+    context = {
+        'analitica': AnaliticaIngresos().generar(),
+        'columnas_cohorte': range(12),
+    }
+    
+    return render(request, 'pagos/pago_analitica.html', context)
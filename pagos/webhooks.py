@@ -0,0 +1,344 @@
+"""
+Bandeja de entrada de webhooks de las pasarelas de pago.
+
+El endpoint de cada pasarela solo verifica la firma, guarda el evento en
+EventoWebhook y responde 200: no consulta la pasarela ni modifica pagos. La
+restricción única (pasarela, id_evento) descarta los reintentos, de modo que un
+evento repetido se confirma sin volver a registrarse.
+
+Los eventos pendientes se aplican en lotes con `manage.py procesar_webhooks`
+(desde cron o con --continuo). Cada evento se reclama con un UPDATE condicional
+y las transiciones de TransaccionPago/Pago son idempotentes: una transacción ya
+completada no se vuelve a completar ni retrocede por un evento tardío.
+
+Antes de completar se compara el monto cobrado con el monto actual del pago: si
+no coincide (ej. se pagó una sesión vieja después de un cambio de monto), el pago
+no se marca como pagado y la transacción queda 'procesando' para revisión manual.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import time
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import EventoWebhook, TransaccionPago
+
+logger = logging.getLogger(__name__)
+
+
+def _partes_firma(cabecera):
+    """Convierte 't=1,v1=abc,v1=def' en {'t': ['1'], 'v1': ['abc', 'def']}."""
+    partes = {}
+    for parte in (cabecera or '').split(','):
+        clave, _, valor = parte.strip().partition('=')
+        if clave and valor:
+            partes.setdefault(clave, []).append(valor)
+    return partes
+
+
+def _monto(valor, centavos=False):
+    """Monto de la pasarela como Decimal con dos decimales (None si no viene)."""
+    if valor is None:
+        return None
+    try:
+        monto = Decimal(str(valor))
+    except (InvalidOperation, ValueError):
+        return None
+    return (monto / 100 if centavos else monto).quantize(Decimal('0.01'))
+
+
+def _hmac_sha256(secreto, mensaje):
+    return hmac.new(secreto.encode('utf-8'), mensaje.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def verificar_firma_stripe(payload, cabecera, secreto, tolerancia=300, ahora=None):
+    """
+    Verifica la cabecera Stripe-Signature (HMAC-SHA256 de "timestamp.payload").
+
+    Args:
+        payload: Cuerpo de la petición (str o bytes)
+        cabecera: Valor de Stripe-Signature ("t=...,v1=...")
+        secreto: STRIPE_WEBHOOK_SECRET
+        tolerancia: Antigüedad máxima del evento en segundos
+    """
+    if isinstance(payload, bytes):
+        payload = payload.decode('utf-8')
+    partes = _partes_firma(cabecera)
+    try:
+        timestamp = int(partes['t'][0])
+    except (KeyError, ValueError):
+        return False
+    ahora = ahora if ahora is not None else time.time()
+    if tolerancia and abs(ahora - timestamp) > tolerancia:
+        return False
+    esperada = _hmac_sha256(secreto, f'{timestamp}.{payload}')
+    return any(hmac.compare_digest(esperada, firma) for firma in partes.get('v1', []))
+
+
+def verificar_firma_mercadopago(cabecera, request_id, recurso_id, secreto):
+    """
+    Verifica la cabecera x-signature de Mercado Pago.
+
+    El manifiesto firmado es "id:<data.id>;request-id:<x-request-id>;ts:<ts>;".
+    """
+    partes = _partes_firma(cabecera)
+    if 'ts' not in partes or 'v1' not in partes:
+        return False
+    manifiesto = ''
+    if recurso_id:
+        manifiesto += f'id:{str(recurso_id).lower()};'
+    if request_id:
+        manifiesto += f'request-id:{request_id};'
+    manifiesto += f"ts:{partes['ts'][0]};"
+    esperada = _hmac_sha256(secreto, manifiesto)
+    return any(hmac.compare_digest(esperada, firma) for firma in partes['v1'])
+
+
+class BandejaWebhooks:
+    """Servicio para recibir y aplicar los eventos de webhook de las pasarelas."""
+
+    @staticmethod
+    def registrar(pasarela, id_evento, tipo, datos):
+        """
+        Guarda un evento en la bandeja; un id_evento repetido no se vuelve a guardar.
+
+        Returns:
+            dict: {'success': True, 'duplicado': bool, 'evento_id': int o None}
+        """
+        try:
+            with transaction.atomic():
+                evento = EventoWebhook.objects.create(
+                    pasarela=pasarela,
+                    id_evento=str(id_evento)[:200],
+                    tipo=(tipo or '')[:100],
+                    datos=datos,
+                )
+        except IntegrityError:
+            logger.info(f'Webhook duplicado de {pasarela}: {id_evento}')
+            return {'success': True, 'duplicado': True, 'evento_id': None}
+        return {'success': True, 'duplicado': False, 'evento_id': evento.pk}
+
+    @classmethod
+    def recibir_stripe(cls, payload, firma):
+        """Verifica la firma de un webhook de Stripe y lo guarda en la bandeja."""
+        secreto = getattr(settings, 'STRIPE_WEBHOOK_SECRET', '')
+        if not secreto:
+            logger.warning("STRIPE_WEBHOOK_SECRET no configurada")
+            return {'success': False, 'error': 'Webhook secret no configurado'}
+        tolerancia = getattr(settings, 'STRIPE_WEBHOOK_TOLERANCIA', 300)
+        if not verificar_firma_stripe(payload, firma, secreto, tolerancia=tolerancia):
+            logger.warning("Webhook de Stripe con firma inválida")
+            return {'success': False, 'error': 'Firma inválida'}
+        try:
+            evento = json.loads(payload)
+            return cls.registrar('stripe', evento['id'], evento.get('type'), evento)
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Payload de Stripe inválido: {str(e)}")
+            return {'success': False, 'error': 'Payload inválido'}
+
+    @classmethod
+    def recibir_mercadopago(cls, payload, firma, request_id, parametros):
+        """
+        Verifica la firma de una notificación de Mercado Pago y la guarda en la bandeja.
+
+        La notificación solo indica qué recurso cambió; el estado real del pago se
+        consulta a la API al procesarla. Por eso, si MERCADOPAGO_WEBHOOK_SECRET no
+        está configurada, se acepta sin firma: una notificación falsa solo provoca
+        una consulta.
+
+        Args:
+            payload: Cuerpo de la petición (puede venir vacío en el formato IPN)
+            firma: Cabecera x-signature
+            request_id: Cabecera x-request-id
+            parametros: Parámetros de la URL (data.id, type, topic, id)
+        """
+        try:
+            cuerpo = json.loads(payload) if payload else {}
+        except ValueError:
+            return {'success': False, 'error': 'Payload inválido'}
+        if not isinstance(cuerpo, dict):
+            return {'success': False, 'error': 'Payload inválido'}
+
+        tipo = cuerpo.get('type') or parametros.get('type') or parametros.get('topic') or ''
+        recurso_id = (
+            (cuerpo.get('data') or {}).get('id')
+            or parametros.get('data.id')
+            or parametros.get('id')
+        )
+        if not recurso_id:
+            return {'success': False, 'error': 'Notificación sin recurso'}
+
+        secreto = getattr(settings, 'MERCADOPAGO_WEBHOOK_SECRET', '')
+        if secreto:
+            firmado = parametros.get('data.id') or recurso_id
+            if not verificar_firma_mercadopago(firma, request_id, firmado, secreto):
+                logger.warning("Webhook de Mercado Pago con firma inválida")
+                return {'success': False, 'error': 'Firma inválida'}
+
+        # Mercado Pago manda una notificación por cada cambio de estado del mismo pago:
+        # sin id propio, x-request-id distingue cada envío
+        id_evento = cuerpo.get('id') or f"{tipo}:{recurso_id}:{cuerpo.get('action', '')}:{request_id or ''}"
+        datos = {'recurso_id': str(recurso_id), 'accion': cuerpo.get('action', ''), 'cuerpo': cuerpo}
+        resultado = cls.registrar('mercadopago', id_evento, tipo, datos)
+        if resultado['duplicado']:
+            # Sin x-request-id la clave se repite entre cambios de estado: volver a encolar
+            # el evento ya aplicado, que al procesarse consulta el estado actual del pago
+            EventoWebhook.objects.filter(
+                pasarela='mercadopago', id_evento=str(id_evento)[:200], estado__in=['procesado', 'ignorado']
+            ).update(estado='pendiente')
+        return resultado
+
+    # ------------------------------------------------------------------
+    # Procesamiento
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def procesar_pendientes(cls, limite=None):
+        """
+        Aplica un lote de eventos pendientes en orden de llegada.
+
+        Returns:
+            dict: Cantidad de eventos por estado final
+        """
+        limite = limite or getattr(settings, 'PAGOS_WEBHOOK_LOTE', 100)
+        ids = list(
+            EventoWebhook.objects.filter(estado='pendiente')
+            .order_by('fecha_recepcion', 'id')
+            .values_list('id', flat=True)[:limite]
+        )
+        resumen = {}
+        for evento_id in ids:
+            # Reclamar el evento: si otro proceso lo tomó, el UPDATE no afecta filas
+            reclamado = EventoWebhook.objects.filter(pk=evento_id, estado='pendiente').update(
+                estado='procesando', intentos=F('intentos') + 1
+            )
+            if not reclamado:
+                continue
+            evento = EventoWebhook.objects.get(pk=evento_id)
+            estado = cls.procesar(evento)
+            resumen[estado] = resumen.get(estado, 0) + 1
+        return resumen
+
+    @classmethod
+    def procesar(cls, evento):
+        """
+        Aplica un evento ya reclamado y guarda su estado final.
+
+        Si falla, vuelve a pendiente hasta PAGOS_WEBHOOK_MAX_INTENTOS; después queda fallido.
+
+        Returns:
+            str: Estado final del evento
+        """
+        try:
+            with transaction.atomic():
+                if evento.pasarela == 'stripe':
+                    estado, mensaje = cls._aplicar_stripe(evento)
+                elif evento.pasarela == 'mercadopago':
+                    estado, mensaje = cls._aplicar_mercadopago(evento)
+                else:
+                    estado, mensaje = 'ignorado', f'Pasarela {evento.pasarela} sin procesador de webhooks'
+        except Exception as e:
+            max_intentos = getattr(settings, 'PAGOS_WEBHOOK_MAX_INTENTOS', 5)
+            estado = 'fallido' if evento.intentos >= max_intentos else 'pendiente'
+            mensaje = str(e)
+            logger.error(f'Error al procesar webhook {evento.pk} ({evento.pasarela} {evento.id_evento}): {mensaje}')
+
+        evento.estado = estado
+        evento.resultado = mensaje
+        evento.fecha_procesado = timezone.now()
+        evento.save(update_fields=['estado', 'resultado', 'fecha_procesado'])
+        return estado
+
+    @classmethod
+    def _aplicar_stripe(cls, evento):
+        objeto = evento.datos.get('data', {}).get('object', {})
+        if evento.tipo == 'checkout.session.completed':
+            transaccion = TransaccionPago.objects.filter(id_transaccion_pasarela=objeto.get('id')).first()
+            return cls.completar(transaccion, _monto(objeto.get('amount_total'), centavos=True))
+        if evento.tipo == 'payment_intent.succeeded':
+            transaccion = TransaccionPago.objects.filter(id_pago_intento=objeto.get('id')).first()
+            return cls.completar(transaccion, _monto(objeto.get('amount_received'), centavos=True))
+        if evento.tipo == 'payment_intent.payment_failed':
+            transaccion = TransaccionPago.objects.filter(id_pago_intento=objeto.get('id')).first()
+            error = (objeto.get('last_payment_error') or {}).get('message', 'Pago fallido')
+            return cls.fallar(transaccion, error)
+        return 'ignorado', f'Evento de Stripe no procesado: {evento.tipo}'
+
+    @classmethod
+    def _aplicar_mercadopago(cls, evento):
+        if evento.tipo != 'payment':
+            return 'ignorado', f'Notificación de Mercado Pago no procesada: {evento.tipo}'
+
+        pago_mp = cls.consultar_pago_mercadopago(evento.datos['recurso_id'])
+        payment_id = str(pago_mp.get('id') or evento.datos['recurso_id'])
+        transaccion = TransaccionPago.objects.filter(pasarela='mercadopago', id_pago_intento=payment_id).first()
+        if transaccion is None and pago_mp.get('external_reference'):
+            # Las transacciones se crean con el id de la preferencia; el pago llega con external_reference
+            transaccion = TransaccionPago.objects.filter(
+                pasarela='mercadopago',
+                pago_id=pago_mp['external_reference'],
+            ).exclude(estado='reembolsada').order_by('-fecha_creacion').first()
+        if transaccion is None:
+            return 'ignorado', f'Transacción no encontrada para el pago {payment_id}'
+
+        if transaccion.id_pago_intento != payment_id:
+            TransaccionPago.objects.filter(pk=transaccion.pk).update(id_pago_intento=payment_id)
+
+        status = pago_mp.get('status')
+        if status == 'approved':
+            return cls.completar(transaccion, _monto(pago_mp.get('transaction_amount')))
+        if status in ('rejected', 'cancelled'):
+            return cls.fallar(transaccion, pago_mp.get('status_detail') or f'Pago {status}')
+        return 'procesado', f'Pago {payment_id} en estado {status}'
+
+    @staticmethod
+    def consultar_pago_mercadopago(payment_id):
+        """Consulta un pago en la API de Mercado Pago."""
+        from .payment_gateway import PaymentGateway
+
+        gateway = PaymentGateway(pasarela='mercadopago')
+        respuesta = gateway.mp.payment().get(payment_id)
+        if respuesta.get('status') != 200:
+            raise ValueError(f"Mercado Pago respondió {respuesta.get('status')} al consultar el pago {payment_id}")
+        return respuesta.get('response', {})
+
+    @staticmethod
+    def completar(transaccion, monto_pagado=None):
+        """
+        Completa la transacción y marca el pago como pagado (sin efecto si ya estaba completada).
+
+        Si monto_pagado no coincide con el monto del pago, no se marca como pagado: la
+        transacción queda 'procesando' con el detalle en mensaje_error.
+        """
+        if transaccion is None:
+            return 'ignorado', 'Transacción no encontrada'
+        transaccion = TransaccionPago.objects.select_for_update().select_related('pago').get(pk=transaccion.pk)
+        if transaccion.estado in ('completada', 'reembolsada'):
+            return 'ignorado', f'Transacción {transaccion.pk} ya {transaccion.estado}'
+        if monto_pagado is not None and monto_pagado != transaccion.pago.monto:
+            mensaje = (
+                f'Monto cobrado ${monto_pagado} distinto del monto del pago ${transaccion.pago.monto}: '
+                f'requiere revisión manual'
+            )
+            transaccion.estado = 'procesando'
+            transaccion.mensaje_error = mensaje
+            transaccion.save(update_fields=['estado', 'mensaje_error', 'fecha_actualizacion'])
+            logger.error(f'Transacción {transaccion.pk} (pago {transaccion.pago_id}): {mensaje}')
+            return 'procesado', f'Transacción {transaccion.pk} en revisión: {mensaje}'
+        transaccion.marcar_como_completada()
+        return 'procesado', f'Transacción {transaccion.pk} completada'
+
+    @staticmethod
+    def fallar(transaccion, mensaje_error):
+        """Marca la transacción como fallida (sin efecto si ya se completó)."""
+        if transaccion is None:
+            return 'ignorado', 'Transacción no encontrada'
+        transaccion = TransaccionPago.objects.select_for_update().get(pk=transaccion.pk)
+        if transaccion.estado in ('completada', 'reembolsada', 'fallida'):
+            return 'ignorado', f'Transacción {transaccion.pk} ya {transaccion.estado}'
+        transaccion.marcar_como_fallida(mensaje_error=mensaje_error)
+        return 'procesado', f'Transacción {transaccion.pk} fallida'